@@ -16,7 +16,7 @@ project_root = os.path.dirname(os.path.abspath(__file__))
 src_path = os.path.join(project_root, 'src')
 sys.path.insert(0, src_path)
 
-def run_basic_spider(max_pages=5, spider_type='role', equip_type='normal', use_browser=True, delay_range=(5, 8), cached_params_file=None, skip_cookie_check=False):
+def run_basic_spider(max_pages=5, spider_type='role', equip_type='normal', use_browser=True, delay_range=(5, 8), cached_params_file=None, skip_cookie_check=False, concurrency=1, rate=None):
     """运行基础爬虫"""
     # 移除print输出，避免重复日志
     # print("启动基础CBG爬虫...")
@@ -42,7 +42,7 @@ def run_basic_spider(max_pages=5, spider_type='role', equip_type='normal', use_b
                 os.unlink(cached_params_file)
     
     # 调用新的run_spider函数
-    run_spider(spider_type=spider_type, equip_type=equip_type, max_pages=max_pages, delay_range=delay_range, use_browser=use_browser, cached_params=cached_params, skip_cookie_check=skip_cookie_check)
+    run_spider(spider_type=spider_type, equip_type=equip_type, max_pages=max_pages, delay_range=delay_range, use_browser=use_browser, cached_params=cached_params, skip_cookie_check=skip_cookie_check, concurrency=concurrency, rate=rate)
 
 def run_proxy_spider(max_pages=5):
     """运行带代理的爬虫"""
@@ -172,7 +172,7 @@ def show_help_examples():
     print("   - 支持参数缓存，避免重复设置")
     print("="*60)
 
-def run_spider(spider_type='role', equip_type='normal', max_pages=10, delay_range=(1, 3), use_browser=False, cached_params=None, skip_cookie_check=False):
+def run_spider(spider_type='role', equip_type='normal', max_pages=10, delay_range=(1, 3), use_browser=False, cached_params=None, skip_cookie_check=False, concurrency=1, rate=None):
     """运行指定的爬虫"""
     print(f"启动{spider_type}爬虫...")
     
@@ -198,7 +198,7 @@ def run_spider(spider_type='role', equip_type='normal', max_pages=10, delay_rang
             # 爬取数据
             print("开始爬取数据...")
             print(f"爬取角色数据，页数: {max_pages}")
-            spider.crawl_all_pages(max_pages=max_pages, delay_range=delay_range, use_browser=use_browser, search_params=cached_params)
+            spider.crawl_all_pages(max_pages=max_pages, delay_range=delay_range, use_browser=use_browser, search_params=cached_params, concurrency=concurrency, rate=rate)
             return
             
         except Exception as e:
@@ -237,7 +237,9 @@ def run_spider(spider_type='role', equip_type='normal', max_pages=10, delay_rang
                 delay_range=delay_range, 
                 use_browser=use_browser,
                 equip_type=equip_type,
-                cached_params=cached_params
+                cached_params=cached_params,
+                concurrency=concurrency,
+                rate=rate
             )
             return
             
@@ -270,7 +272,9 @@ def run_spider(spider_type='role', equip_type='normal', max_pages=10, delay_rang
                 max_pages=max_pages, 
                 delay_range=delay_range, 
                 use_browser=use_browser,
-                cached_params=cached_params
+                cached_params=cached_params,
+                concurrency=concurrency,
+                rate=rate
             )
             return
             
@@ -534,6 +538,10 @@ def main():
                            help='请求延迟最小值(秒) (默认: 5.0)')
         parser.add_argument('--delay-max', type=float, default=8.0,
                            help='请求延迟最大值(秒) (默认: 8.0)')
+        parser.add_argument('--concurrency', type=int, default=1,
+                           help='同时在途的页面请求数 (默认: 1)')
+        parser.add_argument('--rate', type=float,
+                           help='每秒请求数，不指定时按延迟范围的平均间隔限速')
         parser.add_argument('--cached-params', type=str,
                            help='缓存参数文件路径')
         
@@ -577,6 +585,7 @@ def main():
                 print(f"数据库: cbg_pets_{datetime.now().strftime('%Y%m')}.db")
             print(f"爬取页数: {args.pages}")
             print(f"延迟范围: {args.delay_min}-{args.delay_max}秒")
+            print(f"并发页数: {args.concurrency}")
             if args.use_browser:
                 print("浏览器模式: 启用")
                 if args.type == 'pet':
@@ -603,7 +612,9 @@ def main():
                     use_browser=args.use_browser,
                     delay_range=(args.delay_min, args.delay_max),
                     cached_params_file=args.cached_params,
-                    skip_cookie_check=args.skip_cookie_check
+                    skip_cookie_check=args.skip_cookie_check,
+                    concurrency=args.concurrency,
+                    rate=args.rate
                 )
             elif args.mode == 'proxy':
                 run_proxy_spider(args.pages)
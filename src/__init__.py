@@ -7,21 +7,17 @@ __version__ = "2.0.0"
 __author__ = "CBG Spider Team"
 __description__ = "梦幻西游藏宝阁智能爬虫系统"
 
-# 导出主要类 - 延迟导入，避免在模块加载时自动创建数据库
+# 导出主要类 - 延迟导入：爬虫子进程等只用到部分子模块的场景，导入src包时不加载SQLAlchemy等重量级依赖
 # from .cbg_spider import CBGSpider
 # from .spider.equip import CBGEquipSpider
-from .utils.smart_db_helper import CBGSmartDB, SmartDBHelper
-
-# 可选导入，避免模块不存在时出错
-try:
-    from .proxy_rotation_system import ProxyRotationManager
-except ImportError:
-    ProxyRotationManager = None
-
-try:
-    from .proxy_source_manager import ProxySourceManager
-except ImportError:
-    ProxySourceManager = None
+_LAZY_EXPORTS = {
+    'CBGSmartDB': ('.utils.smart_db_helper', 'CBGSmartDB'),
+    'SmartDBHelper': ('.utils.smart_db_helper', 'SmartDBHelper'),
+    # 可选模块，不存在时为None
+    'ProxyRotationManager': ('.proxy_rotation_system', 'ProxyRotationManager'),
+    'ProxySourceManager': ('.proxy_source_manager', 'ProxySourceManager'),
+}
+_OPTIONAL_EXPORTS = ('ProxyRotationManager', 'ProxySourceManager')
 
 __all__ = [
     # 'CBGEquipSpider',  # 延迟导入
@@ -30,11 +26,22 @@ __all__ = [
     'SmartDBHelper',
 ]
 
-# 添加可选模块
-if ProxyRotationManager:
-    __all__.append('ProxyRotationManager')
-if ProxySourceManager:
-    __all__.append('ProxySourceManager')
+
+def __getattr__(name):
+    """第一次访问导出的类时才导入对应模块"""
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    module_name, attr = _LAZY_EXPORTS[name]
+    try:
+        value = getattr(importlib.import_module(module_name, __name__), attr)
+    except ImportError:
+        if name not in _OPTIONAL_EXPORTS:
+            raise
+        value = None
+    globals()[name] = value
+    return value
+
 
 """
 梦幻西游角色评估系统
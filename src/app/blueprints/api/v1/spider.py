@@ -23,6 +23,7 @@ API端点列表:
 - max_pages: 爬取页数 (默认5)
 - delay_min: 最小延迟秒数 (默认5.0)
 - delay_max: 最大延迟秒数 (默认8.0)
+- max_workers: 多服务器模式下同时爬取的服务器数 (默认3，环境变量SPIDER_MAX_WORKERS)
 
 响应格式:
 {
@@ -191,7 +192,8 @@ def start_equip_spider():
             delay_max=data.get('delay_max', 8.0),
             cached_params=data.get('cached_params'),
             target_server_list=target_server_list,
-            multi=multi
+            multi=multi,
+            max_workers=data.get('max_workers')
         )
         return success_response(data=result, message="装备爬虫已启动")
     except Exception as e:
@@ -219,7 +221,8 @@ def start_pet_spider():
             delay_max=data.get('delay_max', 8.0),
             cached_params=data.get('cached_params'),
             target_server_list=target_server_list,
-            multi=multi
+            multi=multi,
+            max_workers=data.get('max_workers')
         )
         return success_response(data=result, message="召唤兽爬虫已启动")
     except Exception as e:
@@ -478,7 +481,8 @@ def stream_logs():
                     total_servers = task_status.get('details', {}).get('total_servers', 0)
                     
                     # 如果当前没有服务器在运行，说明正在等待
-                    if current_server and completed_servers > 0 and completed_servers < total_servers:
+                    running_servers = task_status.get('details', {}).get('running_servers')
+                    if current_server and not running_servers and completed_servers > 0 and completed_servers < total_servers:
                         # 计算等待时间（基于延迟参数）
                         delay_min = 5.0  # 默认最小延迟
                         delay_max = 8.0  # 默认最大延迟
@@ -37,7 +37,8 @@ class SpiderController:
                           delay_max: float = 8.0,
                           cached_params: dict = None,
                           target_server_list: list = None,
-                          multi: bool = False):
+                          multi: bool = False,
+                        max_workers: int = None):
         """
         启动基础爬虫
         
@@ -50,6 +51,7 @@ class SpiderController:
             cached_params: 缓存的搜索参数
             target_server_list: 目标服务器列表
             multi: 是否多服务器模式
+            max_workers: 多服务器模式下同时爬取的服务器数
         """
         if self.service.is_task_running():
             raise Exception("已有任务在运行中")
@@ -64,7 +66,8 @@ class SpiderController:
                     delay_max=delay_max,
                     cached_params=cached_params,
                     target_server_list=target_server_list,
-                    multi=multi
+                    multi=multi,
+                    max_workers=max_workers
                 )
             except Exception as e:
                 logger.error(f"基础爬虫执行失败: {e}")
@@ -97,7 +100,8 @@ class SpiderController:
     
     def start_equip_spider(self, equip_type: str = 'normal', max_pages: int = 5, delay_min: float = 5.0, 
                           delay_max: float = 8.0, cached_params: dict = None,
-                          target_server_list: list = None, multi: bool = False):
+                          target_server_list: list = None, multi: bool = False,
+                          max_workers: int = None):
         """启动装备爬虫"""
         return self.start_basic_spider(
             spider_type='equip',
@@ -107,14 +111,16 @@ class SpiderController:
             delay_max=delay_max,
             cached_params=cached_params,
             target_server_list=target_server_list,
-            multi=multi
+            multi=multi,
+            max_workers=max_workers
         )
     
     def start_pet_spider(self, max_pages: int = 5,
                         delay_min: float = 5.0, delay_max: float = 8.0,
                         cached_params: dict = None,
                         target_server_list: list = None,
-                        multi: bool = False):
+                        multi: bool = False,
+                        max_workers: int = None):
         """启动召唤兽爬虫"""
         return self.start_basic_spider(
             spider_type='pet',
@@ -123,7 +129,8 @@ class SpiderController:
             delay_max=delay_max,
             cached_params=cached_params,
             target_server_list=target_server_list,
-            multi=multi
+            multi=multi,
+            max_workers=max_workers
         )
     
     def start_proxy_spider(self, max_pages: int = 5):
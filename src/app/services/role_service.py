@@ -17,12 +17,21 @@ from src.database import db
 from src.models.role import Role, LargeEquipDescData
 from src.evaluator.market_anchor_evaluator import MarketAnchorEvaluator
 from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
+from src.evaluator.utils.instance_registry import get_instance_registry
 # 导入Flask-Caching
 from flask_caching import Cache
 
 
 logger = logging.getLogger(__name__)
 
+# 进程内共享的角色特征提取器和市场锚定估价器（各请求、各线程共用，配置文件变化时自动重新加载）
+ROLE_FEATURE_EXTRACTOR = 'role_feature_extractor'
+ROLE_MARKET_EVALUATOR = 'role_market_evaluator'
+
+get_instance_registry().register(ROLE_FEATURE_EXTRACTOR, FeatureExtractor, FeatureExtractor.get_config_files())
+get_instance_registry().register(ROLE_MARKET_EVALUATOR, MarketAnchorEvaluator)
+
+
 class RoleService:
     """角色服务完整迁移版本"""
     
@@ -32,23 +41,29 @@ class RoleService:
         # Flask-Caching将在使用时动态获取
         self._cache_instance = None
         
-        # 初始化特征提取器
-        self.feature_extractor = None
-        if FeatureExtractor:
-            try:
-                self.feature_extractor = FeatureExtractor()
-                logger.info("角色特征提取器初始化成功")
-            except Exception as e:
-                logger.error(f"角色特征提取器初始化失败: {e}")
+        # 预热共享的特征提取器和市场锚定估价器（进程内只初始化一次）
+        if self.feature_extractor:
+            logger.info("角色特征提取器初始化成功")
+        if self.market_evaluator:
+            logger.info("角色市场锚定估价器初始化成功")
 
-        # 初始化市场锚定估价器
-        self.market_evaluator = None
-        if MarketAnchorEvaluator:
-            try:
-                self.market_evaluator = MarketAnchorEvaluator()
-                logger.info("角色市场锚定估价器初始化成功")
-            except Exception as e:
-                logger.error(f"角色市场锚定估价器初始化失败: {e}")
+    @property
+    def feature_extractor(self) -> Optional[FeatureExtractor]:
+        """共享的角色特征提取器，初始化失败时为None"""
+        try:
+            return get_instance_registry().get(ROLE_FEATURE_EXTRACTOR)
+        except Exception as e:
+            logger.error(f"角色特征提取器初始化失败: {e}")
+            return None
+
+    @property
+    def market_evaluator(self) -> Optional[MarketAnchorEvaluator]:
+        """共享的角色市场锚定估价器，初始化失败时为None"""
+        try:
+            return get_instance_registry().get(ROLE_MARKET_EVALUATOR)
+        except Exception as e:
+            logger.error(f"角色市场锚定估价器初始化失败: {e}")
+            return None
 
     def _ensure_app_context(self):
         """确保在Flask应用上下文中执行数据库操作"""
@@ -579,11 +594,10 @@ class RoleService:
             if not role_data:
                 return None
 
-            # 导入特征提取器（与原始版本保持一致）
-            from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
-
-            # 创建特征提取器实例
-            extractor = FeatureExtractor()
+            # 使用共享的特征提取器
+            extractor = self.feature_extractor
+            if not extractor:
+                return None
 
             # 提取特征
             features = extractor.extract_features(role_data)
@@ -650,14 +664,17 @@ class RoleService:
                           similarity_threshold: float = 0.7, max_anchors: int = 30) -> Dict:
         """获取角色估价 - 使用市场锚定法"""
         try:
-            if not self.market_evaluator:
+            # 本次估价使用同一组共享实例（配置热更新时不会中途切换）
+            market_evaluator = self.market_evaluator
+            if not market_evaluator:
                 return {
                     "error": "角色市场锚定估价器未初始化",
                     "estimated_price": 0,
                     "estimated_price_yuan": 0
                 }
             
-            if not self.feature_extractor:
+            extractor = self.feature_extractor
+            if not extractor:
                 return {
                     "error": "角色特征提取器未初始化",
                     "estimated_price": 0,
@@ -673,12 +690,6 @@ class RoleService:
                     "estimated_price_yuan": 0
                 }
             
-            # 导入特征提取器（与原始版本保持一致）
-            from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
-            
-            # 创建特征提取器实例
-            extractor = FeatureExtractor()
-            
             # 使用特征提取器提取特征
             try:
                 role_features = extractor.extract_features(role_data)
@@ -715,7 +726,7 @@ class RoleService:
             
             # 调用市场锚定估价器
             try:
-                result = self.market_evaluator.calculate_value(
+                result = market_evaluator.calculate_value(
                     target_features=role_features,
                     strategy=strategy,
                     similarity_threshold=similarity_threshold,
@@ -815,11 +826,8 @@ class RoleService:
                     "anchor_count": 0
                 }
             
-            # 导入特征提取器（与原始版本保持一致）
-            from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
-            
-            # 创建特征提取器实例
-            extractor = FeatureExtractor()
+            # 使用共享的特征提取器（不再每次请求重新加载配置）
+            extractor = self.feature_extractor
             
             # 使用特征提取器提取特征
             try:
@@ -937,9 +945,6 @@ class RoleService:
             if not self.market_evaluator:
                 return {"error": "角色市场锚定估价器未初始化"}
             
-            # 导入特征提取器（与原始版本保持一致）
-            from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
-            
             results = []
             total_value = 0
             success_count = 0
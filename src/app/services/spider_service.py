@@ -10,6 +10,7 @@ import logging
 import sys
 import os
 import subprocess
+import time
 from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
@@ -221,7 +222,8 @@ class SpiderService:
                         delay_max: float = 8.0,
                         cached_params: dict = None,
                         target_server_list: list = None,
-                        multi: bool = False):
+                        multi: bool = False,
+                        max_workers: int = None):
         """
         运行基础爬虫
         
@@ -234,6 +236,7 @@ class SpiderService:
             cached_params: 缓存的搜索参数
             target_server_list: 目标服务器列表
             multi: 是否多服务器模式
+            max_workers: 多服务器模式下同时爬取的服务器数
         """
         global task_status
         try:
@@ -248,7 +251,8 @@ class SpiderService:
                     delay_min=delay_min,
                     delay_max=delay_max,
                     cached_params=cached_params,
-                    target_server_list=target_server_list
+                    target_server_list=target_server_list,
+                    max_workers=max_workers
                 )
             
             task_status = {
@@ -1012,11 +1016,108 @@ class SpiderService:
             }
             raise
     
+    def _inject_server_info(self, cached_params: dict, server: dict) -> dict:
+        """
+        复制缓存参数并把服务器信息注入到所有层级
+        
+        Args:
+            cached_params: 缓存的搜索参数
+            server: 服务器信息
+            
+        Returns:
+            dict: 注入服务器信息后的参数副本
+        """
+        import copy
+        
+        server_id = server.get('server_id')
+        server_name = server.get('server_name', f'服务器{server_id}')
+        areaid = server.get('areaid')
+        server_cached_params = copy.deepcopy(cached_params) if cached_params else {}
+        
+        # 服务器相关字段的完整映射
+        server_field_mappings = {
+            'server_id': server_id,
+            'areaid': areaid,
+            'server_name': server_name,
+            'area_id': areaid,  # 可能的别名
+            'serverId': server_id,  # 驼峰命名
+            'areaId': areaid,  # 驼峰命名
+            'serverName': server_name,  # 驼峰命名
+            'server': server_id,  # 简化命名
+            'area': areaid  # 简化命名
+        }
+        
+        def inject_server_info_recursive(obj):
+            """递归注入服务器信息到所有层级"""
+            if isinstance(obj, dict):
+                # 更新当前层级的所有服务器相关字段
+                for field, new_value in server_field_mappings.items():
+                    if field in obj:
+                        obj[field] = new_value
+                
+                # 特殊处理server_data_value数组
+                if 'server_data_value' in obj:
+                    obj['server_data_value'] = [areaid, server_id]
+                
+                # 递归处理嵌套字典
+                for value in obj.values():
+                    if isinstance(value, (dict, list)):
+                        inject_server_info_recursive(value)
+                        
+            elif isinstance(obj, list):
+                # 递归处理列表中的每个元素
+                for item in obj:
+                    inject_server_info_recursive(item)
+        
+        inject_server_info_recursive(server_cached_params)
+        return server_cached_params
+    
+    def _get_multi_server_checkpoint_file(self, spider_type: str, equip_type: str, max_pages: int,
+                                          cached_params: dict, target_server_list: list) -> str:
+        """
+        多服务器任务的断点文件路径（相同的爬虫类型、页数、参数和服务器列表共用一个断点）
+        """
+        import hashlib
+        from src.utils.safe_json_io import safe_json_dumps
+        
+        key_payload = safe_json_dumps({
+            'spider_type': spider_type,
+            'equip_type': equip_type if spider_type == 'equip' else None,
+            'max_pages': max_pages,
+            'cached_params': cached_params or {},
+            'servers': sorted(str(server.get('server_id')) for server in target_server_list),
+        }, indent=None)
+        key = hashlib.md5(key_payload.encode('utf-8')).hexdigest()[:12]
+        checkpoint_dir = os.path.join(self.project_root, 'output', 'spider_checkpoints')
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        return os.path.join(checkpoint_dir, f"multi_{spider_type}_{key}.json")
+    
+    def _load_multi_server_checkpoint(self, checkpoint_file: str) -> set:
+        """读取断点中已完成的服务器ID"""
+        from src.utils.safe_json_io import safe_read_json
+        
+        if not os.path.exists(checkpoint_file):
+            return set()
+        checkpoint = safe_read_json(checkpoint_file) or {}
+        return set(str(server_id) for server_id in checkpoint.get('completed_servers', []))
+    
+    def _save_multi_server_checkpoint(self, checkpoint_file: str, completed_server_ids: set, failed_server_ids: set):
+        """保存断点（每个服务器完成后写入，任务中断后可从断点继续）"""
+        import time
+        from src.utils.safe_json_io import safe_write_json
+        
+        safe_write_json({
+            'completed_servers': sorted(completed_server_ids),
+            'failed_servers': sorted(failed_server_ids),
+            'updated_at': time.strftime("%Y-%m-%d %H:%M:%S")
+        }, checkpoint_file)
+    
     def _run_multi_server_spider(self, spider_type: str, equip_type: str, max_pages: int, 
                                 delay_min: float, delay_max: float, cached_params: dict, 
-                                target_server_list: list):
+                                target_server_list: list, max_workers: int = None,
+                                rate_budget: float = None, resume: bool = True):
         """
-        运行多服务器爬虫
+        运行多服务器爬虫（服务器级工作队列，多个服务器同时爬取）
         
         Args:
             spider_type: 爬虫类型
@@ -1026,11 +1127,47 @@ class SpiderService:
             delay_max: 最大延迟
             cached_params: 缓存的搜索参数
             target_server_list: 目标服务器列表
+            max_workers: 同时爬取的服务器数（默认读取环境变量SPIDER_MAX_WORKERS，未设置时为3）
+            rate_budget: 所有服务器共享的每秒请求数（默认每个工作线程保持原延迟范围的平均间隔）
+            resume: 是否跳过断点中已完成的服务器
         """
         global task_status
         import time
-        import json
-        import copy
+        import queue
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        
+        if max_workers is None:
+            max_workers = int(os.getenv('SPIDER_MAX_WORKERS', '3'))
+        max_workers = max(1, min(int(max_workers), len(target_server_list)))
+        
+        # 全局速率预算平均分给每个工作线程，任意时刻所有子进程的请求速率之和不超过预算
+        mean_delay = (delay_min + delay_max) / 2
+        if rate_budget is None and mean_delay > 0:
+            rate_budget = max_workers / mean_delay
+        worker_rate = rate_budget / max_workers if rate_budget else None
+        
+        # 断点续爬：跳过已完成的服务器
+        checkpoint_file = self._get_multi_server_checkpoint_file(
+            spider_type, equip_type, max_pages, cached_params, target_server_list)
+        completed_server_ids = self._load_multi_server_checkpoint(checkpoint_file) if resume else set()
+        failed_server_ids = set()
+        
+        server_progress = {}
+        for server in target_server_list:
+            server_id = str(server.get('server_id'))
+            already_completed = server_id in completed_server_ids
+            server_progress[server_id] = {
+                "server_id": server.get('server_id'),
+                "server_name": server.get('server_name', f'服务器{server_id}'),
+                "areaid": server.get('areaid'),
+                "status": "skipped" if already_completed else "pending",
+                "completed_pages": 0,
+                "total_pages": max_pages,
+                "message": "断点中已完成，跳过" if already_completed else ""
+            }
+        pending_servers = [server for server in target_server_list
+                           if str(server.get('server_id')) not in completed_server_ids]
         
         task_status = {
             "status": "running", 
@@ -1041,12 +1178,19 @@ class SpiderService:
                 "start_time": time.strftime("%Y-%m-%d %H:%M:%S"),
                 "duration": None,
                 "total_servers": len(target_server_list),
-                "completed_servers": 0,
-                "current_server": None
+                "completed_servers": len(target_server_list) - len(pending_servers),
+                "current_server": None,
+                "running_servers": [],
+                "max_workers": max_workers,
+                "rate_budget": rate_budget,
+                "servers": server_progress
             }
         }
         
-        logger.info(f"开始多服务器爬虫任务，共{len(target_server_list)}个服务器")
+        logger.info(f"开始多服务器爬虫任务，共{len(target_server_list)}个服务器，"
+                    f"待爬取{len(pending_servers)}个，并发{max_workers}个")
+        if len(pending_servers) < len(target_server_list):
+            logger.info(f"从断点继续，跳过已完成的{len(target_server_list) - len(pending_servers)}个服务器")
         
         # 多服务器模式下，预先验证一次cookies，避免重复验证
         try:
@@ -1059,120 +1203,101 @@ class SpiderService:
         except Exception as e:
             logger.warning(f"多服务器模式：cookies验证异常，但继续执行任务: {e}")
         
-        try:
-            for i, server in enumerate(target_server_list, 1):
-                # 检查任务是否被停止
-                if task_status.get("status") == "stopped":
-                    logger.info("检测到任务已被停止，退出多服务器循环")
-                    return {"message": "多服务器任务已被手动停止"}
-                
-                server_id = server.get('server_id')
-                server_name = server.get('server_name', f'服务器{server_id}')
-                areaid = server.get('areaid')
-                
-                # 更新任务状态
-                task_status["message"] = f"正在爬取服务器: {server_name} ({i}/{len(target_server_list)})"
-                task_status["details"]["current_server"] = {
-                    "server_id": server_id,
-                    "server_name": server_name,
-                    "areaid": areaid
-                }
-                
-                logger.info(f"开始爬取服务器: {server_name} (ID: {server_id}, 区域: {areaid})")
-                
-                # 为当前服务器准备参数
-                server_cached_params = copy.deepcopy(cached_params) if cached_params else {}
-                
-                # 将服务器信息合并到缓存参数中
-                if server_cached_params:
-                    # 递归更新所有服务器相关参数
-                    def inject_server_info_recursive(obj, path=""):
-                        """递归注入服务器信息到所有层级"""
-                        if isinstance(obj, dict):
-                            # 服务器相关字段的完整映射
-                            server_field_mappings = {
-                                'server_id': server_id,
-                                'areaid': areaid,
-                                'server_name': server_name,
-                                'area_id': areaid,  # 可能的别名
-                                'serverId': server_id,  # 驼峰命名
-                                'areaId': areaid,  # 驼峰命名
-                                'serverName': server_name,  # 驼峰命名
-                                'server': server_id,  # 简化命名
-                                'area': areaid  # 简化命名
-                            }
-                            
-                            # 更新当前层级的所有服务器相关字段
-                            for field, new_value in server_field_mappings.items():
-                                if field in obj:
-                                    old_value = obj[field]
-                                    obj[field] = new_value
-                            
-                            # 特殊处理server_data_value数组
-                            if 'server_data_value' in obj:
-                                old_value = obj['server_data_value']
-                                obj['server_data_value'] = [areaid, server_id]
-                            
-                            # 递归处理嵌套字典
-                            for key, value in obj.items():
-                                if isinstance(value, (dict, list)):
-                                    current_path = f"{path}.{key}" if path else key
-                                    inject_server_info_recursive(value, current_path)
-                                    
-                        elif isinstance(obj, list):
-                            # 递归处理列表中的每个元素
-                            for i, item in enumerate(obj):
-                                inject_server_info_recursive(item, f"{path}[{i}]")
-                    
-                    # 执行递归注入
-                    inject_server_info_recursive(server_cached_params)
+        server_queue = queue.Queue()
+        for server in pending_servers:
+            server_queue.put(server)
+        state_lock = threading.Lock()
+        details = task_status["details"]
+        
+        def is_stopped():
+            return task_status.get("status") == "stopped"
+        
+        def worker(worker_index: int):
+            # 错开各工作线程的启动时间，避免同时发起第一批请求
+            stagger = mean_delay * worker_index / max_workers
+            while stagger > 0 and not is_stopped():
+                time.sleep(min(1.0, stagger))
+                stagger -= 1.0
+            
+            while not is_stopped():
+                try:
+                    server = server_queue.get_nowait()
+                except queue.Empty:
+                    return
                 
-                # 运行单个服务器的爬虫
-                result = self._run_single_server_spider(
-                    spider_type=spider_type,
-                    equip_type=equip_type,
-                    max_pages=max_pages,
-                    delay_min=delay_min,
-                    delay_max=delay_max,
-                    cached_params=server_cached_params,
-                    server_info=server,
-                    skip_cookie_check=True  # 多服务器模式下跳过cookies验证
-                )
+                server_id = str(server.get('server_id'))
+                progress = server_progress[server_id]
+                server_name = progress["server_name"]
+                with state_lock:
+                    progress["status"] = "running"
+                    progress["started_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                    details["running_servers"].append(server_id)
+                    details["current_server"] = {
+                        "server_id": server.get('server_id'),
+                        "server_name": server_name,
+                        "areaid": server.get('areaid')
+                    }
+                    task_status["message"] = (f"正在爬取服务器: {server_name} "
+                                              f"({details['completed_servers'] + 1}/{len(target_server_list)})")
                 
-                # 更新完成状态
-                task_status["details"]["completed_servers"] = i
+                logger.info(f"开始爬取服务器: {server_name} (ID: {server_id}, 区域: {server.get('areaid')})")
                 
-                logger.info(f"服务器 {server_name} 爬取完成")
+                try:
+                    self._run_single_server_spider(
+                        spider_type=spider_type,
+                        equip_type=equip_type,
+                        max_pages=max_pages,
+                        delay_min=delay_min,
+                        delay_max=delay_max,
+                        cached_params=self._inject_server_info(cached_params, server),
+                        server_info=server,
+                        skip_cookie_check=True,  # 多服务器模式下跳过cookies验证
+                        rate=worker_rate,
+                        progress=progress
+                    )
+                    succeeded = True
+                except Exception as e:
+                    logger.error(f"服务器 {server_name} 爬取失败: {e}")
+                    progress["message"] = str(e)[:200]
+                    succeeded = False
                 
-                # 服务器间的延迟
-                if i < len(target_server_list):
-                    # 使用前端传递的延迟参数的平均值作为服务器间延迟
-                    delay_between_servers = (delay_min + delay_max) / 2
-                    logger.info(f"等待 {delay_between_servers:.1f} 秒后继续下一个服务器...")
-                    
-                    # 更新任务状态，显示等待信息
-                    task_status["message"] = f"服务器 {server_name} 爬取完成，等待 {delay_between_servers:.1f} 秒后继续下一个服务器..."
-                    
-                    # 分段等待，每段检查一次停止状态
-                    segment_delay = 1.0  # 每1秒检查一次
-                    remaining_delay = delay_between_servers
-                    
-                    while remaining_delay > 0:
-                        # 检查任务是否被停止
-                        if task_status.get("status") == "stopped":
-                            logger.info("延迟等待期间检测到任务已被停止，退出多服务器循环")
-                            return {"message": "多服务器任务已被手动停止"}
-                        
-                        # 更新剩余等待时间
-                        if remaining_delay > 1.0:
-                            task_status["message"] = f"服务器 {server_name} 爬取完成，等待 {remaining_delay:.1f} 秒后继续下一个服务器..."
-                        
-                        # 等待一小段时间
-                        wait_time = min(segment_delay, remaining_delay)
-                        time.sleep(wait_time)
-                        remaining_delay -= wait_time
+                with state_lock:
+                    details["running_servers"].remove(server_id)
+                    progress["finished_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                    if is_stopped():
+                        progress["status"] = "stopped"
+                        return
+                    if succeeded:
+                        progress["status"] = "completed"
+                        completed_server_ids.add(server_id)
+                        failed_server_ids.discard(server_id)
+                        logger.info(f"服务器 {server_name} 爬取完成")
+                    else:
+                        progress["status"] = "failed"
+                        failed_server_ids.add(server_id)
+                    details["completed_servers"] += 1
+                    task_status["message"] = (f"服务器 {server_name} 爬取{'完成' if succeeded else '失败'} "
+                                              f"({details['completed_servers']}/{len(target_server_list)})")
+                    self._save_multi_server_checkpoint(checkpoint_file, completed_server_ids, failed_server_ids)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='MultiServerSpider-') as executor:
+                futures = [executor.submit(worker, index) for index in range(max_workers)]
+                for future in futures:
+                    future.result()
+            
+            if is_stopped():
+                logger.info("检测到任务已被停止，已完成的服务器保存在断点中")
+                return {"message": "多服务器任务已被手动停止"}
+            
+            if failed_server_ids:
+                failed_names = [server_progress[server_id]["server_name"] for server_id in sorted(failed_server_ids)]
+                raise Exception(f"{len(failed_names)}个服务器爬取失败: {', '.join(failed_names)}，重新运行将从断点继续")
+            
+            # 所有服务器完成，清除断点
+            if os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
             
-            # 所有服务器完成
             task_status = {
                 "status": "completed",
                 "message": f"多服务器爬虫完成，共处理 {len(target_server_list)} 个服务器",
@@ -1181,7 +1306,8 @@ class SpiderService:
                     "start_time": task_status["details"]["start_time"],
                     "duration": None,
                     "total_servers": len(target_server_list),
-                    "completed_servers": len(target_server_list)
+                    "completed_servers": len(target_server_list),
+                    "servers": server_progress
                 }
             }
             
@@ -1196,14 +1322,16 @@ class SpiderService:
                 "details": {
                     "task_id": task_status["details"]["task_id"],
                     "start_time": task_status["details"]["start_time"],
-                    "duration": None
+                    "duration": None,
+                    "servers": server_progress
                 }
             }
             raise
     
     def _run_single_server_spider(self, spider_type: str, equip_type: str, max_pages: int,
                                  delay_min: float, delay_max: float, cached_params: dict,
-                                 server_info: dict, skip_cookie_check: bool = False):
+                                 server_info: dict, skip_cookie_check: bool = False,
+                                 rate: float = None, progress: dict = None):
         """
         运行单个服务器的爬虫
         
@@ -1216,7 +1344,10 @@ class SpiderService:
             cached_params: 缓存的搜索参数
             server_info: 服务器信息
             skip_cookie_check: 是否跳过cookies验证（多服务器模式使用）
+            rate: 子进程的每秒请求数（多服务器模式下由全局速率预算分配）
+            progress: 该服务器的进度字典（根据子进程输出更新已完成页数）
         """
+        import re
         import tempfile
         import json
         
@@ -1241,6 +1372,10 @@ class SpiderService:
         if skip_cookie_check:
             cmd.append('--skip-cookie-check')
         
+        # 速率预算
+        if rate:
+            cmd.extend(['--rate', f"{rate:.4f}"])
+        
         # 缓存参数
         if cached_params:
             # 创建临时文件保存缓存参数
@@ -1274,6 +1409,8 @@ class SpiderService:
         current_process = process
         
         # 启动实时日志监控线程（多服务器模式）
+        page_complete_pattern = re.compile(r'第\s*(\d+)\s*页完成')
+        
         def monitor_server_output():
             nonlocal process  # 使用局部进程变量，避免全局变量冲突
             server_name = server_info.get('server_name', '未知服务器')
@@ -1284,6 +1421,11 @@ class SpiderService:
                         if line:
                             # 避免重复日志，只记录关键信息到任务状态
                             line_content = line.strip()
+                            if line_content and progress is not None:
+                                page_match = page_complete_pattern.search(line_content)
+                                if page_match:
+                                    progress["completed_pages"] = max(progress["completed_pages"], int(page_match.group(1)))
+                                    progress["message"] = line_content
                             if line_content:
                                 # 更新任务状态，包含当前服务器信息
                                 if "爬取页面" in line_content or "page" in line_content.lower():
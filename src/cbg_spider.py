@@ -16,7 +16,6 @@ sys.path.insert(0, project_root)
 import requests
 import json
 import time
-import random
 import re
 import pandas as pd
 from datetime import datetime
@@ -41,6 +40,7 @@ from src.spider.logger_factory import get_spider_logger, log_progress, log_page_
 
 # 导入统一Cookie管理
 from src.utils.cookie_manager import setup_session_with_cookies, get_playwright_cookies_for_context
+from src.spider.page_scheduler import PageCrawlScheduler
 
 # 定义一个特殊的标记，用于表示登录已过期
 LOGIN_EXPIRED_MARKER = "LOGIN_EXPIRED"
@@ -138,13 +138,10 @@ class CBGSpider:
             if clean_desc.startswith('@') and clean_desc.endswith('@'):
                 clean_desc = clean_desc[1:-1]
             
-            # 只使用lpc_to_js方法进行解析
-            js_format = self.lpc_helper.lpc_to_js(clean_desc, return_dict=False)
-            if js_format:
-                # 然后用js_eval解析JavaScript格式字符串
-                parsed_data = self.lpc_helper.js_eval(js_format)
-                if parsed_data and isinstance(parsed_data, dict) and len(parsed_data) > 0:
-                    return self.extract_role_fields(parsed_data)
+            # 只使用lpc_to_js方法进行解析，直接返回Python对象（不再经过JSON字符串中转）
+            parsed_data = self.lpc_helper.lpc_to_js(clean_desc, return_dict=True)
+            if parsed_data and isinstance(parsed_data, dict) and len(parsed_data) > 0:
+                return self.extract_role_fields(parsed_data)
             
             log_warning(self.logger, f"LPC->JS解析失败，原始数据前200字符: {clean_desc[:200]}")
             return {}
@@ -562,15 +559,18 @@ class CBGSpider:
         
         return saved_count
     
-    def crawl_all_pages(self, max_pages=10, delay_range=None, search_params=None, use_browser=False):
+    def crawl_all_pages(self, max_pages=10, delay_range=None, search_params=None, use_browser=False,
+                        concurrency=1, rate=None):
         """
         爬取所有页面的数据
         
         Args:
             max_pages: 最大爬取页数
-            delay_range: 延迟范围，格式为(min_seconds, max_seconds)
+            delay_range: 延迟范围，格式为(min_seconds, max_seconds)，换算为令牌桶的平均请求间隔
             search_params: 搜索参数，如果提供则直接使用这些参数
             use_browser: 是否使用浏览器监听模式获取参数
+            concurrency: 同时在途的页面请求数
+            rate: 每秒请求数（为None时按delay_range限速）
             
         Returns:
             list: 所有页面的数据列表
@@ -595,10 +595,6 @@ class CBGSpider:
         else:
             self.logger.info("Cookie验证通过")
 
-        current_page = 1
-        total_roles = 0
-        successful_pages = 0
-        
         # 输出总页数信息
         log_total_pages(self.logger, max_pages)
         
@@ -622,38 +618,30 @@ class CBGSpider:
                 log_warning(self.logger, f"加载搜索参数失败: {e}")
                 search_params = {'server_type': 3}
         
-        while current_page <= max_pages:
+        def fetch_text(page):
             # 使用统一的进度日志格式
-            log_progress(self.logger, current_page, max_pages)
-            
-            # 获取当前页数据
-            page_data = self.fetch_page(current_page, search_params)
-            
-            if not page_data:
-                log_error(self.logger, f"第 {current_page} 页数据获取失败，停止爬取")
-                break
-                
+            log_progress(self.logger, page, max_pages)
+            return self.fetch_page_text(page, search_params)
+
+        def handle_page(page, page_data):
             # 保存数据
             saved_count = self.save_role_data(page_data)
-            total_roles += saved_count
-            successful_pages += 1
-            
             # 使用统一的页面完成日志格式
-            log_page_complete(self.logger, current_page, len(page_data), saved_count)
-    
-            # 检查是否还有下一页
-            # if len(page_data) < 15:  # 如果返回的数据少于15条，说明是最后一页
-            #     self.logger.info("已到达最后一页")
-            #     break
-                
-            current_page += 1
-            
-            # 添加随机延迟（最后一页完成后不需要等待）
-            if delay_range and current_page <= max_pages:
-                min_delay, max_delay = delay_range
-                delay = random.uniform(min_delay, max_delay)
-                log_info(self.logger, f"等待 {delay:.2f} 秒后继续...")
-                time.sleep(delay)
+            log_page_complete(self.logger, page, len(page_data), saved_count)
+            return saved_count
+
+        scheduler = PageCrawlScheduler(
+            concurrency=concurrency, rate=rate, delay_range=delay_range, logger=self.logger)
+        stats = scheduler.run_sync(
+            max_pages,
+            fetch_text=fetch_text,
+            parse_page=self.parse_jsonp_response,
+            handle_page=handle_page,
+        )
+        total_roles = stats['saved_count']
+        successful_pages = stats['successful_pages']
+        if stats['throttle_count']:
+            log_warning(self.logger, f"爬取过程中被限流 {stats['throttle_count']} 次")
         
         # 使用统一的任务完成日志格式
         log_task_complete(self.logger, successful_pages, max_pages, total_roles, "角色")
@@ -681,6 +669,24 @@ class CBGSpider:
         Returns:
             dict: 解析后的数据
         """
+        response_text = self.fetch_page_text(page, search_params)
+        if not response_text:
+            return None
+
+        # 解析响应
+        return self.parse_jsonp_response(response_text)
+
+    def fetch_page_text(self, page=1, search_params=None):
+        """
+        获取单页的原始JSONP响应（由调度器判断是否被限流后再解析）
+        
+        Args:
+            page: 页码
+            search_params: 搜索参数
+            
+        Returns:
+            str: 响应文本，请求失败时返回None
+        """
         try:
             # 确保search_params不为None
             if search_params is None:
@@ -730,10 +736,7 @@ class CBGSpider:
                 log_error(self.logger, "请求失败，未获取到响应")
                 return None
 
-            # 解析响应
-            parsed_result = self.parse_jsonp_response(response_text)
-            
-            return parsed_result
+            return response_text
                 
         except Exception as e:
             log_error(self.logger, f"获取第{page}页数据时出错: {e}")
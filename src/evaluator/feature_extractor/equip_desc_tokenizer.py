@@ -0,0 +1,241 @@
+"""
+装备描述（large_equip_desc / cDesc）解析记录
+
+装备描述是带颜色代码（#r换行、#G/#Y/#W颜色、#c4DBAF4特技特效颜色）的文本，例如：
+    #r等级 160  五行 金#r#r命中 +807 伤害 +524#r耐久度 152  修理失败 1次#r锻炼等级 10  镶嵌宝石 太阳石、 红玛瑙
+    #r#G#G体质 +21#Y #G力量 +35#Y#Y#r#c4DBAF4特技：#c4DBAF4破血狂攻#Y#Y#r#G开运孔数：5孔/5孔...
+
+EquipDescRecord 是各解析步骤共用的描述解析结果：
+- 属性记号：属性名 + 前缀颜色代码（#G#G/#G/#r）+ 符号 + 数值，如 "#G#G体质 +21"
+  第一次取用属性时用一个预编译的正则扫描一次，得到所有属性记号
+- 标记位置：开运孔数、熔炼效果等固定文本的位置，用于限定属性的解析范围
+- 特效文本：所有 #c4DBAF4xxx#Y 中的文本
+- 排除区间：#c4DBAFF法术暴击伤害/物理暴击伤害/格挡物理伤害 等不属于基础伤害的片段
+属性先只扫描到开运孔数为止，后面的符石、星位只在前面找不到时才扫描；标记、特效、排除区间
+都在第一次用到时解析，结果缓存。只取开运孔数、熔炼效果等的场景（完整的市场数据）不需要扫描属性。
+
+各解析方法按"第一个满足条件的记号"取值，与逐个 re.search 的结果一致。
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# 参与基础属性/附加属性/宝石解析的属性名（锻炼等级需在等级之前，优先匹配更长的名称）
+ATTR_NAMES = ('锻炼等级', '等级', '速度', '命中', '伤害', '气血', '灵力', '防御',
+              '敏捷', '体质', '力量', '耐力', '魔力', '法防', '躲避')
+
+HOLE_LANDMARK = '开运孔数：'
+RONGLIAN_LANDMARK = '熔炼效果：'
+EFFECT_COLOR = '#c4DBAF4'
+EXCLUDED_COLOR = '#c4DBAFF'
+
+# 属性记号 "体质 +21"
+# 正则以属性名开头（前缀颜色代码不放进正则，匹配后直接看前面的字符），re 可以按首字符快速跳过不可能的位置
+_ATTR_TOKEN_RE = re.compile('(' + '|'.join(ATTR_NAMES) + r')\s*([+-]?)(\d+)')
+# 特效文本 #c4DBAF4永不磨损#Y
+_EFFECT_RE = re.compile(r'#c4DBAF4([^#]*)#Y')
+# 不计入基础伤害的片段 #c4DBAFF法术暴击伤害 +3.42%
+_EXCLUDED_RE = re.compile(r'#c4DBAFF(?:法术暴击|物理暴击|格挡物理)伤害\s*\+')
+
+# 属性记号: (起始位置, 数值结束位置, 前缀, 符号, 数值)
+AttrToken = Tuple[int, int, str, str, int]
+
+
+class EquipDescRecord:
+    """装备描述的解析结果（属性记号、标记位置、特效文本），按需解析并缓存"""
+
+    def __init__(self, desc: str):
+        self.desc = desc or ''
+        self.length = len(self.desc)
+        # 属性名 -> 属性记号（按出现顺序），已扫描到的位置
+        self._tokens: Optional[Dict[str, List[AttrToken]]] = None
+        self._scanned_to = 0
+        # 固定文本 -> 出现位置
+        self._positions: Dict[str, List[int]] = {}
+        self._effects: Optional[Set[str]] = None
+        self._excluded_spans: Optional[Dict[int, int]] = None
+
+    def _scan_tokens(self, until: int) -> Dict[str, List[AttrToken]]:
+        """
+        扫描属性记号到 until 为止（接着上次扫描的位置继续）
+
+        先只扫描开运孔数之前的部分，后面的符石、星位等只有在前面找不到时才需要扫描；
+        标记文本不含数字，记号不会跨过扫描的分界点。
+        """
+        desc = self.desc
+        if self._tokens is None:
+            self._tokens = {}
+        tokens = self._tokens
+        if until <= self._scanned_to:
+            return tokens
+        has_excluded = bool(self.excluded_spans)
+        for m in _ATTR_TOKEN_RE.finditer(desc, self._scanned_to, until):
+            name, sign, value = m.groups()
+            start = m.start()
+            # 排除区间内的伤害数值（如"法术暴击伤害 +3.42%"）不是基础伤害
+            if has_excluded and name == '伤害' and self._in_excluded_span(start):
+                continue
+            if start >= 4 and desc.startswith('#G#G', start - 4):
+                prefix = '#G#G'
+            elif start >= 2 and desc[start - 2] == '#' and desc[start - 1] in 'Gr':
+                prefix = desc[start - 2:start]
+            else:
+                prefix = ''
+            token = (start, m.end(), prefix, sign, int(value))
+            if name in tokens:
+                tokens[name].append(token)
+            else:
+                tokens[name] = [token]
+        self._scanned_to = until
+        return tokens
+
+    def _name_tokens(self, name: str, endpos: int, full: bool = False) -> List[AttrToken]:
+        """属性已扫描到的记号；full 为 True 时先扫描到 endpos"""
+        if full:
+            tokens = self._scan_tokens(endpos)
+        elif self._tokens is None:
+            tokens = self._scan_tokens(min(self.hole_pos, endpos))
+        else:
+            tokens = self._tokens
+        return tokens.get(name, ())
+
+    def tokens(self, name: str, endpos: Optional[int] = None) -> List[AttrToken]:
+        """属性在 endpos 之前的所有记号（按出现顺序）"""
+        if endpos is None:
+            endpos = self.length
+        return [token for token in self._name_tokens(name, endpos, full=True) if token[1] <= endpos]
+
+    @property
+    def hole_pos(self) -> int:
+        """开运孔数的位置，之后是符石、星位等信息，基础属性和附加属性只解析之前的部分"""
+        return self.first_landmark(HOLE_LANDMARK, self.length)
+
+    @property
+    def added_attrs_end(self) -> int:
+        """附加属性的解析范围：开运孔数、熔炼效果之前"""
+        return min(self.hole_pos, self.first_landmark(RONGLIAN_LANDMARK, self.length))
+
+    def positions(self, text: str) -> List[int]:
+        """固定文本的所有出现位置（互不重叠，按出现顺序）"""
+        positions = self._positions.get(text)
+        if positions is not None:
+            return positions
+        desc = self.desc
+        positions = []
+        pos = desc.find(text)
+        while pos != -1:
+            positions.append(pos)
+            pos = desc.find(text, pos + len(text))
+        self._positions[text] = positions
+        return positions
+
+    def first_landmark(self, landmark: str, default: int) -> int:
+        """标记第一次出现的位置"""
+        positions = self.positions(landmark)
+        return positions[0] if positions else default
+
+    @property
+    def effects(self) -> Set[str]:
+        """所有 #c4DBAF4xxx#Y 中的特效文本"""
+        if self._effects is None:
+            effects = set()
+            for pos in self.positions(EFFECT_COLOR):
+                m = _EFFECT_RE.match(self.desc, pos)
+                if m:
+                    effects.add(m.group(1))
+            self._effects = effects
+        return self._effects
+
+    @property
+    def excluded_spans(self) -> Dict[int, int]:
+        """排除区间: 起始位置 -> 结束位置（延伸到下一个颜色代码）"""
+        if self._excluded_spans is None:
+            spans = {}
+            desc = self.desc
+            for pos in self.positions(EXCLUDED_COLOR):
+                m = _EXCLUDED_RE.match(desc, pos)
+                if m:
+                    span_end = desc.find('#', m.end())
+                    spans[pos] = span_end if span_end != -1 else self.length
+            self._excluded_spans = spans
+        return self._excluded_spans
+
+    def _in_excluded_span(self, pos: int) -> bool:
+        for span_start, span_end in self.excluded_spans.items():
+            if span_start <= pos < span_end:
+                return True
+        return False
+
+    def first_value(self, name: str, sign: str = '+', endpos: Optional[int] = None,
+                    prefix: str = '', before_r: bool = False, skip_excluded: bool = False) -> Optional[int]:
+        """
+        第一个满足条件的属性数值
+
+        Args:
+            name: 属性名
+            sign: 符号（'+'、'-'，无符号为''）
+            endpos: 只在该位置之前查找（如开运孔数之前）
+            prefix: 要求的前缀颜色代码（'#G' 同时匹配 '#G#G'）
+            before_r: 要求数值后紧跟 #r
+            skip_excluded: 判断 #r 时跳过紧随其后的排除区间（伤害解析时排除区间视为已删除）
+
+        Returns:
+            int或None: 数值（不含符号）
+        """
+        if endpos is None:
+            endpos = self.length
+        value = self._first_value(self._name_tokens(name, endpos), sign, endpos, prefix, before_r, skip_excluded)
+        if value is None and self._scanned_to < endpos:
+            value = self._first_value(self._name_tokens(name, endpos, full=True),
+                                      sign, endpos, prefix, before_r, skip_excluded)
+        return value
+
+    def _first_value(self, name_tokens, sign, endpos, prefix, before_r, skip_excluded) -> Optional[int]:
+        for _, end, token_prefix, token_sign, value in name_tokens:
+            if end > endpos:
+                break
+            if token_sign != sign or not token_prefix.endswith(prefix):
+                continue
+            if before_r:
+                while skip_excluded and end in self.excluded_spans:
+                    end = self.excluded_spans[end]
+                if end + 2 > endpos or not self.desc.startswith('#r', end):
+                    continue
+            return value
+        return None
+
+    def first_variant_value(self, name: str, variants: Sequence[Tuple[str, str]],
+                            endpos: Optional[int] = None) -> Optional[int]:
+        """
+        按写法优先级取属性数值：依次尝试 variants 中的 (前缀颜色代码, 符号)，
+        与逐个调用 first_value 的结果一致，但只遍历一次记号
+
+        Returns:
+            int或None: 带符号的数值（'-' 写法返回负值）
+        """
+        if endpos is None:
+            endpos = self.length
+        # 只有找到最优先的写法时才能不看后面的记号
+        name_tokens = self._name_tokens(name, endpos)
+        if self._scanned_to < endpos:
+            rank, value = self._best_variant(name_tokens, variants, endpos)
+            if rank == 0:
+                return value
+            name_tokens = self._name_tokens(name, endpos, full=True)
+        return self._best_variant(name_tokens, variants, endpos)[1]
+
+    def _best_variant(self, name_tokens, variants, endpos) -> Tuple[int, Optional[int]]:
+        best_rank = len(variants)
+        best_value = None
+        for _, end, token_prefix, token_sign, value in name_tokens:
+            if end > endpos:
+                break
+            for rank in range(best_rank):
+                prefix, sign = variants[rank]
+                if token_sign == sign and token_prefix.endswith(prefix):
+                    best_rank = rank
+                    best_value = -value if sign == '-' else value
+                    break
+            if best_rank == 0:
+                break
+        return best_rank, best_value
@@ -1,20 +1,89 @@
 import json
 import re
+import hashlib
 import numpy as np
 from datetime import datetime
 import logging
-from typing import Dict, Any, Union, List
+from typing import Dict, Any, Union, List, Optional, Tuple
 import os
+from functools import lru_cache
 from src.utils.jsonc_loader import load_js_config_relative_to_file
 from src.evaluator.constants.equipment_types import SHOES_KINDID,BELT_KINDID,is_weapon,is_helm,NECKLACE_KINDID, is_armor
+from src.evaluator.feature_extractor.equip_desc_tokenizer import EquipDescRecord
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 描述解析用的正则（模块加载时编译）
+# #r星位：伤害#r 中文字而不是数字
+XINGWEI_RE = re.compile(r"#r星位：(\D+)#r")
+# 开运孔数
+HOLE_RE = re.compile(r"开运孔数：(\d+)孔/(\d+)孔")
+# 修理失败次数
+REPAIR_FAIL_RE = re.compile(r"修理失败\s+(\d+)次")
+# 熔炼效果 - 包含#r
+RONGLIAN_RE = re.compile(r"熔炼效果：#r#Y#r([^#]+(?:#r[^#]+)*)")
+# 制造帮属性 #r#W制造帮：仙之领域#r#Y+1敏捷
+ZHIZAO_RE = re.compile(r'#r#W制造帮：[^#]*?#r#Y(\+[^#]+)')
+# #r玩家68766666专用#r
+BINDING_RE = re.compile(r"玩家(\d+)专用")
+# 气血的另一种写法 +639 气血
+HP_REVERSE_RE = re.compile(r'\+(\d+)\s*气血')
+# #G法术吸收率 火+12%
+MAGIC_ABSORPTION_RE = re.compile(r'#G法术吸收率\s*[^+]*\+(\d+)%')
+# 镶嵌宝石 光芒石、 黑宝石
+GEM_NAMES_RE = re.compile(r'镶嵌宝石\s*([^#\r]+)')
+# +80伤害 镶嵌等级：8
+GEM_EFFECT_RE = re.compile(r'\+(\d+)([^#\s]+)\s*镶嵌等级')
+# #r#c4DBAF4特技：#c4DBAF4破血狂攻#Y#Y
+SPECIAL_SKILL_RE = re.compile(r'#r#c4DBAF4特技：#c4DBAF4\s*([^#\n]+)#Y#Y')
+# 套装效果（在去除颜色代码后的文本中匹配）
+UPPER_COLOR_CODE_RE = re.compile(r'#[A-Z]')
+SUIT_PATTERNS = [
+    (re.compile(r'套装效果：附加状态\s*([^#\n]+)'), 'suit_added_status'),  # 套装效果：附加状态 xxx
+    (re.compile(r'套装效果：追加法术\s*([^#\n]+)'), 'suit_append_skills'),  # 套装效果：追加法术 xxx
+    (re.compile(r'套装效果：变身术之\s*([^#\n]+)'), 'suit_transform_skills'),  # 套装效果：变身术之 xxx
+    (re.compile(r'套装效果：变化咒之\s*([^#\n]+)'), 'suit_transform_charms'),  # 套装效果：变化咒之 xxx
+]
+WHITESPACE_RE = re.compile(r'\s+')
+# 熔炼/制造帮属性 +10防御 -15魔法
+RONGLIAN_ATTR_RE = re.compile(r'([+-])(\d+)\s*(体质|力量|耐力|敏捷|魔力|灵力|防御|气血)')
+# agg_added_attrs中的魔力 "魔力 +12"
+AGG_MOLI_RE = re.compile(r'魔力\s*([+-]?)\s*(\d+(?:\.\d+)?)')
+
+# 附加属性的匹配顺序：(前缀颜色代码, 符号)，先匹配 #G#G 开头的写法
+ADDON_VARIANTS = [('#G#G', '+'), ('#G#G', '-'), ('', '+'), ('', '-')]
+ADDON_VARIANTS_WITH_G = [('#G#G', '+'), ('#G#G', '-'), ('#G', '+'), ('#G', '-'), ('', '+'), ('', '-')]
+
+
+@lru_cache(maxsize=4096)
+def _kindid_for_itype(i_type: int) -> int:
+    """根据iType在KINDID_ITYPE_RANGE中查找kindid（iType种类有限，结果缓存）"""
+    from src.evaluator.constants.i_type_kindid_map import KINDID_ITYPE_RANGE
+
+    for kindid, ranges in KINDID_ITYPE_RANGE.items():
+        for range_tuple in ranges:
+            if len(range_tuple) == 2:
+                start, end = range_tuple
+                if int(start) <= i_type <= int(end):
+                    return kindid
+
+    return 0
+
 
 class EquipFeatureExtractor:
     """梦幻西游装备特征提取器"""
 
+    # 特征结构版本：修改特征提取逻辑（增删特征、调整计算口径）时递增，使已缓存的预计算特征失效
+    FEATURE_SCHEMA_VERSION = 1
+
+    # 并非每件装备都会输出的特征及其缺省值（缺省时不输出该特征）
+    # 预计算特征按缺省值存储，还原时遇到缺省值即视为该特征不存在
+    OPTIONAL_FEATURE_DEFAULTS = {
+        'suit_effect': 0,  # 套装效果为0时不输出
+        'hole_num': None,  # 没有large_equip_desc时不输出
+    }
+
     def __init__(self):
         """初始化特征提取器"""
         print("初始化特征提取器...")
@@ -23,6 +92,9 @@ class EquipFeatureExtractor:
         # 加载配置文件
         self._load_configs()
 
+        # 提取器配置版本（特征结构版本 + 配置内容哈希），用于判断预计算特征是否过期
+        self.config_version = self._compute_config_version()
+
         # 初始化正则表达式
         self._init_patterns()
 
@@ -58,18 +130,24 @@ class EquipFeatureExtractor:
             self.gems_name = {}
             self.suit_effects = {}
 
+    def _compute_config_version(self) -> str:
+        """根据特征结构版本和影响特征提取的配置内容计算版本哈希"""
+        payload = json.dumps({
+            'schema': self.FEATURE_SCHEMA_VERSION,
+            'special_skills': self.special_skills,
+            'special_effects': self.special_effects,
+            'gems_name': self.gems_name,
+            'suit_effects': self.suit_effects,
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()[:12]
+
     def _init_patterns(self):
-        """初始化正则表达式"""
-        # #r星位：伤害#r 中文字而不是数字
-        self.xingwei_pattern = r"#r星位：(\D+)#r"
-        # 开运孔数
-        self.hole_pattern = r"开运孔数：(\d+)孔/(\d+)孔"
-        # 修理失败次数
-        self.repair_fail_pattern = r"修理失败\s+(\d+)次"
-        # 熔炼效果 - 修复正则表达式以包含#r
-        self.ronglian_pattern = r"熔炼效果：#r#Y#r([^#]+(?:#r[^#]+)*)"
-        # #r玩家68766666专用#r   
-        self.binding_pattern = r"玩家(\d+)专用"
+        """初始化正则表达式（模块加载时已编译）"""
+        self.xingwei_pattern = XINGWEI_RE
+        self.hole_pattern = HOLE_RE
+        self.repair_fail_pattern = REPAIR_FAIL_RE
+        self.ronglian_pattern = RONGLIAN_RE
+        self.binding_pattern = BINDING_RE
 
     def extract_features(self, equip_data: Dict[str, Any]) -> Dict[str, Union[int, float, str]]:
         """
@@ -122,10 +200,12 @@ class EquipFeatureExtractor:
         """
         try:
             features = {}
+            # 装备描述只扫描一次，各解析步骤共用扫描结果
+            desc_record = None
             _is_desc_only_data = self._is_desc_only_data(equip_data)
             # 检查是否只有cDesc字段，如果是则先解析
             if _is_desc_only_data:
-                equip_data = self._parse_equip_data_from_desc(equip_data)
+                equip_data, desc_record = self._parse_equip_data_from_desc(equip_data)
             # TODO: 这里需要优化，如果kindid为0，则返回equip_data
             if equip_data.get('kindid', 0) == 0:
                 return equip_data
@@ -148,10 +228,12 @@ class EquipFeatureExtractor:
             features.update(self._extract_suit_effect_features(equip_data))
 
             # 七、其他特征（从large_equip_desc提取）
-            features.update(self._extract_other_features(equip_data))
+            if desc_record is None:
+                desc_record = self._get_desc_record(equip_data.get('large_equip_desc', ''))
+            features.update(self._extract_other_features(equip_data, desc_record))
             
             # 解析熔炼效果
-            ronglian_features = self._extract_ronglian_zhizaobang_features(equip_data)
+            ronglian_features = self._extract_ronglian_zhizaobang_features(equip_data, desc_record)
             
             # 应用熔炼特征到装备特征中
             self._apply_ronglian_features(features, ronglian_features, equip_data,_is_desc_only_data)
@@ -164,6 +246,12 @@ class EquipFeatureExtractor:
             print(traceback.format_exc())
             raise
 
+    def _get_desc_record(self, desc: str, desc_record: EquipDescRecord = None) -> EquipDescRecord:
+        """获取装备描述的扫描结果，已扫描过同一描述时直接复用"""
+        if desc_record is not None and desc_record.desc == desc:
+            return desc_record
+        return EquipDescRecord(desc)
+
     def _is_desc_only_data(self, equip_data: Dict[str, Any]) -> bool:
         """
         判断是否为只有cDesc字段的数据
@@ -361,7 +449,8 @@ class EquipFeatureExtractor:
 
         return features
 
-    def _extract_other_features(self, equip_data: Dict[str, Any]) -> Dict[str, int]:
+    def _extract_other_features(self, equip_data: Dict[str, Any],
+                                desc_record: EquipDescRecord = None) -> Dict[str, int]:
         """从large_equip_desc提取其他特征"""
         features = {}
 
@@ -374,13 +463,14 @@ class EquipFeatureExtractor:
         # 从large_equip_desc解析
         large_desc = equip_data.get('large_equip_desc', '')
         if large_desc:
+            record = self._get_desc_record(large_desc, desc_record)
             # 解析开运孔数
-            hole_match = re.search(self.hole_pattern, large_desc)
+            hole_match = self.hole_pattern.search(record.desc)
             if hole_match:
                 current_holes = int(hole_match.group(1))
                 max_holes = int(hole_match.group(2))
             # 解析星位
-            xingwei_match = re.search(self.xingwei_pattern, large_desc)
+            xingwei_match = self.xingwei_pattern.search(record.desc)
             if xingwei_match:
                 if(equip_data.get('equip_level', 0) <= 60):
                    current_holes =2
@@ -392,15 +482,15 @@ class EquipFeatureExtractor:
                     current_holes = 5
 
             # 解析修理失败次数
-            repair_match = re.search(self.repair_fail_pattern, large_desc)
+            repair_match = self.repair_fail_pattern.search(record.desc)
             if repair_match:
                 repair_count = int(repair_match.group(1))
                 features['repair_fail_num'] = repair_count
             else:
                 # 如果包含修理信息但没有匹配到，记录一下
-                if "修理失败" in large_desc:
+                if '修理失败' in large_desc:
                     print(f"警告：发现修理失败信息但正则匹配失败")
-                    print(f"使用的模式: {self.repair_fail_pattern}")
+                    print(f"使用的模式: {self.repair_fail_pattern.pattern}")
                     # 提取修理失败相关的片段用于调试
                     start_idx = large_desc.find("修理失败")
                     end_idx = large_desc.find("#", start_idx)
@@ -428,7 +518,7 @@ class EquipFeatureExtractor:
             features['hole_score'] = round(hole_score, 2)
             features['hole_num'] = current_holes
             # #r玩家68766666专用#r   
-            binding_match = re.search(self.binding_pattern, large_desc)
+            binding_match = self.binding_pattern.search(record.desc)
             if binding_match:
                 features['binding'] = 1
             else:
@@ -436,7 +526,8 @@ class EquipFeatureExtractor:
 
         return features
 
-    def _extract_ronglian_zhizaobang_features(self, equip_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _extract_ronglian_zhizaobang_features(self, equip_data: Dict[str, Any],
+                                              desc_record: EquipDescRecord = None) -> Dict[str, Any]:
         """提取熔炼效果/制造帮属性特征"""
         # 定义熔炼属性类型和默认值
         ronglian_attr_types = {
@@ -459,7 +550,7 @@ class EquipFeatureExtractor:
             return features
 
         # 提取熔炼和制造帮文本
-        ronglian_text = self._extract_ronglian_and_zhizao_text(desc)
+        ronglian_text = self._extract_ronglian_and_zhizao_text(self._get_desc_record(desc, desc_record))
         if not ronglian_text:
             return features
 
@@ -501,8 +592,7 @@ class EquipFeatureExtractor:
             for attr in attrs_list:
                 if isinstance(attr, str) and "魔力" in attr:
                     # 使用正则表达式提取魔力数值，支持正负值
-                    import re
-                    moli_match = re.search(r'魔力\s*([+-]?)\s*(\d+(?:\.\d+)?)', attr)
+                    moli_match = AGG_MOLI_RE.search(attr)
                     if moli_match:
                         value = int(moli_match.group(2))
                         # 如果是负值，取负
@@ -516,19 +606,19 @@ class EquipFeatureExtractor:
             self.logger.warning(f"提取魔力属性时出错: {e}")
             return 0
 
-    def _parse_equip_data_from_desc(self, equip_data: Dict[str, Any]) -> Dict[str, Any]:
-        """从large_equip_desc解析出完整的装备数据"""
+    def _parse_equip_data_from_desc(self, equip_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[EquipDescRecord]]:
+        """从large_equip_desc解析出完整的装备数据，同时返回描述的扫描结果（不是装备时为None）"""
         desc = equip_data.get('cDesc', '')
 
         if not desc:
-            return equip_data
+            return equip_data, None
         # kindid需要根据iType在KINDID_ITYPE_RANGE中找到对应的kindid
         i_type = equip_data.get('iType', 0)
         # 创建新的装备数据字典
         
         kindid = self._get_kindid_from_itype(equip_data.get('kindid', 0), i_type)
         if kindid == 0:
-            return equip_data
+            return equip_data, None
         
         # 如果kindid还是为0，则判断是物品
         parsed_data = equip_data.copy()
@@ -566,436 +656,276 @@ class EquipFeatureExtractor:
         parsed_data['special_effect'] = []
         parsed_data['suit_effect'] = 0
    
+        # 扫描一次描述，以下各解析步骤共用扫描结果
+        record = EquipDescRecord(desc)
 
         # 解析宝石信息
-        self._parse_gem_info_from_desc(desc, parsed_data)
+        self._parse_gem_info_from_desc(record, parsed_data)
 
         # 解析基础属性
-        self._parse_basic_attrs_from_desc(desc, parsed_data)
+        self._parse_basic_attrs_from_desc(record, parsed_data)
 
         # 解析附加属性
-        self._parse_added_attrs_from_desc(desc, parsed_data)
+        self._parse_added_attrs_from_desc(record, parsed_data)
 
         # 解析特技特效
-        self._parse_special_skills_from_desc(desc, parsed_data)
+        self._parse_special_skills_from_desc(record, parsed_data)
 
         # 解析套装信息
-        self._parse_suit_info_from_desc(desc, parsed_data)
+        self._parse_suit_info_from_desc(record, parsed_data)
 
-        return parsed_data
+        return parsed_data, record
 
-    def _parse_basic_attrs_from_desc(self, desc: str, parsed_data: Dict[str, Any]):
+    def _parse_basic_attrs_from_desc(self, record: EquipDescRecord, parsed_data: Dict[str, Any]):
         """从描述中解析基础属性
-           要先去除开运孔数后的描述再解析
-           以下也需要排除，不然会匹配成伤害值
+           只解析开运孔数之前的描述
+           以下也需要排除，不然会匹配成伤害值（扫描时记录为排除区间）
            #c4DBAFF法术暴击伤害 +3.42%
            #c4DBAFF物理暴击伤害 +3.42%
            #c4DBAFF格挡物理伤害 +3
         """
+        # 开运孔数的位置，只解析前面的部分
+        endpos = record.hole_pos
 
-        # 先去除开运孔数后的描述
-        # 找到开运孔数的位置，只保留前面的部分
-        hole_match = re.search(r'开运孔数：', desc)
-        if hole_match:
-            desc = desc[:hole_match.start()]
-
-        # 解析装备等级
-        level_patterns = [
-            r'#r等级\s*(\d+)',          # #r等级 125
-        ]
-        for pattern in level_patterns:
-            level_match = re.search(pattern, desc)
-            if level_match:
-                parsed_data['equip_level'] = int(level_match.group(1))
-                break
+        # 解析装备等级 #r等级 125
+        equip_level = record.first_value('等级', sign='', endpos=endpos, prefix='#r')
+        if equip_level is not None:
+            parsed_data['equip_level'] = equip_level
 
         # 解析速度（用于计算黑宝石等级）- 必须在气血解析之前
-        speed_patterns = [
-            r'#G#G速度\s*\+(\d+)',     # #G#G速度 +104
-            r'速度\s*\+(\d+)',         # 速度 +32
-        ]
-        for pattern in speed_patterns:
-            speed_match = re.search(pattern, desc)
-            if speed_match:
-                speed_value = int(speed_match.group(1))
-                # 黑宝石每级提供8点速度，所以等级 = 速度值 / 8
-                black_gem_level = speed_value // 8
-                parsed_data['black_gem_level'] = black_gem_level
-                break
-        
+        # 先匹配 #G#G速度 +104，再匹配 速度 +32
+        speed_value = record.first_value('速度', endpos=endpos, prefix='#G#G')
+        if speed_value is None:
+            speed_value = record.first_value('速度', endpos=endpos)
+        if speed_value is not None:
+            # 黑宝石每级提供8点速度，所以等级 = 速度值 / 8
+            black_gem_level = speed_value // 8
+            parsed_data['black_gem_level'] = black_gem_level
+
         # 只有武器
         kindid = parsed_data.get('kindid', 0)
         if is_weapon(kindid) or is_helm(kindid):
-            # 解析命中
-            mingzhong_patterns = [
-                r'命中\s*\+(\d+)#r',      #r伤害 +596 命中 +561#r => 561
-                r'命中\s*\+(\d+)',        # 命中 +561
-            ]
-            for pattern in mingzhong_patterns:
-                mingzhong_match = re.search(pattern, desc)
-                if mingzhong_match:
-                    # 是头盔
-                    if is_helm(kindid):
-                        parsed_data['mingzhong_gem_level'] = int(mingzhong_match.group(1))//25
-                    else:
-                        parsed_data['mingzhong'] = int(mingzhong_match.group(1))
-                    break
-                    
-            # 解析伤害 - 支持多种格式
-            # 先排除特定的伤害相关文本，避免误匹配
-            desc_for_damage = desc
-            exclude_patterns = [
-                r'#c4DBAFF法术暴击伤害\s*\+[^#]*',
-                r'#c4DBAFF物理暴击伤害\s*\+[^#]*',
-                r'#c4DBAFF格挡物理伤害\s*\+[^#]*',
-            ]
-            for pattern in exclude_patterns:
-                desc_for_damage = re.sub(pattern, '', desc_for_damage)
-        
-            damage_patterns = [
-                r'伤害\s*\+(\d+)#r',      #r伤害 +596 命中 +561#r => 561
-                r'伤害\s*\+(\d+)',        # 命中 +561
-            ]
-            
-            for pattern in damage_patterns:
-                damage_match = re.search(pattern, desc_for_damage)
-                if damage_match:
-                    gem_level = parsed_data.get('gem_level',0)
-                    gem_value = parsed_data['gem_value']
-                    extract_init_damage_raw  = int(damage_match.group(1))
-                    init_damage_raw = extract_init_damage_raw
-                    mingzhong2shanghai = parsed_data['mingzhong'] // 3
-                    gem_mingzhong = 0
-                    gem_shanghai = 0  # 初始化默认值
-                    if is_weapon(kindid):
-                        parsed_data['all_damage'] = extract_init_damage_raw + mingzhong2shanghai
-                    # 太阳石 玛瑙石计算
-                    if gem_level > 0 and (1 in gem_value or 2 in gem_value):
-                        # 玛瑙石
-                        if gem_value == [1]:
-                            gem_mingzhong = 25*gem_level
-                        # 太阳石    
-                        elif gem_value == [2]:  
-                            gem_shanghai = 8 * gem_level
-                            init_damage_raw -= gem_shanghai
-                        #混打 无解
-                        else:
-                            gass_shanghai_gem_level = 1
-                            gem_shanghai = (8 * gass_shanghai_gem_level) + (gem_level-gass_shanghai_gem_level)*25//3
-                            init_damage_raw = init_damage_raw - (8 * gass_shanghai_gem_level)
-                    # 是武器
-                    if is_weapon(kindid):
-                        parsed_data['init_damage_raw'] = init_damage_raw 
-                        parsed_data['init_damage'] = (parsed_data['mingzhong'] - gem_mingzhong)//3 + extract_init_damage_raw - gem_shanghai
-                    # 是头盔
-                    if is_helm(kindid):
-                        parsed_data['shanghai_gem_level'] = int(damage_match.group(1)) //8
+            # 解析命中：先匹配 命中 +561#r，再匹配 命中 +561
+            mingzhong_value = record.first_value('命中', endpos=endpos, before_r=True)
+            if mingzhong_value is None:
+                mingzhong_value = record.first_value('命中', endpos=endpos)
+            if mingzhong_value is not None:
+                # 是头盔
+                if is_helm(kindid):
+                    parsed_data['mingzhong_gem_level'] = mingzhong_value//25
+                else:
+                    parsed_data['mingzhong'] = mingzhong_value
+
+            # 解析伤害：先匹配 伤害 +596#r，再匹配 伤害 +596（排除区间内的伤害不计入）
+            damage_value = record.first_value('伤害', endpos=endpos, before_r=True, skip_excluded=True)
+            if damage_value is None:
+                damage_value = record.first_value('伤害', endpos=endpos)
+            if damage_value is not None:
+                gem_level = parsed_data.get('gem_level',0)
+                gem_value = parsed_data['gem_value']
+                extract_init_damage_raw  = damage_value
+                init_damage_raw = extract_init_damage_raw
+                mingzhong2shanghai = parsed_data['mingzhong'] // 3
+                gem_mingzhong = 0
+                gem_shanghai = 0  # 初始化默认值
+                if is_weapon(kindid):
+                    parsed_data['all_damage'] = extract_init_damage_raw + mingzhong2shanghai
+                # 太阳石 玛瑙石计算
+                if gem_level > 0 and (1 in gem_value or 2 in gem_value):
+                    # 玛瑙石
+                    if gem_value == [1]:
+                        gem_mingzhong = 25*gem_level
+                    # 太阳石
+                    elif gem_value == [2]:
+                        gem_shanghai = 8 * gem_level
+                        init_damage_raw -= gem_shanghai
+                    #混打 无解
                     else:
-                        parsed_data['shanghai'] = int(damage_match.group(1))
+                        gass_shanghai_gem_level = 1
+                        gem_shanghai = (8 * gass_shanghai_gem_level) + (gem_level-gass_shanghai_gem_level)*25//3
+                        init_damage_raw = init_damage_raw - (8 * gass_shanghai_gem_level)
+                # 是武器
+                if is_weapon(kindid):
+                    parsed_data['init_damage_raw'] = init_damage_raw
+                    parsed_data['init_damage'] = (parsed_data['mingzhong'] - gem_mingzhong)//3 + extract_init_damage_raw - gem_shanghai
+                # 是头盔
+                if is_helm(kindid):
+                    parsed_data['shanghai_gem_level'] = damage_value //8
+                else:
+                    parsed_data['shanghai'] = damage_value
 
-                    break
 
-     
-        # 解析气血
-        hp_patterns = [
-            r'气血\s*\+(\d+)',          # 气血 +639
-            r'\+(\d+)\s*气血',          # +639 气血
-        ]
-        for pattern in hp_patterns:
-            hp_match = re.search(pattern, desc)
+        # 解析气血：先匹配 气血 +639，再匹配 +639 气血
+        init_hp = record.first_value('气血', endpos=endpos)
+        if init_hp is None:
+            hp_match = HP_REVERSE_RE.search(record.desc, 0, endpos)
             if hp_match:
                 init_hp = int(hp_match.group(1))
-                # 计算非黑宝石的等级（总等级减去黑宝石等级）
-                black_gem_level = parsed_data.get('black_gem_level', 0)
-                total_gem_level = parsed_data.get('gem_level', 0)
-                hp_gem_level = total_gem_level - black_gem_level
-                # 是腰带
-                if kindid == BELT_KINDID:
-                    # 且有光芒石
-                    if 4 in parsed_data['gem_value']:
-                        # 混搭神秘石
-                        if 7 in parsed_data['gem_value']:
-                            duobi_gem_level = parsed_data.get('duobi_gem_level',0)
-                            hp_gem_level = hp_gem_level - duobi_gem_level
-                        parsed_data['init_hp'] = init_hp - 40 * hp_gem_level
-                    else:
-                        parsed_data['init_hp'] = init_hp
+        if init_hp is not None:
+            # 计算非黑宝石的等级（总等级减去黑宝石等级）
+            black_gem_level = parsed_data.get('black_gem_level', 0)
+            total_gem_level = parsed_data.get('gem_level', 0)
+            hp_gem_level = total_gem_level - black_gem_level
+            # 是腰带
+            if kindid == BELT_KINDID:
+                # 且有光芒石
+                if 4 in parsed_data['gem_value']:
+                    # 混搭神秘石
+                    if 7 in parsed_data['gem_value']:
+                        duobi_gem_level = parsed_data.get('duobi_gem_level',0)
+                        hp_gem_level = hp_gem_level - duobi_gem_level
+                    parsed_data['init_hp'] = init_hp - 40 * hp_gem_level
                 else:
-                    parsed_data['hp_gem_level']  =  init_hp//40
-                break
+                    parsed_data['init_hp'] = init_hp
+            else:
+                parsed_data['hp_gem_level']  =  init_hp//40
 
         if kindid == NECKLACE_KINDID or is_armor(kindid):
-            # 解析灵力
-            magic_patterns = [
-                r'灵力\s*\+(\d+)',          # 灵力 +113
-            ]
-            for pattern in magic_patterns:
-                magic_match = re.search(pattern, desc)
-                if magic_match:
-                    if kindid == NECKLACE_KINDID:
-                        parsed_data['init_wakan'] = int(magic_match.group(1))
-                        # 舍利子计算
-                        if parsed_data['gem_level'] > 0 and 3 in parsed_data['gem_value']:
-                            if parsed_data['gem_value'] == [3]:
-                                gem_wakan = 6*parsed_data['gem_level']
-                                parsed_data['init_wakan'] -= gem_wakan
-                            else:
-                                # 解析法术吸收率
-                                other_gem_level = self._parse_magic_absorption_from_desc(desc)//4
-                                gem_wakan = 6*(parsed_data['gem_level']-other_gem_level)
-                                parsed_data['init_wakan'] -= gem_wakan
-                        break
-                    else:
-                        parsed_data['wakan_gem_level'] = int(magic_match.group(1))//6
-               
-        # 解析防御
-        defense_patterns = [
-            r'防御\s*\+(\d+)',          # 防御 +95
-        ]
+            # 解析灵力 灵力 +113
+            wakan_value = record.first_value('灵力', endpos=endpos)
+            if wakan_value is not None:
+                if kindid == NECKLACE_KINDID:
+                    parsed_data['init_wakan'] = wakan_value
+                    # 舍利子计算
+                    if parsed_data['gem_level'] > 0 and 3 in parsed_data['gem_value']:
+                        if parsed_data['gem_value'] == [3]:
+                            gem_wakan = 6*parsed_data['gem_level']
+                            parsed_data['init_wakan'] -= gem_wakan
+                        else:
+                            # 解析法术吸收率
+                            other_gem_level = self._parse_magic_absorption_from_desc(record)//4
+                            gem_wakan = 6*(parsed_data['gem_level']-other_gem_level)
+                            parsed_data['init_wakan'] -= gem_wakan
+                else:
+                    parsed_data['wakan_gem_level'] = wakan_value//6
+
+        # 解析防御 防御 +95
         # TODO:参考腰带黑宝石，先计算气血，得出光芒石等级，再计算防御
-        for pattern in defense_patterns:
-            defense_match = re.search(pattern, desc)
-            if defense_match:
-                parsed_data['init_defense'] = int(defense_match.group(1))
+        defense_value = record.first_value('防御', endpos=endpos)
+        if defense_value is not None:
+            parsed_data['init_defense'] = defense_value
+            # 月亮石计算
+            gem_level = parsed_data.get('gem_level', 0)
+            hp_gem_level = parsed_data.get('hp_gem_level',0)
+            black_gem_level = parsed_data.get('black_gem_level', 0)
+            shanghai_gem_level = parsed_data.get('shanghai_gem_level',0)
+            mingzhong_gem_level = parsed_data.get('mingzhong_gem_level',0)
+            wakan_gem_level = parsed_data.get('wakan_gem_level',0)
+
+            if gem_level > 0 and 5 in parsed_data['gem_value']:
+                defense_gem_level = gem_level
+                if hp_gem_level > 0:
+                    defense_gem_level = defense_gem_level - hp_gem_level
+                if black_gem_level  > 0:
+                   defense_gem_level = defense_gem_level - black_gem_level
+                if shanghai_gem_level > 0:
+                    defense_gem_level = defense_gem_level - shanghai_gem_level
+                if mingzhong_gem_level > 0:
+                    defense_gem_level = defense_gem_level - mingzhong_gem_level
+                if wakan_gem_level > 0:
+                    defense_gem_level = defense_gem_level - wakan_gem_level
+                if 12 in parsed_data['gem_value']:
+                    # 翡翠石计算法防
+                    # 先解析法防值 #G法防 +24
+                    magic_defense_value = record.first_value('法防', endpos=endpos, prefix='#G')
+                    if magic_defense_value is not None:
+                        # 翡翠石每级提供12点法防
+                        magic_defense_gem_level = magic_defense_value // 12
+                        parsed_data['magic_defense_gem_level'] = magic_defense_gem_level
+                        # 从防御宝石等级中减去法防宝石等级
+                        defense_gem_level = defense_gem_level - magic_defense_gem_level
+
                 # 月亮石计算
-                gem_level = parsed_data.get('gem_level', 0)
-                hp_gem_level = parsed_data.get('hp_gem_level',0)
-                black_gem_level = parsed_data.get('black_gem_level', 0)
-                shanghai_gem_level = parsed_data.get('shanghai_gem_level',0)
-                mingzhong_gem_level = parsed_data.get('mingzhong_gem_level',0)
-                wakan_gem_level = parsed_data.get('wakan_gem_level',0)
-                
-                if gem_level > 0 and 5 in parsed_data['gem_value']:
-                    defense_gem_level = gem_level
-                    if hp_gem_level > 0:
-                        defense_gem_level = defense_gem_level - hp_gem_level
-                    if black_gem_level  > 0:
-                       defense_gem_level = defense_gem_level - black_gem_level
-                    if shanghai_gem_level > 0:
-                        defense_gem_level = defense_gem_level - shanghai_gem_level
-                    if mingzhong_gem_level > 0:
-                        defense_gem_level = defense_gem_level - mingzhong_gem_level
-                    if wakan_gem_level > 0:
-                        defense_gem_level = defense_gem_level - wakan_gem_level
-                    if 12 in parsed_data['gem_value']:
-                        # 翡翠石计算法防
-                        # 先解析法防值
-                        magic_defense_match = re.search(r'#G法防\s*\+(\d+)', desc)
-                        if magic_defense_match:
-                            magic_defense_value = int(magic_defense_match.group(1))
-                            # 翡翠石每级提供12点法防
-                            magic_defense_gem_level = magic_defense_value // 12
-                            parsed_data['magic_defense_gem_level'] = magic_defense_gem_level
-                            # 从防御宝石等级中减去法防宝石等级
-                            defense_gem_level = defense_gem_level - magic_defense_gem_level
-
-                    # 月亮石计算
-                    gem_defense = 12*defense_gem_level
-                    parsed_data['init_defense'] -= gem_defense
-                break
-        
-        # 解析鞋子敏捷
+                gem_defense = 12*defense_gem_level
+                parsed_data['init_defense'] -= gem_defense
+
+        # 解析鞋子敏捷 敏捷 +23
         if kindid == SHOES_KINDID:
-            dex_patterns = [
-                r'敏捷\s*\+(\d+)',          # 敏捷 +23
-            ]
-            for pattern in dex_patterns:
-                dex_match = re.search(pattern, desc)
-                if dex_match:
-                    parsed_data['init_dex'] = int(dex_match.group(1))
-                    break
-        
+            dex_value = record.first_value('敏捷', endpos=endpos)
+            if dex_value is not None:
+                parsed_data['init_dex'] = dex_value
+
 
-    def _parse_magic_absorption_from_desc(self, desc: str):
-        """从描述中解析法术吸收率
+    def _parse_magic_absorption_from_desc(self, record: EquipDescRecord):
+        """从描述中解析法术吸收率（开运孔数之前）
         格式：#G法术吸收率 火+12% => 提取12
         """
-        
-        # 法术吸收率正则表达式模式 - 匹配任意元素类型
-        absorption_pattern = r'#G法术吸收率\s*[^+]*\+(\d+)%'
-        
-        # 查找匹配
-        match = re.search(absorption_pattern, desc)
+        match = MAGIC_ABSORPTION_RE.search(record.desc, 0, record.hole_pos)
         if match:
             value = int(match.group(1))
             return value
 
-        return 0    
+        return 0
 
-    def _parse_added_attrs_from_desc(self, desc: str, parsed_data: Dict[str, Any]):
+    def _parse_added_attrs_from_desc(self, record: EquipDescRecord, parsed_data: Dict[str, Any]):
         """从描述中解析附加属性
-        需要去除开运孔数后的描述再解析
+        只解析开运孔数、熔炼效果之前的描述
         """
-        # 先去除开运孔数后的描述
-        # 找到开运孔数的位置，只保留前面的部分
-        hole_match = re.search(r'开运孔数：', desc)
-        if hole_match:
-            desc = desc[:hole_match.start()]
-        # 先去除熔炼效果后的描述
-        # 找到熔炼效果的位置，只保留前面的部分
-        ronglian_match = re.search(r'熔炼效果：', desc)
-        if ronglian_match:
-            desc = desc[:ronglian_match.start()]
+        endpos = record.added_attrs_end
 
         # 只有武器和防具才需要提取附加属性
         kindid = parsed_data.get('kindid', 0)
         if not self._is_weapon_or_armor_or_shoes(kindid):
             return
 
-        # 解析敏捷 - 支持多种格式，包括负值
-        minjie_patterns = [
-            r'#G#G敏捷\s*\+(\d+)',     # #G#G敏捷 +17
-            r'#G#G敏捷\s*-(\d+)',      # #G#G敏捷 -13
-            r'敏捷\s*\+(\d+)',         # 敏捷 +17
-            r'敏捷\s*-(\d+)',          # 敏捷 -13
-        ]
-        for pattern in minjie_patterns:
-            minjie_match = re.search(pattern, desc)
-            if minjie_match:
-                value = int(minjie_match.group(1))
-                if '-(\\d+)' in pattern or '敏捷\\s*-(\\d+)' in pattern or '#G#G敏捷\\s*-(\\d+)' in pattern:
-                    value = -value
-
-                # 如果是鞋子，提取为init_dex；否则提取为addon_minjie
-                if kindid == SHOES_KINDID:
-                    parsed_data['init_dex'] = value
-                else:
-                    parsed_data['addon_minjie'] = value
-                break
+        # 解析敏捷 - #G#G敏捷 +17 / #G#G敏捷 -13 / 敏捷 +17 / 敏捷 -13
+        minjie_value = record.first_variant_value('敏捷', ADDON_VARIANTS, endpos)
+        if minjie_value is not None:
+            # 如果是鞋子，提取为init_dex；否则提取为addon_minjie
+            if kindid == SHOES_KINDID:
+                parsed_data['init_dex'] = minjie_value
+            else:
+                parsed_data['addon_minjie'] = minjie_value
 
         # 如果是鞋子，不需要继续解析其他附加属性
         if kindid == SHOES_KINDID:
             return
 
-        # 解析体质 - 支持多种格式，包括负值
-        tizhi_patterns = [
-            r'#G#G体质\s*\+(\d+)',     # #G#G体质 +5
-            r'#G#G体质\s*-(\d+)',      # #G#G体质 -3
-            r'#G体质\s*\+(\d+)',     # #G体质 +5
-            r'#G体质\s*-(\d+)',      # #G体质 -3
-            r'体质\s*\+(\d+)',         # 体质 +5
-            r'体质\s*-(\d+)',          # 体质 -3
-        ]
-        for pattern in tizhi_patterns:
-            tizhi_match = re.search(pattern, desc)
-            if tizhi_match:
-                value = int(tizhi_match.group(1))
-                if '-(\\d+)' in pattern or '体质\\s*-(\\d+)' in pattern or '#G#G体质\\s*-(\\d+)' in pattern:
-                    value = -value
-                parsed_data['addon_tizhi'] = value
-                break
-
-        # 解析力量 - 支持多种格式，包括负值
-        liliang_patterns = [
-            r'#G#G力量\s*\+(\d+)',     # #G#G力量 +12
-            r'#G#G力量\s*-(\d+)',      # #G#G力量 -6
-            r'力量\s*\+(\d+)',         # 力量 +12
-            r'力量\s*-(\d+)',          # 力量 -6
+        # 体质、魔力还支持 #G体质 +5 写法
+        addon_attrs = [
+            ('体质', 'addon_tizhi', ADDON_VARIANTS_WITH_G),
+            ('力量', 'addon_liliang', ADDON_VARIANTS),
+            ('耐力', 'addon_naili', ADDON_VARIANTS),
+            ('灵力', 'addon_lingli', ADDON_VARIANTS),
+            ('魔力', 'addon_moli', ADDON_VARIANTS_WITH_G),
         ]
-        for pattern in liliang_patterns:
-            liliang_match = re.search(pattern, desc)
-            if liliang_match:
-                value = int(liliang_match.group(1))
-                if '-(\\d+)' in pattern or '力量\\s*-(\\d+)' in pattern or '#G#G力量\\s*-(\\d+)' in pattern:
-                    value = -value
-                parsed_data['addon_liliang'] = value
-                break
-
-        # 解析耐力 - 支持多种格式，包括负值
-        naili_patterns = [
-            r'#G#G耐力\s*\+(\d+)',     # #G#G耐力 +10
-            r'#G#G耐力\s*-(\d+)',      # #G#G耐力 -8
-            r'耐力\s*\+(\d+)',         # 耐力 +10
-            r'耐力\s*-(\d+)',          # 耐力 -8
-        ]
-        for pattern in naili_patterns:
-            naili_match = re.search(pattern, desc)
-            if naili_match:
-                value = int(naili_match.group(1))
-                if '-(\\d+)' in pattern or '耐力\\s*-(\\d+)' in pattern or '#G#G耐力\\s*-(\\d+)' in pattern:
-                    value = -value
-                parsed_data['addon_naili'] = value
-                break
-
-        # 解析灵力 - 支持多种格式，包括负值
-        lingli_patterns = [
-            r'#G#G灵力\s*\+(\d+)',     # #G#G灵力 +10
-            r'#G#G灵力\s*-(\d+)',      # #G#G灵力 -8
-            r'灵力\s*\+(\d+)',         # 灵力 +10
-            r'灵力\s*-(\d+)',          # 灵力 -8
-        ]
-        for pattern in lingli_patterns:
-            lingli_match = re.search(pattern, desc)
-            if lingli_match:
-                value = int(lingli_match.group(1))
-                if '-(\\d+)' in pattern or '灵力\\s*-(\\d+)' in pattern or '#G#G灵力\\s*-(\\d+)' in pattern:
-                    value = -value
-                parsed_data['addon_lingli'] = value
-                break
-
-        # 解析魔力 - 支持多种格式，包括负值
-        moli_patterns = [
-            r'#G#G魔力\s*\+(\d+)',     # #G#G魔力 +8
-            r'#G#G魔力\s*-(\d+)',      # #G#G魔力 -16
-            r'#G魔力\s*\+(\d+)',       # #G魔力 +30
-            r'#G魔力\s*-(\d+)',        # #G魔力 -16
-            r'魔力\s*\+(\d+)',         # 魔力 +8
-            r'魔力\s*-(\d+)',          # 魔力 -16
-        ]
-        for pattern in moli_patterns:
-            moli_match = re.search(pattern, desc)
-            if moli_match:
-                value = int(moli_match.group(1))
-                # 检查是否是负值模式
-                if pattern.endswith('-(\\d+)') or '魔力\\s*-(\\d+)' in pattern or '#G#G魔力\\s*-(\\d+)' in pattern:
-                    value = -value
-                parsed_data['addon_moli'] = value
-                break
-
-        # 计算附加属性总和
-        total = (parsed_data['addon_tizhi'] + parsed_data['addon_liliang'] +
-                 parsed_data['addon_naili'] + parsed_data['addon_minjie'] +
-                 parsed_data['addon_lingli'] + parsed_data['addon_moli'])
+        for attr_name, feature_name, variants in addon_attrs:
+            value = record.first_variant_value(attr_name, variants, endpos)
+            if value is not None:
+                parsed_data[feature_name] = value
+
         # 官方数据就是0 这个字段没用
         parsed_data['addon_total'] = 0
 
-    def _parse_gem_info_from_desc(self, desc: str, parsed_data: Dict[str, Any]):
+    def _parse_gem_info_from_desc(self, record: EquipDescRecord, parsed_data: Dict[str, Any]):
         """从描述中解析宝石信息"""
-        # 解析宝石等级
-        gem_level_patterns = [
-            r'锻炼等级\s*(\d+)',       # 锻炼等级 10
-        ]
-        for pattern in gem_level_patterns:
-            gem_level_match = re.search(pattern, desc)
-            if gem_level_match:
-                parsed_data['gem_level'] = int(gem_level_match.group(1))
-                break
+        desc = record.desc
+        # 解析宝石等级 锻炼等级 10
+        gem_level = record.first_value('锻炼等级', sign='')
+        if gem_level is not None:
+            parsed_data['gem_level'] = gem_level
 
         # 解析宝石类型 #r锻炼等级 13  镶嵌宝石 光芒石、 黑宝石#r
         gem_types = []
-        gem_type_patterns = [
-            r'镶嵌宝石\s*([^#\r]+)',   # 镶嵌宝石 光芒石、 黑宝石
-            r'\+(\d+)([^#\s]+)\s*镶嵌等级',  # +80伤害 镶嵌等级：8
-        ]
-        for pattern in gem_type_patterns:
-            gem_type_match = re.search(pattern, desc)
+        gem_type_match = GEM_NAMES_RE.search(desc)
+        if gem_type_match:
+            # 提取完整的宝石字符串，然后分割
+            gem_text = gem_type_match.group(1).strip()
+            # 分割宝石名称，处理"光芒石、 黑宝石"这种情况
+            # 先按"、"分割，再按空格分割，然后清理
+            gem_parts = []
+            for part in gem_text.split('、'):
+                for sub_part in part.split():
+                    sub_part = sub_part.strip()
+                    if sub_part and sub_part not in ['、', '']:
+                        gem_parts.append(sub_part)
+            gem_types.extend(gem_parts)
+        else:
+            # +80伤害 镶嵌等级：8
+            gem_type_match = GEM_EFFECT_RE.search(desc)
             if gem_type_match:
-                if '镶嵌宝石' in pattern:
-                    # 提取完整的宝石字符串，然后分割
-                    gem_text = gem_type_match.group(1).strip()
-                    # 分割宝石名称，处理"光芒石、 黑宝石"这种情况
-                    # 先按"、"分割，再按空格分割，然后清理
-                    gem_parts = []
-                    for part in gem_text.split('、'):
-                        for sub_part in part.split():
-                            sub_part = sub_part.strip()
-                            if sub_part and sub_part not in ['、', '']:
-                                gem_parts.append(sub_part)
-                    gem_types.extend(gem_parts)
-                else:
-                    gem_type = gem_type_match.group(2)
-                    gem_types.append(gem_type)
-                break
+                gem_type = gem_type_match.group(2)
+                gem_types.append(gem_type)
 
         # 如果没有找到宝石类型，尝试从其他信息推断
         if not gem_types:
@@ -1004,7 +934,6 @@ class EquipFeatureExtractor:
                 # 根据装备类型或其他信息推断宝石类型
                 # 暂时设置为默认值
                 gem_types = ['未知宝石']
-
        
         parsed_data['gem_value'] = gem_types
 
@@ -1069,23 +998,22 @@ class EquipFeatureExtractor:
 
         # 混搭宝石预处理
         if 7 in gem_ids:
-            duobi_match = re.search(r'#G躲避\s*\+(\d+)', desc)
-            if duobi_match:
-                duobi_value = int(duobi_match.group(1))
+            duobi_value = record.first_value('躲避', prefix='#G')
+            if duobi_value is not None:
                 # 神秘石每级提供20点躲避
                 duobi_gem_level = duobi_value // 20
                 parsed_data['duobi_gem_level'] = duobi_gem_level
              
 
-    def _parse_special_skills_from_desc(self, desc: str, parsed_data: Dict[str, Any]):
+    def _parse_special_skills_from_desc(self, record: EquipDescRecord, parsed_data: Dict[str, Any]):
         """从描述中解析特技特效"""
         parsed_data['special_skill'] = 0
         parsed_data['special_effect'] = []
-        special_skill_pattern = r'#r#c4DBAF4特技：#c4DBAF4\s*([^#\n]+)#Y#Y'
+        desc = record.desc
         if not desc:
             return
         # 解析特技
-        special_skill_match = re.search(special_skill_pattern, desc)
+        special_skill_match = SPECIAL_SKILL_RE.search(desc)
         if special_skill_match:
             #'决', '诀' 特技名称
             special_skill_name = special_skill_match.group(1).strip().replace('决', '诀')
@@ -1101,61 +1029,47 @@ class EquipFeatureExtractor:
         # #r#c4DBAF4特效：#c4DBAF4永不磨损#Y#r => 永不磨损
         # #r#c4DBAF4特效：#c4DBAF4无级别限制#Y #c4DBAF4愤怒#Y#r => 无级别限制 愤怒
         
-        # 直接在整个描述中搜索特效
+        # 扫描时已收集所有 #c4DBAF4xxx#Y 中的文本
         effects = []
+        effect_texts = record.effects
         for effect_id, effect_name in self.special_effects.items():
             # 处理特殊情况：无级别 -> 无级别限制
             search_name = effect_name
             if effect_name == '无级别':
                 search_name = '无级别限制'
 
-            # 直接搜索特效名称
-            search_pattern = f"#c4DBAF4{search_name}#Y"
-            if search_pattern in desc:
+            # 名称本身含颜色代码时按原文查找
+            if '#' in search_name:
+                found = f"#c4DBAF4{search_name}#Y" in desc
+            else:
+                found = search_name in effect_texts
+            if found:
                 effects.append(int(effect_id))
         
         parsed_data['special_effect'] = effects
 
-    def _parse_suit_info_from_desc(self, desc: str, parsed_data: Dict[str, Any]):
+    def _parse_suit_info_from_desc(self, record: EquipDescRecord, parsed_data: Dict[str, Any]):
         """从描述中解析套装信息"""
-        if not desc:
+        desc = record.desc
+        if not desc or '套装效果' not in desc:
             parsed_data['suit_effect'] = 0
             return
 
         # 移除颜色代码
-        desc_clean = re.sub(r'#c4DBAF4', '', desc)
-        desc_clean = re.sub(r'#[A-Z]', '', desc_clean)
+        desc_clean = UPPER_COLOR_CODE_RE.sub('', desc.replace('#c4DBAF4', ''))
 
         # 查找套装效果相关信息
         # 第三和第四的套装效果需要特殊处理 提取的名字会一样，需要记录在哪提取的
         # 比如加上index，变身术之 只能在suit_transform_skills查找，变化咒之 只能在suit_transform_charms查找，
-        suit_patterns = [
-            (r'套装效果：附加状态\s*([^#\n]+)', 'added_status'),  # 套装效果：附加状态 xxx
-            (r'套装效果：追加法术\s*([^#\n]+)', 'append_skills'),  # 套装效果：追加法术 xxx
-            (r'套装效果：变身术之\s*([^#\n]+)', 'transform_skills'),  # 套装效果：变身术之 xxx
-            (r'套装效果：变化咒之\s*([^#\n]+)', 'transform_charms')  # 套装效果：变化咒之 xxx
-        ]
-
-        for pattern, suit_type in suit_patterns:
-            match = re.search(pattern, desc_clean)
+        for pattern, config_key in SUIT_PATTERNS:
+            match = pattern.search(desc_clean)
             if match:
                 suit_info = match.group(1).strip()
                 # 清理多余的空格和特殊字符
-                suit_info = re.sub(r'\s+', ' ', suit_info)
-                
-                # 根据套装类型选择对应的配置
-                if suit_type == 'added_status':
-                    suit_config = self.auto_config.get('suit_added_status', {})
-                elif suit_type == 'append_skills':
-                    suit_config = self.auto_config.get('suit_append_skills', {})
-                elif suit_type == 'transform_skills':
-                    suit_config = self.auto_config.get('suit_transform_skills', {})
-                elif suit_type == 'transform_charms':
-                    suit_config = self.auto_config.get('suit_transform_charms', {})
-                else:
-                    continue
+                suit_info = WHITESPACE_RE.sub(' ', suit_info)
 
                 # 在对应的配置中查找匹配的套装
+                suit_config = self.auto_config.get(config_key, {})
                 for suit_id, suit_name in suit_config.items():
                     if suit_name == suit_info:
                         parsed_data['suit_effect'] = int(suit_id)
@@ -1166,7 +1080,6 @@ class EquipFeatureExtractor:
                 return
 
         parsed_data['suit_effect'] = 0
-
     def _get_kindid_from_itype(self, kindid: int, i_type: int) -> int:
         """
         根据kindid和iType获取对应的kindid
@@ -1187,22 +1100,12 @@ class EquipFeatureExtractor:
         if not i_type or i_type <= 0:
             return 0
             
-        # 根据iType转换kindid
-        from ..constants.i_type_kindid_map import KINDID_ITYPE_RANGE
-        
         try:
             i_type = int(i_type)
         except (ValueError, TypeError):
             return 0
 
-        for kindid, ranges in KINDID_ITYPE_RANGE.items():
-            for range_tuple in ranges:
-                if len(range_tuple) == 2:
-                    start, end = range_tuple
-                    if int(start) <= i_type <= int(end):
-                        return kindid
-
-        return 0
+        return _kindid_for_itype(i_type)
 
     def _is_weapon_or_armor_or_shoes(self, kindid: int) -> bool:
         """判断是否为武器或防具"""
@@ -1307,12 +1210,12 @@ class EquipFeatureExtractor:
                                      features['addon_naili'] + features['addon_minjie'] + features['addon_moli'])
       
 
-    def _extract_ronglian_and_zhizao_text(self, desc: str) -> str:
+    def _extract_ronglian_and_zhizao_text(self, record: EquipDescRecord) -> str:
         """
         从装备描述中提取熔炼和制造帮文本
         
         Args:
-            desc: 装备描述文本
+            record: 装备描述扫描结果
             
         Returns:
             str: 合并后的熔炼和制造帮文本
@@ -1320,13 +1223,12 @@ class EquipFeatureExtractor:
         ronglian_text = ""
         
         # 查找熔炼效果部分
-        ronglian_match = re.search(self.ronglian_pattern, desc)
+        ronglian_match = self.ronglian_pattern.search(record.desc)
         if ronglian_match:
             ronglian_text = ronglian_match.group(1).strip()
 
         # 查找"制造帮："后面的属性
-        zhizao_pattern = r'#r#W制造帮：[^#]*?#r#Y(\+[^#]+)'
-        zhizao_match = re.search(zhizao_pattern, desc)
+        zhizao_match = ZHIZAO_RE.search(record.desc)
         if zhizao_match:
             zhizao_text = zhizao_match.group(1).strip()
             # 将制造帮的属性也加入到熔炼文本中一起解析
@@ -1347,23 +1249,13 @@ class EquipFeatureExtractor:
             features: 特征字典
             ronglian_attr_types: 熔炼属性类型映射
         """
-        # 为每种属性类型生成正则表达式模式
+        # 一次扫描累加各属性的正负值
+        totals = {}
+        for sign, value, attr_name in RONGLIAN_ATTR_RE.findall(ronglian_text):
+            value = int(value)
+            totals[attr_name] = totals.get(attr_name, 0) + (value if sign == '+' else -value)
+
+        # 更新特征值
         for feature_name, attr_name in ronglian_attr_types.items():
-            # 生成正负值的正则表达式模式
-            positive_pattern = rf'\+(\d+)\s*{attr_name}'
-            negative_pattern = rf'-(\d+)\s*{attr_name}'
-            
-            # 查找所有匹配项
-            positive_matches = re.findall(positive_pattern, ronglian_text)
-            negative_matches = re.findall(negative_pattern, ronglian_text)
-            
-            # 累加所有匹配的值
-            total_value = 0
-            for match in positive_matches:
-                total_value += int(match)
-            for match in negative_matches:
-                total_value -= int(match)
-                
-            # 更新特征值
-            features[feature_name] = total_value
+            features[feature_name] = totals.get(attr_name, 0)
 
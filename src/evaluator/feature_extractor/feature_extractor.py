@@ -1,11 +1,12 @@
 import json
 import re
+import hashlib
 import numpy as np
 from datetime import datetime
 import logging
 from typing import Dict, Any, Union, List
 import os
-from src.utils.jsonc_loader import load_jsonc, load_jsonc_from_config_dir, load_jsonc_relative_to_file
+from src.utils.jsonc_loader import load_jsonc, load_jsonc_from_config_dir
 try:
     from utils.project_path import get_project_root
 except ImportError:
@@ -15,21 +16,27 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RULE_SETTING_FILE = os.path.join(_SRC_DIR, 'evaluator', 'config', 'rule_setting.jsonc')
+HOT_SERVER_LIST_FILE = os.path.join(_SRC_DIR, 'constant', 'hot_server_list.json')
+APPEARANCE_CONFIG_FILE = os.path.join(_SRC_DIR, 'constant', 'ex_avt_value.jsonc')
+
 class FeatureExtractor:
     """梦幻西游账号特征提取器"""
 
+    # 特征结构版本：修改特征提取逻辑（增删特征、调整计算口径）时递增，使已缓存的角色特征失效
+    FEATURE_SCHEMA_VERSION = 1
+
     def __init__(self):
         """初始化特征提取器"""
         print("初始化特征提取器...")
         self.logger = logging.getLogger(__name__)
 
         # 加载规则配置
-        self.config = load_jsonc_relative_to_file(
-            __file__, '../config/rule_setting.jsonc')
+        self.config = load_jsonc(RULE_SETTING_FILE)
 
         # 加载hot_server_list配置
-        self.hot_server_list = load_jsonc_relative_to_file(
-            __file__, '../../constant/hot_server_list.json')
+        self.hot_server_list = load_jsonc(HOT_SERVER_LIST_FILE)
         
         # 预加载外观配置文件，避免重复加载
         self.appearance_config = self._load_appearance_config()
@@ -37,6 +44,29 @@ class FeatureExtractor:
         # 预初始化规则估价器，避免重复初始化
         self.rule_evaluator = self._init_rule_evaluator()
 
+        # 提取器配置版本（特征结构版本 + 配置内容哈希），用于判断缓存的角色特征是否过期
+        self.config_version = self._compute_config_version()
+
+    @staticmethod
+    def get_config_files() -> List[str]:
+        """特征提取依赖的配置文件路径（包括规则估价器的配置），用于判断配置是否更新"""
+        from ..rule_evaluator import RuleEvaluator
+        files = [RULE_SETTING_FILE, HOT_SERVER_LIST_FILE, APPEARANCE_CONFIG_FILE]
+        files.extend(path for path in RuleEvaluator.get_config_files() if path not in files)
+        return files
+
+    def _compute_config_version(self) -> str:
+        """根据特征结构版本和影响特征提取的配置内容计算版本哈希"""
+        payload = json.dumps({
+            'schema': self.FEATURE_SCHEMA_VERSION,
+            'rule_setting': self.config,
+            'hot_server_list': self.hot_server_list,
+            'appearance_config': self.appearance_config,
+            'rule_evaluator_config': self.rule_evaluator.rule_config if self.rule_evaluator else None,
+            'discount_rates': self.rule_evaluator.discount_rates if self.rule_evaluator else None,
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()[:12]
+
     def _init_rule_evaluator(self):
         """初始化规则估价器"""
         try:
@@ -715,7 +745,7 @@ class FeatureExtractor:
         """加载外观价值配置文件"""
         try:
             # 从constant目录加载外观配置文件
-            constant_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'constant', 'ex_avt_value.jsonc')
+            constant_path = APPEARANCE_CONFIG_FILE
             config = load_jsonc(constant_path)
             self.logger.info(f"外观配置文件加载成功: {constant_path}")
             return config
@@ -728,6 +758,7 @@ class FeatureExtractor:
         """重新加载外观配置文件（用于配置更新）"""
         try:
             self.appearance_config = self._load_appearance_config()
+            self.config_version = self._compute_config_version()
             self.logger.info("外观配置文件重新加载成功")
             return True
         except Exception as e:
@@ -740,6 +771,7 @@ class FeatureExtractor:
             if self.rule_evaluator is not None:
                 success = self.rule_evaluator.reload_configs()
                 if success:
+                    self.config_version = self._compute_config_version()
                     self.logger.info("规则估价器配置重新加载成功")
                 return success
             else:
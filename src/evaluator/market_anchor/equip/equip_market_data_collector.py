@@ -1,9 +1,15 @@
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Union, Tuple
 import logging
+import numpy as np
 import pandas as pd
 import os
 from src.evaluator.feature_extractor.equip_feature_extractor import EquipFeatureExtractor
+from src.evaluator.constants.equipment_types import LINGSHI_KINDIDS, PET_EQUIP_KINDID
+from .equip_market_index import EquipMarketIndex
+from src.evaluator.utils.shared_frame_store import (
+    get_shared_frame_store, get_snapshot_store, ensure_writable, PUBLISH_DELAY_SECONDS, SNAPSHOT_INTERVAL_SECONDS
+)
 from src.database import db
 from src.models.equipment import Equipment
 from sqlalchemy import and_, or_, func, text
@@ -37,6 +43,15 @@ LOW_VALUE_SPECIAL_SKILLS = get_low_value_special_skills()
 # 低价值特效
 LOW_VALUE_EFFECTS = get_low_value_effects()
 
+# 预计算特征存储：普通装备在进入全量缓存时提取一次特征，按列存储（列名加前缀）
+PRECOMPUTED_FEATURE_PREFIX = 'feat_'
+# 预计算特征版本列，取值为特征提取器的 config_version，不一致时重新提取
+FEATURE_VERSION_COLUMN = 'feature_version'
+# 列表类型的特征（object列），其余特征均按float64数值列存储
+LIST_FEATURES = {'gem_value', 'special_effect'}
+# 不做预计算的装备类型（灵饰/召唤兽装备在数据库中已是提取好的特征）
+NON_PRECOMPUTED_KINDIDS = LINGSHI_KINDIDS + [PET_EQUIP_KINDID]
+
 # 添加项目根目录到Python路径，解决模块导入问题
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -47,6 +62,9 @@ class EquipMarketDataCollector:
 
     _instance = None  # 单例实例
     _lock = None  # 线程锁，确保线程安全
+    _shared_store = None  # 多进程共享缓存（未启用时为None）
+    _shared_generation = None  # 已挂载的共享缓存版本
+    _snapshot_store = None  # 磁盘快照（不使用时为None）
     
     def __new__(cls):
         """单例模式实现"""
@@ -108,6 +126,12 @@ class EquipMarketDataCollector:
         self._full_cache_key = "equipment_market_data_full"
         self._cache_ttl_hours = -1  # 永不过期，只能手动刷新
         self._full_data_cache = None  # 内存中的全量数据缓存
+        self._market_index = None  # 全量数据的多维索引（按数据对象惰性构建）
+        # 多进程部署：全量缓存由写入进程发布到共享内存，其他进程只读挂载（未启用时为None）
+        self._shared_store = get_shared_frame_store('equipment_market')
+        self._shared_generation = None
+        # 磁盘快照（冷启动时挂载后只补齐增量；多进程部署时与共享缓存为同一存储）
+        self._snapshot_store = get_snapshot_store('equipment_market')
         
         # 进度跟踪相关属性
         self._refresh_status = "idle"  # idle, running, completed, error
@@ -134,6 +158,7 @@ class EquipMarketDataCollector:
             self.redis_pubsub = None
         
         self._initialized = True
+        self._warm_up_shared_cache()
         cache_mode = "永不过期模式" if self._cache_ttl_hours == -1 else f"{self._cache_ttl_hours}小时过期"
         print(f"装备市场数据采集器单例初始化完成，支持Redis全量缓存（{cache_mode}）")
 
@@ -216,6 +241,7 @@ class EquipMarketDataCollector:
                         self._refresh_current_batch = 1
                         # 将数据加载到内存缓存
                         self._full_data_cache = cached_data
+                        self._publish_shared_cache()
                         return True
                     else:
                         print("Redis缓存不存在或为空，将重新加载数据")
@@ -366,6 +392,10 @@ class EquipMarketDataCollector:
             
             df = pd.DataFrame(all_data)
             print(f"总共加载 {len(df)} 条装备数据")
+
+            # 普通装备在入缓存时提取一次特征，估价时直接使用
+            self._refresh_message = "预计算装备特征..."
+            df = self.attach_precomputed_features(df)
             
             # 存储到Redis分块缓存
             self._refresh_message = "保存到Redis缓存..."
@@ -421,6 +451,7 @@ class EquipMarketDataCollector:
                     cache_info = "永不过期（仅手动刷新）" if self._cache_ttl_hours == -1 else f"{self._cache_ttl_hours}小时"
                     print(f"全量装备数据已缓存到Redis，缓存策略: {cache_info}，总耗时: {elapsed_time:.2f}秒")
                     self._full_data_cache = df  # 同时缓存到内存
+                    self._publish_shared_cache(immediate=True)
                     
                     # 完成进度跟踪
                     self._refresh_status = "completed"
@@ -458,17 +489,28 @@ class EquipMarketDataCollector:
             return None
             
         try:
+            # 多进程部署：挂载共享内存中的最新版本
+            self._attach_shared_cache()
+            
             # 先检查内存缓存
             if self._full_data_cache is not None and not self._full_data_cache.empty:
                 print(f"从内存缓存获取全量数据: {len(self._full_data_cache)} 条")
                 return self._full_data_cache
             
+            # 冷启动：优先挂载磁盘快照并补齐增量
+            snapshot_data = self._load_snapshot()
+            if snapshot_data is not None:
+                self._full_data_cache = snapshot_data
+                self._publish_shared_cache()
+                return snapshot_data
+            
             # 从Redis获取分块数据
             cached_data = self.redis_cache.get_hash_data(self._full_cache_key)
             
             if cached_data is not None and not cached_data.empty:
                 print(f"从Redis分块缓存获取全量数据: {len(cached_data)} 条")
                 self._full_data_cache = cached_data  # 缓存到内存
+                self._publish_shared_cache()
                 return cached_data
             else:
                 print("Redis全量缓存未命中")
@@ -478,9 +520,335 @@ class EquipMarketDataCollector:
             self.logger.warning(f"从Redis获取全量数据失败: {e}")
             return None
 
+    def _get_stale_feature_mask(self, data: pd.DataFrame) -> pd.Series:
+        """返回需要（重新）提取特征的普通装备行：没有预计算特征或特征版本过期"""
+        kindids = pd.to_numeric(data['kindid'], errors='coerce').fillna(0)
+        normal_mask = (kindids != 0) & ~kindids.isin(NON_PRECOMPUTED_KINDIDS)
+        if FEATURE_VERSION_COLUMN not in data.columns:
+            return normal_mask
+        return normal_mask & (data[FEATURE_VERSION_COLUMN] != self.feature_extractor.config_version)
+
+    def _to_native_value(self, value) -> Any:
+        """将单元格值转换为特征提取器使用的Python原生类型（缺失值转为None）"""
+        if isinstance(value, np.ndarray):
+            if value.size == 0:
+                return []
+            if value.size == 1:
+                single_value = value.item()
+                return None if pd.isna(single_value) else single_value
+            return value.tolist()
+        if isinstance(value, (list, dict)):
+            return value
+        if pd.isna(value):
+            return None
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def attach_precomputed_features(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        为普通装备提取特征并以 feat_ 前缀列存储，只处理没有特征或特征版本过期的行
+
+        Args:
+            data: 装备原始数据DataFrame
+
+        Returns:
+            pd.DataFrame: 带预计算特征列的DataFrame（无需提取时返回原对象）
+        """
+        if data is None or data.empty or 'kindid' not in data.columns:
+            return data
+
+        stale_mask = self._get_stale_feature_mask(data)
+        if not stale_mask.any():
+            return data
+
+        stale_rows = data.loc[stale_mask]
+        raw_columns = [col for col in stale_rows.columns
+                       if not col.startswith(PRECOMPUTED_FEATURE_PREFIX) and col != FEATURE_VERSION_COLUMN]
+
+        feature_values = {}  # 特征名 -> {行索引: 值}，保持特征首次出现的顺序
+        extracted_index = []
+        failed_count = 0
+        for idx, record in zip(stale_rows.index, stale_rows[raw_columns].to_dict('records')):
+            try:
+                features = self.feature_extractor.extract_features(
+                    {key: self._to_native_value(value) for key, value in record.items()})
+            except Exception as e:
+                self.logger.warning(f"预计算装备 {record.get('equip_sn')} 特征失败: {e}")
+                failed_count += 1
+                continue
+            for name, value in features.items():
+                feature_values.setdefault(name, {})[idx] = value
+            extracted_index.append(idx)
+
+        result = data.copy()
+        if FEATURE_VERSION_COLUMN not in result.columns:
+            result[FEATURE_VERSION_COLUMN] = pd.Series(None, index=result.index, dtype=object)
+        # 先将过期行的版本清空，提取失败的行保持无版本状态（使用时回退到实时提取）
+        result.loc[stale_mask, FEATURE_VERSION_COLUMN] = None
+
+        optional_defaults = self.feature_extractor.OPTIONAL_FEATURE_DEFAULTS
+        for name, values in feature_values.items():
+            column = f"{PRECOMPUTED_FEATURE_PREFIX}{name}"
+            default = optional_defaults.get(name)
+            if name in LIST_FEATURES:
+                if column not in result.columns:
+                    result[column] = pd.Series(None, index=result.index, dtype=object)
+                column_values = pd.Series([values.get(idx, default) for idx in extracted_index],
+                                          index=extracted_index, dtype=object)
+            else:
+                if column not in result.columns:
+                    result[column] = np.nan
+                column_values = pd.to_numeric(
+                    pd.Series([values.get(idx, default) for idx in extracted_index],
+                              index=extracted_index, dtype=object),
+                    errors='coerce').astype('float64')
+            result.loc[extracted_index, column] = column_values
+
+        result.loc[extracted_index, FEATURE_VERSION_COLUMN] = self.feature_extractor.config_version
+
+        print(f"预计算装备特征: {len(extracted_index)} 条"
+              + (f"，失败 {failed_count} 条" if failed_count else ""))
+        return result
+
+    def get_precomputed_features(self, market_data: pd.DataFrame) -> List[Optional[Dict[str, Any]]]:
+        """
+        按行还原预计算的特征字典；版本过期的行先重新提取并回写到内存全量缓存（惰性重提取）
+
+        Args:
+            market_data: 从全量缓存筛选出的市场数据
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: 与market_data逐行对应的特征字典，无法提供预计算特征的行为None
+        """
+        if market_data is None or market_data.empty or 'kindid' not in market_data.columns:
+            return [None] * (0 if market_data is None else len(market_data))
+
+        stale_mask = self._get_stale_feature_mask(market_data)
+        if stale_mask.any():
+            market_data = self.attach_precomputed_features(market_data)
+            self._write_back_precomputed_features(market_data.loc[stale_mask])
+
+        feature_columns = [col for col in market_data.columns if col.startswith(PRECOMPUTED_FEATURE_PREFIX)]
+        if not feature_columns or FEATURE_VERSION_COLUMN not in market_data.columns:
+            return [None] * len(market_data)
+
+        current_version = self.feature_extractor.config_version
+        ready = (market_data[FEATURE_VERSION_COLUMN] == current_version).tolist()
+        optional_defaults = self.feature_extractor.OPTIONAL_FEATURE_DEFAULTS
+
+        columns = []
+        for column in feature_columns:
+            name = column[len(PRECOMPUTED_FEATURE_PREFIX):]
+            columns.append((name, name in LIST_FEATURES, name in optional_defaults,
+                            optional_defaults.get(name), market_data[column].tolist()))
+
+        features_list = []
+        for position, is_ready in enumerate(ready):
+            if not is_ready:
+                features_list.append(None)
+                continue
+            features = {}
+            for name, is_list, is_optional, default, values in columns:
+                value = values[position]
+                if is_list:
+                    value = self._to_native_value(value)
+                elif value != value:  # NaN
+                    value = None
+                elif float(value).is_integer():
+                    value = int(value)
+                if is_optional and value == default:
+                    continue
+                features[name] = value
+            features_list.append(features)
+        return features_list
+
+    def _write_back_precomputed_features(self, rows: pd.DataFrame):
+        """
+        将重新提取的特征回写到内存全量缓存（按索引和equip_sn匹配）
+        
+        多进程部署时只有写入进程回写并延迟发布新版本；非写入进程挂载的是只读共享缓存，
+        本次提取的特征只用于当前查询，新版本发布后切换
+        """
+        full_data = self._full_data_cache
+        if full_data is None or full_data.empty or rows.empty or 'equip_sn' not in rows.columns:
+            return
+        if not self._owns_shared_cache():
+            return
+        try:
+            common_index = rows.index.intersection(full_data.index)
+            if common_index.empty:
+                return
+            same_equip = full_data.loc[common_index, 'equip_sn'] == rows.loc[common_index, 'equip_sn']
+            target_index = common_index[same_equip.to_numpy()]
+            if target_index.empty:
+                return
+
+            # 全量缓存可能是挂载的快照/共享版本（例如本进程刚接替写入进程），先复制到私有内存
+            writable_data = ensure_writable(full_data)
+            if writable_data is not full_data:
+                full_data = self._full_data_cache = writable_data
+            
+            store_columns = [col for col in rows.columns
+                             if col.startswith(PRECOMPUTED_FEATURE_PREFIX) or col == FEATURE_VERSION_COLUMN]
+            for column in store_columns:
+                if column not in full_data.columns:
+                    if column == FEATURE_VERSION_COLUMN or column[len(PRECOMPUTED_FEATURE_PREFIX):] in LIST_FEATURES:
+                        full_data[column] = pd.Series(None, index=full_data.index, dtype=object)
+                    else:
+                        full_data[column] = np.nan
+                full_data.loc[target_index, column] = rows.loc[target_index, column]
+            print(f"已回写 {len(target_index)} 条重新提取的装备特征到内存缓存")
+            self._publish_shared_cache()
+        except Exception as e:
+            self.logger.warning(f"回写预计算特征到内存缓存失败: {e}")
+
+    def _get_market_index(self, full_data: pd.DataFrame) -> EquipMarketIndex:
+        """获取全量数据对应的多维索引，数据对象变化时重新构建"""
+        index = self._market_index
+        if index is not None and index.data is full_data:
+            return index
+
+        import time
+        start_time = time.time()
+        index = EquipMarketIndex(full_data)
+        if full_data is self._full_data_cache:
+            self._market_index = index
+        print(f"装备多维索引构建完成: {len(full_data)} 条，耗时: {time.time() - start_time:.3f}秒")
+        return index
+
+    def _update_market_index(self, existing_data: pd.DataFrame, merged_data: pd.DataFrame, keep_mask) -> None:
+        """
+        合并新数据后增量更新多维索引（合并结果与 existing[keep_mask] + new_data 不一致时丢弃索引，下次查询重建）
+
+        Args:
+            existing_data: 合并前的全量数据
+            merged_data: 合并后的全量数据
+            keep_mask: 合并前数据中保留的行
+        """
+        index = self._market_index
+        self._market_index = None
+        if index is None or index.data is not existing_data:
+            return
+        try:
+            self._market_index = index.appended(merged_data, keep_mask)
+        except Exception as e:
+            self.logger.warning(f"增量更新装备多维索引失败，下次查询时重建: {e}")
+
     def _filter_data_from_full_cache(self, full_data: pd.DataFrame, **filters) -> pd.DataFrame:
         """
-        从Redis全量数据中进行筛选 - 使用pandas高效筛选
+        从Redis全量数据中进行筛选 - 通过多维索引只访问命中的行，不复制全量数据
+        索引查询失败时回退到逐步布尔掩码筛选
+
+        Args:
+            full_data: 全量装备数据
+            **filters: 筛选条件（与 _filter_data_with_masks 相同）
+
+        Returns:
+            筛选后的DataFrame
+        """
+        try:
+            index = self._get_market_index(full_data)
+            positions = self._query_market_index(index, **filters)
+
+            filtered_df = full_data.iloc[positions].copy()
+            if 'update_time' in filtered_df.columns and filtered_df['update_time'].dtype == 'object':
+                filtered_df['update_time'] = pd.to_datetime(filtered_df['update_time'])
+
+            print(f"索引筛选完成: 全量 {len(full_data)} 条，命中 {len(filtered_df)} 条")
+            return filtered_df
+
+        except Exception as e:
+            self.logger.warning(f"索引筛选失败，回退到逐步筛选: {e}")
+            return self._filter_data_with_masks(full_data, **filters)
+
+    def _query_market_index(self, index: EquipMarketIndex, **filters) -> np.ndarray:
+        """
+        在多维索引上执行筛选条件，返回按更新时间倒序、限制数量后的行位置
+
+        Args:
+            index: 全量数据的多维索引
+            **filters: 筛选条件
+
+        Returns:
+            np.ndarray: 命中行在全量数据中的位置
+        """
+        kindid = filters.get('kindid')
+        level_range = filters.get('level_range')
+        price_range = filters.get('price_range')
+        server = filters.get('server')
+        special_skill = filters.get('special_skill')
+        suit_effect = filters.get('suit_effect')
+        special_effect = filters.get('special_effect')
+        exclude_special_effect = filters.get('exclude_special_effect')
+        exclude_suit_effect = filters.get('exclude_suit_effect')
+        exclude_high_value_simple_equips = filters.get('exclude_high_value_simple_equips', False)
+        require_high_value_suits = filters.get('require_high_value_suits', False)
+        exclude_high_value_special_skills = filters.get('exclude_high_value_special_skills', False)
+        limit = filters.get('limit', 1000)
+
+        # 1-2. 装备类型分区 + 等级范围二分查找
+        positions = index.candidates(kindid, level_range)
+
+        # 3. 价格范围
+        if price_range:
+            min_price, max_price = price_range
+            positions = positions[index.range_mask(positions, 'price', min_price, max_price)]
+
+        # 4. 服务器
+        if server:
+            positions = positions[index.equal_mask(positions, 'server_name', server)]
+
+        # 5. 特技
+        if special_skill is not None and not exclude_high_value_special_skills:
+            positions = positions[index.bitmap_mask(positions, 'special_skill', [special_skill])]
+
+        # 6. 排除高价值特技装备（只保留无特技或低价值特技）
+        if exclude_high_value_special_skills:
+            low_value_mask = (index.bitmap_mask(positions, 'special_skill', [0, *LOW_VALUE_SPECIAL_SKILLS]) |
+                              index.isna_mask(positions, 'special_skill'))
+            positions = positions[low_value_mask]
+
+        # 7. 套装效果
+        if suit_effect is not None:
+            try:
+                suit_effect_num = int(suit_effect)
+                if suit_effect_num > 0:
+                    positions = positions[index.bitmap_mask(positions, 'suit_effect', [suit_effect_num])]
+            except (ValueError, TypeError):
+                if suit_effect and str(suit_effect).strip():
+                    positions = positions[index.equal_mask(positions, 'suit_effect_raw', suit_effect)]
+
+        # 8. 强制包含高价值套装
+        if require_high_value_suits and HIGH_VALUE_SUITS:
+            positions = positions[index.bitmap_mask(positions, 'suit_effect', HIGH_VALUE_SUITS)]
+
+        # 9. 特效（包含任意一个非低价值特效）
+        if special_effect:
+            effects = [effect for effect in special_effect if effect not in LOW_VALUE_EFFECTS]
+            positions = positions[index.effect_mask(positions, effects)]
+
+        # 10. 排除特效（不包含其中任何一个特效）
+        if exclude_special_effect:
+            positions = positions[~index.effect_mask(positions, exclude_special_effect)]
+
+        # 11. 排除套装效果
+        if exclude_suit_effect:
+            positions = positions[~index.bitmap_mask(positions, 'suit_effect', exclude_suit_effect)]
+
+        # 12. 排除高价值简易装备（指定等级且有简易特效）
+        if exclude_high_value_simple_equips:
+            level_mask = np.zeros(len(positions), dtype=bool)
+            for level in HIGH_VALUE_EQUIP_LEVELS:
+                level_mask |= index.range_mask(positions, 'equip_level', level, level)
+            positions = positions[~(level_mask & index.effect_mask(positions, [SIMPLE_EFFECT_ID]))]
+
+        # 13-14. 按更新时间倒序并限制数量
+        return index.sort_by_update_time(positions, limit)
+
+    def _filter_data_with_masks(self, full_data: pd.DataFrame, **filters) -> pd.DataFrame:
+        """
+        从Redis全量数据中进行筛选 - 使用pandas逐步布尔掩码筛选（索引不可用时的回退方案）
         
         Args:
             full_data: 全量装备数据
@@ -1535,6 +1903,9 @@ class EquipMarketDataCollector:
             if 'equip_sn' not in new_data_df.columns:
                 print(" 新数据缺少equip_sn列，无法添加")
                 return False
+
+            # 预计算普通装备特征
+            new_data_df = self.attach_precomputed_features(new_data_df)
             
             # 检查当前内存缓存状态
             if self._full_data_cache is not None and not self._full_data_cache.empty:
@@ -2367,6 +2738,75 @@ class EquipMarketDataCollector:
             self.logger.error(f"按属性分类获取市场数据失败: {e}")
             return pd.DataFrame()
     
+    def _owns_shared_cache(self) -> bool:
+        """是否负责更新全量缓存（未启用共享缓存时每个进程各自更新）"""
+        return self._shared_store is None or self._shared_store.is_owner()
+
+    def _attach_shared_cache(self) -> bool:
+        """
+        多进程部署：非写入进程挂载共享内存中的全量缓存（有新版本时切换）
+        
+        Returns:
+            bool: 是否已挂载共享缓存
+        """
+        if self._owns_shared_cache():
+            return False
+        attached = self._shared_store.poll(self._shared_generation)
+        if attached is not None:
+            self._shared_generation, self._full_data_cache = attached
+            self._market_index = None
+        return self._shared_generation is not None
+
+    def _publish_shared_cache(self, immediate: bool = False):
+        """
+        全量缓存变化后发布新版本：多进程部署时由写入进程发布到共享内存（延迟合并），
+        单进程部署时定期写入磁盘快照；全量刷新后立即发布
+        """
+        store = self._snapshot_store
+        if store is None:
+            return
+        if immediate:
+            # 全量刷新完成：任何进程都直接发布，各进程切换到新版本
+            try:
+                store.publish(self._full_data_cache)
+            except Exception as e:
+                self.logger.warning(f"发布共享缓存失败: {e}")
+        elif self._owns_shared_cache():
+            delay = PUBLISH_DELAY_SECONDS if self._shared_store is not None else SNAPSHOT_INTERVAL_SECONDS
+            store.schedule_publish(lambda: self._full_data_cache, delay=delay)
+
+    def _warm_up_shared_cache(self):
+        """写入进程启动时在后台加载全量缓存并发布，其他进程直接挂载"""
+        if self._shared_store is None or not self._shared_store.is_owner():
+            return
+        import threading
+        threading.Thread(target=self._get_full_data_from_redis, daemon=True).start()
+
+    def _load_snapshot(self) -> Optional[pd.DataFrame]:
+        """
+        冷启动：挂载磁盘快照，并从MySQL补齐快照水位之后的增量数据
+        
+        Returns:
+            Optional[pd.DataFrame]: 补齐后的全量数据，没有可用快照时返回None
+        """
+        if self._snapshot_store is None:
+            return None
+        snapshot = self._snapshot_store.attach_snapshot()
+        if snapshot is None:
+            return None
+        data, delta_since = snapshot
+        if delta_since is None:
+            # 没有水位无法补齐增量
+            return None
+        
+        delta = self._get_incremental_data_from_mysql_removed(delta_since)
+        if not delta.empty:
+            delta = self.attach_precomputed_features(delta)
+            data = self._merge_incremental_data_removed(data, delta)
+        print(f"快照补齐增量数据 {len(delta)} 条（{delta_since.isoformat()} 之后），全量数据: {len(data)} 条")
+        # 快照以只读内存映射挂载，作为本进程的全量缓存（之后会原地回写）前复制到私有内存
+        return ensure_writable(data)
+
     def _handle_equipment_update_message(self, message: Dict[str, Any]):
         """
         处理装备数据更新消息（跨进程通信）
@@ -2382,6 +2822,11 @@ class EquipMarketDataCollector:
             self.logger.info(f"📨 收到装备数据更新消息: {message_type}, 时间: {timestamp}, 操作: {action}")
             
             if message_type == 'equipment_data_saved':
+                if not self._owns_shared_cache():
+                    # 多进程部署：由写入进程合并更新并发布新版本，本进程在下次查询时挂载
+                    self.logger.info("📨 共享缓存由写入进程更新，跳过本进程的内存缓存更新")
+                    return
+                
                 data_count = message.get('data_count', 0)
                 total_equipments = message.get('total_equipments', 0)
                 
@@ -2390,7 +2835,13 @@ class EquipMarketDataCollector:
                 if action == 'add_dataframe' and 'dataframe' in message:
                     # 直接更新内存缓存，然后异步增量同步到Redis
                     dataframe = message['dataframe']
+                    if self._shared_store is not None and self._full_data_cache is None:
+                        # 写入进程先加载全量数据，避免只用新增数据发布共享缓存
+                        self._get_full_data_from_redis()
                     self.logger.info(f"📨 直接更新内存缓存，数据量: {len(dataframe)} 条")
+
+                    # 预计算特征（爬虫端已提取且版本一致时跳过），同时用于内存缓存和Redis同步
+                    dataframe = self.attach_precomputed_features(dataframe)
                     
                     # 直接更新内存缓存
                     success = self._update_memory_cache_with_dataframe(dataframe)
@@ -2424,6 +2875,9 @@ class EquipMarketDataCollector:
                 return True
             
             self.logger.info(f"🔄 开始直接更新内存缓存，新数据量: {len(new_dataframe)} 条")
+
+            # 确保新数据带有当前版本的预计算特征
+            new_dataframe = self.attach_precomputed_features(new_dataframe)
             
             # 如果内存缓存为空，直接使用新数据
             if self._full_data_cache is None or self._full_data_cache.empty:
@@ -2432,12 +2886,22 @@ class EquipMarketDataCollector:
                 return True
             
             # 合并现有数据和新数据
-            merged_data = self._merge_incremental_data_removed(self._full_data_cache, new_dataframe)
+            existing_data = self._full_data_cache
+            keep_mask = ~existing_data['equip_sn'].isin(new_dataframe['equip_sn']).to_numpy() \
+                if 'equip_sn' in existing_data.columns and 'equip_sn' in new_dataframe.columns else None
+            merged_data = self._merge_incremental_data_removed(existing_data, new_dataframe)
             
             # 更新内存缓存
             self._full_data_cache = merged_data
             
+            # 增量更新多维索引
+            if keep_mask is not None and len(merged_data) == int(keep_mask.sum()) + len(new_dataframe):
+                self._update_market_index(existing_data, merged_data, keep_mask)
+            else:
+                self._market_index = None
+            
             self.logger.info(f"✅ 内存缓存已直接更新，数据量: {len(self._full_data_cache)} 条")
+            self._publish_shared_cache()
             return True
             
         except Exception as e:
@@ -2502,6 +2966,7 @@ class EquipMarketDataCollector:
             if cached_data is not None and not cached_data.empty:
                 # 更新内存缓存
                 self._full_data_cache = cached_data
+                self._publish_shared_cache()
                 self.logger.info(f"✅ 内存缓存已从Redis刷新，数据量: {len(cached_data)} 条")
                 return True
             else:
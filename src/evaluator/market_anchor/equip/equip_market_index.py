@@ -0,0 +1,264 @@
+"""
+装备全量缓存的多维索引
+
+- 按kindid分区，分区内按(equip_level, price)排序，等级范围用二分查找定位
+- special_skill / suit_effect / special_effect 建立位图索引（np.packbits压缩）
+- 查询只处理命中的行位置，不复制全量DataFrame
+- 新数据合并进全量缓存时增量更新（只重排受影响的分区）
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# special_effect 是 "[1,6]" 形式的字符串：提取被 "[" / "," 与 "]" / "," 包围的片段，
+# 与 "[6]"、"[6,"、",6,"、",6]" 子串匹配的判定完全一致
+_EFFECT_TOKEN_PATTERN = re.compile(r'(?<=[\[,])[^\[\],]*(?=[\],])')
+
+
+def _pack_mask(mask: np.ndarray) -> np.ndarray:
+    """布尔掩码压缩为位图"""
+    return np.packbits(mask)
+
+
+def _unpack_bitmap(bitmap: np.ndarray, size: int) -> np.ndarray:
+    """位图还原为布尔掩码"""
+    return np.unpackbits(bitmap, count=size).astype(bool)
+
+
+def _test_bitmap(bitmap: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """读取位图中指定行位置的位"""
+    return ((bitmap[positions >> 3] >> (7 - (positions & 7))) & 1).astype(bool)
+
+
+def _to_numeric_array(data: pd.DataFrame, column: str) -> np.ndarray:
+    """将列转换为float64数组（缺失或非数值为NaN）"""
+    if column not in data.columns:
+        return np.full(len(data), np.nan)
+    return pd.to_numeric(data[column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _to_object_array(data: pd.DataFrame, column: str) -> np.ndarray:
+    """将列转换为object数组（列不存在时为None）"""
+    if column not in data.columns:
+        return np.full(len(data), None, dtype=object)
+    return data[column].to_numpy(dtype=object)
+
+
+def _effect_tokens(values: np.ndarray) -> List[Tuple[str, ...]]:
+    """解析每行的特效片段（非字符串的值视为没有特效，与字符串包含匹配的行为一致）"""
+    return [tuple(_EFFECT_TOKEN_PATTERN.findall(value)) if isinstance(value, str) else ()
+            for value in values]
+
+
+class EquipMarketIndex:
+    """装备全量缓存的多维索引（构建后不再修改，增量更新时生成新的索引对象）"""
+
+    # 建立位图索引的数值列
+    BITMAP_COLUMNS = ('special_skill', 'suit_effect')
+
+    def __init__(self, data: pd.DataFrame, _columns: Optional[Dict[str, np.ndarray]] = None,
+                 _bitmaps: Optional[Dict[str, Dict[Any, np.ndarray]]] = None,
+                 _partitions: Optional[Dict[float, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None):
+        """
+        Args:
+            data: 建立索引的全量数据（索引只记录行位置，不复制数据）
+        """
+        self.data = data
+        self.size = len(data)
+        if _columns is None:
+            _columns = self._extract_columns(data)
+        self._columns = _columns
+        self._bitmaps = _bitmaps if _bitmaps is not None else self._build_bitmaps(_columns, self.size)
+        self._partitions = _partitions if _partitions is not None else self._build_partitions(
+            _columns, np.arange(self.size))
+
+    @staticmethod
+    def _extract_columns(data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """提取索引需要的列"""
+        return {
+            'kindid': _to_numeric_array(data, 'kindid'),
+            'equip_level': _to_numeric_array(data, 'equip_level'),
+            'price': _to_numeric_array(data, 'price'),
+            'special_skill': _to_numeric_array(data, 'special_skill'),
+            'suit_effect': _to_numeric_array(data, 'suit_effect'),
+            'suit_effect_raw': _to_object_array(data, 'suit_effect'),
+            'server_name': _to_object_array(data, 'server_name'),
+            'special_effect': _to_object_array(data, 'special_effect'),
+            'update_time': _to_object_array(data, 'update_time') if 'update_time' in data.columns else None,
+        }
+
+    @classmethod
+    def _build_bitmaps(cls, columns: Dict[str, np.ndarray], size: int) -> Dict[str, Dict[Any, np.ndarray]]:
+        """为特技、套装、特效建立位图索引"""
+        bitmaps = {}
+        for column in cls.BITMAP_COLUMNS:
+            values = columns[column]
+            codes, uniques = pd.factorize(values)  # NaN的code为-1，不建立位图
+            bitmaps[column] = {float(value): _pack_mask(codes == code) for code, value in enumerate(uniques)}
+
+        effect_positions: Dict[str, List[int]] = {}
+        for position, tokens in enumerate(_effect_tokens(columns['special_effect'])):
+            for token in tokens:
+                effect_positions.setdefault(token, []).append(position)
+        effect_bitmaps = {}
+        for token, positions in effect_positions.items():
+            mask = np.zeros(size, dtype=bool)
+            mask[positions] = True
+            effect_bitmaps[token] = _pack_mask(mask)
+        bitmaps['special_effect'] = effect_bitmaps
+        return bitmaps
+
+    @staticmethod
+    def _build_partitions(columns: Dict[str, np.ndarray], positions: np.ndarray,
+                          partitions: Optional[Dict] = None) -> Dict[float, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """按kindid分区，分区内按(equip_level, price)排序：{kindid: (行位置, 等级, 价格)}"""
+        partitions = {} if partitions is None else partitions
+        if len(positions) == 0:
+            return partitions
+        kindids = columns['kindid'][positions]
+        for kindid in pd.unique(kindids):
+            if np.isnan(kindid):
+                continue
+            part = positions[kindids == kindid]
+            levels = columns['equip_level'][part]
+            prices = columns['price'][part]
+            order = np.lexsort((prices, levels))
+            partitions[float(kindid)] = (part[order], levels[order], prices[order])
+        return partitions
+
+    def appended(self, merged_data: pd.DataFrame, keep_mask: np.ndarray) -> 'EquipMarketIndex':
+        """
+        生成合并新数据后的索引（与 existing[keep_mask] + new_data 的合并顺序一致）
+
+        Args:
+            merged_data: 合并后的全量数据
+            keep_mask: 原数据中保留的行（被新数据替换的行为False）
+
+        Returns:
+            EquipMarketIndex: 新的索引对象
+        """
+        keep_mask = np.asarray(keep_mask, dtype=bool)
+        kept_count = int(keep_mask.sum())
+        new_count = len(merged_data) - kept_count
+        if len(keep_mask) != self.size or new_count < 0:
+            return EquipMarketIndex(merged_data)
+
+        new_rows = merged_data.iloc[kept_count:]
+        new_columns = self._extract_columns(new_rows)
+        columns = {}
+        for name, values in self._columns.items():
+            if values is None or new_columns[name] is None:
+                columns[name] = None if name == 'update_time' else values
+                continue
+            columns[name] = np.concatenate([values[keep_mask], new_columns[name]])
+        if columns['update_time'] is None and 'update_time' in merged_data.columns:
+            columns['update_time'] = _to_object_array(merged_data, 'update_time')
+
+        # 位图：删除被替换的行，追加新行
+        size = len(merged_data)
+        new_bitmaps = self._build_bitmaps(new_columns, new_count)
+        bitmaps = {}
+        for column, value_bitmaps in self._bitmaps.items():
+            merged_bitmaps = {}
+            for value in set(value_bitmaps) | set(new_bitmaps[column]):
+                old_bits = _unpack_bitmap(value_bitmaps[value], self.size)[keep_mask] \
+                    if value in value_bitmaps else np.zeros(kept_count, dtype=bool)
+                new_bits = _unpack_bitmap(new_bitmaps[column][value], new_count) \
+                    if value in new_bitmaps[column] else np.zeros(new_count, dtype=bool)
+                merged_bitmaps[value] = _pack_mask(np.concatenate([old_bits, new_bits]))
+            bitmaps[column] = merged_bitmaps
+
+        # 分区：保留行的位置重新编号，只有新数据涉及或有行被删除的分区需要重排
+        new_positions = np.cumsum(keep_mask) - 1
+        new_row_positions = np.arange(kept_count, size)
+        touched_kindids = set(float(k) for k in pd.unique(new_columns['kindid']) if not np.isnan(k))
+        partitions = {}
+        for kindid, (part, levels, prices) in self._partitions.items():
+            part_keep = keep_mask[part]
+            if kindid in touched_kindids:
+                continue
+            if part_keep.all():
+                partitions[kindid] = (new_positions[part], levels, prices)
+            elif part_keep.any():
+                partitions[kindid] = (new_positions[part[part_keep]], levels[part_keep], prices[part_keep])
+        for kindid in touched_kindids:
+            old_part = self._partitions.get(kindid)
+            positions = new_row_positions[new_columns['kindid'] == kindid]
+            if old_part is not None:
+                kept = old_part[0][keep_mask[old_part[0]]]
+                positions = np.concatenate([new_positions[kept], positions])
+            self._build_partitions(columns, positions, partitions)
+
+        return EquipMarketIndex(merged_data, columns, bitmaps, partitions)
+
+    def candidates(self, kindid=None, level_range: Optional[Tuple[float, float]] = None) -> np.ndarray:
+        """按装备类型和等级范围取候选行位置（有kindid时只访问对应分区）"""
+        if kindid is not None:
+            partition = self._partitions.get(float(kindid))
+            if partition is None:
+                return np.empty(0, dtype=np.int64)
+            positions, levels, _ = partition
+            if level_range:
+                min_level, max_level = level_range
+                start = np.searchsorted(levels, min_level, side='left')
+                end = np.searchsorted(levels, max_level, side='right')
+                positions = positions[start:end]
+            return np.sort(positions)
+
+        positions = np.arange(self.size)
+        if level_range:
+            min_level, max_level = level_range
+            levels = self._columns['equip_level']
+            positions = positions[(levels >= min_level) & (levels <= max_level)]
+        return positions
+
+    def range_mask(self, positions: np.ndarray, column: str, min_value, max_value) -> np.ndarray:
+        """数值范围条件（闭区间）"""
+        values = self._columns[column][positions]
+        return (values >= min_value) & (values <= max_value)
+
+    def equal_mask(self, positions: np.ndarray, column: str, value) -> np.ndarray:
+        """等值条件（server_name、suit_effect原始值等非位图列）"""
+        return self._columns[column][positions] == value
+
+    def isna_mask(self, positions: np.ndarray, column: str) -> np.ndarray:
+        """缺失值条件"""
+        return np.isnan(self._columns[column][positions])
+
+    def bitmap_mask(self, positions: np.ndarray, column: str, values: Iterable) -> np.ndarray:
+        """位图条件：列值属于values中任意一个"""
+        value_bitmaps = self._bitmaps[column]
+        mask = np.zeros(len(positions), dtype=bool)
+        for value in values:
+            try:
+                bitmap = value_bitmaps.get(float(value))
+            except (TypeError, ValueError):
+                bitmap = None
+            if bitmap is not None:
+                mask |= _test_bitmap(bitmap, positions)
+        return mask
+
+    def effect_mask(self, positions: np.ndarray, effects: Iterable) -> np.ndarray:
+        """特效位图条件：special_effect包含effects中任意一个"""
+        effect_bitmaps = self._bitmaps['special_effect']
+        mask = np.zeros(len(positions), dtype=bool)
+        for effect in effects:
+            bitmap = effect_bitmaps.get(str(effect))
+            if bitmap is not None:
+                mask |= _test_bitmap(bitmap, positions)
+        return mask
+
+    def sort_by_update_time(self, positions: np.ndarray, limit: Optional[int]) -> np.ndarray:
+        """按更新时间倒序排列并限制数量（与对筛选结果调用sort_values的顺序一致）"""
+        update_times = self._columns['update_time']
+        if update_times is not None:
+            times = pd.Series(update_times[positions])
+            if times.dtype == 'object':
+                times = pd.to_datetime(times)
+            positions = positions[times.sort_values(ascending=False).index.to_numpy()]
+        if limit is not None and len(positions) > limit:
+            positions = positions[:limit]
+        return positions
@@ -1,22 +1,41 @@
+import json
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import pandas as pd
 import numpy as np
 from abc import ABC, abstractmethod
 
 # 导入市场数据采集器
-from src.evaluator.market_anchor.equip.equip_market_data_collector import EquipMarketDataCollector
+from src.evaluator.market_anchor.equip.equip_market_data_collector import (
+    EquipMarketDataCollector, PRECOMPUTED_FEATURE_PREFIX, FEATURE_VERSION_COLUMN
+)
 from src.evaluator.market_anchor.lingshi.lingshi_market_data_collector import LingshiMarketDataCollector
 from src.evaluator.market_anchor.pet_equip.pet_equip_market_data_collector import PetEquipMarketDataCollector
 
 # 导入通用工具
 from ...utils.base_valuator import BaseValuator
+from .suit_effect_table import SuitEffectTable
 
 # 导入装备类型常量
 from ...constants.equipment_types import ( PET_EQUIP_KINDID, EQUIP_CATEGORIES,
     is_lingshi, is_pet_equip
 )
 
+# 相似度计算时忽略的元数据字段
+SIMILARITY_EXCLUDED_FEATURES = {'equip_sn', 'price', 'create_time', 'index'}
+
+# get_market_data_for_similarity 加载候选时读取的目标字段（取值相同的装备共享同一批候选）
+SIMILARITY_QUERY_KEYS = ('kindid', 'equip_level', 'equip_level_range', 'special_skill', 'special_effect', 'suit_effect')
+
+# 向量化相似度计算中视为数值的类型
+_NUMERIC_TYPES = (int, float, np.integer, np.floating, np.bool_)
+
+# 打分计划缓存的最大条目数（按kindid+目标特征签名缓存）
+SCORING_PLAN_CACHE_SIZE = 512
+
 
 class BaseEquipmentConfig:
     """基础装备配置类 - 提供默认的配置"""
@@ -236,6 +255,39 @@ class EquipmentTypePlugin(ABC):
         return None
 
 
+class EquipmentScoringPlan:
+    """
+    目标装备的打分计划（只与目标有关，构建后不再修改）
+
+    包含最终权重、相对容忍度、增强后的目标特征和插件自定义相似度钩子，
+    逐个候选打分时只做候选侧的计算。
+    """
+
+    def __init__(self,
+                 kindid: int,
+                 feature_weights: Dict[str, float],
+                 relative_tolerances: Dict[str, float],
+                 enhanced_target_features: Dict[str, Any],
+                 similarity_hooks: List[Callable[[str, Any, Any], Optional[float]]],
+                 context: Optional[Dict[str, Any]] = None):
+        self.kindid = kindid
+        self.feature_weights = feature_weights
+        self.relative_tolerances = relative_tolerances
+        self.enhanced_target_features = enhanced_target_features
+        self.similarity_hooks = similarity_hooks
+        self.context = context
+        # 参与相似度计算的目标特征名称（不含元数据字段）
+        self.target_feature_names = set(enhanced_target_features.keys()) - SIMILARITY_EXCLUDED_FEATURES
+
+    def calculate_plugin_similarity(self, feature_name: str, target_val: Any, market_val: Any) -> Optional[float]:
+        """按插件优先级调用自定义相似度钩子，均返回None时使用默认规则"""
+        for hook in self.similarity_hooks:
+            similarity = hook(feature_name, target_val, market_val)
+            if similarity is not None:
+                return similarity
+        return None
+
+
 class EquipmentPluginManager:
     """装备插件管理器"""
 
@@ -243,6 +295,9 @@ class EquipmentPluginManager:
         self.base_config = base_config
         self.plugins: List[EquipmentTypePlugin] = []
         self._kindid_plugin_map: Dict[int, List[EquipmentTypePlugin]] = {}
+        # 打分计划缓存：(kindid, 目标特征签名) -> EquipmentScoringPlan
+        self._scoring_plan_cache: 'OrderedDict[Tuple[int, str], EquipmentScoringPlan]' = OrderedDict()
+        self._scoring_plan_lock = threading.Lock()
 
         # 使用插件包的自动加载功能
         try:
@@ -293,6 +348,9 @@ class EquipmentPluginManager:
             self._kindid_plugin_map[kindid].sort(
                 key=lambda p: p.priority, reverse=True)
 
+        # 插件变化后已缓存的打分计划失效
+        self.clear_scoring_plans()
+
         print(f"已注册装备插件: {plugin.plugin_name} (优先级: {plugin.priority})")
 
     def get_plugins_for_kindid(self, kindid: int) -> List[EquipmentTypePlugin]:
@@ -362,6 +420,60 @@ class EquipmentPluginManager:
 
         return relative_tolerances
 
+    def get_scoring_plan(self,
+                         kindid: int,
+                         target_features: Dict[str, Any],
+                         context: Dict[str, Any] = None) -> EquipmentScoringPlan:
+        """
+        获取目标装备的打分计划（按kindid+目标特征签名缓存，同一目标的多次打分只构建一次）
+
+        Args:
+            kindid: 装备类型ID
+            target_features: 目标装备特征
+            context: 派生特征计算所需的上下文
+
+        Returns:
+            EquipmentScoringPlan: 打分计划（共享对象，调用方不得修改）
+        """
+        key = (kindid, self._scoring_plan_signature(target_features, context))
+        with self._scoring_plan_lock:
+            plan = self._scoring_plan_cache.get(key)
+            if plan is not None:
+                self._scoring_plan_cache.move_to_end(key)
+                return plan
+
+        enhanced_target_features = self.get_enhanced_features(kindid, target_features, context)
+        for name in SIMILARITY_EXCLUDED_FEATURES:
+            # 元数据字段不参与打分，也不进入签名，避免不同目标共享计划时带出其他装备的元数据
+            enhanced_target_features.pop(name, None)
+        plan = EquipmentScoringPlan(
+            kindid=kindid,
+            feature_weights=self.get_final_weights(kindid, target_features),
+            relative_tolerances=self.get_final_tolerances(kindid, target_features),
+            enhanced_target_features=enhanced_target_features,
+            similarity_hooks=[plugin.calculate_custom_similarity
+                              for plugin in self.get_plugins_for_kindid(kindid)],
+            context=context)
+
+        with self._scoring_plan_lock:
+            self._scoring_plan_cache[key] = plan
+            while len(self._scoring_plan_cache) > SCORING_PLAN_CACHE_SIZE:
+                self._scoring_plan_cache.popitem(last=False)
+        return plan
+
+    def clear_scoring_plans(self):
+        """清空打分计划缓存"""
+        with self._scoring_plan_lock:
+            self._scoring_plan_cache.clear()
+
+    @staticmethod
+    def _scoring_plan_signature(target_features: Dict[str, Any], context: Optional[Dict[str, Any]]) -> str:
+        """目标特征（不含元数据字段）和上下文的规范化签名，非JSON类型带上类型名以区分"""
+        relevant = {name: value for name, value in target_features.items()
+                    if name not in SIMILARITY_EXCLUDED_FEATURES}
+        return json.dumps([relevant, context], sort_keys=True, ensure_ascii=False,
+                          default=lambda value: f"{type(value).__name__}:{value!r}")
+
     def calculate_plugin_similarity(self,
                                     kindid: int,
                                     feature_name: str,
@@ -414,6 +526,12 @@ class EquipAnchorEvaluator(BaseValuator):
         # 初始化插拔式配置系统
         self.base_config = BaseEquipmentConfig()
         self.plugin_manager = EquipmentPluginManager(self.base_config)
+
+        # 列式相似度模式：候选装备一次性向量化计算（False时使用逐行标量计算）
+        self.vectorized_similarity = True
+
+        # 套装效果相似度表：套装分类和两两相似度在初始化时编译
+        self.suit_effect_table = SuitEffectTable.from_config()
         
         print("装备锚定估价器初始化完成，支持插拔式装备类型配置")
         print(f"已加载插件: {[p.plugin_name for p in self.plugin_manager.plugins]}")
@@ -462,65 +580,150 @@ class EquipAnchorEvaluator(BaseValuator):
         try:
             if verbose:
                 print(f"开始寻找装备市场锚点，相似度阈值: {similarity_threshold}")
-            # 获取目标装备的equip_sn，用于排除自身
-            target_equip_sn = target_features.get('equip_sn')
-            if target_equip_sn and verbose:
-                print(f"目标装备序列号: {target_equip_sn}，将排除自身")
-
-            # 构建预过滤条件以提高效率
-            pre_filters = self._build_pre_filters(target_features)
-            # 根据装备类型决定market_collector
-            # 根据装备类型决定是否使用属性分类过滤
-            target_kindid = target_features.get('kindid', 0)
-            needs_addon_filter = self.base_config.needs_addon_classification_filter(
-                target_kindid)
-            # 根据装备类型决定饰市场数据采集器
-            if self.base_config.is_lingshi(target_kindid):
-                # 灵饰使用灵饰市场数据采集器
-                market_data = self.lingshi_market_collector.get_market_data_with_business_rules(pre_filters)
-            elif is_pet_equip(target_kindid):
-                # 召唤兽装备使用召唤兽装备市场数据采集器
-                if verbose:
-                    print(f"召唤兽装备类型target_features: {pre_filters}")
-                market_data = self.pet_equip_market_collector.get_market_data_with_addon_classification({
-                        **pre_filters,
-                        **target_features
-                    })
-            elif needs_addon_filter:
-                # 需要属性分类过滤的装备类型（武器和防具）
-                if verbose:
-                    print(f"装备类型 {target_kindid} 需要属性分类过滤")
-                pre_filters.update({
-                    'addon_minjie': target_features.get('addon_minjie', 0),
-                    'addon_liliang': target_features.get('addon_liliang', 0),
-                    'addon_naili': target_features.get('addon_naili', 0),
-                    'addon_tizhi': target_features.get('addon_tizhi', 0),
-                    'addon_moli': target_features.get('addon_moli', 0)
+            market_data = self._load_market_candidates(target_features, verbose)
+            return self._find_anchors_in_candidates(
+                target_features, market_data, similarity_threshold, max_anchors, verbose=verbose)
+
+        except Exception as e:
+            self.logger.error(f"寻找装备市场锚点失败: {e}")
+            return []
+
+    def _get_candidate_group_key(self, target_features: Dict[str, Any]) -> Optional[str]:
+        """
+        获取候选集合分组键：只包含各采集器加载候选时实际读取的字段
+
+        召唤兽装备的候选加载会读取目标的全部特征，不参与分组。
+
+        Args:
+            target_features: 目标装备特征
+
+        Returns:
+            Optional[str]: 分组键，None表示单独估价
+        """
+        target_kindid = target_features.get('kindid', 0)
+        if is_pet_equip(target_kindid):
+            return None
+
+        pre_filters = self._build_pre_filters(target_features)
+        if self.base_config.is_lingshi(target_kindid):
+            # 灵饰采集器按预过滤条件（等级、主属性、附加属性等）加载候选
+            return self._make_candidate_group_key('lingshi', pre_filters)
+        if self.base_config.needs_addon_classification_filter(target_kindid):
+            # 武器和防具：相似度查询条件 + 属性分类
+            return self._make_candidate_group_key(
+                'addon',
+                [pre_filters.get(key) for key in SIMILARITY_QUERY_KEYS],
+                self.market_collector._get_target_addon_classification(target_features))
+        merged_filters = {**pre_filters, **target_features}
+        return self._make_candidate_group_key(
+            'similarity', [merged_filters.get(key) for key in SIMILARITY_QUERY_KEYS])
+
+    def _load_market_candidates(self,
+                                target_features: Dict[str, Any],
+                                verbose: bool = True) -> pd.DataFrame:
+        """
+        根据装备类型选择市场数据采集器并加载预过滤后的候选装备
+
+        Args:
+            target_features: 目标装备特征
+            verbose: 是否显示详细调试日志
+
+        Returns:
+            pd.DataFrame: 预过滤后的市场数据
+        """
+        # 构建预过滤条件以提高效率
+        pre_filters = self._build_pre_filters(target_features)
+        # 根据装备类型决定是否使用属性分类过滤
+        target_kindid = target_features.get('kindid', 0)
+        needs_addon_filter = self.base_config.needs_addon_classification_filter(
+            target_kindid)
+        # 根据装备类型决定市场数据采集器
+        if self.base_config.is_lingshi(target_kindid):
+            # 灵饰使用灵饰市场数据采集器
+            return self.lingshi_market_collector.get_market_data_with_business_rules(pre_filters)
+        if is_pet_equip(target_kindid):
+            # 召唤兽装备使用召唤兽装备市场数据采集器
+            if verbose:
+                print(f"召唤兽装备类型target_features: {pre_filters}")
+            return self.pet_equip_market_collector.get_market_data_with_addon_classification({
+                    **pre_filters,
+                    **target_features
                 })
-                # 获取预过滤的市场数据（使用属性分类过滤）
-                market_data = self.market_collector.get_market_data_with_addon_classification(
-                    pre_filters)
-            else:
-                # 不需要属性分类过滤的装备类型
-                if verbose:
-                    print(f"装备类型 {target_kindid} 不需要属性分类过滤")
-                # 获取预过滤的市场数据（不使用属性分类过滤）
-                market_data = self.market_collector.get_market_data_for_similarity({**pre_filters,**target_features})
-
-            if market_data.empty:
-                if verbose:
-                    print("装备市场数据为空，无法找到锚点")
-                return []
+        if needs_addon_filter:
+            # 需要属性分类过滤的装备类型（武器和防具）
+            if verbose:
+                print(f"装备类型 {target_kindid} 需要属性分类过滤")
+            pre_filters.update({
+                'addon_minjie': target_features.get('addon_minjie', 0),
+                'addon_liliang': target_features.get('addon_liliang', 0),
+                'addon_naili': target_features.get('addon_naili', 0),
+                'addon_tizhi': target_features.get('addon_tizhi', 0),
+                'addon_moli': target_features.get('addon_moli', 0)
+            })
+            # 获取预过滤的市场数据（使用属性分类过滤）
+            return self.market_collector.get_market_data_with_addon_classification(
+                pre_filters)
+        # 不需要属性分类过滤的装备类型
+        if verbose:
+            print(f"装备类型 {target_kindid} 不需要属性分类过滤")
+        # 获取预过滤的市场数据（不使用属性分类过滤）
+        return self.market_collector.get_market_data_for_similarity({**pre_filters, **target_features})
+
+    def _find_anchors_in_candidates(self,
+                                    target_features: Dict[str, Any],
+                                    market_data: pd.DataFrame,
+                                    similarity_threshold: float = 0.7,
+                                    max_anchors: int = 30,
+                                    verbose: bool = True,
+                                    prepared: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        在已加载的候选装备中计算相似度并选出锚点
+
+        Args:
+            target_features: 目标装备特征
+            market_data: 预过滤后的市场数据
+            similarity_threshold: 相似度阈值（0-1）
+            max_anchors: 最大锚点数量
+            verbose: 是否显示详细调试日志
+            prepared: 同组共享的候选侧预处理结果（_prepare_market_candidates）
+
+        Returns:
+            List[Dict[str, Any]]: 锚点装备列表
+        """
+        # 获取目标装备的equip_sn，用于排除自身
+        target_equip_sn = target_features.get('equip_sn')
+        if target_equip_sn and verbose:
+            print(f"目标装备序列号: {target_equip_sn}，将排除自身")
+        target_kindid = target_features.get('kindid', 0)
 
+        if market_data.empty:
             if verbose:
-                print(f"预过滤后获得 {len(market_data)} 条候选装备数据")
+                print("装备市场数据为空，无法找到锚点")
+            return []
+
+        if verbose:
+            print(f"预过滤后获得 {len(market_data)} 条候选装备数据")
 
-            # 计算所有市场装备的相似度
+        # 计算所有市场装备的相似度
+        if self.vectorized_similarity:
+            # 列式相似度：所有候选一次性计算
+            anchor_candidates, error_count, excluded_self_count = self._score_market_candidates_vectorized(
+                target_features, market_data, similarity_threshold, max_anchors, prepared=prepared)
+        else:
             anchor_candidates = []
             error_count = 0
             excluded_self_count = 0
+            features_ready = self.base_config.is_lingshi(target_kindid) or target_kindid == PET_EQUIP_KINDID
+            precomputed_features = [None] * len(market_data) if features_ready else \
+                self._get_precomputed_market_features(market_data)
+            raw_market_data = self._drop_precomputed_columns(market_data)
+            # 目标侧打分计划只构建一次（构建失败时逐个候选按原流程记录错误）
+            try:
+                scoring_plan = self._get_scoring_plan(target_features)
+            except Exception:
+                scoring_plan = None
 
-            for idx, market_row in market_data.iterrows():
+            for position, (idx, market_row) in enumerate(raw_market_data.iterrows()):
                 try:
                     # 获取当前市场装备的equip_sn
                     current_equip_sn = market_row.get('equip_sn', idx)
@@ -538,6 +741,9 @@ class EquipAnchorEvaluator(BaseValuator):
                     elif target_kindid == PET_EQUIP_KINDID:
                         # 召唤兽装备数据已经在数据库中完成特征提取，直接使用
                         market_features = self._convert_pandas_row_to_dict(market_row)
+                    elif precomputed_features[position] is not None:
+                        # 普通装备优先使用缓存中的预计算特征
+                        market_features = precomputed_features[position]
                     else:
                         # 普通装备需要从原始数据中提取特征
                         market_features = self.feature_extractor.extract_features(
@@ -545,7 +751,7 @@ class EquipAnchorEvaluator(BaseValuator):
 
                     # 计算相似度
                     similarity = self._calculate_similarity(
-                        target_features, market_features, verbose=verbose)
+                        target_features, market_features, verbose=verbose, scoring_plan=scoring_plan)
 
                     if similarity >= similarity_threshold:
                         anchor_candidates.append({
@@ -563,37 +769,179 @@ class EquipAnchorEvaluator(BaseValuator):
                     error_count += 1
                     continue
 
-            # 输出处理统计
-            processed_count = len(market_data)
-            success_count = processed_count - error_count - excluded_self_count
-            if error_count > 0 or excluded_self_count > 0:
-                self.logger.warning(
-                    f"数据处理统计: 总数={processed_count}, 成功={success_count}, 失败={error_count}, 排除自身={excluded_self_count}")
+        # 输出处理统计
+        processed_count = len(market_data)
+        success_count = processed_count - error_count - excluded_self_count
+        if error_count > 0 or excluded_self_count > 0:
+            self.logger.warning(
+                f"数据处理统计: 总数={processed_count}, 成功={success_count}, 失败={error_count}, 排除自身={excluded_self_count}")
+
+        # 按相似度排序
+        anchor_candidates.sort(key=lambda x: x['similarity'], reverse=True)
+        # 返回前N个锚点
+        anchors = anchor_candidates[:max_anchors]
+
+        # 对锚点进行极端值过滤
+        if anchors:
+            anchors = self.extreme_value_filter.filter_anchors_for_extreme_values(anchors)
+
+        if verbose:
+            print(f"找到 {len(anchors)} 个装备市场锚点")
+            if excluded_self_count > 0:
+                print(f"排除目标装备自身 {excluded_self_count} 次")
+            if anchors:
+                print(
+                    f"相似度范围: {anchors[-1]['similarity']:.3f} - {anchors[0]['similarity']:.3f}")
+                print(
+                    f"价格范围: {min(a['price'] for a in anchors):.1f} - {max(a['price'] for a in anchors):.1f}")
 
-            # 按相似度排序
-            anchor_candidates.sort(key=lambda x: x['similarity'], reverse=True)
-            # 返回前N个锚点
-            anchors = anchor_candidates[:max_anchors]
+        return anchors
 
-            # 对锚点进行极端值过滤
-            if anchors:
-                anchors = self.extreme_value_filter.filter_anchors_for_extreme_values(anchors)
+    def _prepare_market_candidates(self,
+                                   target_features: Dict[str, Any],
+                                   market_data: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """
+        候选侧预处理：记录转换、特征提取和插件特征增强只与候选有关，同组目标共享
 
-            if verbose:
-                print(f"找到 {len(anchors)} 个装备市场锚点")
-                if excluded_self_count > 0:
-                    print(f"排除目标装备自身 {excluded_self_count} 次")
-                if anchors:
-                    print(
-                        f"相似度范围: {anchors[-1]['similarity']:.3f} - {anchors[0]['similarity']:.3f}")
-                    print(
-                        f"价格范围: {min(a['price'] for a in anchors):.1f} - {max(a['price'] for a in anchors):.1f}")
+        Args:
+            target_features: 组内任一目标装备特征（只读取kindid）
+            market_data: 预过滤后的市场数据
+
+        Returns:
+            Optional[Dict[str, Any]]: 预处理结果；标量模式下不预处理，返回None
+        """
+        if not self.vectorized_similarity:
+            return None
+
+        target_kindid = target_features.get('kindid', 0)
+        features_ready = self.base_config.is_lingshi(target_kindid) or target_kindid == PET_EQUIP_KINDID
+
+        precomputed_features = [None] * len(market_data) if features_ready else \
+            self._get_precomputed_market_features(market_data)
+        records = self._convert_dataframe_to_dicts(self._drop_precomputed_columns(market_data))
+        prices = market_data['price'].tolist() if 'price' in market_data.columns else [0] * len(records)
+
+        candidate_rows = []  # (记录位置, equip_sn)
+        market_features_list = []
+        failed_equip_sns = []  # 特征提取失败的候选（排除自身时不计为失败）
+
+        for position, (idx, record) in enumerate(zip(market_data.index, records)):
+            # 获取当前市场装备的equip_sn
+            current_equip_sn = record.get('equip_sn', idx)
+            try:
+                # 灵饰/召唤兽装备数据已经包含提取好的特征，普通装备需要从原始数据中提取特征
+                if features_ready:
+                    market_features = record
+                elif precomputed_features[position] is not None:
+                    market_features = precomputed_features[position]
+                else:
+                    market_features = self.feature_extractor.extract_features(dict(record))
+            except Exception as e:
+                self.logger.error(f"处理装备 {current_equip_sn} 时出错: {e}")
+                failed_equip_sns.append(current_equip_sn)
+                continue
+
+            candidate_rows.append((position, current_equip_sn))
+            market_features_list.append(market_features)
+
+        return {
+            'records': records,
+            'prices': prices,
+            'candidate_rows': candidate_rows,
+            'market_features_list': market_features_list,
+            'failed_equip_sns': failed_equip_sns,
+            'enhanced_market': self._enhance_market_features(target_kindid, market_features_list),
+        }
+
+    def _score_market_candidates_vectorized(self,
+                                            target_features: Dict[str, Any],
+                                            market_data: pd.DataFrame,
+                                            similarity_threshold: float,
+                                            max_anchors: int,
+                                            prepared: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], int, int]:
+        """
+        列式相似度模式：一次性计算所有候选装备的相似度并选出锚点候选
+
+        Args:
+            target_features: 目标装备特征
+            market_data: 预过滤后的市场数据
+            similarity_threshold: 相似度阈值
+            max_anchors: 最大锚点数量
+            prepared: 同组共享的候选侧预处理结果，为None时现场预处理
+
+        Returns:
+            Tuple[按相似度降序的锚点候选（最多max_anchors个）, 失败数, 排除自身次数]
+        """
+        if prepared is None:
+            prepared = self._prepare_market_candidates(target_features, market_data)
+
+        target_equip_sn = target_features.get('equip_sn')
+        candidate_rows = prepared['candidate_rows']
+        records = prepared['records']
+        prices = prepared['prices']
+
+        # 组内候选与目标无关，逐个目标计算后再排除自身
+        similarities = self._calculate_similarity_vectorized(
+            target_features, prepared['market_features_list'], enhanced_market=prepared['enhanced_market'])
+
+        excluded_self_count = 0
+        error_count = len(prepared['failed_equip_sns'])
+        if target_equip_sn:
+            self_mask = np.fromiter((equip_sn == target_equip_sn for _, equip_sn in candidate_rows),
+                                    dtype=bool, count=len(candidate_rows))
+            excluded_self_count = int(self_mask.sum())
+            failed_self_count = sum(1 for equip_sn in prepared['failed_equip_sns'] if equip_sn == target_equip_sn)
+            excluded_self_count += failed_self_count
+            error_count -= failed_self_count
+            if self_mask.any():
+                similarities = np.where(self_mask, -np.inf, similarities)
+
+        # 阈值过滤后按（保留三位小数的）相似度稳定排序，只物化前N个锚点
+        selected = [(i, round(float(similarities[i]), 3))
+                    for i in np.flatnonzero(similarities >= similarity_threshold)]
+        selected.sort(key=lambda x: x[1], reverse=True)
+
+        anchor_candidates = []
+        for i, similarity in selected[:max_anchors]:
+            position, current_equip_sn = candidate_rows[i]
+            anchor_candidates.append({
+                'equip_sn': current_equip_sn,
+                'similarity': similarity,
+                'price': float(prices[position]),
+                # 同组目标共享候选记录，锚点中返回副本
+                'features': dict(records[position])
+            })
+
+        return anchor_candidates, error_count, excluded_self_count
+
+    def _get_precomputed_market_features(self, market_data: pd.DataFrame) -> List[Optional[Dict[str, Any]]]:
+        """
+        获取市场数据中普通装备的预计算特征
 
-            return anchors
+        Args:
+            market_data: 预过滤后的市场数据
 
+        Returns:
+            List[Optional[Dict[str, Any]]]: 逐行对应的特征字典，没有可用预计算特征的行为None（需实时提取）
+        """
+        if FEATURE_VERSION_COLUMN not in market_data.columns or \
+                not hasattr(self.market_collector, 'get_precomputed_features'):
+            return [None] * len(market_data)
+        # 采集器与估价器的特征提取器配置不一致时不能直接使用预计算特征
+        if getattr(self.market_collector.feature_extractor, 'config_version', None) != \
+                getattr(self.feature_extractor, 'config_version', None):
+            return [None] * len(market_data)
+        try:
+            return self.market_collector.get_precomputed_features(market_data)
         except Exception as e:
-            self.logger.error(f"寻找装备市场锚点失败: {e}")
-            return []
+            self.logger.warning(f"读取预计算特征失败，改为实时提取: {e}")
+            return [None] * len(market_data)
+
+    def _drop_precomputed_columns(self, market_data: pd.DataFrame) -> pd.DataFrame:
+        """去掉预计算特征列，保持锚点中返回的原始装备数据不变"""
+        columns = [col for col in market_data.columns
+                   if col.startswith(PRECOMPUTED_FEATURE_PREFIX) or col == FEATURE_VERSION_COLUMN]
+        return market_data.drop(columns=columns) if columns else market_data
 
     def _build_pre_filters(self, target_features: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -676,7 +1024,8 @@ class EquipAnchorEvaluator(BaseValuator):
     def _calculate_similarity(self,
                               target_features: Dict[str, Any],
                               market_features: Dict[str, Any],
-                              verbose: bool = False) -> float:
+                              verbose: bool = False,
+                              scoring_plan: Optional[EquipmentScoringPlan] = None) -> float:
         """
         计算两个装备特征的相似度 - 支持插拔式装备类型配置
 
@@ -684,6 +1033,7 @@ class EquipAnchorEvaluator(BaseValuator):
             target_features: 目标装备特征
             market_features: 市场装备特征
             verbose: 是否显示详细调试日志（批量估价默认关闭）
+            scoring_plan: 目标装备的打分计划，为None时从插件管理器获取（有缓存）
 
         Returns:
             float: 相似度分数（0-1）
@@ -694,35 +1044,25 @@ class EquipAnchorEvaluator(BaseValuator):
                 self.logger.warning("装备特征数据格式错误，使用默认相似度")
                 return 0.0
 
-            # 获取装备类型相关配置（通过插件系统）
-            kindid = target_features.get('kindid', 0)
-            feature_weights, relative_tolerances = self.get_equip_type_configs(
-                kindid, target_features)
+            # 目标侧的权重、容忍度和派生特征来自打分计划，这里只做候选侧计算
+            if scoring_plan is None:
+                scoring_plan = self._get_scoring_plan(target_features)
+            kindid = scoring_plan.kindid
+            feature_weights = scoring_plan.feature_weights
+            relative_tolerances = scoring_plan.relative_tolerances
+            enhanced_target_features = scoring_plan.enhanced_target_features
 
             # 特征增强：添加派生特征
-            # 对于灵饰，传递target_match_attrs信息
-            context = None
-            if self.base_config.is_lingshi(kindid) and hasattr(self.lingshi_market_collector, 'target_features'):
-                target_match_attrs = self.lingshi_market_collector.target_features.get('target_match_attrs')
-                if target_match_attrs:
-                    context = {
-                        'target_match_attrs': target_match_attrs
-                    }
-            
-            enhanced_target_features = self.plugin_manager.get_enhanced_features(
-                kindid, target_features, context)
             enhanced_market_features = self.plugin_manager.get_enhanced_features(
-                kindid, market_features, context)
+                kindid, market_features, scoring_plan.context)
 
             total_weight = 0
             weighted_similarity = 0
 
             # 合并所有特征名称（包括派生特征）
-            all_features = set(enhanced_target_features.keys()) | set(
-                enhanced_market_features.keys())
             # 过滤掉一些元数据字段 ???FIXME:为什么这么多元数据字段
-            excluded_features = {'equip_sn', 'price', 'create_time', 'index'}
-            all_features = all_features - excluded_features
+            all_features = scoring_plan.target_feature_names | (
+                set(enhanced_market_features.keys()) - SIMILARITY_EXCLUDED_FEATURES)
 
             # 收集所有特征的计算结果，用于按得分排序输出
             feature_results = []
@@ -737,120 +1077,11 @@ class EquipAnchorEvaluator(BaseValuator):
                 # 权重为0的特征不参与计算
                 if weight == 0:
                     continue
-                # 尝试使用插件的自定义相似度计算
-                plugin_similarity = self.plugin_manager.calculate_plugin_similarity(
-                    kindid, feature_name, target_val, market_val)
-
-                if plugin_similarity is not None:
-                    # 使用插件的自定义计算结果
-                    feature_similarity = plugin_similarity
-                    calculation_method = "插件"
-                elif target_val == 0 and market_val == 0:
-                    # 两者都为0，完全匹配
-                    feature_similarity = 1.0
-                    calculation_method = "默认"
-                elif feature_name in ['suit_effect']:
-                    # 套装效果特殊相似度计算
-                    target_kindid = enhanced_target_features.get('kindid')
-                    market_kindid = enhanced_market_features.get('kindid')
-                    feature_similarity = self._calculate_suit_effect_similarity(
-                        target_val, market_val, target_kindid, market_kindid)
-                    calculation_method = "套装"
-                elif feature_name in relative_tolerances:
-                    # 使用装备类型特定的相对容忍度计算
-                    tolerance = relative_tolerances[feature_name]
-
-                    if feature_name == 'repair_fail_num':
-                        # 修理失败次数特殊处理：次数越多越不好
-                        if target_val == market_val:
-                            feature_similarity = 1.0
-                        elif market_val > target_val:
-                            # 市场装备修理失败次数更多，相似度降低更多
-                            diff = market_val - target_val
-                            feature_similarity = max(
-                                0.0, 1.0 - diff * 0.3)  # 每多1次失败，相似度降低0.3
-                        else:
-                            # 目标装备修理失败次数更多，相似度降低较少
-                            diff = target_val - market_val
-                            feature_similarity = max(
-                                0.0, 1.0 - diff * 0.2)  # 每多1次失败，相似度降低0.2
-                        calculation_method = "修理"
-                    elif feature_name in ['special_skill']:
-                        # 特技和套装效果必须完全一致（容忍度为0）
-                        if target_val == market_val:
-                            feature_similarity = 1.0
-                        else:
-                            feature_similarity = 0.0
-                        calculation_method = "特技/套装"
-                    elif target_val == 0 or market_val == 0:
-                        feature_similarity = 0.10
-                        calculation_method = "零值"
-                    
-                    else:
-                        # 计算相对差异 - 先检查数据类型
-                        try:
-                            # 处理列表和字典类型的特征值
-                            if isinstance(target_val, (list, dict)) or isinstance(market_val, (list, dict)):
-                                if verbose:
-                                    print(f"[DEBUG] 特征 '{feature_name}' 包含复杂类型:")
-                                    print(
-                                        f"  目标值: {target_val} (类型: {type(target_val)})")
-                                    print(
-                                        f"  市场值: {market_val} (类型: {type(market_val)})")
-
-                                # 对于复杂类型，使用简单匹配
-                                if target_val == market_val:
-                                    feature_similarity = 1.0
-                                else:
-                                    feature_similarity = 0.1  # 给予较低相似度
-                                calculation_method = "复杂"
-                            else:
-                                # 确保都是数值类型后进行计算
-                                target_numeric = float(
-                                    target_val) if target_val is not None else 0
-                                market_numeric = float(
-                                    market_val) if market_val is not None else 0
-
-                                denominator = max(
-                                    abs(target_numeric), abs(market_numeric))
-                                diff_ratio = abs(
-                                    target_numeric - market_numeric) / denominator
-
-                                if diff_ratio <= tolerance:
-                                    # 在容忍度内，相似度为1
-                                    feature_similarity = 1.0
-                                elif diff_ratio <= tolerance * 2:
-                                    # 超出容忍度但在2倍范围内，线性递减
-                                    feature_similarity = max(
-                                        0, 1.0 - (diff_ratio - tolerance) / max(tolerance, 0.1))
-                                else:
-                                    # 差异太大，相似度为0
-                                    feature_similarity = 0.0
-                                calculation_method = "容忍"
-
-                        except (TypeError, ValueError) as e:
-                            # 捕获类型错误并记录详细信息
-                            if verbose:
-                                print(f"[DEBUG] 特征 '{feature_name}' 转换失败:")
-                                print(
-                                    f"  目标值: {target_val} (类型: {type(target_val)})")
-                                print(
-                                    f"  市场值: {market_val} (类型: {type(market_val)})")
-                                print(f"  错误信息: {e}")
-
-                            # 对于无法处理的类型，使用简单匹配
-                            if target_val == market_val:
-                                feature_similarity = 1.0
-                            else:
-                                feature_similarity = 0.5
-                            calculation_method = "错误"
-                else:
-                    # 未配置的特征，使用默认逻辑
-                    if target_val == market_val:
-                        feature_similarity = 1.0
-                    else:
-                        feature_similarity = 0.5  # 给予中等相似度
-                    calculation_method = "默认"
+                # 计算单个特征的相似度（插件优先，其次默认规则）
+                feature_similarity, calculation_method = self._calculate_feature_similarity(
+                    kindid, feature_name, target_val, market_val, relative_tolerances,
+                    enhanced_target_features.get('kindid'), enhanced_market_features.get('kindid'),
+                    verbose=verbose, scoring_plan=scoring_plan)
 
                 # 计算加权得分
                 weighted_score = feature_similarity * weight
@@ -906,9 +1137,477 @@ class EquipAnchorEvaluator(BaseValuator):
             self.logger.error(f"计算装备相似度失败: {e}")
             return 0.0
 
+    def _calculate_feature_similarity(self,
+                                      kindid: int,
+                                      feature_name: str,
+                                      target_val: Any,
+                                      market_val: Any,
+                                      relative_tolerances: Dict[str, float],
+                                      target_kindid: Any = None,
+                                      market_kindid: Any = None,
+                                      verbose: bool = False,
+                                      scoring_plan: Optional[EquipmentScoringPlan] = None) -> Tuple[float, str]:
+        """
+        计算单个特征的相似度（标量路径与向量化路径共用的规则）
+
+        Args:
+            kindid: 装备类型ID（用于查找插件）
+            feature_name: 特征名称
+            target_val: 目标值
+            market_val: 市场值
+            relative_tolerances: 相对容忍度配置
+            target_kindid: 目标装备类型ID（套装相似度使用）
+            market_kindid: 市场装备类型ID（套装相似度使用）
+            verbose: 是否显示详细调试日志
+            scoring_plan: 目标装备的打分计划（使用其中的插件相似度钩子）
+
+        Returns:
+            Tuple[相似度分数, 计算方法]
+        """
+        # 尝试使用插件的自定义相似度计算
+        if scoring_plan is not None:
+            plugin_similarity = scoring_plan.calculate_plugin_similarity(
+                feature_name, target_val, market_val)
+        else:
+            plugin_similarity = self.plugin_manager.calculate_plugin_similarity(
+                kindid, feature_name, target_val, market_val)
+
+        if plugin_similarity is not None:
+            # 使用插件的自定义计算结果
+            return plugin_similarity, "插件"
+
+        return self._calculate_default_feature_similarity(
+            feature_name, target_val, market_val, relative_tolerances,
+            target_kindid, market_kindid, verbose=verbose)
+
+    def _calculate_default_feature_similarity(self,
+                                              feature_name: str,
+                                              target_val: Any,
+                                              market_val: Any,
+                                              relative_tolerances: Dict[str, float],
+                                              target_kindid: Any = None,
+                                              market_kindid: Any = None,
+                                              verbose: bool = False) -> Tuple[float, str]:
+        """
+        按默认规则计算单个特征的相似度（不经过插件）
+
+        Returns:
+            Tuple[相似度分数, 计算方法]
+        """
+        if target_val == 0 and market_val == 0:
+            # 两者都为0，完全匹配
+            feature_similarity = 1.0
+            calculation_method = "默认"
+        elif feature_name in ['suit_effect']:
+            # 套装效果特殊相似度计算
+            feature_similarity = self._calculate_suit_effect_similarity(
+                target_val, market_val, target_kindid, market_kindid)
+            calculation_method = "套装"
+        elif feature_name in relative_tolerances:
+            # 使用装备类型特定的相对容忍度计算
+            tolerance = relative_tolerances[feature_name]
+
+            if feature_name == 'repair_fail_num':
+                # 修理失败次数特殊处理：次数越多越不好
+                if target_val == market_val:
+                    feature_similarity = 1.0
+                elif market_val > target_val:
+                    # 市场装备修理失败次数更多，相似度降低更多
+                    diff = market_val - target_val
+                    feature_similarity = max(
+                        0.0, 1.0 - diff * 0.3)  # 每多1次失败，相似度降低0.3
+                else:
+                    # 目标装备修理失败次数更多，相似度降低较少
+                    diff = target_val - market_val
+                    feature_similarity = max(
+                        0.0, 1.0 - diff * 0.2)  # 每多1次失败，相似度降低0.2
+                calculation_method = "修理"
+            elif feature_name in ['special_skill']:
+                # 特技和套装效果必须完全一致（容忍度为0）
+                if target_val == market_val:
+                    feature_similarity = 1.0
+                else:
+                    feature_similarity = 0.0
+                calculation_method = "特技/套装"
+            elif target_val == 0 or market_val == 0:
+                feature_similarity = 0.10
+                calculation_method = "零值"
+                    
+            else:
+                # 计算相对差异 - 先检查数据类型
+                try:
+                    # 处理列表和字典类型的特征值
+                    if isinstance(target_val, (list, dict)) or isinstance(market_val, (list, dict)):
+                        if verbose:
+                            print(f"[DEBUG] 特征 '{feature_name}' 包含复杂类型:")
+                            print(
+                                f"  目标值: {target_val} (类型: {type(target_val)})")
+                            print(
+                                f"  市场值: {market_val} (类型: {type(market_val)})")
+
+                        # 对于复杂类型，使用简单匹配
+                        if target_val == market_val:
+                            feature_similarity = 1.0
+                        else:
+                            feature_similarity = 0.1  # 给予较低相似度
+                        calculation_method = "复杂"
+                    else:
+                        # 确保都是数值类型后进行计算
+                        target_numeric = float(
+                            target_val) if target_val is not None else 0
+                        market_numeric = float(
+                            market_val) if market_val is not None else 0
+
+                        denominator = max(
+                            abs(target_numeric), abs(market_numeric))
+                        diff_ratio = abs(
+                            target_numeric - market_numeric) / denominator
+
+                        if diff_ratio <= tolerance:
+                            # 在容忍度内，相似度为1
+                            feature_similarity = 1.0
+                        elif diff_ratio <= tolerance * 2:
+                            # 超出容忍度但在2倍范围内，线性递减
+                            feature_similarity = max(
+                                0, 1.0 - (diff_ratio - tolerance) / max(tolerance, 0.1))
+                        else:
+                            # 差异太大，相似度为0
+                            feature_similarity = 0.0
+                        calculation_method = "容忍"
+
+                except (TypeError, ValueError) as e:
+                    # 捕获类型错误并记录详细信息
+                    if verbose:
+                        print(f"[DEBUG] 特征 '{feature_name}' 转换失败:")
+                        print(
+                            f"  目标值: {target_val} (类型: {type(target_val)})")
+                        print(
+                            f"  市场值: {market_val} (类型: {type(market_val)})")
+                        print(f"  错误信息: {e}")
+
+                    # 对于无法处理的类型，使用简单匹配
+                    if target_val == market_val:
+                        feature_similarity = 1.0
+                    else:
+                        feature_similarity = 0.5
+                    calculation_method = "错误"
+        else:
+            # 未配置的特征，使用默认逻辑
+            if target_val == market_val:
+                feature_similarity = 1.0
+            else:
+                feature_similarity = 0.5  # 给予中等相似度
+            calculation_method = "默认"
+
+        return feature_similarity, calculation_method
+
+    def _get_similarity_context(self, kindid: int) -> Optional[Dict[str, Any]]:
+        """
+        获取派生特征计算所需的上下文
+
+        对于灵饰，传递target_match_attrs信息
+
+        Args:
+            kindid: 装备类型ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 上下文信息，无需上下文时返回None
+        """
+        if self.base_config.is_lingshi(kindid) and hasattr(self.lingshi_market_collector, 'target_features'):
+            target_match_attrs = self.lingshi_market_collector.target_features.get('target_match_attrs')
+            if target_match_attrs:
+                return {
+                    'target_match_attrs': target_match_attrs
+                }
+        return None
+
+    def _get_scoring_plan(self, target_features: Dict[str, Any]) -> EquipmentScoringPlan:
+        """
+        获取目标装备的打分计划（权重、容忍度、派生特征和插件钩子，按目标缓存）
+
+        Args:
+            target_features: 目标装备特征
+
+        Returns:
+            EquipmentScoringPlan: 打分计划
+        """
+        kindid = target_features.get('kindid', 0)
+        return self.plugin_manager.get_scoring_plan(
+            kindid, target_features, self._get_similarity_context(kindid))
+
+    def _enhance_market_features(self,
+                                 kindid: int,
+                                 market_features_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        对候选装备特征做插件增强（与目标无关，同组目标共享）
+
+        Args:
+            kindid: 装备类型ID
+            market_features_list: 市场装备特征列表
+
+        Returns:
+            Dict[str, Any]: enhanced（增强后的特征列表）、failed（增强失败的掩码）、
+                kindids（候选的kindid）、feature_names（候选特征名称并集）
+        """
+        context = self._get_similarity_context(kindid)
+        # 候选特征增强，失败的候选整体相似度记为0（与标量路径一致）
+        failed = np.zeros(len(market_features_list), dtype=bool)
+        enhanced_market_list = []
+        feature_names = set()
+        for i, market_features in enumerate(market_features_list):
+            enhanced = None
+            if isinstance(market_features, dict):
+                try:
+                    enhanced = self.plugin_manager.get_enhanced_features(
+                        kindid, market_features, context)
+                except Exception as e:
+                    self.logger.error(f"计算装备相似度失败: {e}")
+            if enhanced is None:
+                failed[i] = True
+                enhanced = {}
+            enhanced_market_list.append(enhanced)
+            feature_names.update(enhanced.keys())
+
+        return {
+            'enhanced': enhanced_market_list,
+            'failed': failed,
+            'kindids': [enhanced.get('kindid') for enhanced in enhanced_market_list],
+            'feature_names': feature_names,
+        }
+
+    def _calculate_similarity_vectorized(self,
+                                         target_features: Dict[str, Any],
+                                         market_features_list: List[Dict[str, Any]],
+                                         enhanced_market: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        列式计算目标装备与一组市场装备的相似度 - 与 _calculate_similarity 结果一致
+
+        每个特征在所有候选上一次性计算（数值列使用数组运算），再按权重聚合。
+
+        Args:
+            target_features: 目标装备特征
+            market_features_list: 市场装备特征列表
+            enhanced_market: 候选侧增强结果（_enhance_market_features），为None时现场计算
+
+        Returns:
+            np.ndarray: 每个候选装备的相似度分数（0-1）
+        """
+        candidate_count = len(market_features_list)
+        if candidate_count == 0 or not isinstance(target_features, dict):
+            return np.zeros(candidate_count)
+
+        try:
+            # 目标侧配置和派生特征来自打分计划（按目标缓存）
+            scoring_plan = self._get_scoring_plan(target_features)
+            kindid = scoring_plan.kindid
+            feature_weights = scoring_plan.feature_weights
+            relative_tolerances = scoring_plan.relative_tolerances
+            enhanced_target_features = scoring_plan.enhanced_target_features
+
+            if enhanced_market is None:
+                enhanced_market = self._enhance_market_features(kindid, market_features_list)
+            enhanced_market_list = enhanced_market['enhanced']
+            failed = enhanced_market['failed'].copy()
+
+            # 合并所有特征名称（包括派生特征）
+            all_features = scoring_plan.target_feature_names | (
+                enhanced_market['feature_names'] - SIMILARITY_EXCLUDED_FEATURES)
+
+            target_kindid = enhanced_target_features.get('kindid')
+            market_kindids = enhanced_market['kindids']
+
+            weighted_similarity = np.zeros(candidate_count)
+            total_weight = np.zeros(candidate_count)
+
+            for feature_name in all_features:
+                weight = feature_weights.get(feature_name, 0.5)
+                # 权重为0的特征不参与计算
+                if weight == 0:
+                    continue
+
+                # 特征只在目标或该候选中存在时才参与计算
+                if feature_name in enhanced_target_features:
+                    present = np.ones(candidate_count, dtype=bool)
+                else:
+                    present = np.fromiter(
+                        (feature_name in enhanced for enhanced in enhanced_market_list),
+                        dtype=bool, count=candidate_count)
+
+                target_val = enhanced_target_features.get(feature_name, 0)
+                market_vals = [enhanced.get(feature_name, 0) for enhanced in enhanced_market_list]
+
+                feature_similarity, feature_failed = self._calculate_feature_similarity_vector(
+                    kindid, feature_name, target_val, market_vals, relative_tolerances,
+                    target_kindid, market_kindids, scoring_plan=scoring_plan)
+
+                failed |= feature_failed & present
+                weighted_similarity += np.where(present, feature_similarity * weight, 0.0)
+                total_weight += np.where(present, weight, 0.0)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                similarities = np.where(total_weight > 0, weighted_similarity / total_weight, 0.0)
+            similarities[failed] = 0.0
+            return similarities
+
+        except Exception as e:
+            self.logger.error(f"向量化计算装备相似度失败: {e}")
+            return np.zeros(candidate_count)
+
+    def _calculate_feature_similarity_vector(self,
+                                             kindid: int,
+                                             feature_name: str,
+                                             target_val: Any,
+                                             market_vals: List[Any],
+                                             relative_tolerances: Dict[str, float],
+                                             target_kindid: Any,
+                                             market_kindids: List[Any],
+                                             scoring_plan: Optional[EquipmentScoringPlan] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算单个特征在所有候选上的相似度
+
+        插件钩子按市场值去重后调用；数值元素使用数组运算；
+        套装效果查表；非数值元素按去重后的值走标量规则。
+        scoring_plan 为None时插件钩子从插件管理器按kindid查找。
+
+        Returns:
+            Tuple[相似度数组, 失败掩码]
+        """
+        candidate_count = len(market_vals)
+        similarities = np.zeros(candidate_count)
+        failed = np.zeros(candidate_count, dtype=bool)
+        resolved = np.zeros(candidate_count, dtype=bool)
+
+        def cache_key(*values):
+            key = tuple((type(value), value) for value in values)
+            try:
+                hash(key)
+            except TypeError:
+                return None
+            return key
+
+        # 1. 插件自定义相似度（只依赖市场值，相同值只计算一次）
+        failed_marker = object()
+        if scoring_plan is not None:
+            has_hooks = bool(scoring_plan.similarity_hooks)
+            plugin_similarity_of = scoring_plan.calculate_plugin_similarity
+        else:
+            has_hooks = bool(self.plugin_manager.get_plugins_for_kindid(kindid))
+            plugin_similarity_of = partial(self.plugin_manager.calculate_plugin_similarity, kindid)
+        if has_hooks:
+            plugin_cache = {}
+            for i, market_val in enumerate(market_vals):
+                key = cache_key(market_val)
+                if key is not None and key in plugin_cache:
+                    plugin_similarity = plugin_cache[key]
+                else:
+                    try:
+                        plugin_similarity = plugin_similarity_of(feature_name, target_val, market_val)
+                    except Exception:
+                        plugin_similarity = failed_marker
+                    if key is not None:
+                        plugin_cache[key] = plugin_similarity
+                if plugin_similarity is None:
+                    continue
+                if plugin_similarity is failed_marker:
+                    failed[i] = True
+                else:
+                    similarities[i] = plugin_similarity
+                resolved[i] = True
+
+        # 2. 数值特征：数组运算
+        target_is_numeric = isinstance(target_val, _NUMERIC_TYPES) and target_val == target_val
+        if target_is_numeric and feature_name != 'suit_effect':
+            numeric_mask = ~resolved & np.fromiter(
+                (isinstance(value, _NUMERIC_TYPES) and value == value for value in market_vals),
+                dtype=bool, count=candidate_count)
+            if numeric_mask.any():
+                numeric_idx = np.flatnonzero(numeric_mask)
+                market_numeric = np.array([market_vals[i] for i in numeric_idx], dtype=float)
+                similarities[numeric_idx] = self._calculate_default_similarity_array(
+                    feature_name, float(target_val), market_numeric, relative_tolerances)
+                resolved[numeric_idx] = True
+
+        # 3. 套装效果：查套装效果相似度表
+        if feature_name == 'suit_effect':
+            suit_idx = np.flatnonzero(~resolved)
+            if len(suit_idx):
+                similarities[suit_idx] = self._get_suit_effect_table().similarity_array(
+                    target_val, [market_vals[i] for i in suit_idx],
+                    target_kindid, [market_kindids[i] for i in suit_idx])
+                resolved[suit_idx] = True
+
+        # 4. 其余元素（字符串、列表等）：去重后走标量规则
+        default_cache = {}
+        for i in np.flatnonzero(~resolved):
+            market_val = market_vals[i]
+            market_kindid = market_kindids[i]
+            key = cache_key(market_val, market_kindid)
+            if key is not None and key in default_cache:
+                feature_similarity = default_cache[key]
+            else:
+                try:
+                    feature_similarity, _ = self._calculate_default_feature_similarity(
+                        feature_name, target_val, market_val, relative_tolerances,
+                        target_kindid, market_kindid)
+                except Exception:
+                    feature_similarity = failed_marker
+                if key is not None:
+                    default_cache[key] = feature_similarity
+            if feature_similarity is failed_marker:
+                failed[i] = True
+            else:
+                similarities[i] = feature_similarity
+
+        return similarities, failed
+
+    def _calculate_default_similarity_array(self,
+                                            feature_name: str,
+                                            target_val: float,
+                                            market_vals: np.ndarray,
+                                            relative_tolerances: Dict[str, float]) -> np.ndarray:
+        """
+        数值特征默认相似度规则的数组版本（对应 _calculate_default_feature_similarity）
+
+        Args:
+            feature_name: 特征名称
+            target_val: 目标值
+            market_vals: 市场值数组
+            relative_tolerances: 相对容忍度配置
+
+        Returns:
+            np.ndarray: 相似度数组
+        """
+        if feature_name in relative_tolerances:
+            tolerance = relative_tolerances[feature_name]
+
+            if feature_name == 'repair_fail_num':
+                # 市场装备失败次数更多每次降0.3，目标更多每次降0.2
+                similarities = np.where(
+                    market_vals > target_val,
+                    np.maximum(0.0, 1.0 - (market_vals - target_val) * 0.3),
+                    np.maximum(0.0, 1.0 - (target_val - market_vals) * 0.2))
+                similarities = np.where(market_vals == target_val, 1.0, similarities)
+            elif feature_name in ['special_skill']:
+                similarities = np.where(market_vals == target_val, 1.0, 0.0)
+            else:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    denominator = np.maximum(abs(target_val), np.abs(market_vals))
+                    diff_ratio = np.abs(target_val - market_vals) / denominator
+                similarities = np.where(
+                    diff_ratio <= tolerance, 1.0,
+                    np.where(diff_ratio <= tolerance * 2,
+                             np.maximum(0, 1.0 - (diff_ratio - tolerance) / max(tolerance, 0.1)),
+                             0.0))
+                similarities = np.where((market_vals == 0) | (target_val == 0), 0.10, similarities)
+        else:
+            similarities = np.where(market_vals == target_val, 1.0, 0.5)
+
+        # 两者都为0，完全匹配
+        return np.where((market_vals == 0) & (target_val == 0), 1.0, similarities)
+
     def _calculate_suit_effect_similarity(self, target_val: int, market_val: int, target_kindid: int, market_kindid: int) -> float:
         """
-        计算套装效果相似度
+        计算套装效果相似度（查预先编译的套装效果相似度表）
 
         Args:
             target_val: 目标套装效果ID
@@ -919,78 +1618,14 @@ class EquipAnchorEvaluator(BaseValuator):
         Returns:
             float: 相似度分数（0-1）
         """
-        # 完全相同的情况
-        if target_val == market_val:
-            return 1.0
-
-        # 如果目标装备没有套装效果，市场装备也没有套装效果
-        if target_val == 0 and market_val == 0:
-            return 1.0
-
-        # 如果目标装备有套装效果，市场装备没有套装效果（或反之）
-        if target_val == 0 or market_val == 0:
-            return 0.1  # 一个有套装一个没有，相似度很低
-
-        # 从配置文件加载敏捷套和魔力套的详细分类
-        from .constant import get_agility_suits_detailed, get_magic_suits_detailed
-        agility_suits = get_agility_suits_detailed()
-        magic_suits = get_magic_suits_detailed()
-
-        def get_suit_info(suit_id):
-            """获取套装信息：(类型, 等级)"""
-            if suit_id in agility_suits['B']:
-                return ('agility', 'B')
-            elif suit_id in agility_suits['A']:
-                return ('agility', 'A')
-            elif suit_id in magic_suits['B']:
-                return ('magic', 'B')
-            elif suit_id in magic_suits['A']:
-                return ('magic', 'A')
-            else:
-                return (None, None)
-
-        # 检查是否为敏捷套或魔力套
-        target_type, target_grade = get_suit_info(target_val)
-        market_type, market_grade = get_suit_info(market_val)
-
-        # 如果都是敏捷套或魔力套，使用原有的详细逻辑
-        if target_type is not None and market_type is not None:
-            # 新增规则：检查装备类型限制
-            # 类型kindid为19（鞋子）敏捷套的不适配跨套装类型匹配
-            # 类型kindid为21（饰品）魔力套的不适配跨套装类型匹配
-            # 17（男头）、18（男衣）待定
-            restricted_agility_kindids = [19]  # 男头、男衣、鞋子
-            restricted_magic_kindids = [21]  # 饰品
-
-            # 检查是否为限制类型的装备
-            is_restricted_agility = (target_kindid in restricted_agility_kindids and
-                                     market_kindid in restricted_agility_kindids and
-                                     target_kindid == market_kindid)
-            is_restricted_magic = (target_kindid in restricted_magic_kindids and
-                                   market_kindid in restricted_magic_kindids and
-                                   target_kindid == market_kindid)
-
-            # 如果是限制类型的装备，且套装类型不同，则相似度为0
-            if (is_restricted_agility or is_restricted_magic) and target_type != market_type:
-                return 0.0
+        return self._get_suit_effect_table().similarity(target_val, market_val, target_kindid, market_kindid)
 
-            # 正常的敏捷套/魔力套相似度计算
-            if target_type == market_type and target_grade == market_grade:
-                # 同类型同等级（如巴蛇A级敏捷套 -> 机关鸟A级敏捷套）
-                return 0.8
-            elif target_type != market_type and target_grade == market_grade:
-                # 不同类型同等级（如巴蛇A级敏捷套 -> 灵鹤A级魔力套）
-                return 0.5
-            elif target_type == market_type and target_grade != market_grade:
-                # 同类型跨等级（如巴蛇A级敏捷套 -> 凤凰B级敏捷套）
-                return 0.5
-            elif target_type != market_type and target_grade != market_grade:
-                # 不同类型跨等级（如巴蛇A级敏捷套 -> 蛟龙B级魔力套）
-                return 0.2
-
-        # 其他套装效果：使用简化逻辑，给予较低的相似度
-        # 这样可以避免套装效果差异过大的装备被误认为相似
-        return 0.2
+    def _get_suit_effect_table(self) -> SuitEffectTable:
+        """获取套装效果相似度表（未初始化时从配置构建）"""
+        table = getattr(self, 'suit_effect_table', None)
+        if table is None:
+            table = self.suit_effect_table = SuitEffectTable.from_config()
+        return table
 
     def _convert_pandas_row_to_dict(self, row: pd.Series) -> Dict[str, Any]:
         """
@@ -1005,45 +1640,59 @@ class EquipAnchorEvaluator(BaseValuator):
         try:
             result = {}
             for col in row.index:
-                value = row[col]
-                # 处理numpy数组的情况
-                if isinstance(value, np.ndarray):
-                    if value.size == 0:
-                        result[col] = []
-                    elif value.size == 1:
-                        # 单个元素的数组，提取值
-                        single_value = value.item()
-                        if pd.isna(single_value):
-                            result[col] = None
-                        else:
-                            result[col] = self._convert_single_value(single_value)
-                    else:
-                        # 多元素数组，转换为列表
-                        result[col] = value.tolist()
-                elif isinstance(value, list):
-                    # 处理列表中的numpy数组
-                    converted_list = []
-                    for item in value:
-                        if isinstance(item, np.ndarray):
-                            if item.size == 0:
-                                converted_list.append([])
-                            elif item.size == 1:
-                                converted_list.append(item.item())
-                            else:
-                                converted_list.append(item.tolist())
-                        else:
-                            converted_list.append(item)
-                    result[col] = converted_list
-                elif pd.isna(value):
-                    result[col] = None
-                else:
-                    result[col] = self._convert_single_value(value)
+                result[col] = self._convert_cell_value(row[col])
             return result
         except Exception as e:
             self.logger.error(f"转换pandas行数据失败: {e}")
             # 降级到原始to_dict()方法
             return row.to_dict()
-    
+
+    def _convert_dataframe_to_dicts(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        将整个DataFrame按列批量转换为字典列表，转换规则与 _convert_pandas_row_to_dict 一致
+
+        Args:
+            df: pandas DataFrame对象
+
+        Returns:
+            List[Dict[str, Any]]: 每行一个字典，所有数值都是Python原生类型
+        """
+        convert = self._convert_cell_value
+        return [{col: convert(value) for col, value in record.items()}
+                for record in df.to_dict('records')]
+
+    def _convert_cell_value(self, value) -> Any:
+        """转换单个单元格的值，处理numpy数组、列表中的数组以及缺失值"""
+        # 处理numpy数组的情况
+        if isinstance(value, np.ndarray):
+            if value.size == 0:
+                return []
+            elif value.size == 1:
+                # 单个元素的数组，提取值
+                single_value = value.item()
+                if pd.isna(single_value):
+                    return None
+                return self._convert_single_value(single_value)
+            # 多元素数组，转换为列表
+            return value.tolist()
+        elif isinstance(value, list):
+            # 处理列表中的numpy数组
+            converted_list = []
+            for item in value:
+                if isinstance(item, np.ndarray):
+                    if item.size == 0:
+                        converted_list.append([])
+                    elif item.size == 1:
+                        converted_list.append(item.item())
+                    else:
+                        converted_list.append(item.tolist())
+                else:
+                    converted_list.append(item)
+            return converted_list
+        elif pd.isna(value):
+            return None
+        return self._convert_single_value(value)
+
     def _convert_list_types(self, data_list) -> List[Any]:
         """递归转换列表中的numpy类型"""
         converted_list = []
@@ -0,0 +1,150 @@
+"""
+套装效果相似度查找表
+
+- 估价器初始化时把敏捷套/魔力套的A/B级分类编译为 套装ID -> 分类编码 的稠密数组
+- 分类编码两两之间的相似度预先计算为二维表（含鞋子/饰品不跨套装类型匹配的限制规则）
+- 标量和向量化打分都只做数组查表
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+# 分类编码：0为未分类（非敏捷套/魔力套），其余为 (类型, 等级) 组合
+SUIT_CLASSES = [(None, None), ('agility', 'B'), ('agility', 'A'), ('magic', 'B'), ('magic', 'A')]
+
+# 类型kindid为19（鞋子）、21（饰品）的装备，同类装备之间不适配跨套装类型匹配
+# 17（男头）、18（男衣）待定
+RESTRICTED_SUIT_KINDIDS = (19, 21)
+
+# 一个有套装一个没有
+SUIT_MISSING_SIMILARITY = 0.1
+# 其他套装效果：给予较低的相似度，避免套装效果差异过大的装备被误认为相似
+SUIT_DEFAULT_SIMILARITY = 0.2
+
+_NUMERIC_TYPES = (int, float, np.integer, np.floating, np.bool_)
+
+
+def _pair_similarity(target_class, market_class, restricted: bool) -> float:
+    """两个分类之间的相似度（均为敏捷套/魔力套时的详细规则）"""
+    target_type, target_grade = target_class
+    market_type, market_grade = market_class
+    if target_type is None or market_type is None:
+        return SUIT_DEFAULT_SIMILARITY
+    # 限制类型的装备，套装类型不同则相似度为0
+    if restricted and target_type != market_type:
+        return 0.0
+    if target_type == market_type and target_grade == market_grade:
+        # 同类型同等级（如巴蛇A级敏捷套 -> 机关鸟A级敏捷套）
+        return 0.8
+    if target_type != market_type and target_grade == market_grade:
+        # 不同类型同等级（如巴蛇A级敏捷套 -> 灵鹤A级魔力套）
+        return 0.5
+    if target_type == market_type:
+        # 同类型跨等级（如巴蛇A级敏捷套 -> 凤凰B级敏捷套）
+        return 0.5
+    # 不同类型跨等级（如巴蛇A级敏捷套 -> 蛟龙B级魔力套）
+    return 0.2
+
+
+class SuitEffectTable:
+    """套装效果相似度查找表（构建后不再修改）"""
+
+    def __init__(self, agility_suits: Dict[str, List[int]], magic_suits: Dict[str, List[int]]):
+        """
+        Args:
+            agility_suits: 敏捷套详细分类 {'A': [...], 'B': [...]}
+            magic_suits: 魔力套详细分类 {'A': [...], 'B': [...]}
+        """
+        # 分类优先级与原逐个判断一致：敏捷B > 敏捷A > 魔力B > 魔力A（倒序写入，优先级高的覆盖）
+        ordered = [(1, agility_suits.get('B', [])), (2, agility_suits.get('A', [])),
+                   (3, magic_suits.get('B', [])), (4, magic_suits.get('A', []))]
+        suit_ids = [int(suit_id) for _, ids in ordered for suit_id in ids]
+        self.codes = np.zeros(max(suit_ids, default=0) + 1, dtype=np.int8)
+        for code, ids in reversed(ordered):
+            self.codes[np.asarray(ids, dtype=np.int64)] = code
+
+        # pair_tables[是否限制][目标分类, 市场分类]
+        size = len(SUIT_CLASSES)
+        self.pair_tables = np.array([
+            [[_pair_similarity(SUIT_CLASSES[t], SUIT_CLASSES[m], restricted) for m in range(size)]
+             for t in range(size)]
+            for restricted in (False, True)
+        ])
+
+    @classmethod
+    def from_config(cls) -> 'SuitEffectTable':
+        """从装备配置构建"""
+        from .constant import get_agility_suits_detailed, get_magic_suits_detailed
+        return cls(get_agility_suits_detailed(), get_magic_suits_detailed())
+
+    def suit_code(self, suit_id: Any) -> int:
+        """单个套装ID的分类编码（非整数ID、未分类ID为0）"""
+        if isinstance(suit_id, _NUMERIC_TYPES) and suit_id == suit_id and float(suit_id).is_integer() \
+                and 0 <= suit_id < len(self.codes):
+            return int(self.codes[int(suit_id)])
+        return 0
+
+    def suit_codes(self, suit_ids: np.ndarray) -> np.ndarray:
+        """一组数值套装ID的分类编码"""
+        suit_ids = np.asarray(suit_ids, dtype=float)
+        valid = np.isfinite(suit_ids) & (suit_ids >= 0) & (suit_ids < len(self.codes)) & \
+            (suit_ids == np.floor(suit_ids))
+        codes = np.zeros(len(suit_ids), dtype=np.int8)
+        codes[valid] = self.codes[suit_ids[valid].astype(np.int64)]
+        return codes
+
+    @staticmethod
+    def is_restricted(target_kindid: Any, market_kindid: Any) -> bool:
+        """同为鞋子或同为饰品时不适配跨套装类型匹配"""
+        return target_kindid in RESTRICTED_SUIT_KINDIDS and target_kindid == market_kindid
+
+    def similarity(self, target_val: Any, market_val: Any, target_kindid: Any, market_kindid: Any) -> float:
+        """
+        计算套装效果相似度
+
+        Args:
+            target_val: 目标套装效果ID
+            market_val: 市场套装效果ID
+            target_kindid: 目标装备类型ID
+            market_kindid: 市场装备类型ID
+
+        Returns:
+            float: 相似度分数（0-1）
+        """
+        # 完全相同（包括都没有套装）
+        if target_val == market_val:
+            return 1.0
+        # 一个有套装一个没有
+        if target_val == 0 or market_val == 0:
+            return SUIT_MISSING_SIMILARITY
+        table = self.pair_tables[1 if self.is_restricted(target_kindid, market_kindid) else 0]
+        return float(table[self.suit_code(target_val), self.suit_code(market_val)])
+
+    def similarity_array(self, target_val: Any, market_vals: Sequence[Any],
+                         target_kindid: Any, market_kindids: Sequence[Any]) -> np.ndarray:
+        """
+        计算目标套装与一组市场套装的相似度（数值ID查表，其余逐个计算）
+
+        Returns:
+            np.ndarray: 相似度数组
+        """
+        count = len(market_vals)
+        similarities = np.empty(count)
+        numeric = np.fromiter((isinstance(value, _NUMERIC_TYPES) for value in market_vals),
+                              dtype=bool, count=count)
+        if isinstance(target_val, _NUMERIC_TYPES) and numeric.any():
+            idx = np.flatnonzero(numeric)
+            values = np.array([market_vals[i] for i in idx], dtype=float)
+            restricted = np.zeros(len(idx), dtype=bool)
+            if target_kindid in RESTRICTED_SUIT_KINDIDS:
+                restricted = np.array([market_kindids[i] == target_kindid for i in idx], dtype=bool)
+            result = self.pair_tables[restricted.astype(np.int64), self.suit_code(target_val),
+                                      self.suit_codes(values)]
+            result = np.where((values == 0) | (target_val == 0), SUIT_MISSING_SIMILARITY, result)
+            similarities[idx] = np.where(values == target_val, 1.0, result)
+        else:
+            numeric[:] = False
+        for i in np.flatnonzero(~numeric):
+            similarities[i] = self.similarity(target_val, market_vals[i], target_kindid, market_kindids[i])
+        return similarities
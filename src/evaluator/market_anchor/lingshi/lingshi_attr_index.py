@@ -0,0 +1,117 @@
+"""
+灵饰附加属性分区
+
+- 每件灵饰的附加属性类型排序后作为签名（多重集合），与kindid一起作为分区键
+- 目标附加属性的匹配规则（优先级排序、重复属性选择）按目标属性组合缓存
+- "市场灵饰是否满足目标匹配属性"变为 签名是否包含所需属性多重集合，按分区判断一次
+"""
+
+import json
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+from src.evaluator.constants.lingshi_priorities import get_priority_by_attr_name
+
+# 附加属性无法解析的灵饰（不参与任何附加属性匹配）
+INVALID_SIGNATURE = None
+
+
+def normalize_kindid(kindid: Any) -> Hashable:
+    """kindid统一为int（整数值的浮点数也转为int），其他值原样返回"""
+    try:
+        if kindid == kindid and float(kindid).is_integer():
+            return int(kindid)
+    except (TypeError, ValueError):
+        pass
+    return kindid
+
+
+def attr_type_signature(agg_added_attrs: Any) -> Optional[Tuple[str, ...]]:
+    """
+    灵饰附加属性类型签名
+
+    Args:
+        agg_added_attrs: 附加属性列表（或其JSON字符串），每个元素包含attr_type
+
+    Returns:
+        Optional[Tuple[str, ...]]: 排序后的属性类型；数据格式错误时返回None
+    """
+    if isinstance(agg_added_attrs, str):
+        try:
+            agg_added_attrs = json.loads(agg_added_attrs)
+        except json.JSONDecodeError:
+            return ()
+    if not isinstance(agg_added_attrs, (list, tuple)) or not agg_added_attrs:
+        return ()
+
+    attr_types = []
+    for attr in agg_added_attrs:
+        if not isinstance(attr, dict):
+            return INVALID_SIGNATURE
+        attr_type = attr.get('attr_type', '')
+        if attr_type:
+            attr_types.append(attr_type)
+    return tuple(sorted(attr_types))
+
+
+def lingshi_partition_keys(data: pd.DataFrame) -> List[Tuple[Hashable, Optional[Tuple[str, ...]]]]:
+    """灵饰数据的分区键 (kindid, 附加属性类型签名)"""
+    kindids = data['kindid'].tolist() if 'kindid' in data.columns else [None] * len(data)
+    attrs = data['agg_added_attrs'].tolist() if 'agg_added_attrs' in data.columns else [None] * len(data)
+    return [(normalize_kindid(kindid), attr_type_signature(attr)) for kindid, attr in zip(kindids, attrs)]
+
+
+@lru_cache(maxsize=1024)
+def resolve_match_attrs(target_attr_types: Tuple[str, ...],
+                        equipment_type: Hashable) -> Tuple[Tuple[str, ...], Optional[str]]:
+    """
+    根据目标属性数量和装备类型确定匹配所需的属性
+
+    - 2条属性：2条属性类型都需要匹配
+    - 3条属性都相同：3条都需要匹配
+    - 3条属性有重复：选择重复的属性（重复属性只有1个时再加1个其他属性）
+    - 3条属性都不同：按优先级取前2条
+
+    Args:
+        target_attr_types: 目标附加属性类型
+        equipment_type: 装备类型（kindid），用于属性优先级
+
+    Returns:
+        Tuple[匹配属性, 未选中属性]
+    """
+    target_attr_count = len(target_attr_types)
+    if target_attr_count == 2:
+        return tuple(target_attr_types), None
+    if target_attr_count == 3:
+        if len(set(target_attr_types)) == 1:
+            return tuple(target_attr_types), None
+
+        attr_counter = Counter(target_attr_types)
+        if len(attr_counter) < len(target_attr_types):
+            # 有重复属性，选择重复最多的属性
+            most_common_attr = attr_counter.most_common(1)[0][0]
+            if attr_counter[most_common_attr] >= 2:
+                unmatched_attrs = [attr for attr in target_attr_types if attr != most_common_attr]
+                return (most_common_attr, most_common_attr), unmatched_attrs[0] if unmatched_attrs else None
+            other_attrs = [attr for attr in target_attr_types if attr != most_common_attr]
+            unmatched_attr = other_attrs[1] if len(other_attrs) > 1 else None
+            return (most_common_attr, other_attrs[0]), unmatched_attr
+
+        # 没有重复属性，按优先级取2条（优先级相同的保持原顺序）
+        sorted_attrs = sorted(target_attr_types, key=lambda x: get_priority_by_attr_name(x, equipment_type))
+        unmatched_attr = sorted_attrs[2] if len(sorted_attrs) > 2 else None
+        return tuple(sorted_attrs[:2]), unmatched_attr
+
+    # 灵饰最多只有3条属性，这里不应该到达
+    raise ValueError(f"灵饰属性数量异常: {target_attr_count}，最多只能有3条属性")
+
+
+def signature_matches(signature: Optional[Tuple[str, ...]], required: Dict[str, int]) -> bool:
+    """签名是否包含所需的属性多重集合"""
+    if signature is INVALID_SIGNATURE or not required:
+        return False
+    counter = Counter(signature)
+    return all(counter.get(attr_type, 0) >= count for attr_type, count in required.items())
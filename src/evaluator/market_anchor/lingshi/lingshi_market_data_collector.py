@@ -1,3 +1,4 @@
+from collections import Counter
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Union, Tuple
 import logging
@@ -6,11 +7,14 @@ import pandas as pd
 
 # 导入灵饰优先级配置
 from src.evaluator.constants.lingshi_priorities import (
-    RING_EARRING_PRIORITY, BRACELET_ACCESSORY_PRIORITY,
-    get_priority_by_attr_name
+    RING_EARRING_PRIORITY, BRACELET_ACCESSORY_PRIORITY
 )
 
 from src.evaluator.feature_extractor.lingshi_feature_extractor import LingshiFeatureExtractor
+from src.evaluator.market_anchor.lingshi.lingshi_attr_index import (
+    lingshi_partition_keys, normalize_kindid, resolve_match_attrs, signature_matches
+)
+from src.evaluator.utils.partitioned_frame import PartitionedFrame
 from src.database import db
 from src.models.equipment import Equipment
 from sqlalchemy import and_, or_, func, text
@@ -35,6 +39,9 @@ class LingshiMarketDataCollector:
         # 缓存过滤后的灵饰数据，避免重复读取和过滤
         self._cached_lingshi_data = None
         self._cache_timestamp = None
+        # 按 (kindid, 附加属性类型签名) 分区的灵饰数据，以及 目标匹配属性 -> 满足条件的分区键 缓存
+        self._lingshi_partitions = None
+        self._attr_match_keys = {}
         
         # 订阅装备数据更新消息
         self._setup_equipment_update_subscription()
@@ -90,60 +97,90 @@ class LingshiMarketDataCollector:
             return None
             
         try:
-            # 检查实例缓存是否有效
-            if self._cached_lingshi_data is not None:
-                print(f" 使用实例缓存的灵饰数据，共 {len(self._cached_lingshi_data)} 条")
-                
-                # 如果指定了kindid，进一步过滤
-                if kindid is not None:
-                    filtered_data = self._cached_lingshi_data[self._cached_lingshi_data['kindid'] == kindid]
-                    if not filtered_data.empty:
-                        print(f" 按kindid={kindid}过滤后得到 {len(filtered_data)} 条灵饰数据")
-                        return filtered_data
-                    else:
-                        print(f"实例缓存中没有找到kindid={kindid}的灵饰数据")
-                        return None
-                else:
-                    return self._cached_lingshi_data
-            
-            # 实例缓存为空，从装备数据采集器获取全量缓存
-            full_data = self.equip_collector._get_full_data_from_redis()
-            
-            if full_data is None or full_data.empty:
-                print("装备数据采集器缓存为空，无法共享")
+            partitions = self._get_lingshi_partitions()
+            if partitions is None:
                 return None
-            
-            # 过滤出灵饰数据 (kindid: 61-64) 并保存到实例缓存
-            self._cached_lingshi_data = full_data[full_data['kindid'].isin([61, 62, 63, 64])].copy()
-            self._cache_timestamp = datetime.now()
-            
-            if not self._cached_lingshi_data.empty:
-                print(f" 从装备数据采集器获取并缓存 {len(self._cached_lingshi_data)} 条灵饰数据")
-                
-                # 如果指定了kindid，进一步过滤
-                if kindid is not None:
-                    filtered_data = self._cached_lingshi_data[self._cached_lingshi_data['kindid'] == kindid]
-                    if not filtered_data.empty:
-                        print(f" 按kindid={kindid}过滤后得到 {len(filtered_data)} 条灵饰数据")
-                        return filtered_data
-                    else:
-                        print(f"缓存中没有找到kindid={kindid}的灵饰数据")
-                        return None
+
+            # 如果指定了kindid，取该kindid的所有分区
+            if kindid is not None:
+                filtered_data = partitions.rows(self._get_kindid_partition_keys(kindid))
+                if not filtered_data.empty:
+                    print(f" 按kindid={kindid}过滤后得到 {len(filtered_data)} 条灵饰数据")
+                    return filtered_data
                 else:
-                    return self._cached_lingshi_data
-            else:
-                print("装备数据采集器缓存中没有找到灵饰数据")
-                return None
+                    print(f"实例缓存中没有找到kindid={kindid}的灵饰数据")
+                    return None
+            return self._cached_lingshi_data
                 
         except Exception as e:
             self.logger.warning(f"获取共享缓存数据失败: {e}")
             print(f" 共享缓存获取失败: {e}")
             return None
 
+    def _get_lingshi_partitions(self) -> Optional[PartitionedFrame]:
+        """
+        获取按 (kindid, 附加属性类型签名) 分区的灵饰数据，实例缓存为空时从装备数据采集器加载
+
+        Returns:
+            Optional[PartitionedFrame]: 分区数据，缓存不可用或没有灵饰数据时返回None
+        """
+        # 检查实例缓存是否有效
+        if self._lingshi_partitions is not None:
+            print(f" 使用实例缓存的灵饰数据，共 {len(self._lingshi_partitions)} 条")
+            return self._lingshi_partitions
+
+        # 实例缓存为空，从装备数据采集器获取全量缓存
+        full_data = self.equip_collector._get_full_data_from_redis()
+
+        if full_data is None or full_data.empty:
+            print("装备数据采集器缓存为空，无法共享")
+            return None
+
+        # 过滤出灵饰数据 (kindid: 61-64) 并保存到实例缓存
+        lingshi_data = full_data[full_data['kindid'].isin([61, 62, 63, 64])]
+        if lingshi_data.empty:
+            print("装备数据采集器缓存中没有找到灵饰数据")
+            return None
+
+        self._set_lingshi_partitions(PartitionedFrame(lingshi_data, lingshi_partition_keys))
+        print(f" 从装备数据采集器获取并缓存 {len(self._cached_lingshi_data)} 条灵饰数据，"
+              f"共 {len(self._lingshi_partitions.partitions)} 个附加属性分区")
+        return self._lingshi_partitions
+
+    def _set_lingshi_partitions(self, partitions: Optional[PartitionedFrame]):
+        """更新分区数据（实例缓存指向分区数据，匹配分区缓存失效）"""
+        self._lingshi_partitions = partitions
+        self._cached_lingshi_data = partitions.data if partitions is not None else None
+        self._cache_timestamp = datetime.now() if partitions is not None else None
+        self._attr_match_keys = {}
+
+    def _get_kindid_partition_keys(self, kindid: int) -> List[Any]:
+        """指定kindid的所有分区键"""
+        kindid = normalize_kindid(kindid)
+        return [key for key in self._lingshi_partitions.keys() if key[0] == kindid]
+
+    def _get_attr_match_partition_keys(self, kindid: int, match_attrs: Tuple[str, ...]) -> List[Any]:
+        """
+        满足目标匹配属性的分区键（按 kindid+匹配属性 缓存，分区更新时失效）
+
+        Args:
+            kindid: 灵饰类型ID
+            match_attrs: 目标匹配属性（可包含重复属性）
+
+        Returns:
+            List[Any]: 分区键列表
+        """
+        cache_key = (normalize_kindid(kindid), tuple(sorted(match_attrs)))
+        keys = self._attr_match_keys.get(cache_key)
+        if keys is None:
+            required = dict(Counter(match_attrs))
+            keys = [key for key in self._get_kindid_partition_keys(kindid) if signature_matches(key[1], required)]
+            self._attr_match_keys[cache_key] = keys
+        return keys
+
     def clear_cache(self):
         """清除实例缓存，强制下次重新从装备数据采集器获取数据"""
-        self._cached_lingshi_data = None
-        self._cache_timestamp = None
+        self._set_lingshi_partitions(None)
         print(" 已清除灵饰数据实例缓存")
     
     def force_refresh_cache(self):
@@ -209,17 +246,15 @@ class LingshiMarketDataCollector:
             
             self.logger.info(f"📨 从新增数据中提取到 {len(lingshi_data)} 条灵饰数据")
             
-            # 更新实例缓存
-            if self._cached_lingshi_data is None or self._cached_lingshi_data.empty:
+            # 更新实例缓存：只为新增数据计算分区键，已有数据按equip_sn去重（保留最新）
+            if self._lingshi_partitions is None or self._lingshi_partitions.data.empty:
                 # 如果缓存为空，直接使用新数据
-                self._cached_lingshi_data = lingshi_data
+                self._set_lingshi_partitions(PartitionedFrame(lingshi_data, lingshi_partition_keys))
             else:
-                # 合并新数据到现有缓存
-                self._cached_lingshi_data = pd.concat([self._cached_lingshi_data, lingshi_data], ignore_index=True)
-                # 去重（基于equip_sn）
-                self._cached_lingshi_data = self._cached_lingshi_data.drop_duplicates(subset=['equip_sn'], keep='last')
+                # 合并新数据到现有分区
+                self._lingshi_partitions.append(lingshi_data)
+                self._set_lingshi_partitions(self._lingshi_partitions)
             
-            self._cache_timestamp = datetime.now()
             self.logger.info(f"📨 灵饰缓存更新成功，当前缓存 {len(self._cached_lingshi_data)} 条数据")
             
         except Exception as e:
@@ -263,6 +298,23 @@ class LingshiMarketDataCollector:
             
             # 优先从共享缓存获取数据
             if use_shared_cache:
+                if attrs and kindid is not None:
+                    # 附加属性分区：直接取满足目标匹配属性的分区，再做其他条件筛选
+                    cached_data = self._get_attr_partition_data(kindid, attrs)
+                    if cached_data is not None:
+                        filtered_data = self._filter_cached_data(
+                            cached_data,
+                            level_range=level_range,
+                            main_attr=main_attr,
+                            is_super_simple=is_super_simple,
+                            price_range=price_range,
+                            server=server,
+                            limit=limit
+                        )
+                        elapsed_time = time.time() - start_time
+                        print(f" 从共享缓存附加属性分区获取灵饰数据完成，耗时: {elapsed_time:.3f}秒，返回: {len(filtered_data)} 条数据")
+                        return filtered_data
+
                 cached_data = self._get_shared_cache_data(kindid)
                 
                 if cached_data is not None and not cached_data.empty:
@@ -465,6 +517,74 @@ class LingshiMarketDataCollector:
             print(f"SQL执行异常: {e}")
             return pd.DataFrame()
 
+    def _resolve_target_attrs(self, target_attrs: List[Dict[str, Any]], equipment_type: Any) -> Optional[Tuple[str, ...]]:
+        """
+        确定目标附加属性的匹配属性，并保存到目标特征中供后续特征计算使用
+
+        匹配规则（按目标属性组合缓存）：
+        戒指/耳饰属性优先级：伤害(1)、物理暴击等级(2)、穿刺等级(3)、狂暴等级(4)、法术伤害(1)、法术暴击等级(2)、法术伤害结果(3)、固定伤害(1)、治疗能力(2)、封印命中等级(3)、速度(4)
+        手镯/佩饰属性优先级：气血(1)、防御(1)、抵抗封印等级(2)、抗物理暴击(2)、格挡值(3)、法术防御(3)、抗法术暴击(4)、气血回复效果(4)
+
+        Args:
+            target_attrs: 目标附加属性列表，每个元素包含attr_type和attr_value
+            equipment_type: 装备类型（kindid）
+
+        Returns:
+            Optional[Tuple[str, ...]]: 匹配属性（可包含重复属性），目标没有附加属性类型时返回None
+        """
+        # 保存目标特征，供后续特征计算使用
+        self.target_features = {'attrs': target_attrs}
+
+        # 提取目标附加属性的类型
+        target_attr_types = tuple(attr.get('attr_type', '') for attr in target_attrs if attr.get('attr_type', ''))
+        if not target_attr_types:
+            return None
+
+        print(f"[附加属性筛选] 目标属性类型: {list(target_attr_types)}")
+        target_match_attrs, unmatched_attr = resolve_match_attrs(target_attr_types, normalize_kindid(equipment_type))
+        print(f"预先计算目标匹配属性target_match_attrs {list(target_match_attrs)}")
+        print(f"预先计算未选中属性unmatched_attr {unmatched_attr}")
+
+        # 将target_match_attrs信息添加到目标特征中，供后续特征计算使用
+        self.target_features['target_match_attrs'] = list(target_match_attrs)
+        self.target_features['attr_3_type'] = unmatched_attr
+        return target_match_attrs
+
+    def _get_attr_partition_data(self, kindid: int, target_attrs: List[Dict[str, Any]]) -> Optional[pd.DataFrame]:
+        """
+        从附加属性分区获取满足目标匹配属性的灵饰数据
+
+        Args:
+            kindid: 灵饰类型ID
+            target_attrs: 目标附加属性列表
+
+        Returns:
+            Optional[pd.DataFrame]: 满足条件的灵饰数据；缓存不可用或没有该kindid的数据时返回None
+        """
+        if not self.equip_collector:
+            return None
+
+        try:
+            partitions = self._get_lingshi_partitions()
+            if partitions is None:
+                return None
+            if not self._get_kindid_partition_keys(kindid):
+                print(f"实例缓存中没有找到kindid={kindid}的灵饰数据")
+                return None
+        except Exception as e:
+            self.logger.warning(f"获取共享缓存数据失败: {e}")
+            print(f" 共享缓存获取失败: {e}")
+            return None
+
+        target_match_attrs = self._resolve_target_attrs(target_attrs, kindid)
+        if target_match_attrs is None:
+            return partitions.rows(self._get_kindid_partition_keys(kindid))
+
+        match_keys = self._get_attr_match_partition_keys(kindid, target_match_attrs)
+        result_df = partitions.rows(match_keys)
+        print(f"[附加属性筛选] 命中 {len(match_keys)} 个附加属性分区，共 {len(result_df)} 条")
+        return result_df
+
     def _filter_by_attrs(self, data_df: pd.DataFrame, target_attrs: List[Dict[str, Any]]) -> pd.DataFrame:
         """
         根据附加属性类型筛选数据
@@ -479,185 +599,24 @@ class LingshiMarketDataCollector:
         if data_df.empty or not target_attrs:
             return data_df
         
-        # 保存目标特征，供后续特征计算使用
-        self.target_features = {'attrs': target_attrs}
-        
-        # 提取目标附加属性的类型
-        target_attr_types = []
-        for attr in target_attrs:
-            attr_type = attr.get('attr_type', '')
-            if attr_type:
-                target_attr_types.append(attr_type)
-        
-        if not target_attr_types:
+        # 由于equipment_type在同类装备中是固定的，从第一行数据获取equipment_type
+        first_equipment_type = data_df.iloc[0].get('kindid', 0)
+        target_match_attrs = self._resolve_target_attrs(target_attrs, first_equipment_type)
+        if target_match_attrs is None:
             return data_df
-        
-        print(f"[附加属性筛选] 目标属性类型: {target_attr_types}")
-        
-        # 定义属性优先级映射
-        # 戒指/耳饰属性优先级：
-        # 物理系：伤害(S)、物理暴击等级(A)、穿刺等级(B)、狂暴等级(C)
-        # 法术系：法术伤害(S)、法术暴击等级(A)、法术伤害结果(B)
-        # 辅助系：固定伤害(S)、治疗能力(A)、速度(B)、封印命中等级(C)
-        # 使用统一的灵饰属性优先级配置
-        # 戒指/耳饰属性优先级：伤害(1)、物理暴击等级(2)、穿刺等级(3)、狂暴等级(4)、法术伤害(1)、法术暴击等级(2)、法术伤害结果(3)、固定伤害(1)、治疗能力(2)、封印命中等级(3)、速度(4)
-        # 手镯/佩饰属性优先级：气血(1)、防御(1)、抵抗封印等级(2)、抗物理暴击(2)、格挡值(3)、法术防御(3)、抗法术暴击(4)、气血回复效果(4)
-        
-        # 根据目标属性数量确定匹配策略
-        target_attr_count = len(target_attr_types)
-        
-        # 获取目标属性的优先级排序
-        def get_priority_sorted_attrs(attr_types, equipment_type):
-            """根据装备类型获取优先级排序的属性列表"""
-            # 使用统一的优先级配置
-            # 按优先级排序，优先级相同的保持原顺序
-            sorted_attrs = sorted(attr_types, key=lambda x: get_priority_by_attr_name(x, equipment_type))
-            return sorted_attrs
-        
-        # 根据目标属性数量确定匹配所需的属性
-        def get_match_attrs(target_attrs, equipment_type):
-            """根据目标属性数量和装备类型确定匹配所需的属性，返回(匹配属性列表, 未选中属性)"""
-            if target_attr_count == 2:
-                # 2条属性时，需要2条属性类型相同
-                return list(target_attrs), None
-            elif target_attr_count == 3:
-                # 3条属性时，检查是否都相同
-                unique_attrs = set(target_attrs)
-                if len(unique_attrs) == 1:
-                    # 3条属性都一样，必须3条匹配
-                    return list(target_attrs), None
-                else:
-                    # 3条属性不全相同，优先选择重复的属性
-                    from collections import Counter
-                    attr_counter = Counter(target_attrs)
-                    
-                    # 如果有重复属性，优先选择重复最多的属性
-                    if len(attr_counter) < len(target_attrs):
-                        # 有重复属性，选择重复最多的属性
-                        most_common_attr = attr_counter.most_common(1)[0][0]
-                        # 如果重复属性有2个或以上，选择2个重复属性
-                        if attr_counter[most_common_attr] >= 2:
-                            # 选择2个重复属性，未选中的是其他属性
-                            unmatched_attrs = [attr for attr in target_attrs if attr != most_common_attr]
-                            return [most_common_attr, most_common_attr], unmatched_attrs[0] if unmatched_attrs else None
-                        else:
-                            # 重复属性只有1个，选择1个重复属性 + 1个其他属性
-                            other_attrs = [attr for attr in target_attrs if attr != most_common_attr]
-                            # 未选中的是其他属性中除了已选择的那一个
-                            unmatched_attr = other_attrs[1] if len(other_attrs) > 1 else None
-                            return [most_common_attr, other_attrs[0]], unmatched_attr
-                    else:
-                        # 没有重复属性，按优先级取2条
-                        sorted_attrs = get_priority_sorted_attrs(target_attrs, equipment_type)
-                        # 未选中的是排序后第3个属性
-                        unmatched_attr = sorted_attrs[2] if len(sorted_attrs) > 2 else None
-                        return sorted_attrs[:2], unmatched_attr
-            else:
-                # 灵饰最多只有3条属性，这里不应该到达
-                raise ValueError(f"灵饰属性数量异常: {target_attr_count}，最多只能有3条属性")
-        
-        # 预先计算目标匹配属性，避免在循环中重复计算
-        # 由于equipment_type在同类装备中是固定的，可以预先计算
-        # 从第一行数据获取equipment_type，因为同类装备的equipment_type是固定的
-        first_equipment_type = data_df.iloc[0].get('kindid', 0) if not data_df.empty else 0
-        target_match_attrs, unmatched_attr = get_match_attrs(target_attr_types, first_equipment_type)
-        print(f"预先计算目标匹配属性target_match_attrs {target_match_attrs}")
-        print(f"预先计算未选中属性unmatched_attr {unmatched_attr}")
-        
-        # 将target_match_attrs信息添加到目标特征中，供后续特征计算使用
-        if hasattr(self, 'target_features') and self.target_features:
-            self.target_features['target_match_attrs'] = target_match_attrs
-            self.target_features['attr_3_type'] = unmatched_attr
-        filtered_rows = []
-        
-        for _, row in data_df.iterrows():
-            try:
-                # 直接使用数据库中已经存在的agg_added_attrs字段，避免重复特征提取
-                market_attrs = row.get('agg_added_attrs', [])
-                
-                # 如果agg_added_attrs是字符串（JSON），需要解析
-                if isinstance(market_attrs, str):
-                    import json
-                    try:
-                        market_attrs = json.loads(market_attrs)
-                    except json.JSONDecodeError:
-                        market_attrs = []
-
-                if not market_attrs:
-                    continue
-                
-                # 获取装备类型
-                equipment_type = row.get('kindid', 0)
-                
-                # 统计市场装备的附加属性类型
-                market_attr_types = []
-                for attr in market_attrs:
-                    attr_type = attr.get('attr_type', '')
-                    if attr_type:
-                        market_attr_types.append(attr_type)
-                # 检查匹配条件
-                if target_attr_count == 2:
-                    # 2条属性时，需要2条属性类型相同
-                    # 检查目标属性是否都相同
-                    unique_target_attrs = set(target_attr_types)
-                    if len(unique_target_attrs) == 1:
-                        # 2条属性都一样，需要市场装备至少有2条该类型属性
-                        target_attr_type = list(unique_target_attrs)[0]
-                        market_attr_counter = {}
-                        for attr_type in market_attr_types:
-                            market_attr_counter[attr_type] = market_attr_counter.get(attr_type, 0) + 1
-                        
-                        if market_attr_counter.get(target_attr_type, 0) >= 2:
-                            filtered_rows.append(row)
-                    else:
-                        # 2条属性不同，需要市场装备包含这2种属性
-                        market_attr_set = set(market_attr_types)
-                        target_match_set = set(target_match_attrs)
-                        if len(target_match_set.intersection(market_attr_set)) >= 2:
-                            filtered_rows.append(row)
-                elif target_attr_count == 3:
-                    # 3条属性时的特殊处理
-                    unique_target_attrs = set(target_attr_types)
-                    if len(unique_target_attrs) == 1:
-                        # 3条属性都一样，必须3条匹配
-                        market_attr_counter = {}
-                        for attr_type in market_attr_types:
-                            market_attr_counter[attr_type] = market_attr_counter.get(attr_type, 0) + 1
-                        
-                        target_attr_type = list(unique_target_attrs)[0]
-                        if market_attr_counter.get(target_attr_type, 0) >= 3:
-                            filtered_rows.append(row)
-                    else:
-                        # 3条属性不全相同，优先选择重复的属性
-                        # 使用计数方式，因为target_match_attrs可能包含重复属性
-                        market_attr_counter = {}
-                        for attr_type in market_attr_types:
-                            market_attr_counter[attr_type] = market_attr_counter.get(attr_type, 0) + 1
-                        
-                        # 检查target_match_attrs中的每个属性是否在市场装备中存在
-                        match_count = 0
-                        for target_attr in target_match_attrs:
-                            if market_attr_counter.get(target_attr, 0) > 0:
-                                match_count += 1
-                                # 减少计数，避免重复计算
-                                market_attr_counter[target_attr] -= 1
-                        
-                        if match_count >= 2:
-                            filtered_rows.append(row)
-                else:
-                    # 其他情况，使用交集匹配
-                    market_attr_set = set(market_attr_types)
-                    target_match_set = set(target_match_attrs)
-                    common_attr_types = target_match_set.intersection(market_attr_set)
-                    if len(common_attr_types) >= min(2, len(target_match_set)):
-                        filtered_rows.append(row)
-                    
-            except Exception as e:
-                self.logger.warning(f"处理装备 {row.get('id', 'unknown')} 的附加属性时出错: {e}")
-                continue
-        
-        if filtered_rows:
-            result_df = pd.DataFrame(filtered_rows)
+
+        # 直接使用数据库中已经存在的agg_added_attrs字段，按附加属性类型签名判断是否满足匹配属性
+        required = dict(Counter(target_match_attrs))
+        matches = {}
+        mask = []
+        for key in lingshi_partition_keys(data_df):
+            signature = key[1]
+            if signature not in matches:
+                matches[signature] = signature_matches(signature, required)
+            mask.append(matches[signature])
+
+        if any(mask):
+            result_df = data_df[mask]
             print(f"[附加属性筛选] 筛选前: {len(data_df)} 条，筛选后: {len(result_df)} 条")
             return result_df
         else:
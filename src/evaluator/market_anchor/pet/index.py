@@ -4,6 +4,8 @@ from openpyxl import Workbook
 import warnings
 from datetime import datetime
 import logging
+import numpy as np
+import pandas as pd
 from typing import Dict, Any, List, Optional, Union, Tuple
 
 from src.evaluator.market_anchor.pet.pet_market_data_collector import PetMarketDataCollector
@@ -12,6 +14,9 @@ from src.evaluator.utils.base_valuator import BaseValuator
 
 warnings.filterwarnings('ignore')
 
+# 向量化相似度计算中视为数值的类型
+_NUMERIC_TYPES = (int, float, np.integer, np.floating, np.bool_)
+
 
 class PetMarketAnchorEvaluator(BaseValuator):
     """市场锚定估价器 - 基于市场相似召唤兽的价格锚定估价"""
@@ -84,103 +89,247 @@ class PetMarketAnchorEvaluator(BaseValuator):
         """
         try:
             print(f"开始寻找市场锚点，相似度阈值: {similarity_threshold}")
-            # 获取目标装备的equip_sn，用于排除自身
-            target_equip_sn = target_features.get('equip_sn')
-            if target_equip_sn:
-                print(f"目标装备序列号: {target_equip_sn}，将排除自身")
-
-            # 构建预过滤条件以提高效率
-            pre_filters = self._build_pre_filters(target_features)
-
-            # 获取预过滤的市场数据
-            market_data = self.market_collector.get_market_data_with_business_rules(
-                pre_filters)
-
-            if market_data.empty:
-                print("市场数据为空，无法找到锚点")
-                return []
-
-            print(f"预过滤后获得 {len(market_data)} 条候选数据")
-
-            # 计算所有市场召唤兽的相似度
-            anchor_candidates = []
-            error_count = 0
-            excluded_self_count = 0
-
-            for idx, market_row in market_data.iterrows():
-                try:
-                    # 获取当前市场装备的equip_sn
-                    current_equip_sn = market_row.get('equip_sn', idx)
-
-                    # 排除目标装备自身
-                    if target_equip_sn and current_equip_sn == target_equip_sn:
-                        excluded_self_count += 1
-                        continue
-
-                    # 计算相似度
-                    similarity = self._calculate_similarity(
-                        target_features, market_row.to_dict())
-                    if similarity >= similarity_threshold:
-                        # 提取价格，如果有equip_list_amount则减去装备估价
-                        total_price = market_row.get('price', 0)
-                        equip_list_amount = market_row.get('equip_list_amount', 0)
-                        # TODO:带装备只算了裸价，没有算装备价格？怎么办？
-                        # 计算纯召唤兽价格（总价格减去装备估价）
-                        pet_price = total_price - equip_list_amount
-                        if equip_list_amount > 0:
-                            print({
-                                'total_price': total_price,
-                                'equip_list_amount': equip_list_amount,
-                                'pet_price': pet_price
-                            })
-                        if pet_price < 0:
-                            pet_price = 0  # 确保价格不为负数
-                        
-                        anchor_candidates.append({
-                            'equip_sn': current_equip_sn,
-                            'similarity': round(float(similarity), 3),
-                            'price': pet_price,  # 使用纯召唤兽价格
-                            'total_price': total_price,  # 保留总价格用于参考
-                            'equip_list_amount': equip_list_amount,  # 保留装备估价用于参考
-                            'features': market_row.to_dict()
-                        })
-
-                except Exception as e:
-                    # 详细记录有问题的数据
-                    market_dict = market_row.to_dict()
-                    self.logger.error(f"处理召唤兽 {current_equip_sn} 时出错: {e}")
-                    self.logger.error(f"问题数据内容: {market_dict}")
-
-                    error_count += 1
-                    continue
-
-            # 输出处理统计
-            processed_count = len(market_data)
-            success_count = processed_count - error_count - excluded_self_count
-            if error_count > 0 or excluded_self_count > 0:
-                self.logger.warning(
-                    f"数据处理统计: 总数={processed_count}, 成功={success_count}, 失败={error_count}, 排除自身={excluded_self_count}")
-
-            # 按相似度排序
-            anchor_candidates.sort(key=lambda x: x['similarity'], reverse=True)
-            # 返回前N个锚点
-            anchors = anchor_candidates[:max_anchors]
-            # 对锚点进行极端值过滤
-            if anchors:
-                anchors = self.extreme_value_filter.filter_anchors_for_extreme_values(anchors)
-            print(f"找到 {len(anchors)} 个市场锚点召唤兽")
-            if anchors:
-                print(
-                    f"相似度范围: {anchors[-1]['similarity']:.3f} - {anchors[0]['similarity']:.3f}")
-                print(
-                    f"价格范围: {min(a['price'] for a in anchors):.1f} - {max(a['price'] for a in anchors):.1f}")
-
-            return anchors
+            market_data = self._load_market_candidates(target_features, verbose)
+            return self._find_anchors_in_candidates(
+                target_features, market_data, similarity_threshold, max_anchors, verbose=verbose)
 
         except Exception as e:
             self.logger.error(f"寻找市场锚点失败: {e}")
             return []
 
+    def _get_candidate_group_key(self, target_features: Dict[str, Any]) -> Optional[str]:
+        """
+        获取候选集合分组键：采集器只按携带等级和技能加载候选（并对候选提取特征）
+
+        Args:
+            target_features: 目标召唤兽特征
+
+        Returns:
+            Optional[str]: 分组键
+        """
+        return self._make_candidate_group_key(
+            target_features.get('role_grade_limit', 0), target_features.get('all_skill', ''))
+
+    def _load_market_candidates(self,
+                                target_features: Dict[str, Any],
+                                verbose: bool = True) -> pd.DataFrame:
+        """
+        加载预过滤后的市场召唤兽（已提取特征）
+
+        Args:
+            target_features: 目标召唤兽特征
+            verbose: 是否显示详细调试日志
+
+        Returns:
+            pd.DataFrame: 预过滤后的市场数据
+        """
+        # 构建预过滤条件以提高效率
+        pre_filters = self._build_pre_filters(target_features)
+
+        # 获取预过滤的市场数据
+        return self.market_collector.get_market_data_with_business_rules(
+            pre_filters)
+
+    def _prepare_market_candidates(self,
+                                   target_features: Dict[str, Any],
+                                   market_data: pd.DataFrame) -> Dict[str, Any]:
+        """
+        候选侧预处理：把相似度特征堆叠为数值列、计算纯召唤兽价格，同组目标共享
+
+        Args:
+            target_features: 组内任一目标召唤兽特征（未使用）
+            market_data: 预过滤后的市场数据
+
+        Returns:
+            Dict[str, Any]: records（候选字典）、equip_sns、feature_columns（特征名 -> float数组）、
+                scalar_mask（含非数值特征、需逐行标量计算的候选）、prices/total_prices/equip_list_amounts
+        """
+        count = len(market_data)
+        records = market_data.to_dict('records')
+        equip_sns = np.array([record.get('equip_sn', idx) for idx, record in zip(market_data.index, records)],
+                             dtype=object)
+
+        # 市场数据中存在的特征列转为float数组；None、字符串等非数值的行走标量计算（与原逐行逻辑一致）
+        feature_columns = {}
+        scalar_mask = np.zeros(count, dtype=bool)
+        for feature_name in self.relative_tolerances:
+            if feature_name not in market_data.columns:
+                continue
+            values, numeric = self._to_float_array(market_data[feature_name])
+            feature_columns[feature_name] = values
+            scalar_mask |= ~numeric
+
+        # 纯召唤兽价格 = 总价格 - 装备估价（不低于0）
+        total_prices = self._to_float_array(market_data['price'])[0] \
+            if 'price' in market_data.columns else np.zeros(count)
+        equip_list_amounts = self._to_float_array(market_data['equip_list_amount'])[0] \
+            if 'equip_list_amount' in market_data.columns else np.zeros(count)
+        prices = np.maximum(np.nan_to_num(total_prices) - np.nan_to_num(equip_list_amounts), 0)
+
+        return {
+            'records': records,
+            'equip_sns': equip_sns,
+            'feature_columns': feature_columns,
+            'scalar_mask': scalar_mask,
+            'prices': prices,
+        }
+
+    @staticmethod
+    def _to_float_array(column: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        把一列转为float数组
+
+        Returns:
+            Tuple[float数组, 数值掩码（None、字符串等非数值为False，对应位置为NaN）]
+        """
+        if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+            return column.to_numpy(dtype=float), np.ones(len(column), dtype=bool)
+        raw = column.to_numpy(dtype=object)
+        numeric = np.fromiter((isinstance(value, _NUMERIC_TYPES) for value in raw), dtype=bool, count=len(raw))
+        values = np.full(len(raw), np.nan)
+        if numeric.any():
+            values[numeric] = raw[numeric].astype(float)
+        return values, numeric
+
+    def _find_anchors_in_candidates(self,
+                                    target_features: Dict[str, Any],
+                                    market_data: pd.DataFrame,
+                                    similarity_threshold: float = 0.7,
+                                    max_anchors: int = 30,
+                                    verbose: bool = True,
+                                    prepared: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        在已加载的候选召唤兽中计算相似度并选出锚点
+
+        相似度按列一次性计算，阈值过滤后用argpartition取前max_anchors个，只物化选中的锚点。
+
+        Args:
+            target_features: 目标召唤兽特征
+            market_data: 预过滤后的市场数据
+            similarity_threshold: 相似度阈值（0-1）
+            max_anchors: 最大锚点数量
+            verbose: 是否显示详细调试日志
+            prepared: 同组共享的候选侧预处理结果（_prepare_market_candidates）
+
+        Returns:
+            List[Dict[str, Any]]: 锚点召唤兽列表
+        """
+        # 获取目标装备的equip_sn，用于排除自身
+        target_equip_sn = target_features.get('equip_sn')
+        if target_equip_sn:
+            print(f"目标装备序列号: {target_equip_sn}，将排除自身")
+
+        if market_data.empty:
+            print("市场数据为空，无法找到锚点")
+            return []
+
+        print(f"预过滤后获得 {len(market_data)} 条候选数据")
+
+        if prepared is None:
+            prepared = self._prepare_market_candidates(target_features, market_data)
+
+        # 计算所有市场召唤兽的相似度
+        similarities = self._calculate_similarity_vectorized(target_features, prepared)
+
+        # 排除目标装备自身
+        excluded_self_count = 0
+        if target_equip_sn:
+            self_mask = prepared['equip_sns'] == target_equip_sn
+            excluded_self_count = int(self_mask.sum())
+            similarities = np.where(self_mask, -np.inf, similarities)
+
+        # 输出处理统计
+        if excluded_self_count > 0:
+            processed_count = len(market_data)
+            self.logger.warning(
+                f"数据处理统计: 总数={processed_count}, 成功={processed_count - excluded_self_count}, 失败=0, 排除自身={excluded_self_count}")
+
+        # 按相似度排序，返回前N个锚点
+        records = prepared['records']
+        prices = prepared['prices']
+        anchors = []
+        for i in self._select_top_anchors(similarities, similarity_threshold, max_anchors):
+            record = records[i]
+            anchors.append({
+                'equip_sn': prepared['equip_sns'][i],
+                'similarity': round(float(similarities[i]), 3),
+                'price': float(prices[i]),  # 使用纯召唤兽价格
+                'total_price': record.get('price', 0),  # 保留总价格用于参考
+                'equip_list_amount': record.get('equip_list_amount', 0),  # 保留装备估价用于参考
+                # TODO:带装备只算了裸价，没有算装备价格？怎么办？
+                # 同组目标共享候选字典，锚点中返回副本
+                'features': dict(record)
+            })
+
+        # 对锚点进行极端值过滤
+        if anchors:
+            anchors = self.extreme_value_filter.filter_anchors_for_extreme_values(anchors)
+        print(f"找到 {len(anchors)} 个市场锚点召唤兽")
+        if anchors:
+            print(
+                f"相似度范围: {anchors[-1]['similarity']:.3f} - {anchors[0]['similarity']:.3f}")
+            print(
+                f"价格范围: {min(a['price'] for a in anchors):.1f} - {max(a['price'] for a in anchors):.1f}")
+
+        return anchors
+
+    def _calculate_similarity_vectorized(self,
+                                         target_features: Dict[str, Any],
+                                         prepared: Dict[str, Any]) -> np.ndarray:
+        """
+        列式计算目标召唤兽与所有候选的相似度 - 与 _calculate_similarity 结果一致
+
+        Args:
+            target_features: 目标召唤兽特征
+            prepared: 候选侧预处理结果（_prepare_market_candidates）
+
+        Returns:
+            np.ndarray: 每个候选的相似度分数（0-1）
+        """
+        records = prepared['records']
+        count = len(records)
+        target_values = {name: target_features.get(name, 0) for name in self.relative_tolerances}
+        if not isinstance(target_features, dict) or \
+                not all(isinstance(value, _NUMERIC_TYPES) for value in target_values.values()):
+            # 目标含非数值特征时逐行计算
+            return np.array([self._calculate_similarity(target_features, record) for record in records], dtype=float)
+
+        weighted_similarity = np.zeros(count)
+        total_weight = 0.0
+        for feature_name, tolerance in self.relative_tolerances.items():
+            market_vals = prepared['feature_columns'].get(feature_name)
+            if market_vals is None:
+                if feature_name not in target_features:
+                    continue
+                market_vals = np.zeros(count)
+
+            target_val = float(target_values[feature_name])
+            weight = self.feature_weights.get(feature_name, 0.5)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                diff_ratio = np.abs(target_val - market_vals) / np.maximum(abs(target_val), np.abs(market_vals))
+                # 超出容忍度但在2倍范围内，线性递减
+                decayed = np.maximum(0, 1.0 - (diff_ratio - tolerance) / max(tolerance, 0.1))
+                feature_similarity = np.where(
+                    diff_ratio <= tolerance, 1.0,
+                    np.where(diff_ratio <= tolerance * 2, decayed, 0.0))
+            market_zero = market_vals == 0
+            # 两者都为0完全匹配；一个为0一个不为0给予部分相似度
+            if target_val == 0:
+                feature_similarity = np.where(market_zero, 1.0, 0.3)
+            else:
+                feature_similarity = np.where(market_zero, 0.3, feature_similarity)
+
+            weighted_similarity += feature_similarity * weight
+            total_weight += weight
+
+        similarities = weighted_similarity / total_weight if total_weight > 0 else np.zeros(count)
+
+        # 含非数值特征的候选逐行计算
+        for i in np.flatnonzero(prepared['scalar_mask']):
+            similarities[i] = self._calculate_similarity(target_features, records[i])
+        return similarities
+
     def _build_pre_filters(self, target_features: Dict[str, Any]) -> Dict[str, Any]:
         """
         根据目标特征构建预过滤条件，减少计算量
@@ -5,6 +5,12 @@ from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
 
 from src.evaluator.feature_extractor.pet_feature_extractor import PetFeatureExtractor
+from src.evaluator.market_anchor.pet.pet_skill_index import (
+    PetSkillVocabulary, attach_skill_masks, parse_target_skills, skill_subset_mask
+)
+from src.evaluator.utils.shared_frame_store import (
+    get_shared_frame_store, get_snapshot_store, ensure_writable, PUBLISH_DELAY_SECONDS, SNAPSHOT_INTERVAL_SECONDS
+)
 from src.database import db
 from src.models.pet import Pet
 from sqlalchemy import and_, or_, func, text
@@ -15,6 +21,9 @@ class PetMarketDataCollector:
 
     _instance = None  # 单例实例
     _lock = None  # 线程锁，确保线程安全
+    _shared_store = None  # 多进程共享缓存（未启用时为None）
+    _shared_generation = None  # 已挂载的共享缓存版本
+    _snapshot_store = None  # 磁盘快照（不使用时为None）
     
     def __new__(cls):
         """单例模式实现"""
@@ -64,6 +73,12 @@ class PetMarketDataCollector:
         self._full_cache_key = "pet_market_data_full"
         self._cache_ttl_hours = -1  # 永不过期，只能手动刷新
         self._full_data_cache = None  # 内存中的全量数据缓存
+        self._skill_vocabulary = None  # 技能位图使用的技能表（首次使用时加载）
+        # 多进程部署：全量缓存由写入进程发布到共享内存，其他进程只读挂载（未启用时为None）
+        self._shared_store = get_shared_frame_store('pet_market')
+        self._shared_generation = None
+        # 磁盘快照（冷启动时挂载后只补齐增量；多进程部署时与共享缓存为同一存储）
+        self._snapshot_store = get_snapshot_store('pet_market')
         
         # 进度跟踪相关属性
         self._refresh_status = "idle"  # idle, running, completed, error
@@ -90,6 +105,7 @@ class PetMarketDataCollector:
             self.redis_pubsub = None
         
         self._initialized = True
+        self._warm_up_shared_cache()
         cache_mode = "永不过期模式" if self._cache_ttl_hours == -1 else f"{self._cache_ttl_hours}小时过期"
         print(f"宠物市场数据采集器单例初始化完成，支持Redis全量缓存（{cache_mode}）")
     
@@ -193,12 +209,7 @@ class PetMarketDataCollector:
             )
 
             # 处理all_skill参数，支持字符串或列表
-            target_skills = []
-            if all_skill:
-                if isinstance(all_skill, str):
-                    target_skills = [s for s in all_skill.split('|') if s]
-                elif isinstance(all_skill, list):
-                    target_skills = [str(s) for s in all_skill if s]
+            target_skills = parse_target_skills(all_skill) if all_skill else []
 
             # 基础筛选条件
             if level_range is not None:
@@ -259,14 +270,9 @@ class PetMarketDataCollector:
                 
                 result_df = pd.DataFrame(data_list)
                 
-                # Python集合精确过滤技能
+                # 技能位图精确过滤技能
                 if target_skills:
-                    target_set = set(target_skills)
-                    def match(row):
-                        all_skill_val = row.get('all_skill', '')
-                        skill_set = set(all_skill_val.split('|')) if all_skill_val else set()
-                        return target_set.issubset(skill_set)
-                    result_df = result_df[result_df.apply(match, axis=1)]
+                    result_df = result_df[skill_subset_mask(result_df, target_skills, self._get_skill_vocabulary())]
                 
                 # 去重
                 result_df = result_df.drop_duplicates(subset=['equip_sn'], keep='first')
@@ -293,7 +299,8 @@ class PetMarketDataCollector:
         Returns:
             过滤后的市场数据DataFrame
         """
-        # 优先使用内存缓存
+        # 优先使用内存缓存（多进程部署时先挂载共享内存中的最新版本）
+        self._attach_shared_cache()
         if self._full_data_cache is not None and not self._full_data_cache.empty:
             print("使用内存缓存进行相似度计算...")
             # 基础过滤条件
@@ -467,8 +474,9 @@ class PetMarketDataCollector:
                         self._refresh_processed_records = len(cached_data)
                         self._refresh_total_batches = 1
                         self._refresh_current_batch = 1
-                        # 将数据加载到内存缓存
-                        self._full_data_cache = cached_data
+                        # 将数据加载到内存缓存（缺少技能位图的行在此编码）
+                        self._full_data_cache = self._attach_skill_masks(cached_data)
+                        self._publish_shared_cache()
                         return True
                     else:
                         print("Redis缓存不存在或为空，将重新加载数据")
@@ -613,6 +621,9 @@ class PetMarketDataCollector:
             df = pd.DataFrame(all_data)
             print(f"总共加载 {len(df)} 条宠物数据")
             
+            # 编码技能位图，随全量缓存一起存储
+            df = self._attach_skill_masks(df)
+            
             # 存储到Redis分块缓存
             self._refresh_message = "保存到Redis缓存..."
             self._refresh_progress = 95
@@ -674,6 +685,7 @@ class PetMarketDataCollector:
                     cache_info = "永不过期（仅手动刷新）" if self._cache_ttl_hours == -1 else f"{self._cache_ttl_hours}小时"
                     print(f"全量宠物数据已缓存到Redis，缓存策略: {cache_info}，总耗时: {elapsed_time:.2f}秒")
                     self._full_data_cache = df  # 同时缓存到内存
+                    self._publish_shared_cache(immediate=True)
                     
                     # 完成进度跟踪
                     self._refresh_status = "completed"
@@ -711,18 +723,30 @@ class PetMarketDataCollector:
             return None
             
         try:
+            # 多进程部署：挂载共享内存中的最新版本
+            self._attach_shared_cache()
+            
             # 先检查内存缓存
             if self._full_data_cache is not None and not self._full_data_cache.empty:
                 print(f"从内存缓存获取全量数据: {len(self._full_data_cache)} 条")
                 return self._full_data_cache
             
+            # 冷启动：优先挂载磁盘快照并补齐增量
+            snapshot_data = self._load_snapshot()
+            if snapshot_data is not None:
+                self._full_data_cache = snapshot_data
+                self._publish_shared_cache()
+                return snapshot_data
+            
             # 从Redis获取Hash数据
             hash_key = f"{self._full_cache_key}:hash"
             cached_data = self.redis_cache.get_hash_data(hash_key)
             
             if cached_data is not None and not cached_data.empty:
                 print(f"从Redis Hash缓存获取全量数据: {len(cached_data)} 条")
+                cached_data = self._attach_skill_masks(cached_data)
                 self._full_data_cache = cached_data  # 缓存到内存
+                self._publish_shared_cache()
                 return cached_data
             else:
                 print("Redis全量缓存未命中")
@@ -732,6 +756,27 @@ class PetMarketDataCollector:
             self.logger.warning(f"从Redis获取全量数据失败: {e}")
             return None
 
+    def _get_skill_vocabulary(self) -> Optional[PetSkillVocabulary]:
+        """获取技能位图使用的技能表（加载失败时返回None，技能筛选退回字符串匹配）"""
+        if self._skill_vocabulary is None:
+            try:
+                self._skill_vocabulary = PetSkillVocabulary.from_config()
+            except Exception as e:
+                self.logger.warning(f"加载召唤兽技能表失败，技能筛选使用字符串匹配: {e}")
+                return None
+        return self._skill_vocabulary
+
+    def _attach_skill_masks(self, data: pd.DataFrame) -> pd.DataFrame:
+        """为缺少技能位图（或位图版本过期）的行编码技能位图"""
+        vocabulary = self._get_skill_vocabulary()
+        if vocabulary is None or data is None:
+            return data
+        try:
+            return attach_skill_masks(data, vocabulary)
+        except Exception as e:
+            self.logger.warning(f"编码召唤兽技能位图失败: {e}")
+            return data
+
     def _filter_data_from_full_cache(self, full_data: pd.DataFrame, **filters) -> pd.DataFrame:
         """
         从Redis全量数据中进行筛选 - 使用pandas高效筛选
@@ -790,19 +835,10 @@ class PetMarketDataCollector:
             
             # 5. 技能筛选
             if all_skill:
-                target_skills = []
-                if isinstance(all_skill, str):
-                    target_skills = [s for s in all_skill.split('|') if s]
-                elif isinstance(all_skill, list):
-                    target_skills = [str(s) for s in all_skill if s]
-                
+                target_skills = parse_target_skills(all_skill)
                 if target_skills:
-                    target_set = set(target_skills)
-                    def match(row):
-                        all_skill_val = row.get('all_skill', '')
-                        skill_set = set(all_skill_val.split('|')) if all_skill_val else set()
-                        return target_set.issubset(skill_set)
-                    filtered_df = filtered_df[filtered_df.apply(match, axis=1)]
+                    # 全量缓存中已编码技能位图，整表一次按位与
+                    filtered_df = filtered_df[skill_subset_mask(filtered_df, target_skills, self._get_skill_vocabulary())]
                     print(f"按技能筛选后: {len(filtered_df)} 条")
             
             # 6. 按更新时间排序并限制数量
@@ -1038,6 +1074,121 @@ class PetMarketDataCollector:
                     "elapsed_seconds": 0
                 }
     
+    def _owns_shared_cache(self) -> bool:
+        """是否负责更新全量缓存（未启用共享缓存时每个进程各自更新）"""
+        return self._shared_store is None or self._shared_store.is_owner()
+
+    def _attach_shared_cache(self) -> bool:
+        """
+        多进程部署：非写入进程挂载共享内存中的全量缓存（有新版本时切换）
+        
+        Returns:
+            bool: 是否已挂载共享缓存
+        """
+        if self._owns_shared_cache():
+            return False
+        attached = self._shared_store.poll(self._shared_generation)
+        if attached is not None:
+            self._shared_generation, self._full_data_cache = attached
+        return self._shared_generation is not None
+
+    def _publish_shared_cache(self, immediate: bool = False):
+        """
+        全量缓存变化后发布新版本：多进程部署时由写入进程发布到共享内存（延迟合并），
+        单进程部署时定期写入磁盘快照；全量刷新后立即发布
+        """
+        store = self._snapshot_store
+        if store is None:
+            return
+        if immediate:
+            # 全量刷新完成：任何进程都直接发布，各进程切换到新版本
+            try:
+                store.publish(self._full_data_cache)
+            except Exception as e:
+                self.logger.warning(f"发布共享缓存失败: {e}")
+        elif self._owns_shared_cache():
+            delay = PUBLISH_DELAY_SECONDS if self._shared_store is not None else SNAPSHOT_INTERVAL_SECONDS
+            store.schedule_publish(lambda: self._full_data_cache, delay=delay)
+
+    def _warm_up_shared_cache(self):
+        """写入进程启动时在后台加载全量缓存并发布，其他进程直接挂载"""
+        if self._shared_store is None or not self._shared_store.is_owner():
+            return
+        import threading
+        threading.Thread(target=self._get_full_data_from_redis, daemon=True).start()
+
+    def _get_incremental_data_from_mysql(self, since: datetime) -> pd.DataFrame:
+        """
+        从MySQL获取指定时间之后更新的宠物数据（字段与全量缓存一致）
+        
+        Args:
+            since: 起始更新时间
+            
+        Returns:
+            pd.DataFrame: 增量数据，查询失败时为空
+        """
+        try:
+            from flask import current_app
+            
+            # 确保在Flask应用上下文中
+            if not current_app:
+                from src.app import create_app
+                with create_app().app_context():
+                    return self._get_incremental_data_from_mysql(since)
+            
+            pets = db.session.query(
+                Pet.role_grade_limit,
+                Pet.equip_level,
+                Pet.growth,
+                Pet.is_baobao,
+                Pet.all_skill,
+                Pet.evol_skill_list,
+                Pet.texing,
+                Pet.lx,
+                Pet.equip_list,
+                Pet.equip_list_amount,
+                Pet.neidan,
+                Pet.equip_sn,
+                Pet.price,
+                Pet.update_time
+            ).filter(Pet.update_time > since).all()
+            
+            columns = ['role_grade_limit', 'equip_level', 'growth', 'is_baobao', 'all_skill',
+                       'evol_skill_list', 'texing', 'lx', 'equip_list', 'equip_list_amount',
+                       'neidan', 'equip_sn', 'price', 'update_time']
+            df = pd.DataFrame([tuple(pet) for pet in pets], columns=columns)
+            print(f"从MySQL获取增量宠物数据: {len(df)} 条")
+            return df
+            
+        except Exception as e:
+            self.logger.error(f"获取增量宠物数据失败: {e}")
+            return pd.DataFrame()
+
+    def _load_snapshot(self) -> Optional[pd.DataFrame]:
+        """
+        冷启动：挂载磁盘快照，并从MySQL补齐快照水位之后的增量数据
+        
+        Returns:
+            Optional[pd.DataFrame]: 补齐后的全量数据，没有可用快照时返回None
+        """
+        if self._snapshot_store is None:
+            return None
+        snapshot = self._snapshot_store.attach_snapshot()
+        if snapshot is None:
+            return None
+        data, delta_since = snapshot
+        if delta_since is None:
+            # 没有水位无法补齐增量
+            return None
+        
+        delta = self._get_incremental_data_from_mysql(delta_since)
+        if not delta.empty:
+            delta = self._attach_skill_masks(delta)
+            data = self._merge_incremental_data_removed(data, delta)
+        print(f"快照补齐增量数据 {len(delta)} 条（{delta_since.isoformat()} 之后），全量数据: {len(data)} 条")
+        # 快照以只读内存映射挂载，作为本进程的全量缓存前复制到私有内存
+        return ensure_writable(data)
+
     def _handle_pet_update_message(self, message: Dict[str, Any]):
         """
         处理召唤兽数据更新消息 - 更新内存缓存并同步到Redis
@@ -1049,8 +1200,16 @@ class PetMarketDataCollector:
             action = message.get('action', '')
             self.logger.info(f"📨 收到召唤兽数据更新消息: {action}")
             
+            if not self._owns_shared_cache():
+                # 多进程部署：由写入进程合并更新并发布新版本，本进程在下次查询时挂载
+                self.logger.info("📨 共享缓存由写入进程更新，跳过本进程的内存缓存更新")
+                return
+            
             if action == 'add_dataframe' and 'dataframe' in message:
                 dataframe = message['dataframe']
+                if self._shared_store is not None and self._full_data_cache is None:
+                    # 写入进程先加载全量数据，避免只用新增数据发布共享缓存
+                    self._get_full_data_from_redis()
                 if dataframe is not None and not dataframe.empty:
                     # 直接更新内存缓存
                     success = self._update_memory_cache_with_dataframe(dataframe)
@@ -1086,6 +1245,9 @@ class PetMarketDataCollector:
             
             self.logger.info(f"🔄 开始直接更新内存缓存，新数据量: {len(new_dataframe)} 条")
             
+            # 只为新数据编码技能位图
+            new_dataframe = self._attach_skill_masks(new_dataframe)
+            
             # 如果内存缓存为空，直接使用新数据
             if self._full_data_cache is None or self._full_data_cache.empty:
                 self._full_data_cache = new_dataframe.copy()
@@ -1099,6 +1261,7 @@ class PetMarketDataCollector:
             self._full_data_cache = merged_data
             
             self.logger.info(f"✅ 内存缓存已直接更新，数据量: {len(self._full_data_cache)} 条")
+            self._publish_shared_cache()
             return True
             
         except Exception as e:
@@ -1215,8 +1378,7 @@ class PetMarketDataCollector:
                 return
             
             # 获取当前Redis中的实际数据量
-            full_key = self.redis_cache._make_key(f"{self._full_cache_key}:hash")
-            actual_count = self.redis_cache.client.hlen(full_key)
+            actual_count = self.redis_cache.get_hash_count(f"{self._full_cache_key}:hash")
             
             if actual_count == 0:
                 return
@@ -0,0 +1,175 @@
+"""
+召唤兽技能位图索引
+
+- 技能表来自 ConfigLoader.get_pet_skill_config，每个技能固定一个位，按32位分组存为多个列
+- 每只召唤兽的技能只在加载全量缓存（或新增数据）时编码一次，编码列随全量缓存一起持久化
+- "目标技能是否为候选技能的子集"变为整表一次按位与运算
+- 使用32位字：合并数据时列被升级为float64也不会丢失精度
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+SKILL_MASK_PREFIX = 'skill_mask_'
+SKILL_MASK_VERSION_COLUMN = 'skill_mask_version'
+SKILL_WORD_BITS = 32
+
+logger = logging.getLogger(__name__)
+
+
+def split_skills(all_skill: Any) -> List[str]:
+    """解析 "301|302|..." 形式的技能字符串（非字符串视为没有技能）"""
+    if isinstance(all_skill, str) and all_skill:
+        return all_skill.split('|')
+    return []
+
+
+def parse_target_skills(all_skill: Any) -> List[str]:
+    """解析目标技能（支持字符串或列表，忽略空值）"""
+    if isinstance(all_skill, str):
+        return [s for s in all_skill.split('|') if s]
+    if isinstance(all_skill, list):
+        return [str(s) for s in all_skill if s]
+    return []
+
+
+class PetSkillVocabulary:
+    """技能ID -> 位位置的映射（构建后不再修改）"""
+
+    def __init__(self, skill_ids: Iterable[Any]):
+        """
+        Args:
+            skill_ids: 技能ID列表
+        """
+        ids = sorted({str(skill_id) for skill_id in skill_ids},
+                     key=lambda s: (0, int(s)) if s.isdigit() else (1, s))
+        self.positions = {skill_id: i for i, skill_id in enumerate(ids)}
+        self.word_count = max(1, (len(ids) + SKILL_WORD_BITS - 1) // SKILL_WORD_BITS)
+        self.mask_columns = [f"{SKILL_MASK_PREFIX}{i}" for i in range(self.word_count)]
+        digest = hashlib.md5(json.dumps(ids).encode('utf-8')).hexdigest()
+        # 28位版本号，升级为float64时同样不丢失精度
+        self.version = int(digest[:7], 16)
+
+    @classmethod
+    def from_config(cls) -> 'PetSkillVocabulary':
+        """从召唤兽技能配置构建"""
+        from src.parser.config_loader import ConfigLoader
+        return cls(ConfigLoader().get_pet_skill_config().keys())
+
+    def encode_target(self, skills: List[str]) -> Optional[np.ndarray]:
+        """
+        编码目标技能
+
+        Returns:
+            Optional[np.ndarray]: 技能位图，目标含技能表以外的技能时返回None（需按字符串匹配）
+        """
+        words = np.zeros(self.word_count, dtype=np.uint32)
+        for skill in skills:
+            position = self.positions.get(skill)
+            if position is None:
+                return None
+            words[position // SKILL_WORD_BITS] |= np.uint32(1 << (position % SKILL_WORD_BITS))
+        return words
+
+    def encode(self, all_skill_values: Iterable[Any]) -> np.ndarray:
+        """
+        编码一组技能字符串（技能表以外的技能不占位）
+
+        Returns:
+            np.ndarray: (行数, word_count) 的uint32位图
+        """
+        rows, positions = [], []
+        count = 0
+        for row, value in enumerate(all_skill_values):
+            count += 1
+            for skill in split_skills(value):
+                position = self.positions.get(skill)
+                if position is not None:
+                    rows.append(row)
+                    positions.append(position)
+
+        masks = np.zeros((count, self.word_count), dtype=np.uint32)
+        if rows:
+            positions = np.asarray(positions)
+            bits = np.left_shift(np.uint32(1), (positions % SKILL_WORD_BITS).astype(np.uint32))
+            np.bitwise_or.at(masks, (np.asarray(rows), positions // SKILL_WORD_BITS), bits)
+        return masks
+
+
+def attach_skill_masks(data: pd.DataFrame, vocabulary: PetSkillVocabulary) -> pd.DataFrame:
+    """
+    为缺少编码或编码版本过期的行计算技能位图列（已编码的行不重复计算）
+
+    Args:
+        data: 召唤兽数据（包含all_skill列）
+        vocabulary: 技能表
+
+    Returns:
+        pd.DataFrame: 带技能位图列的数据（需要编码时返回副本）
+    """
+    if data.empty or 'all_skill' not in data.columns:
+        return data
+
+    if SKILL_MASK_VERSION_COLUMN in data.columns and all(col in data.columns for col in vocabulary.mask_columns):
+        stale = (data[SKILL_MASK_VERSION_COLUMN] != vocabulary.version).to_numpy()
+    else:
+        stale = np.ones(len(data), dtype=bool)
+    if not stale.any():
+        return data
+
+    data = data.copy()
+    # 旧版本的多余位图列一并去掉
+    obsolete = [col for col in data.columns
+                if col.startswith(SKILL_MASK_PREFIX) and col not in vocabulary.mask_columns]
+    if obsolete:
+        data = data.drop(columns=obsolete)
+
+    encoded = vocabulary.encode(data['all_skill'].to_numpy(dtype=object)[stale])
+    if stale.all():
+        for i, col in enumerate(vocabulary.mask_columns):
+            data[col] = encoded[:, i]
+        data[SKILL_MASK_VERSION_COLUMN] = np.int64(vocabulary.version)
+    else:
+        for i, col in enumerate(vocabulary.mask_columns):
+            column = _to_word_array(data[col]) if col in data.columns else np.zeros(len(data), dtype=np.uint32)
+            column[stale] = encoded[:, i]
+            data[col] = column
+        data[SKILL_MASK_VERSION_COLUMN] = np.int64(vocabulary.version)
+    return data
+
+
+def _to_word_array(column: pd.Series) -> np.ndarray:
+    """位图列转为uint32数组（缺失值为0）"""
+    return pd.to_numeric(column, errors='coerce').fillna(0).to_numpy(dtype=np.uint32)
+
+
+def skill_subset_mask(data: pd.DataFrame, target_skills: List[str],
+                      vocabulary: Optional[PetSkillVocabulary]) -> np.ndarray:
+    """
+    目标技能是否为每行技能的子集
+
+    Args:
+        data: 召唤兽数据
+        target_skills: 目标技能列表
+        vocabulary: 技能表，为None时按字符串匹配
+
+    Returns:
+        np.ndarray: 每行的布尔结果
+    """
+    target_words = vocabulary.encode_target(target_skills) if vocabulary is not None else None
+    if target_words is None:
+        # 技能表不可用或目标含未知技能：逐行集合匹配
+        target_set = set(target_skills)
+        values = data['all_skill'].to_numpy(dtype=object) if 'all_skill' in data.columns else [None] * len(data)
+        return np.fromiter((target_set.issubset(split_skills(value)) for value in values),
+                           dtype=bool, count=len(data))
+
+    data = attach_skill_masks(data, vocabulary)
+    masks = np.column_stack([_to_word_array(data[col]) for col in vocabulary.mask_columns]) \
+        if len(data) else np.zeros((0, vocabulary.word_count), dtype=np.uint32)
+    return np.all((masks & target_words) == target_words, axis=1)
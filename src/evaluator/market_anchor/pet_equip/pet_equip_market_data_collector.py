@@ -1,8 +1,9 @@
 import os
 import sys
+import numpy as np
 import pandas as pd
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Hashable, List, Optional, Tuple
 from datetime import datetime
 import re
 
@@ -13,6 +14,19 @@ sys.path.insert(0, project_root)
 
 # 导入装备类型常量
 from src.evaluator.constants.equipment_types import PET_EQUIP_KINDID
+from src.evaluator.utils.partitioned_frame import PartitionedFrame
+
+# 附加属性分类使用的字段（与 _classify_addon_attributes 参数顺序一致）
+ADDON_ATTR_COLUMNS = ['addon_fali', 'addon_lingli', 'addon_liliang', 'addon_minjie', 'addon_naili', 'addon_tizhi']
+
+# 同类属性分组
+ADDON_CLASSIFICATION_GROUPS = {
+    "法力系": ["法力", "法灵", "法敏", "法耐", "法体", "力法","灵力", "灵敏", "灵耐", "灵体", "力灵"],
+    "力量系": ["力量", "力敏", "力耐", "力体" ],
+    "敏捷系": ["敏捷", "敏耐", "敏体"],
+    "耐力系": ["耐力", "耐体"],
+    "体质系": ["体质"]
+}
 
 # 导入特征提取器
 try:
@@ -53,6 +67,11 @@ class PetEquipMarketDataCollector:
         # 缓存过滤后的宠物装备数据，避免重复读取和过滤
         self._cached_pet_equip_data = None
         self._cache_timestamp = None
+        # 按 (防御状态, 速度状态, 伤害<20, 附加属性分类) 分区的宠物装备数据
+        self._pet_equip_partitions = None
+
+        # 订阅装备数据更新消息
+        self._setup_equipment_update_subscription()
 
         print(f"召唤兽装备数据采集器初始化，使用MySQL数据库")
 
@@ -66,7 +85,147 @@ class PetEquipMarketDataCollector:
             self.logger.warning(f"获取装备数据采集器实例失败: {e}")
             print(f" 无法共享装备数据采集器缓存: {e}")
 
-    def _get_shared_cache_data(self, fangyu: int = 0, speed: int = 0, shanghai: int = 0) -> Optional[pd.DataFrame]:
+    def _setup_equipment_update_subscription(self):
+        """设置装备数据更新消息订阅"""
+        try:
+            from src.utils.redis_pubsub import get_redis_pubsub, Channel
+
+            # 订阅装备数据更新消息
+            success = get_redis_pubsub().subscribe(
+                Channel.EQUIPMENT_UPDATES,
+                self.handle_equipment_update_message
+            )
+
+            if success:
+                self.logger.info("📨 宠物装备采集器已订阅装备数据更新消息")
+            else:
+                self.logger.warning("📨 宠物装备采集器订阅装备数据更新消息失败")
+
+        except Exception as e:
+            self.logger.error(f"设置装备数据更新订阅失败: {e}")
+            print(f" 设置装备数据更新订阅失败: {e}")
+
+    def handle_equipment_update_message(self, message: Dict[str, Any]):
+        """
+        处理装备数据更新消息，新增的宠物装备直接合并到分区中
+
+        Args:
+            message: 装备数据更新消息
+        """
+        try:
+            message_type = message.get('type')
+            action = message.get('action', 'refresh')
+
+            self.logger.info(f"📨 宠物装备采集器收到装备数据更新消息: {message_type}, 操作: {action}")
+
+            if message_type == 'equipment_data_saved':
+                if action == 'add_dataframe' and 'dataframe' in message:
+                    self._update_pet_equip_cache_with_dataframe(message['dataframe'])
+                else:
+                    # 清除实例缓存，下次会自动从装备数据采集器获取最新数据
+                    self.clear_cache()
+
+        except Exception as e:
+            self.logger.error(f"❌ 处理装备数据更新消息失败: {e}")
+
+    def _update_pet_equip_cache_with_dataframe(self, new_dataframe: pd.DataFrame):
+        """
+        直接使用DataFrame更新宠物装备分区，只为新增的宠物装备计算分区键
+
+        Args:
+            new_dataframe: 新的装备数据DataFrame
+        """
+        try:
+            pet_equip_data = new_dataframe[new_dataframe['kindid'] == PET_EQUIP_KINDID]
+            if pet_equip_data.empty:
+                return
+
+            if self._pet_equip_partitions is None:
+                # 实例缓存尚未加载时不单独建立缓存，下次查询时从全量缓存加载（已包含新增数据）
+                return
+
+            self._pet_equip_partitions.append(pet_equip_data)
+            self._set_pet_equip_partitions(self._pet_equip_partitions)
+            self.logger.info(f"📨 宠物装备缓存更新成功，当前缓存 {len(self._cached_pet_equip_data)} 条数据")
+
+        except Exception as e:
+            self.logger.error(f"❌ 更新宠物装备缓存失败: {e}")
+            # 如果更新失败，清除缓存以确保数据一致性
+            self.clear_cache()
+
+    def _set_pet_equip_partitions(self, partitions: Optional[PartitionedFrame]):
+        """更新分区数据（实例缓存指向分区数据）"""
+        self._pet_equip_partitions = partitions
+        self._cached_pet_equip_data = partitions.data if partitions is not None else None
+        self._cache_timestamp = datetime.now() if partitions is not None else None
+
+    def _pet_equip_partition_keys(self, data: pd.DataFrame) -> List[Tuple[str, str, bool, str]]:
+        """宠物装备数据的分区键 (防御状态, 速度状态, 伤害<20, 附加属性分类)"""
+        fangyu_states = self._value_states(data, 'fangyu')
+        speed_states = self._value_states(data, 'speed')
+        shanghai = self._numeric_column(data, 'shanghai')
+        shanghai_low = (shanghai < 20).tolist()
+        addon_classes = self._classify_addon_rows(data)
+        return list(zip(fangyu_states, speed_states, shanghai_low, addon_classes))
+
+    @staticmethod
+    def _numeric_column(data: pd.DataFrame, column: str) -> np.ndarray:
+        """数值列（缺失列、非数值为NaN）"""
+        if column not in data.columns:
+            return np.full(len(data), np.nan)
+        return pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=float)
+
+    def _value_states(self, data: pd.DataFrame, column: str) -> List[str]:
+        """数值状态：pos（>0）、zero（==0）、other（负数或缺失）"""
+        values = self._numeric_column(data, column)
+        return np.where(values > 0, 'pos', np.where(values == 0, 'zero', 'other')).tolist()
+
+    def _classify_addon_rows(self, data: pd.DataFrame) -> List[str]:
+        """逐行附加属性分类（相同属性组合只分类一次，缺失值视为没有该属性）"""
+        columns = [np.nan_to_num(self._numeric_column(data, column), nan=0.0) for column in ADDON_ATTR_COLUMNS]
+        classifications = {}
+        result = []
+        for values in zip(*columns):
+            classification = classifications.get(values)
+            if classification is None:
+                classification = classifications[values] = self._classify_addon_attributes(*values)
+            result.append(classification)
+        return result
+
+    def _select_partition_keys(self, fangyu: int = 0, speed: int = 0, shanghai: int = 0,
+                               addon_classes: Optional[List[str]] = None) -> List[Hashable]:
+        """
+        满足类型和属性条件的分区键（与 _filter_cached_data_by_attrs 的条件一致）
+
+        Args:
+            fangyu: 防御值 >0 即铠甲
+            speed: 速度值 >0 即项圈
+            shanghai: 伤害值，==0 则只能匹配shanghai小于20的
+            addon_classes: 允许的附加属性分类，为None时不限制
+
+        Returns:
+            List[Hashable]: 分区键列表
+        """
+        keys = []
+        for key in self._pet_equip_partitions.keys():
+            fangyu_state, speed_state, shanghai_low, addon_class = key
+            if shanghai == 0 and not shanghai_low:
+                continue
+            if fangyu > 0:
+                # 铠甲类型：要求有防御值
+                matched = fangyu_state == 'pos'
+            elif speed > 0:
+                # 项圈类型：要求有速度值
+                matched = speed_state == 'pos'
+            else:
+                # 护腕类型：既没有防御也没有速度
+                matched = fangyu_state == 'zero' and speed_state == 'zero'
+            if matched and (addon_classes is None or addon_class in addon_classes):
+                keys.append(key)
+        return keys
+
+    def _get_shared_cache_data(self, fangyu: int = 0, speed: int = 0, shanghai: int = 0,
+                               addon_classes: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
         """
         从装备数据采集器获取共享缓存数据，优先使用实例缓存
         
@@ -74,6 +233,7 @@ class PetEquipMarketDataCollector:
             fangyu: 防御值筛选 >0 即铠甲
             speed: 速度值筛选 >0 即项圈
             shanghai: 伤害值筛选，==0 则只能匹配shanghai小于20的
+            addon_classes: 允许的附加属性分类，为None时不限制
             
         Returns:
             过滤后的宠物装备数据DataFrame，如果缓存不可用则返回None
@@ -83,46 +243,33 @@ class PetEquipMarketDataCollector:
             
         try:
             # 检查实例缓存是否有效
-            if self._cached_pet_equip_data is not None:
-                print(f" 使用实例缓存的宠物装备数据，共 {len(self._cached_pet_equip_data)} 条")
-                
-                # 根据属性值进一步过滤
-                filtered_data = self._filter_cached_data_by_attrs(
-                    self._cached_pet_equip_data, fangyu, speed, shanghai
-                )
-                if not filtered_data.empty:
-                    print(f" 按属性过滤后得到 {len(filtered_data)} 条宠物装备数据")
-                    return filtered_data
-                else:
-                    print(f"实例缓存中没有找到符合条件的宠物装备数据")
+            if self._pet_equip_partitions is not None:
+                print(f" 使用实例缓存的宠物装备数据，共 {len(self._pet_equip_partitions)} 条")
+            else:
+                # 实例缓存为空，从装备数据采集器获取全量缓存
+                full_data = self.equip_collector._get_full_data_from_redis()
+
+                if full_data is None or full_data.empty:
+                    print("装备数据采集器缓存为空，无法共享")
                     return None
-            
-            # 实例缓存为空，从装备数据采集器获取全量缓存
-            full_data = self.equip_collector._get_full_data_from_redis()
-            
-            if full_data is None or full_data.empty:
-                print("装备数据采集器缓存为空，无法共享")
-                return None
-            
-            # 过滤出宠物装备数据 (kindid: PET_EQUIP_KINDID) 并保存到实例缓存
-            self._cached_pet_equip_data = full_data[full_data['kindid'] == PET_EQUIP_KINDID].copy()
-            self._cache_timestamp = datetime.now()
-            
-            if not self._cached_pet_equip_data.empty:
-                print(f" 从装备数据采集器获取并缓存 {len(self._cached_pet_equip_data)} 条宠物装备数据")
-                
-                # 根据属性值进一步过滤
-                filtered_data = self._filter_cached_data_by_attrs(
-                    self._cached_pet_equip_data, fangyu, speed, shanghai
-                )
-                if not filtered_data.empty:
-                    print(f" 按属性过滤后得到 {len(filtered_data)} 条宠物装备数据")
-                    return filtered_data
-                else:
-                    print(f"缓存中没有找到符合条件的宠物装备数据")
+
+                # 过滤出宠物装备数据 (kindid: PET_EQUIP_KINDID)，按类型和附加属性分类分区后保存到实例缓存
+                pet_equip_data = full_data[full_data['kindid'] == PET_EQUIP_KINDID]
+                if pet_equip_data.empty:
+                    print("装备数据采集器缓存中没有找到宠物装备数据")
                     return None
+                self._set_pet_equip_partitions(PartitionedFrame(pet_equip_data, self._pet_equip_partition_keys))
+                print(f" 从装备数据采集器获取并缓存 {len(self._cached_pet_equip_data)} 条宠物装备数据，"
+                      f"共 {len(self._pet_equip_partitions.partitions)} 个分区")
+
+            # 根据属性值取对应分区
+            filtered_data = self._pet_equip_partitions.rows(
+                self._select_partition_keys(fangyu, speed, shanghai, addon_classes))
+            if not filtered_data.empty:
+                print(f" 按属性过滤后得到 {len(filtered_data)} 条宠物装备数据")
+                return filtered_data
             else:
-                print("装备数据采集器缓存中没有找到宠物装备数据")
+                print(f"实例缓存中没有找到符合条件的宠物装备数据")
                 return None
                 
         except Exception as e:
@@ -168,8 +315,7 @@ class PetEquipMarketDataCollector:
 
     def clear_cache(self):
         """清除实例缓存，强制下次重新从装备数据采集器获取数据"""
-        self._cached_pet_equip_data = None
-        self._cache_timestamp = None
+        self._set_pet_equip_partitions(None)
         print(" 已清除宠物装备数据实例缓存")
 
     def get_market_data(self,
@@ -181,7 +327,8 @@ class PetEquipMarketDataCollector:
                         speed: Optional[int] = 0,
                         shanghai: Optional[int] = 0,
                         limit: int = 1000,
-                        use_shared_cache: bool = True) -> pd.DataFrame:
+                        use_shared_cache: bool = True,
+                        addon_classes: Optional[List[str]] = None) -> pd.DataFrame:
         """
         获取市场召唤兽装备数据，优先从装备数据采集器的共享缓存获取数据
 
@@ -198,6 +345,7 @@ class PetEquipMarketDataCollector:
                 shanghai==0 则 只能匹配shanghai小于20的    
             limit: 返回数据条数限制
             use_shared_cache: 是否使用共享缓存
+            addon_classes: 允许的附加属性分类（只用于共享缓存分区，MySQL降级查询不做此过滤）
 
         Returns:
             召唤兽装备市场数据DataFrame
@@ -208,7 +356,7 @@ class PetEquipMarketDataCollector:
             
             # 优先从共享缓存获取数据
             if use_shared_cache:
-                cached_data = self._get_shared_cache_data(fangyu, speed, shanghai)
+                cached_data = self._get_shared_cache_data(fangyu, speed, shanghai, addon_classes)
                 
                 if cached_data is not None and not cached_data.empty:
                     # 对缓存数据进行进一步筛选
@@ -375,13 +523,18 @@ class PetEquipMarketDataCollector:
             print(f"SQL执行异常: {e}")
             return pd.DataFrame()
 
-    def get_market_data_for_similarity(self, target_features: Dict[str, Any]) -> pd.DataFrame:
+    def get_market_data_for_similarity(self, target_features: Dict[str, Any],
+                                       addon_classes: Optional[List[str]] = None) -> pd.DataFrame:
         """
         根据目标特征获取用于相似度计算的市场数据（先类型分类）
+
+        Args:
+            target_features: 目标召唤兽装备特征
+            addon_classes: 允许的附加属性分类，为None时不限制
         """
     
         print(f"目标特征equip_level_range: {target_features.get('equip_level_range')}")
-        market_data = self.get_market_data_with_business_rules(target_features)
+        market_data = self.get_market_data_with_business_rules(target_features, addon_classes=addon_classes)
    
         if market_data.empty:
             return market_data
@@ -409,12 +562,7 @@ class PetEquipMarketDataCollector:
         先类型分类，再做附加属性分类过滤
         """
         try:
-            # 先类型分类
-            market_data = self.get_market_data_for_similarity(target_features)
-            if market_data.empty:
-                return market_data
-            
-            # 再物理、法术分类
+            # 物理、法术分类
             # shanghai>20忽略lingli、addon_fali 
             target_shanghai = target_features.get('shanghai', 0)
             
@@ -429,34 +577,25 @@ class PetEquipMarketDataCollector:
             else:
                 print(f"法术系装备: shanghai={target_shanghai} <= 20，保留法力和灵力属性")
 
-            # 再做附加属性分类过滤（原有逻辑）
             target_classification = self._get_target_addon_classification(classification_features)
             print(f"目标召唤兽装备属性分类: {target_classification}")
             print(f"classification_features: {classification_features}")
-            market_data['addon_classification'] = market_data.apply(
-                lambda row: self._classify_addon_attributes(
-                    row.get('addon_fali', 0),
-                    row.get('addon_lingli', 0),
-                    row.get('addon_liliang', 0),
-                    row.get('addon_minjie', 0),
-                    row.get('addon_naili', 0),
-                    row.get('addon_tizhi', 0)
-                ), axis=1
-            )
+            target_group = None
             if target_classification != "无属性":
-                # 定义同类属性分组（原有逻辑）
-                classification_groups = {
-                    "法力系": ["法力", "法灵", "法敏", "法耐", "法体", "力法","灵力", "灵敏", "灵耐", "灵体", "力灵"],
-                    "力量系": ["力量", "力敏", "力耐", "力体" ],
-                    "敏捷系": ["敏捷", "敏耐", "敏体"],
-                    "耐力系": ["耐力", "耐体"],
-                    "体质系": ["体质"]
-                }
-                target_group = None
-                for group_name, classifications in classification_groups.items():
+                for group_name, classifications in ADDON_CLASSIFICATION_GROUPS.items():
                     if target_classification in classifications:
                         target_group = classifications
                         break
+
+            # 先类型分类（共享缓存按附加属性分类分区，同类属性直接取对应分区）
+            addon_classes = target_group + ["无属性"] if target_group else None
+            market_data = self.get_market_data_for_similarity(target_features, addon_classes=addon_classes)
+            if market_data.empty:
+                return market_data
+
+            # 再做附加属性分类过滤（MySQL降级查询的数据在这里过滤）
+            market_data['addon_classification'] = self._classify_addon_rows(market_data)
+            if target_classification != "无属性":
                 if target_group:
                     before_filter_count = len(market_data)
                     market_data = market_data[
@@ -503,7 +642,8 @@ class PetEquipMarketDataCollector:
             fangyu=fangyu,
             speed=speed,
             shanghai=shanghai,
-            limit=2000
+            limit=2000,
+            addon_classes=kwargs.get('addon_classes')
         )
         if market_data.empty:
             return market_data
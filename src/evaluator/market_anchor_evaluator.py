@@ -22,10 +22,16 @@ from .utils.base_valuator import BaseValuator
 
 warnings.filterwarnings('ignore')
 
+# 向量化相似度计算中视为数值的类型
+_NUMERIC_TYPES = (int, float, np.integer, np.floating, np.bool_)
+
 
 class MarketAnchorEvaluator(BaseValuator):
     """市场锚定估价器 - 基于市场相似角色的价格锚定估价"""
     
+    # 人物修炼特征（攻击、防御、法术、抗法、猎术）
+    CULTIVATION_FIELDS = ('expt_ski1', 'expt_ski2', 'expt_ski3', 'expt_ski4', 'expt_ski5')
+    
     def __init__(self, market_data_collector: Optional[MarketDataCollector] = None):
         super().__init__()
         """
@@ -143,6 +149,9 @@ class MarketAnchorEvaluator(BaseValuator):
             'gender': 0.1,
         }
         
+        # 列式相似度模式：候选角色堆叠为数值特征矩阵一次性计算（False时使用逐行标量计算）
+        self.vectorized_similarity = True
+        
         print("市场锚定估价器初始化完成")
     
     def find_market_anchors(self, 
@@ -175,43 +184,13 @@ class MarketAnchorEvaluator(BaseValuator):
             if market_data.empty:
                 return []
             # 计算所有市场角色的相似度
-            anchor_candidates = []
-            error_count = 0
-            
-            for i, (index_eid, market_row) in enumerate(market_data.iterrows()):
-                try:
-                    # 从行数据中获取真正的eid（优先从列中获取，如果没有则使用index）
-                    # 因为eid被设置为index后，可能不再是列，但index的值就是真正的eid
-                    eid = market_row.get('eid') if 'eid' in market_row.index else index_eid
-                    
-                    # 计算相似度 - 确保数据类型转换
-                    market_dict = self._convert_pandas_row_to_dict(market_row)    
-                    
-                    similarity = self._calculate_similarity(target_features, market_dict, verbose=verbose and i < 3)
-                    
-                    if similarity >= similarity_threshold:
-                        anchor_candidates.append({
-                            'eid': eid,  # 使用真正的eid（从列或index获取）
-                            'similarity': round(float(similarity), 3),
-                            'price': float(market_row.get('price', 0)),
-                            'features': market_dict
-                        })
-                        
-                except Exception as e:
-                    self.logger.error(f"处理角色 {eid} 时出错")
-                    error_count += 1
-                    continue
-            
-            # 输出处理统计
-            processed_count = len(market_data)
-            success_count = processed_count - error_count
-            if error_count > 0:
-                self.logger.warning(f"数据处理统计: 总数={processed_count}, 成功={success_count}, 失败={error_count}")
-            
-            # 按相似度排序
-            anchor_candidates.sort(key=lambda x: x['similarity'], reverse=True)
-            # 返回前N个锚点
-            anchors = anchor_candidates[:max_anchors]
+            if self.vectorized_similarity:
+                # 列式相似度：所有候选一次性计算
+                anchors = self._find_anchors_vectorized(
+                    target_features, market_data, similarity_threshold, max_anchors, verbose)
+            else:
+                anchors = self._find_anchors_by_rows(
+                    target_features, market_data, similarity_threshold, max_anchors, verbose)
             
             print(f"找到 {len(anchors)} 个市场锚点角色")
             if anchors:
@@ -224,6 +203,239 @@ class MarketAnchorEvaluator(BaseValuator):
             self.logger.error(f"寻找市场锚点失败: {e}")
             return []
     
+    def _find_anchors_by_rows(self,
+                              target_features: Dict[str, Any],
+                              market_data: pd.DataFrame,
+                              similarity_threshold: float,
+                              max_anchors: int,
+                              verbose: bool) -> List[Dict[str, Any]]:
+        """
+        逐行标量计算相似度并选出锚点（vectorized_similarity为False时使用）
+        
+        Returns:
+            List[Dict[str, Any]]: 按相似度降序的锚点（最多max_anchors个）
+        """
+        anchor_candidates = []
+        error_count = 0
+        
+        for i, (index_eid, market_row) in enumerate(market_data.iterrows()):
+            try:
+                # 从行数据中获取真正的eid（优先从列中获取，如果没有则使用index）
+                # 因为eid被设置为index后，可能不再是列，但index的值就是真正的eid
+                eid = market_row.get('eid') if 'eid' in market_row.index else index_eid
+                
+                # 计算相似度 - 确保数据类型转换
+                market_dict = self._convert_pandas_row_to_dict(market_row)    
+                
+                similarity = self._calculate_similarity(target_features, market_dict, verbose=verbose and i < 3)
+                
+                if similarity >= similarity_threshold:
+                    anchor_candidates.append({
+                        'eid': eid,  # 使用真正的eid（从列或index获取）
+                        'similarity': round(float(similarity), 3),
+                        'price': float(market_row.get('price', 0)),
+                        'features': market_dict
+                    })
+                    
+            except Exception as e:
+                self.logger.error(f"处理角色 {eid} 时出错")
+                error_count += 1
+                continue
+        
+        # 输出处理统计
+        processed_count = len(market_data)
+        success_count = processed_count - error_count
+        if error_count > 0:
+            self.logger.warning(f"数据处理统计: 总数={processed_count}, 成功={success_count}, 失败={error_count}")
+        
+        # 按相似度排序
+        anchor_candidates.sort(key=lambda x: x['similarity'], reverse=True)
+        # 返回前N个锚点
+        return anchor_candidates[:max_anchors]
+    
+    def _find_anchors_vectorized(self,
+                                 target_features: Dict[str, Any],
+                                 market_data: pd.DataFrame,
+                                 similarity_threshold: float,
+                                 max_anchors: int,
+                                 verbose: bool) -> List[Dict[str, Any]]:
+        """
+        列式计算所有候选角色的相似度并选出锚点
+        
+        相似度在特征矩阵上一次性计算，阈值过滤后用argpartition取前max_anchors个，
+        只为选中的锚点转换特征字典。
+        
+        Returns:
+            List[Dict[str, Any]]: 按相似度降序的锚点（最多max_anchors个）
+        """
+        prepared = self._prepare_market_matrix(market_data)
+        
+        if verbose:
+            # 详细调试日志只输出前3个候选（与逐行计算一致）
+            for i in range(min(3, len(market_data))):
+                self._calculate_similarity(
+                    target_features, self._convert_pandas_row_to_dict(market_data.iloc[i]), verbose=True)
+        
+        similarities = self._calculate_similarity_vectorized(target_features, prepared)
+        
+        eids = prepared['eids']
+        prices = prepared['prices']
+        anchors = []
+        for i in self._select_top_anchors(similarities, similarity_threshold, max_anchors):
+            anchors.append({
+                'eid': eids[i],  # 使用真正的eid（从列或index获取）
+                'similarity': round(float(similarities[i]), 3),
+                'price': float(prices[i]),
+                'features': self._convert_pandas_row_to_dict(market_data.iloc[i])
+            })
+        return anchors
+    
+    def _prepare_market_matrix(self, market_data: pd.DataFrame) -> Dict[str, Any]:
+        """
+        把候选角色的相似度特征堆叠为数值矩阵，并按列完成修炼智能匹配调整
+        
+        Args:
+            market_data: 预过滤后的市场数据
+            
+        Returns:
+            Dict[str, Any]: feature_names（矩阵列对应的特征）、matrix（候选数×特征数的float矩阵）、
+                present（市场数据中存在的特征列）、scalar_mask（含非数值特征、需逐行标量计算的候选）、
+                eids、prices、market_data
+        """
+        count = len(market_data)
+        feature_names = list(self.relative_tolerances)
+        matrix = np.zeros((count, len(feature_names)))
+        present = np.zeros(len(feature_names), dtype=bool)
+        scalar_mask = np.zeros(count, dtype=bool)
+        
+        # 缺失的特征列按0处理；字符串等非数值的行走标量计算（与原逐行逻辑一致）
+        for j, feature_name in enumerate(feature_names):
+            if feature_name not in market_data.columns:
+                continue
+            values, numeric = self._to_float_array(market_data[feature_name])
+            matrix[:, j] = values
+            present[j] = True
+            scalar_mask |= ~numeric
+        
+        # 修炼特征调整后总是存在，与_adjust_cultivation_features一致
+        self._adjust_cultivation_matrix(matrix, feature_names)
+        for j, feature_name in enumerate(feature_names):
+            if feature_name in self.CULTIVATION_FIELDS:
+                present[j] = True
+        
+        # 优先从eid列获取，没有则使用index（eid被设置为index的情况）
+        if 'eid' in market_data.columns:
+            eids = market_data['eid'].tolist()
+        else:
+            eids = market_data.index.tolist()
+        prices = self._to_float_array(market_data['price'])[0] \
+            if 'price' in market_data.columns else np.zeros(count)
+        
+        return {
+            'feature_names': feature_names,
+            'matrix': matrix,
+            'present': present,
+            'scalar_mask': scalar_mask,
+            'eids': eids,
+            'prices': prices,
+            'market_data': market_data,
+        }
+    
+    @staticmethod
+    def _to_float_array(column: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        把一列转为float数组
+        
+        Returns:
+            Tuple[float数组, 数值掩码（字符串等非数值为False，对应位置为NaN）]，None按0处理
+        """
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in 'biuf':
+            return column.to_numpy(dtype=float), np.ones(len(column), dtype=bool)
+        raw = column.to_numpy(dtype=object)
+        numeric = np.fromiter((value is None or isinstance(value, _NUMERIC_TYPES) for value in raw),
+                              dtype=bool, count=len(raw))
+        values = np.full(len(raw), np.nan)
+        if numeric.any():
+            values[numeric] = [0.0 if value is None else float(value) for value in raw[numeric]]
+        return values, numeric
+    
+    def _adjust_cultivation_matrix(self, matrix: np.ndarray, feature_names: List[str]) -> None:
+        """
+        按列调整修炼特征（原地修改），与_adjust_cultivation_features逐行调整的结果一致
+        
+        攻击修炼列取两者最大值作为主修炼，法术修炼列取最小值作为副修炼。
+        """
+        attack = feature_names.index('expt_ski1')
+        magic = feature_names.index('expt_ski3')
+        expt_ski1 = matrix[:, attack].copy()
+        expt_ski3 = matrix[:, magic].copy()
+        # 与内置max/min一致：相等或含NaN时保留攻击修炼的值
+        matrix[:, attack] = np.where(expt_ski3 > expt_ski1, expt_ski3, expt_ski1)
+        matrix[:, magic] = np.where(expt_ski3 < expt_ski1, expt_ski3, expt_ski1)
+    
+    def _calculate_similarity_vectorized(self,
+                                         target_features: Dict[str, Any],
+                                         prepared: Dict[str, Any]) -> np.ndarray:
+        """
+        在特征矩阵上计算目标角色与所有候选的相似度 - 与 _calculate_similarity 结果一致
+        
+        Args:
+            target_features: 目标角色特征
+            prepared: 候选侧预处理结果（_prepare_market_matrix）
+            
+        Returns:
+            np.ndarray: 每个候选的相似度分数（0-1）
+        """
+        market_data = prepared['market_data']
+        count = len(market_data)
+        if not isinstance(target_features, dict):
+            self.logger.warning("特征数据格式错误，使用默认相似度")
+            return np.zeros(count)
+        
+        feature_names = prepared['feature_names']
+        target_adjusted = self._adjust_cultivation_features(target_features)
+        target_values = [target_adjusted.get(name, 0) for name in feature_names]
+        target_values = [0 if value is None else value for value in target_values]
+        if not all(isinstance(value, _NUMERIC_TYPES) for value in target_values):
+            # 目标含非数值特征时逐行计算
+            return np.array([
+                self._calculate_similarity(target_features, self._convert_pandas_row_to_dict(market_data.iloc[i]))
+                for i in range(count)
+            ], dtype=float)
+        
+        # 目标和市场数据中都不存在的特征、权重为0的特征不参与计算
+        weights = np.array([self.feature_weights.get(name, 0.5) for name in feature_names], dtype=float)
+        active = (prepared['present'] | np.array([name in target_adjusted for name in feature_names])) & (weights != 0)
+        
+        market_vals = prepared['matrix'][:, active]
+        target_vals = np.array(target_values, dtype=float)[active]
+        tolerances = np.array([self.relative_tolerances[name] for name in feature_names], dtype=float)[active]
+        weights = weights[active]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diff_ratio = np.abs(target_vals - market_vals) / np.maximum(np.abs(target_vals), np.abs(market_vals))
+            # 超出容忍度但在2倍范围内，线性递减
+            decayed = np.maximum(0, 1.0 - (diff_ratio - tolerances) / np.maximum(tolerances, 0.1))
+            feature_similarity = np.where(
+                diff_ratio <= tolerances, 1.0,
+                np.where(diff_ratio <= tolerances * 2, decayed, 0.0))
+        # 两者都为0完全匹配；一个为0一个不为0给予部分相似度
+        market_zero = market_vals == 0
+        target_zero = target_vals == 0
+        feature_similarity = np.where(market_zero | target_zero,
+                                      np.where(market_zero & target_zero, 1.0, 0.1), feature_similarity)
+        # 容忍度为0表示必须完全一致
+        feature_similarity = np.where(tolerances == 0, (market_vals == target_vals).astype(float), feature_similarity)
+        
+        total_weight = weights.sum()
+        similarities = feature_similarity @ weights / total_weight if total_weight > 0 else np.zeros(count)
+        
+        # 含非数值特征的候选逐行计算
+        for i in np.flatnonzero(prepared['scalar_mask']):
+            similarities[i] = self._calculate_similarity(
+                target_features, self._convert_pandas_row_to_dict(market_data.iloc[i]))
+        return similarities
+    
     def _build_pre_filters(self, target_features: Dict[str, Any]) -> Dict[str, Any]:
         """
         根据目标特征构建预过滤条件，减少计算量
@@ -418,8 +630,7 @@ class MarketAnchorEvaluator(BaseValuator):
             adjusted_features = features.copy()
             
             # 记录原始输入数据（只在有问题时记录）
-            cultivation_fields = ['expt_ski1', 'expt_ski2', 'expt_ski3', 'expt_ski4', 'expt_ski5']
-            original_cultivation = {field: features.get(field) for field in cultivation_fields}
+            original_cultivation = {field: features.get(field) for field in self.CULTIVATION_FIELDS}
             
             # 获取修炼相关数值
             expt_ski1 = features.get('expt_ski1', 0)  # 攻击修炼（物理门派主修）
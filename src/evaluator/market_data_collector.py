@@ -1,6 +1,8 @@
 import sys
 import os
 import threading
+import collections
+import multiprocessing
 import concurrent.futures
 
 # 添加项目根目录到Python路径，解决模块导入问题
@@ -14,6 +16,7 @@ import json
 import logging
 import time
 import hashlib
+import tempfile
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime, timedelta
 from flask import current_app
@@ -23,12 +26,92 @@ try:
 except ImportError:
     from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
 
+try:
+    from .utils.columnar_store import ColumnarFeatureStore
+    from .utils.shared_frame_store import get_shared_frame_store
+except ImportError:
+    from src.evaluator.utils.columnar_store import ColumnarFeatureStore
+    from src.evaluator.utils.shared_frame_store import get_shared_frame_store
+
+
+# 全量加载的SQL（按价格排序，不分页，由服务端游标流式读取）
+MARKET_DATA_STREAM_QUERY = """
+    SELECT 
+        c.eid, c.serverid, c.level, c.school, c.price, c.collect_num,
+        c.yushoushu_skill, c.school_skills, c.life_skills,
+        l.sum_exp, l.three_fly_lv, l.all_new_point, l.jiyuan_amount, 
+        l.packet_page, l.xianyu_amount, l.sum_amount,
+        l.expt_ski1, l.expt_ski2, l.expt_ski3, l.expt_ski4, l.expt_ski5,
+        l.beast_ski1, l.beast_ski2, l.beast_ski3, l.beast_ski4,
+        l.changesch_json, l.ex_avt_json, l.huge_horse_json, l.shenqi_json,
+        l.all_equip_json, l.all_summon_json, l.all_rider_json,
+        c.update_time AS role_update_time, l.update_time AS desc_update_time
+    FROM roles c
+    LEFT JOIN large_equip_desc_data l ON c.eid = l.eid
+    WHERE c.role_type = 'empty' AND c.price > 0
+    ORDER BY c.price ASC
+"""
+
+# 角色特征缓存中记录数据版本（角色和详细数据的update_time）的列
+FEATURE_CACHE_KEY_COLUMN = '_feature_key'
+
+# 特征提取子进程中的特征提取器（每个子进程初始化一次）
+_worker_feature_extractor = None
+
+
+def extract_role_features(feature_extractor, rows: List, columns: List[str],
+                          logger: Optional[logging.Logger] = None) -> List[Dict]:
+    """
+    对一块查询结果提取角色特征
+    
+    Args:
+        feature_extractor: 特征提取器
+        rows: 查询结果行（元组）
+        columns: 列名列表
+        logger: 日志器
+        
+    Returns:
+        List[Dict]: 特征字典列表（提取失败的行被跳过）
+    """
+    logger = logger or logging.getLogger(__name__)
+    features_list = []
+    for i, row in enumerate(rows):
+        role_data = dict(zip(columns, row))
+        try:
+            features = feature_extractor.extract_features(role_data)
+            
+            # 添加基本信息
+            features.update({
+                'eid': role_data.get('eid', ''),
+                'price': role_data.get('price', 0),
+                'school': role_data.get('school', 0),
+                'serverid': role_data.get('serverid', 0)
+            })
+            features_list.append(features)
+        except Exception as e:
+            logger.warning(f"处理第{i+1}条数据({role_data.get('eid', '')})时出错: {e}")
+    return features_list
+
+
+def _init_feature_worker():
+    """特征提取子进程初始化"""
+    global _worker_feature_extractor
+    _worker_feature_extractor = FeatureExtractor()
+
+
+def _extract_role_features_in_worker(rows: List, columns: List[str]) -> List[Dict]:
+    """在子进程中提取一块数据的特征"""
+    return extract_role_features(_worker_feature_extractor, rows, columns)
+
 
 class MarketDataCollector:
     """市场数据采集器 - 从MySQL数据库获取空角色数据作为锚点，支持单例模式的数据缓存共享"""
     
     _instance = None  # 单例实例
     _lock = threading.Lock()  # 线程锁，确保线程安全
+    _engine_lock = threading.Lock()  # 数据库引擎创建锁
+    _shared_store = None  # 多进程共享缓存（未启用时为None）
+    _shared_generation = None  # 已挂载的共享缓存版本
     
     def __new__(cls):
         """单例模式实现"""
@@ -79,7 +162,19 @@ class MarketDataCollector:
         # MySQL数据统计
         self.mysql_data_count = 0  # MySQL中roles表的总记录数
         
+        # 全量加载：复用的数据库引擎，特征提取子进程数（0表示在当前进程中提取）
+        self._stream_engine = None
+        self.feature_workers = min(4, os.cpu_count() or 1)
+        
+        # 角色特征缓存文件：按(eid, update_time, 提取器配置版本)复用上次提取的特征，为None时不使用
+        self.feature_cache_path = os.path.join(project_root, 'data', 'cache', 'role_features.pkl')
+        
+        # 多进程部署：市场数据由写入进程发布到共享内存，其他进程只读挂载（未启用时为None）
+        self._shared_store = get_shared_frame_store('role_market')
+        self._shared_generation = None
+        
         self._initialized = True
+        self._warm_up_shared_cache()
         print("市场数据采集器单例初始化完成，默认获取空角色数据作为锚点")
         print("💾 缓存策略: 数据永不过期，只能通过force_refresh=True或手动刷新更新")
     
@@ -279,16 +374,16 @@ class MarketDataCollector:
                        max_records: int = 99999,
                        use_cache: bool = True,
                        force_refresh: bool = False,
-                       batch_size: int = 200) -> pd.DataFrame:
+                       batch_size: int = 2000) -> pd.DataFrame:
         """
-        刷新市场数据 - 优先从Redis全量缓存获取，支持筛选、分页和详细进度跟踪
+        刷新市场数据 - 优先从Redis全量缓存获取，支持筛选和详细进度跟踪
         
         Args:
             filters: 筛选条件字典，例如 {'level_min': 109, 'price_max': 10000}
             max_records: 最大记录数
             use_cache: 是否使用缓存
             force_refresh: 是否强制刷新全量缓存
-            batch_size: 批次大小（仅在从数据库加载时使用，建议100-800之间）
+            batch_size: 流式读取的块大小（仅在从数据库加载时使用）
             
         Returns:
             pd.DataFrame: 处理后的市场数据
@@ -343,191 +438,82 @@ class MarketDataCollector:
                     self._refresh_message = "缓存未命中，准备从数据库加载..."
                     self._refresh_progress = 10
             
-            self._refresh_message = "从数据库加载全量数据..."
-            self._refresh_progress = 15
+            from sqlalchemy import text
             
-            # 导入MySQL连接相关模块
-            from sqlalchemy import create_engine, text
-            from src.app import create_app
+            self._refresh_message = "连接数据库..."
+            self._refresh_progress = 20
             
-            # 创建Flask应用上下文获取数据库配置
-            app = create_app()
+            # 复用数据库引擎（不再为每次刷新创建Flask应用和连接池）
+            engine = self._get_stream_engine()
             
-            with app.app_context():
-                # 获取数据库配置
-                db_config = app.config.get('SQLALCHEMY_DATABASE_URI')
-                if not db_config:
-                    raise ValueError("未找到数据库配置")
-                
-                self._refresh_message = "连接数据库..."
-                self._refresh_progress = 20
-                print(f"连接MySQL数据库: {db_config}")
-                
-                # 创建优化的数据库连接 - 使用连接池
-                connection_config = self._get_optimized_connection_config(db_config)
-                engine = create_engine(db_config, **connection_config)
-                
-                
-                self._refresh_message = "分析数据量..."
-                self._refresh_progress = 25
-                
-                # 首先获取总记录数
-                count_query = """
-                    SELECT COUNT(*) as total_count
-                    FROM roles c
-                    WHERE c.role_type = 'empty' AND c.price > 0
-                """
-                
-                with engine.connect() as conn:
-                    count_result = conn.execute(text(count_query))
-                    total_count = count_result.fetchone()[0]
-                
-                print(f"总记录数: {total_count}")
+            self._refresh_message = "分析数据量..."
+            self._refresh_progress = 25
+            
+            # 总记录数只用于预分配列式存储和进度显示
+            count_query = """
+                SELECT COUNT(*) as total_count
+                FROM roles c
+                WHERE c.role_type = 'empty' AND c.price > 0
+            """
+            
+            with engine.connect() as conn:
+                total_count = conn.execute(text(count_query)).scalar() or 0
+            
+            print(f"总记录数: {total_count}")
+            
+            full_data_df = self._stream_load_market_data(engine, total_count, batch_size)
+            
+            if not full_data_df.empty:
+                elapsed_time = time.time() - start_time
+                print(f"全量市场数据加载完成，共 {len(full_data_df)} 条有效数据，耗时: {elapsed_time:.2f}秒")
+                print(f"数据特征维度: {len(full_data_df.columns)}")
+                print(f"价格范围: {full_data_df['price'].min():.1f} - {full_data_df['price'].max():.1f}")
                 
-                # 动态调整批次大小（优化查询性能，减少单次查询时间）
-                # 考虑复杂SQL查询（LEFT JOIN + 大量字段），使用更小的批次大小
-                if total_count > 50000:
-                    actual_batch_size = min(batch_size, 300)   # 大数据集：小批次避免查询超时和内存溢出
-                elif total_count > 20000:
-                    actual_batch_size = min(batch_size, 500)   # 中等数据集：适中批次
-                elif total_count > 5000:
-                    actual_batch_size = min(batch_size, 800)   # 中小数据集：较大批次
+                # 缓存全量数据到Redis
+                if use_cache:
+                    self._refresh_message = "缓存数据到Redis..."
+                    self._refresh_progress = 95
+                    
+                    cache_start = time.time()
+                    if self._set_full_cached_data(full_data_df):
+                        cache_time = time.time() - cache_start
+                        print(f" 全量数据已缓存到Redis，缓存耗时: {cache_time:.2f}秒")
+                    else:
+                        print(" Redis全量缓存设置失败，但数据获取成功")
                 else:
-                    actual_batch_size = min(batch_size, 300)   # 小数据集：小批次保证快速响应
-                
-                total_batches = (total_count + actual_batch_size - 1) // actual_batch_size
+                    print(" 跳过Redis缓存存储，use_cache=False")
                 
-                # 更新进度跟踪信息
-                self._refresh_total_records = total_count
-                self._refresh_total_batches = total_batches
-                self._refresh_message = f"准备分批处理: {total_batches} 批，每批 {actual_batch_size} 条"
-                self._refresh_progress = 30
+                # 应用筛选条件并返回结果
+                self._refresh_message = "应用筛选条件..."
+                self._refresh_progress = 98
                 
-                print(f"将分 {total_batches} 批处理，每批 {actual_batch_size} 条")
+                filtered_data = self._apply_filters(full_data_df, filters, max_records)
+                self.market_data = filtered_data
                 
-                # 优化的SQL查询 - 只选择必要字段，减少数据传输
-                base_query = """
-                    SELECT 
-                        c.eid, c.serverid, c.level, c.school, c.price, c.collect_num,
-                        c.yushoushu_skill, c.school_skills, c.life_skills,
-                        l.sum_exp, l.three_fly_lv, l.all_new_point, l.jiyuan_amount, 
-                        l.packet_page, l.xianyu_amount, l.sum_amount,
-                        l.expt_ski1, l.expt_ski2, l.expt_ski3, l.expt_ski4, l.expt_ski5,
-                        l.beast_ski1, l.beast_ski2, l.beast_ski3, l.beast_ski4,
-                        l.changesch_json, l.ex_avt_json, l.huge_horse_json, l.shenqi_json,
-                        l.all_equip_json, l.all_summon_json, l.all_rider_json
-                    FROM roles c
-                    LEFT JOIN large_equip_desc_data l ON c.eid = l.eid
-                    WHERE c.role_type = 'empty' AND c.price > 0
-                    ORDER BY c.price ASC
-                    LIMIT {batch_size} OFFSET {offset}
-                """
+                # 更新缓存状态
+                self._data_loaded = True
+                self._last_refresh_time = datetime.now()
                 
-                # 分批处理数据
-                full_market_data = []
-                processed_count = 0
+                # 完成进度跟踪
+                self._refresh_status = "completed"
+                self._refresh_progress = 100
+                self._refresh_message = "数据刷新完成！"
+                self._refresh_processed_records = len(filtered_data)
                 
-                with engine.connect() as conn:
-                    for batch_num in range(total_batches):
-                        offset = batch_num * actual_batch_size
-                        current_batch_query = base_query.format(batch_size=actual_batch_size, offset=offset)
-                        
-                        # 更新当前批次进度
-                        self._refresh_current_batch = batch_num + 1
-                        batch_progress = 30 + int(((batch_num + 1) / total_batches) * 60)  # 30-90%的进度范围
-                        self._refresh_progress = min(batch_progress, 90)
-                        self._refresh_message = f"处理第 {batch_num + 1}/{total_batches} 批数据..."
-                        
-                        print(f"处理第 {batch_num + 1}/{total_batches} 批，偏移量: {offset}")
-                        
-                        try:
-                            # 执行批次查询
-                            batch_result = conn.execute(text(current_batch_query))
-                            batch_columns = batch_result.keys()
-                            batch_rows = batch_result.fetchall()
-                            
-                            if not batch_rows:
-                                print(f"第 {batch_num + 1} 批无数据，跳过")
-                                continue
-                            
-                            # 使用并行处理当前批次的数据
-                            batch_data = self._process_batch_data_parallel(batch_rows, batch_columns, batch_num + 1)
-                            full_market_data.extend(batch_data)
-                            
-                            processed_count += len(batch_data)
-                            self._refresh_processed_records = processed_count
-                            
-                            progress_percentage = (processed_count / total_count) * 100
-                            print(f"已处理 {processed_count}/{total_count} 条数据 ({progress_percentage:.1f}%)")
-                            
-                            # 每处理几批就强制垃圾回收，释放内存
-                            if batch_num % 5 == 0:
-                                import gc
-                                gc.collect()
-                                
-                        except Exception as e:
-                            self.logger.error(f"处理第 {batch_num + 1} 批数据失败: {e}")
-                            continue
+                print(f"筛选后数据: {len(filtered_data)} 条")
                 
-                # 转换为DataFrame
-                self._refresh_message = "构建数据结构..."
-                self._refresh_progress = 92
-                
-                full_data_df = pd.DataFrame(full_market_data)
-                
-                if not full_data_df.empty:
-                    full_data_df.set_index('eid', inplace=True)
-                    
-                    elapsed_time = time.time() - start_time
-                    print(f"全量市场数据加载完成，共 {len(full_data_df)} 条有效数据，耗时: {elapsed_time:.2f}秒")
-                    print(f"数据特征维度: {len(full_data_df.columns)}")
-                    print(f"价格范围: {full_data_df['price'].min():.1f} - {full_data_df['price'].max():.1f}")
-                    
-                    # 缓存全量数据到Redis
-                    if use_cache:
-                        self._refresh_message = "缓存数据到Redis..."
-                        self._refresh_progress = 95
-                        
-                        cache_start = time.time()
-                        if self._set_full_cached_data(full_data_df):
-                            cache_time = time.time() - cache_start
-                            print(f" 全量数据已缓存到Redis，缓存耗时: {cache_time:.2f}秒")
-                        else:
-                            print(" Redis全量缓存设置失败，但数据获取成功")
-                    else:
-                        print(" 跳过Redis缓存存储，use_cache=False")
-                    
-                    # 应用筛选条件并返回结果
-                    self._refresh_message = "应用筛选条件..."
-                    self._refresh_progress = 98
-                    
-                    filtered_data = self._apply_filters(full_data_df, filters, max_records)
-                    self.market_data = filtered_data
-                    
-                    # 更新缓存状态
-                    self._data_loaded = True
-                    self._last_refresh_time = datetime.now()
-                    
-                    # 完成进度跟踪
-                    self._refresh_status = "completed"
-                    self._refresh_progress = 100
-                    self._refresh_message = "数据刷新完成！"
-                    self._refresh_processed_records = len(filtered_data)
-                    
-                    print(f"筛选后数据: {len(filtered_data)} 条")
-                    
-                else:
-                    print("警告：未获取到有效的市场数据")
-                    self.market_data = pd.DataFrame()
-                    
-                    # 完成进度跟踪（无数据情况）
-                    self._refresh_status = "completed"
-                    self._refresh_progress = 100
-                    self._refresh_message = "未获取到有效数据"
-                    self._refresh_processed_records = 0
-                
-                return self.market_data
+            else:
+                print("警告：未获取到有效的市场数据")
+                self.market_data = pd.DataFrame()
                 
+                # 完成进度跟踪（无数据情况）
+                self._refresh_status = "completed"
+                self._refresh_progress = 100
+                self._refresh_message = "未获取到有效数据"
+                self._refresh_processed_records = 0
+            
+            return self.market_data
+            
         except Exception as e:
             # 错误处理进度跟踪
             self._refresh_status = "error"
@@ -568,6 +554,10 @@ class MarketDataCollector:
         Returns:
             pd.DataFrame: 市场数据
         """
+        # 多进程部署：挂载共享内存中的最新版本（由写入进程刷新）
+        if not force_refresh and self._attach_shared_cache():
+            return self.market_data
+        
         # 检查是否需要刷新数据
         need_refresh = (
             force_refresh or 
@@ -592,6 +582,7 @@ class MarketDataCollector:
             self.refresh_market_data()
             self._data_loaded = True
             self._last_refresh_time = datetime.now()
+            self._publish_shared_cache()
         else:
             if self._cache_expiry_hours == -1:
                 print(f"使用永久缓存的市场数据，上次刷新时间: {self._last_refresh_time}, "
@@ -602,6 +593,48 @@ class MarketDataCollector:
         
         return self.market_data
     
+    def _attach_shared_cache(self) -> bool:
+        """
+        多进程部署：非写入进程挂载共享内存中的市场数据（有新版本时切换）
+        
+        Returns:
+            bool: 是否已挂载共享数据
+        """
+        if self._shared_store is None or self._shared_store.is_owner():
+            return False
+        attached = self._shared_store.poll(self._shared_generation)
+        if attached is not None:
+            self._shared_generation, self.market_data = attached
+            self._data_loaded = True
+            self._last_refresh_time = datetime.now()
+        return self._shared_generation is not None
+    
+    def _publish_shared_cache(self, immediate: bool = False):
+        """写入进程：市场数据变化后延迟发布新版本到共享内存；全量刷新后立即发布"""
+        if self._shared_store is None:
+            return
+        if immediate:
+            # 全量刷新完成：任何进程都直接发布，各进程切换到新版本
+            try:
+                self._shared_store.publish(self.market_data)
+            except Exception as e:
+                self.logger.warning(f"发布共享缓存失败: {e}")
+        elif self._shared_store.is_owner():
+            self._shared_store.schedule_publish(lambda: self.market_data)
+    
+    def _warm_up_shared_cache(self):
+        """写入进程启动时在后台加载市场数据并发布，其他进程直接挂载"""
+        if self._shared_store is None or not self._shared_store.is_owner():
+            return
+        
+        def warm_up():
+            try:
+                self.get_market_data()
+            except Exception as e:
+                self.logger.warning(f"预加载共享市场数据失败: {e}")
+        
+        threading.Thread(target=warm_up, daemon=True).start()
+    
     def _is_cache_expired(self) -> bool:
         """检查缓存是否过期 - 永不过期模式"""
         if not self._last_refresh_time:
@@ -1076,6 +1109,7 @@ class MarketDataCollector:
                 force_refresh=True  # 强制刷新，跳过Redis缓存检查
             )
             
+            self._publish_shared_cache(immediate=True)
             print(" 全量缓存手动刷新完成")
             print("💾 数据已更新为最新版本，将永久保持直到下次手动刷新")
             return True
@@ -1189,7 +1223,7 @@ class MarketDataCollector:
 
     def _process_batch_data(self, batch_rows: List, batch_columns: List, batch_num: int) -> List[Dict]:
         """
-        批量处理数据 - 优化特征提取性能
+        在当前进程中批量处理数据（未启用子进程或子进程不可用时使用）
         
         Args:
             batch_rows: 数据库查询结果行
@@ -1200,31 +1234,7 @@ class MarketDataCollector:
             List[Dict]: 处理后的特征数据列表
         """
         try:
-            batch_data = []
-            
-            # 预先转换为字典列表，减少重复操作
-            role_data_list = [dict(zip(batch_columns, row)) for row in batch_rows]
-            
-            # 批量提取特征
-            for i, role_data in enumerate(role_data_list):
-                try:
-                    # 提取特征
-                    features = self.feature_extractor.extract_features(role_data)
-                    
-                    # 添加基本信息
-                    features.update({
-                        'eid': role_data.get('eid', ''),
-                        'price': role_data.get('price', 0),
-                        'school': role_data.get('school', 0),
-                        'serverid': role_data.get('serverid', 0)
-                    })
-                    
-                    batch_data.append(features)
-                    
-                except Exception as e:
-                    self.logger.warning(f"处理第{batch_num}批第{i+1}条数据时出错: {e}")
-                    continue
-            
+            batch_data = extract_role_features(self.feature_extractor, batch_rows, batch_columns, self.logger)
             print(f"第{batch_num}批处理完成: {len(batch_data)}/{len(batch_rows)} 条有效数据")
             return batch_data
             
@@ -1232,124 +1242,287 @@ class MarketDataCollector:
             self.logger.error(f"批量处理第{batch_num}批数据失败: {e}")
             return []
 
-
-    def _get_optimized_connection_config(self, db_config: str) -> Dict:
+    def _get_stream_engine(self):
         """
-        获取优化的数据库连接配置
+        获取全量加载使用的数据库引擎（首次调用时创建，之后复用连接池）
         
-        Args:
-            db_config: 原始数据库连接字符串
-            
         Returns:
-            Dict: 优化的连接参数
+            Engine: SQLAlchemy引擎
         """
-        return {
-            'pool_size': 10,           # 连接池大小
-            'max_overflow': 20,        # 最大溢出连接数
-            'pool_timeout': 30,        # 获取连接超时时间
-            'pool_recycle': 3600,      # 连接回收时间（1小时）
-            'pool_pre_ping': True,     # 连接前ping测试
-            'echo': False,             # 不打印SQL
-            'connect_args': {
-                'charset': 'utf8mb4',
-                'connect_timeout': 60,
-                'read_timeout': 300,
-                'write_timeout': 300,
-                'autocommit': True
-            }
-        }
+        if self._stream_engine is not None:
+            return self._stream_engine
+        
+        with self._engine_lock:
+            if self._stream_engine is None:
+                from flask import has_app_context
+                from sqlalchemy import create_engine
+                
+                if has_app_context():
+                    db_config = current_app.config.get('SQLALCHEMY_DATABASE_URI')
+                else:
+                    # 后台线程中没有应用上下文，只在首次创建引擎时读取一次配置
+                    from src.app import create_app
+                    db_config = create_app().config.get('SQLALCHEMY_DATABASE_URI')
+                if not db_config:
+                    raise ValueError("未找到数据库配置")
+                
+                print(f"连接MySQL数据库: {db_config}")
+                connection_config = self._get_optimized_connection_config(db_config)
+                self._stream_engine = create_engine(db_config, **connection_config)
+        return self._stream_engine
 
-    def _process_batch_data_parallel(self, batch_rows: List, batch_columns: List, batch_num: int, max_workers: int = 4) -> List[Dict]:
+    def _stream_load_market_data(self, engine, total_count: int, chunk_size: int = 2000,
+                                 max_workers: Optional[int] = None) -> pd.DataFrame:
         """
-        并行批量处理数据 - 使用多线程优化特征提取性能
+        服务端游标流式读取全量数据，子进程并行提取特征，结果追加到预分配的列式存储
+        
+        内存中同时存在的原始行不超过 (2 * 子进程数 + 1) 块，特征结果直接写入列数组，
+        不再保留全部角色的字典列表。数据版本（update_time）和提取器配置版本都没有变化的角色
+        直接复用特征缓存，只提取新增或变化的角色
         
         Args:
-            batch_rows: 数据库查询结果行
-            batch_columns: 列名列表
-            batch_num: 批次号
-            max_workers: 最大工作线程数
+            engine: 数据库引擎
+            total_count: 预估总记录数（用于预分配和进度显示）
+            chunk_size: 每块行数
+            max_workers: 特征提取子进程数，默认使用self.feature_workers，0表示在当前进程中提取
             
         Returns:
-            List[Dict]: 处理后的特征数据列表
+            pd.DataFrame: 以eid为索引的特征数据（保持按价格升序）
         """
+        from sqlalchemy import text
+        
+        chunk_size = max(1, int(chunk_size))
+        max_workers = self.feature_workers if max_workers is None else max_workers
+        total_batches = (total_count + chunk_size - 1) // chunk_size
+        
+        self._refresh_total_records = total_count
+        self._refresh_total_batches = total_batches
+        self._refresh_message = f"流式读取数据: 约 {total_batches} 块，每块 {chunk_size} 条"
+        self._refresh_progress = 30
+        print(f"流式读取全量数据，每块 {chunk_size} 条，特征提取进程数: {max_workers or '当前进程'}")
+        
+        # 上次刷新的特征缓存：eid -> (缓存行位置, 数据版本)
+        feature_cache = self._load_feature_cache()
+        cache_lookup = {}
+        if feature_cache is not None:
+            cache_lookup = dict(zip(feature_cache.index,
+                                    zip(range(len(feature_cache)), feature_cache[FEATURE_CACHE_KEY_COLUMN])))
+        hit_positions = []  # 命中缓存的行位置
+        eid_order = []  # 查询返回的eid顺序（按价格升序）
+        row_keys = {}  # eid -> 数据版本
+        
+        store = ColumnarFeatureStore(capacity=max(total_count - len(cache_lookup), chunk_size))
+        processed_count = 0
+        cached_count = 0
+        
+        def collect(batch_num: int, batch_data: List[Dict], hit_count: int = 0):
+            nonlocal processed_count, cached_count
+            store.append_records(batch_data)
+            processed_count += len(batch_data) + hit_count
+            cached_count += hit_count
+            
+            # 更新当前批次进度（30-90%的进度范围）
+            self._refresh_current_batch = batch_num
+            self._refresh_processed_records = processed_count
+            if total_batches:
+                self._refresh_progress = min(30 + int(batch_num / total_batches * 60), 90)
+            self._refresh_message = f"已处理第 {batch_num}/{max(total_batches, batch_num)} 块数据..."
+            if total_count:
+                print(f"已处理 {processed_count}/{total_count} 条数据 ({processed_count / total_count * 100:.1f}%)")
+        
+        executor = None
+        if max_workers and max_workers > 0:
+            try:
+                # spawn方式启动子进程，避免在多线程的Web进程中fork
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_feature_worker
+                )
+            except Exception as e:
+                self.logger.warning(f"创建特征提取进程池失败，改为在当前进程中提取: {e}")
+        
+        pending = collections.deque()
+        
+        def collect_oldest():
+            batch_num, rows, columns, hit_count, future = pending.popleft()
+            try:
+                batch_data = future.result()
+            except Exception as e:
+                # 子进程异常（包括进程池损坏）：这一块在当前进程中重新提取
+                self.logger.warning(f"第{batch_num}块子进程特征提取失败，改为在当前进程中提取: {e}")
+                batch_data = self._process_batch_data(rows, columns, batch_num)
+            collect(batch_num, batch_data, hit_count)
+        
         try:
-            if len(batch_rows) < 100:
-                # 小批次数据直接串行处理，避免线程开销
-                return self._process_batch_data(batch_rows, batch_columns, batch_num)
-            
-            # 预先转换为字典列表
-            role_data_list = [dict(zip(batch_columns, row)) for row in batch_rows]
-            
-            # 分割数据供多线程处理
-            chunk_size = max(1, len(role_data_list) // max_workers)
-            chunks = [role_data_list[i:i + chunk_size] for i in range(0, len(role_data_list), chunk_size)]
-            
-            batch_data = []
-            
-            # 使用线程池并行处理
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # 提交任务
-                future_to_chunk = {
-                    executor.submit(self._process_data_chunk, chunk, f"{batch_num}-{i+1}"): i 
-                    for i, chunk in enumerate(chunks)
-                }
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                    text(MARKET_DATA_STREAM_QUERY))
+                columns = list(result.keys())
+                eid_index = columns.index('eid')
+                role_time_index = columns.index('role_update_time')
+                desc_time_index = columns.index('desc_update_time')
                 
-                # 收集结果
-                for future in concurrent.futures.as_completed(future_to_chunk):
-                    chunk_index = future_to_chunk[future]
+                for batch_num, partition in enumerate(result.partitions(chunk_size), 1):
+                    # 只提取新增或数据版本变化的角色，其余角色复用缓存的特征
+                    rows = []
+                    hit_count = 0
+                    for row in partition:
+                        eid = row[eid_index]
+                        key = self._feature_cache_key(row[role_time_index], row[desc_time_index])
+                        eid_order.append(eid)
+                        row_keys[eid] = key
+                        cached = cache_lookup.get(eid)
+                        if key is not None and cached is not None and cached[1] == key:
+                            hit_positions.append(cached[0])
+                            hit_count += 1
+                        else:
+                            rows.append(tuple(row))
+                    
+                    if not rows:
+                        collect(batch_num, [], hit_count)
+                        continue
+                    if executor is None:
+                        collect(batch_num, self._process_batch_data(rows, columns, batch_num), hit_count)
+                        continue
+                    
                     try:
-                        chunk_result = future.result()
-                        batch_data.extend(chunk_result)
+                        future = executor.submit(_extract_role_features_in_worker, rows, columns)
                     except Exception as e:
-                        self.logger.error(f"处理第{batch_num}批第{chunk_index+1}块数据失败: {e}")
+                        # 进程池已损坏：剩余数据在当前进程中提取
+                        self.logger.warning(f"特征提取进程池不可用，改为在当前进程中提取: {e}")
+                        while pending:
+                            collect_oldest()
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = None
+                        collect(batch_num, self._process_batch_data(rows, columns, batch_num), hit_count)
                         continue
-            
-            print(f"第{batch_num}批并行处理完成: {len(batch_data)}/{len(batch_rows)} 条有效数据")
-            return batch_data
-            
+                    pending.append((batch_num, rows, columns, hit_count, future))
+                    # 在途块数有上限：按提交顺序收集结果，限制内存中的原始行数
+                    while len(pending) >= max_workers * 2:
+                        collect_oldest()
+                
+                while pending:
+                    collect_oldest()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        self._refresh_message = "构建数据结构..."
+        self._refresh_progress = 92
+        print(f"角色特征缓存命中 {cached_count} 条，重新提取 {processed_count - cached_count} 条")
+        
+        extracted = store.to_dataframe(index='eid')
+        if feature_cache is None and extracted.empty:
+            return extracted
+        
+        frames = [frame for frame in (
+            feature_cache.iloc[hit_positions].drop(columns=[FEATURE_CACHE_KEY_COLUMN]) if hit_positions else None,
+            extracted if len(extracted) else None,
+        ) if frame is not None]
+        if not frames:
+            return extracted
+        full_data = pd.concat(frames) if len(frames) > 1 else frames[0]
+        
+        # 恢复查询返回的价格顺序（提取失败的角色不在结果中）
+        positions = full_data.index.get_indexer(eid_order)
+        full_data = full_data.take(positions[positions >= 0])
+        
+        if len(extracted) or feature_cache is None or len(full_data) != len(feature_cache):
+            self._save_feature_cache(full_data, row_keys)
+        return full_data
+
+    @staticmethod
+    def _feature_cache_key(role_update_time, desc_update_time) -> Optional[str]:
+        """角色数据版本：角色和详细数据的更新时间（没有更新时间的角色不使用缓存）"""
+        if role_update_time is None:
+            return None
+        return f"{role_update_time}|{desc_update_time}"
+
+    def _load_feature_cache(self) -> Optional[pd.DataFrame]:
+        """
+        读取上次刷新保存的角色特征缓存（提取器配置版本不一致时视为无效）
+        
+        Returns:
+            Optional[pd.DataFrame]: 以eid为索引、包含数据版本列的特征数据
+        """
+        if not self.feature_cache_path or not os.path.exists(self.feature_cache_path):
+            return None
+        try:
+            payload = pd.read_pickle(self.feature_cache_path)
+            if payload.get('config_version') != self.feature_extractor.config_version:
+                print("角色特征提取配置已变化，特征缓存失效，将重新提取全部角色")
+                return None
+            data = payload['data']
+            if FEATURE_CACHE_KEY_COLUMN not in data.columns:
+                return None
+            return data
         except Exception as e:
-            self.logger.error(f"并行处理第{batch_num}批数据失败: {e}")
-            # 降级到串行处理
-            return self._process_batch_data(batch_rows, batch_columns, batch_num)
+            self.logger.warning(f"读取角色特征缓存失败，将重新提取全部角色: {e}")
+            return None
 
-    def _process_data_chunk(self, role_data_chunk: List[Dict], chunk_id: str) -> List[Dict]:
+    def _save_feature_cache(self, data: pd.DataFrame, row_keys: Dict[str, Optional[str]]) -> bool:
         """
-        处理数据块 - 线程安全的特征提取
+        保存角色特征缓存（先写临时文件再替换，避免读到写了一半的文件）
         
         Args:
-            role_data_chunk: 角色数据块
-            chunk_id: 块标识
+            data: 以eid为索引的特征数据
+            row_keys: eid -> 数据版本
             
         Returns:
-            List[Dict]: 处理后的特征数据
+            bool: 是否保存成功
         """
+        if not self.feature_cache_path:
+            return False
+        temp_path = None
         try:
-            chunk_data = []
-            
-            for i, role_data in enumerate(role_data_chunk):
-                try:
-                    # 提取特征
-                    features = self.feature_extractor.extract_features(role_data)
-                    
-                    # 添加基本信息
-                    features.update({
-                        'eid': role_data.get('eid', ''),
-                        'price': role_data.get('price', 0),
-                        'school': role_data.get('school', 0),
-                        'serverid': role_data.get('serverid', 0)
-                    })
-                    
-                    chunk_data.append(features)
-                    
-                except Exception as e:
-                    self.logger.warning(f"处理块{chunk_id}第{i+1}条数据时出错: {e}")
-                    continue
-            
-            return chunk_data
-            
+            cache_data = data.copy()
+            cache_data[FEATURE_CACHE_KEY_COLUMN] = [row_keys.get(eid) for eid in data.index]
+            cache_dir = os.path.dirname(self.feature_cache_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            # 每次保存使用独立的临时文件：多个worker同时刷新时不会写入同一个文件
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                pd.to_pickle({
+                    'config_version': self.feature_extractor.config_version,
+                    'saved_at': datetime.now().isoformat(),
+                    'data': cache_data,
+                }, f)
+            # mkstemp创建的文件只有所有者可读
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.feature_cache_path)
+            return True
         except Exception as e:
-            self.logger.error(f"处理数据块{chunk_id}失败: {e}")
-            return []
+            self.logger.warning(f"保存角色特征缓存失败: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def _get_optimized_connection_config(self, db_config: str) -> Dict:
+        """
+        获取优化的数据库连接配置
+        
+        Args:
+            db_config: 原始数据库连接字符串
+            
+        Returns:
+            Dict: 优化的连接参数
+        """
+        return {
+            'pool_size': 10,           # 连接池大小
+            'max_overflow': 20,        # 最大溢出连接数
+            'pool_timeout': 30,        # 获取连接超时时间
+            'pool_recycle': 3600,      # 连接回收时间（1小时）
+            'pool_pre_ping': True,     # 连接前ping测试
+            'echo': False,             # 不打印SQL
+            'connect_args': {
+                'charset': 'utf8mb4',
+                'connect_timeout': 60,
+                'read_timeout': 300,
+                'write_timeout': 300,
+                'autocommit': True
+            }
+        }
 
     def get_performance_stats(self) -> Dict[str, Any]:
         """
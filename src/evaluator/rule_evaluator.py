@@ -1,5 +1,6 @@
 import logging
-from typing import Dict,  Optional, Union
+import os
+from typing import Dict, List, Optional, Union
 from src.utils.jsonc_loader import load_jsonc_from_config_dir
 
 
@@ -12,6 +13,12 @@ class RuleEvaluator:
         self.rule_config = self._load_rule_config()
         self.discount_rates = self._load_discount_rates()
 
+    @staticmethod
+    def get_config_files() -> List[str]:
+        """规则估价器加载的配置文件路径"""
+        config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+        return [os.path.join(config_dir, 'rule_setting.jsonc'), os.path.join(config_dir, 'rate.jsonc')]
+
     def _load_rule_config(self):
         """加载规则配置文件"""
         try:
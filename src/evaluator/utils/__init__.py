@@ -6,5 +6,8 @@
 
 from .extreme_value_filter import ExtremeValueFilter
 from .base_valuator import BaseValuator
+from .columnar_store import ColumnarFeatureStore
+from .partitioned_frame import PartitionedFrame
+from .shared_frame_store import SharedFrameStore
 
-__all__ = ['ExtremeValueFilter', 'BaseValuator'] 
\ No newline at end of file
+__all__ = ['ExtremeValueFilter', 'BaseValuator', 'ColumnarFeatureStore', 'PartitionedFrame', 'SharedFrameStore'] 
\ No newline at end of file
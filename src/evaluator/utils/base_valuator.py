@@ -4,7 +4,9 @@
 提供所有估价类可以共用的核心方法
 """
 
+import json
 import numpy as np
+import pandas as pd
 import logging
 from typing import Dict, Any, List, Optional
 from abc import ABC, abstractmethod
@@ -62,93 +64,232 @@ class BaseValuator(ABC):
         try:
             # 首先检测物品是否无效
             from .invalid_item_detector import InvalidItemDetector
-            invalid_detector = InvalidItemDetector()
-            
-            should_skip, skip_reason, skip_value = invalid_detector.should_skip_valuation(target_features)
-            if should_skip:
-                if verbose:
-                    print(f"物品无效，跳过估价: {skip_reason}")
-                return {
-                    'estimated_price': skip_value,
-                    'anchor_count': 0,
-                    'invalid_item': True,
-                    'skip_reason': skip_reason,
-                    'confidence': 1 if skip_value > 0 else 0,
-                    'kindid': target_features.get('kindid', ''), 
-                    'equip_sn': target_features.get('equip_sn', '')  # 添加装备序列号
-                }
+            skip_result = self._check_invalid_item(target_features, InvalidItemDetector(), verbose)
+            if skip_result is not None:
+                return skip_result
             
             # 寻找市场锚点
             anchors = self.find_market_anchors(
                 target_features, similarity_threshold, max_anchors, verbose=verbose)
             
-            if len(anchors) == 0:
-                return {
-                    'estimated_price': 0,
-                    'anchor_count': 0,
-                    'error': '未找到相似的市场锚点',
-                    'kindid': target_features.get('kindid', ''), 
-                    'equip_sn': target_features.get('equip_sn', '')  # 添加装备序列号
-                }
-            
-            # 提取价格和相似度
-            anchor_prices = [anchor['price'] for anchor in anchors]
-            anchor_similarities = [anchor['similarity'] for anchor in anchors]
-            
-            # 根据策略计算估价
-            if strategy == 'competitive':
-                # 竞争性定价：25%分位数 × 0.9
-                sorted_prices = sorted(anchor_prices)
-                percentile_25_index = int(len(sorted_prices) * 0.25)
-                percentile_25_value = sorted_prices[percentile_25_index] if percentile_25_index < len(sorted_prices) else sorted_prices[-1]
-                estimated_price = float(percentile_25_value * 0.9)
-            elif strategy == 'premium':
-                # 溢价定价：75%分位数 × 0.95
-                sorted_prices = sorted(anchor_prices)
-                percentile_75_index = int(len(sorted_prices) * 0.75)
-                percentile_75_value = sorted_prices[percentile_75_index] if percentile_75_index < len(sorted_prices) else sorted_prices[-1]
-                estimated_price = float(percentile_75_value * 0.95)
-            else:  # fair_value
-                # 公允价值：相似度加权中位数 × 0.93
-                base_price = self._weighted_median(anchor_prices, anchor_similarities)
-                estimated_price = float(base_price * 0.93)
-            
-            # 计算置信度
-            confidence = self._calculate_confidence(anchors, len(anchor_prices))
-            
-            # 构建结果 - 确保所有数值都是Python原生类型
-            result = {
-                'estimated_price': round(estimated_price, 1),
-                'anchor_count': len(anchors),
-                'anchors':anchors,
-                'price_range': {
-                    'min': float(min(anchor_prices)),
-                    'max': float(max(anchor_prices)),
-                    'mean': float(sum(anchor_prices) / len(anchor_prices)),
-                    'median': float(sorted(anchor_prices)[len(anchor_prices) // 2])
-                },
-                'confidence': float(confidence),
-                'strategy_used': strategy,
-                'invalid_item': False,
-                'kindid': target_features.get('kindid', ''), 
-                'equip_sn': target_features.get('equip_sn', '')  # 添加装备序列号
-            }
-            
-            if verbose:
-                print(f"价值计算完成: {estimated_price:.1f}，基于 {len(anchors)} 个锚点，置信度: {confidence:.2f}")
-            
-            return result
+            return self._build_valuation_result(target_features, anchors, strategy, verbose)
             
         except Exception as e:
             self.logger.error(f"计算价值失败: {e}")
+            return self._build_error_result(target_features, e)
+    
+    @staticmethod
+    def _select_top_anchors(similarities: np.ndarray,
+                            similarity_threshold: float,
+                            max_anchors: int) -> np.ndarray:
+        """
+        选出相似度达到阈值的前max_anchors个候选
+
+        按保留三位小数的相似度降序，相同相似度保持候选原顺序（与稳定排序一致）。
+
+        Returns:
+            np.ndarray: 选中候选的位置（按相似度降序）
+        """
+        qualified = np.flatnonzero(similarities >= similarity_threshold)
+        if max_anchors <= 0 or len(qualified) == 0:
+            return qualified[:0]
+        keys = np.round(similarities[qualified], 3)
+        if len(qualified) > max_anchors:
+            # argpartition找到第N大的相似度，大于它的全部入选，等于它的按原顺序补足
+            kth_value = keys[np.argpartition(-keys, max_anchors - 1)[max_anchors - 1]]
+            above = np.flatnonzero(keys > kth_value)
+            ties = np.flatnonzero(keys == kth_value)[:max_anchors - len(above)]
+            chosen = np.concatenate([above, ties])
+        else:
+            chosen = np.arange(len(qualified))
+        order = chosen[np.lexsort((chosen, -keys[chosen]))]
+        return qualified[order]
+
+    def _check_invalid_item(self,
+                            target_features: Dict[str, Any],
+                            invalid_detector,
+                            verbose: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        检测物品是否无效，无效时返回跳过估价的结果
+        
+        Args:
+            target_features: 目标特征字典
+            invalid_detector: 无效物品检测器（批量估价时共用一个实例）
+            verbose: 是否显示详细调试日志
+            
+        Returns:
+            Optional[Dict[str, Any]]: 跳过估价的结果，物品有效时返回None
+        """
+        should_skip, skip_reason, skip_value = invalid_detector.should_skip_valuation(target_features)
+        if not should_skip:
+            return None
+        if verbose:
+            print(f"物品无效，跳过估价: {skip_reason}")
+        return {
+            'estimated_price': skip_value,
+            'anchor_count': 0,
+            'invalid_item': True,
+            'skip_reason': skip_reason,
+            'confidence': 1 if skip_value > 0 else 0,
+            'kindid': target_features.get('kindid', ''), 
+            'equip_sn': target_features.get('equip_sn', '')  # 添加装备序列号
+        }
+    
+    def _build_valuation_result(self,
+                                target_features: Dict[str, Any],
+                                anchors: List[Dict[str, Any]],
+                                strategy: str = 'fair_value',
+                                verbose: bool = True) -> Dict[str, Any]:
+        """
+        根据锚点按定价策略计算估价结果
+        
+        Args:
+            target_features: 目标特征字典
+            anchors: 市场锚点列表
+            strategy: 定价策略 ('fair_value', 'competitive', 'premium')
+            verbose: 是否显示详细调试日志
+            
+        Returns:
+            Dict[str, Any]: 估价结果
+        """
+        if len(anchors) == 0:
             return {
                 'estimated_price': 0,
                 'anchor_count': 0,
-                'error': str(e),
-                'invalid_item': False,
+                'error': '未找到相似的市场锚点',
                 'kindid': target_features.get('kindid', ''), 
                 'equip_sn': target_features.get('equip_sn', '')  # 添加装备序列号
             }
+        
+        # 提取价格和相似度
+        anchor_prices = [anchor['price'] for anchor in anchors]
+        anchor_similarities = [anchor['similarity'] for anchor in anchors]
+        
+        # 根据策略计算估价
+        if strategy == 'competitive':
+            # 竞争性定价：25%分位数 × 0.9
+            sorted_prices = sorted(anchor_prices)
+            percentile_25_index = int(len(sorted_prices) * 0.25)
+            percentile_25_value = sorted_prices[percentile_25_index] if percentile_25_index < len(sorted_prices) else sorted_prices[-1]
+            estimated_price = float(percentile_25_value * 0.9)
+        elif strategy == 'premium':
+            # 溢价定价：75%分位数 × 0.95
+            sorted_prices = sorted(anchor_prices)
+            percentile_75_index = int(len(sorted_prices) * 0.75)
+            percentile_75_value = sorted_prices[percentile_75_index] if percentile_75_index < len(sorted_prices) else sorted_prices[-1]
+            estimated_price = float(percentile_75_value * 0.95)
+        else:  # fair_value
+            # 公允价值：相似度加权中位数 × 0.93
+            base_price = self._weighted_median(anchor_prices, anchor_similarities)
+            estimated_price = float(base_price * 0.93)
+        
+        # 计算置信度
+        confidence = self._calculate_confidence(anchors, len(anchor_prices))
+        
+        # 构建结果 - 确保所有数值都是Python原生类型
+        result = {
+            'estimated_price': round(estimated_price, 1),
+            'anchor_count': len(anchors),
+            'anchors':anchors,
+            'price_range': {
+                'min': float(min(anchor_prices)),
+                'max': float(max(anchor_prices)),
+                'mean': float(sum(anchor_prices) / len(anchor_prices)),
+                'median': float(sorted(anchor_prices)[len(anchor_prices) // 2])
+            },
+            'confidence': float(confidence),
+            'strategy_used': strategy,
+            'invalid_item': False,
+            'kindid': target_features.get('kindid', ''), 
+            'equip_sn': target_features.get('equip_sn', '')  # 添加装备序列号
+        }
+        
+        if verbose:
+            print(f"价值计算完成: {estimated_price:.1f}，基于 {len(anchors)} 个锚点，置信度: {confidence:.2f}")
+        
+        return result
+    
+    def _build_error_result(self, target_features: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """构建估价失败的结果"""
+        return {
+            'estimated_price': 0,
+            'anchor_count': 0,
+            'error': str(error),
+            'invalid_item': False,
+            'kindid': target_features.get('kindid', ''), 
+            'equip_sn': target_features.get('equip_sn', '')  # 添加装备序列号
+        }
+    
+    def _get_candidate_group_key(self, target_features: Dict[str, Any]) -> Optional[str]:
+        """
+        获取候选集合分组键（批量估价时分组键相同的物品共享同一批市场候选）
+        
+        分组键必须覆盖候选加载实际读取的全部字段，子类按自己的加载逻辑实现。
+        
+        Args:
+            target_features: 目标特征字典
+            
+        Returns:
+            Optional[str]: 分组键，None表示该物品单独估价（走find_market_anchors）
+        """
+        return None
+    
+    def _make_candidate_group_key(self, *parts: Any) -> str:
+        """把候选加载读取的字段值规范化为分组键（字典按键排序，元组与列表等价）"""
+        return json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    
+    def _load_market_candidates(self,
+                                target_features: Dict[str, Any],
+                                verbose: bool = True) -> pd.DataFrame:
+        """
+        加载目标物品的市场候选数据（支持分组批量估价的子类实现）
+        
+        Args:
+            target_features: 目标特征字典
+            verbose: 是否显示详细调试日志
+            
+        Returns:
+            pd.DataFrame: 预过滤后的市场候选数据
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持分组批量估价")
+    
+    def _prepare_market_candidates(self,
+                                   target_features: Dict[str, Any],
+                                   market_data: pd.DataFrame) -> Any:
+        """
+        候选侧预处理（与具体目标无关的转换、特征提取等），同组只执行一次
+        
+        Args:
+            target_features: 组内任一目标的特征字典（只读取组内相同的字段）
+            market_data: 市场候选数据
+            
+        Returns:
+            Any: 预处理结果，传给 _find_anchors_in_candidates；默认不做预处理
+        """
+        return None
+    
+    def _find_anchors_in_candidates(self,
+                                    target_features: Dict[str, Any],
+                                    market_data: pd.DataFrame,
+                                    similarity_threshold: float = 0.7,
+                                    max_anchors: int = 30,
+                                    verbose: bool = True,
+                                    prepared: Any = None) -> List[Dict[str, Any]]:
+        """
+        在已加载的市场候选中为目标物品打分并选出锚点（支持分组批量估价的子类实现）
+        
+        Args:
+            target_features: 目标特征字典
+            market_data: 市场候选数据
+            similarity_threshold: 相似度阈值
+            max_anchors: 最大锚点数
+            verbose: 是否显示详细调试日志
+            prepared: _prepare_market_candidates 的预处理结果
+            
+        Returns:
+            List[Dict[str, Any]]: 锚点列表
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持分组批量估价")
     
     def _weighted_median(self, values: List[float], weights: List[float]) -> float:
         """
@@ -228,6 +369,9 @@ class BaseValuator(ABC):
         """
         批量估价（通用方法）
         
+        按候选集合分组：分组键相同的物品只加载一次市场候选、只做一次候选侧预处理，
+        再逐个目标打分（结果与逐个调用calculate_value一致）；不支持分组的物品单独估价。
+        
         Args:
             item_list: 项目特征列表
             strategy: 定价策略
@@ -236,14 +380,78 @@ class BaseValuator(ABC):
             verbose: 是否显示详细调试日志（批量估价默认关闭）
             
         Returns:
-            List[Dict[str, Any]]: 批量估价结果列表
+            List[Dict[str, Any]]: 批量估价结果列表（与item_list顺序一致）
         """
-        results = []
+        results: List[Optional[Dict[str, Any]]] = [None] * len(item_list)
         
         if verbose:
             print(f"开始批量估价，共 {len(item_list)} 个项目")
         
+        from .invalid_item_detector import InvalidItemDetector
+        invalid_detector = InvalidItemDetector()
+        
+        # 无效物品直接跳过，其余按候选集合分组（保持首次出现的顺序）
+        groups: Dict[str, List[int]] = {}
+        singles: List[int] = []
         for i, item_features in enumerate(item_list):
+            try:
+                skip_result = self._check_invalid_item(item_features, invalid_detector, verbose)
+                if skip_result is not None:
+                    results[i] = skip_result
+                    continue
+                group_key = self._get_candidate_group_key(item_features)
+            except Exception as e:
+                self.logger.error(f"批量估价第 {i+1} 个项目失败: {e}")
+                results[i] = self._build_batch_error_result(i, item_features, e)
+                continue
+            if group_key is None:
+                singles.append(i)
+            else:
+                groups.setdefault(group_key, []).append(i)
+        
+        if verbose and groups:
+            grouped_count = sum(len(indices) for indices in groups.values())
+            print(f"{grouped_count} 个项目分为 {len(groups)} 组共享市场候选，{len(singles)} 个项目单独估价")
+        
+        completed = 0
+        
+        def finish(i: int, result: Dict[str, Any]):
+            nonlocal completed
+            result['item_index'] = i
+            results[i] = result
+            completed += 1
+            if verbose and completed % 10 == 0:
+                print(f"已完成 {completed}/{len(item_list)} 个项目的估价")
+        
+        for indices in groups.values():
+            # 同组只加载、预处理一次候选
+            try:
+                market_data = self._load_market_candidates(item_list[indices[0]], verbose)
+                prepared = self._prepare_market_candidates(item_list[indices[0]], market_data) \
+                    if not market_data.empty else None
+            except Exception as e:
+                self.logger.error(f"加载分组市场候选失败: {e}")
+                market_data, prepared = pd.DataFrame(), None
+            
+            for i in indices:
+                item_features = item_list[i]
+                try:
+                    try:
+                        anchors = self._find_anchors_in_candidates(
+                            item_features, market_data, similarity_threshold, max_anchors,
+                            verbose=verbose, prepared=prepared)
+                    except Exception as e:
+                        # 与find_market_anchors一致：打分失败视为没有锚点
+                        self.logger.error(f"寻找市场锚点失败: {e}")
+                        anchors = []
+                    result = self._build_valuation_result(item_features, anchors, strategy, verbose)
+                except Exception as e:
+                    self.logger.error(f"计算价值失败: {e}")
+                    result = self._build_error_result(item_features, e)
+                finish(i, result)
+        
+        for i in singles:
+            item_features = item_list[i]
             try:
                 # 将verbose参数传递给calculate_value方法
                 result = self.calculate_value(
@@ -252,23 +460,26 @@ class BaseValuator(ABC):
                     max_anchors=max_anchors,
                     verbose=verbose
                 )
-                result['item_index'] = i
-                results.append(result)
-                
-                if verbose and (i + 1) % 10 == 0:
-                    print(f"已完成 {i + 1}/{len(item_list)} 个项目的估价")
-                    
+                finish(i, result)
             except Exception as e:
                 self.logger.error(f"批量估价第 {i+1} 个项目失败: {e}")
-                results.append({
-                    'item_index': i,
-                    'estimated_price': 0,
-                    'error': str(e),
-                    'kindid': item_features.get('kindid', 0),
-                    'equip_sn': item_features.get('equip_sn', '')  # 添加装备序列号
-                })
+                results[i] = self._build_batch_error_result(i, item_features, e)
+        
+        for i, result in enumerate(results):
+            if result is not None and 'item_index' not in result:
+                result['item_index'] = i
         
         if verbose:
             print(f"批量估价完成，成功估价 {len([r for r in results if 'error' not in r])} 个项目")
         
-        return results
\ No newline at end of file
+        return results
+    
+    def _build_batch_error_result(self, index: int, item_features: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """构建批量估价中单个项目失败的结果"""
+        return {
+            'item_index': index,
+            'estimated_price': 0,
+            'error': str(error),
+            'kindid': item_features.get('kindid', 0),
+            'equip_sn': item_features.get('equip_sn', '')  # 添加装备序列号
+        }
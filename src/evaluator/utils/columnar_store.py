@@ -0,0 +1,161 @@
+"""
+预分配的列式特征存储
+
+- 按预估行数预分配每列的numpy数组，逐块追加特征字典，不保留中间的字典列表
+- 列类型由首次出现的值推断（int64/float64/bool/object），遇到不兼容的值时升级列类型
+- 最终构建DataFrame时直接使用列数组，避免从字典列表逐行构建
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _infer_dtype(value: Any) -> np.dtype:
+    """推断单个值对应的列类型"""
+    if isinstance(value, (bool, np.bool_)):
+        return np.dtype(bool)
+    if isinstance(value, (int, np.integer)):
+        return np.dtype('int64')
+    if isinstance(value, (float, np.floating)):
+        return np.dtype('float64')
+    return np.dtype(object)
+
+
+def _merge_dtype(current: np.dtype, value: Any) -> np.dtype:
+    """当前列类型能否容纳新值，不能时返回升级后的类型"""
+    if current == object:
+        return current
+    if value is None:
+        # 缺失值：整数列升级为浮点（NaN），布尔列升级为object（与DataFrame构建的结果一致）
+        return np.dtype('float64') if current.kind in 'if' else np.dtype(object)
+    incoming = _infer_dtype(value)
+    if incoming == current:
+        return current
+    if current.kind in 'if' and incoming.kind in 'if':
+        return np.dtype('float64')
+    return np.dtype(object)
+
+
+# 记录中不存在该列（与pd.DataFrame(records)一致：缺失的列填充NaN，显式的None保留为None）
+_ABSENT = object()
+
+
+class ColumnarFeatureStore:
+    """预分配的列式特征存储（单线程追加）"""
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity: 预分配的行数（超出时按倍数扩容）
+        """
+        self.capacity = max(1, int(capacity))
+        self.size = 0
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def _allocate(self, dtype: np.dtype) -> np.ndarray:
+        if dtype.kind == 'f':
+            return np.full(self.capacity, np.nan, dtype=dtype)
+        if dtype == object:
+            return np.full(self.capacity, np.nan, dtype=object)
+        return np.zeros(self.capacity, dtype=dtype)
+
+    def _ensure_capacity(self, required: int):
+        if required <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < required:
+            new_capacity *= 2
+        old_capacity = self.capacity
+        self.capacity = new_capacity
+        for name, values in self._columns.items():
+            grown = self._allocate(values.dtype)
+            grown[:old_capacity] = values
+            self._columns[name] = grown
+
+    def _ensure_column(self, name: str, values: List[Any]):
+        """确保列存在且类型能容纳本块的值（新列在已有行上填充缺失值）"""
+        column = self._columns.get(name)
+        dtype = column.dtype if column is not None else None
+        # 新列的已有行是缺失值
+        has_missing = column is None and self.size > 0
+        for value in values:
+            if value is None or value is _ABSENT:
+                has_missing = True
+                continue
+            dtype = _infer_dtype(value) if dtype is None else _merge_dtype(dtype, value)
+            if dtype == object:
+                break
+        if dtype is None:
+            dtype = np.dtype(object)
+        elif has_missing:
+            dtype = _merge_dtype(dtype, None)
+
+        if column is None:
+            self._columns[name] = self._allocate(dtype)
+        elif column.dtype != dtype:
+            converted = self._allocate(dtype)
+            converted[:self.size] = column[:self.size].astype(dtype)
+            self._columns[name] = converted
+
+    def append_records(self, records: List[Dict[str, Any]]):
+        """
+        追加一块特征字典
+
+        Args:
+            records: 特征字典列表（各条记录的键可以不同，缺失的列填充缺失值）
+        """
+        if not records:
+            return
+        count = len(records)
+        self._ensure_capacity(self.size + count)
+
+        names = list(self._columns)
+        seen = set(names)
+        for record in records:
+            for name in record:
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+
+        start, end = self.size, self.size + count
+        for name in names:
+            values = [record.get(name, _ABSENT) for record in records]
+            self._ensure_column(name, values)
+            column = self._columns[name]
+            if column.dtype != object:
+                try:
+                    column[start:end] = [np.nan if value is None or value is _ABSENT else value
+                                         for value in values]
+                    continue
+                except (OverflowError, TypeError, ValueError):
+                    # 超出int64范围等情况：降级为object列
+                    column = self._columns[name] = column.astype(object)
+            # 逐个赋值，避免列表值被numpy展开为多维数组
+            for offset, value in enumerate(values):
+                column[start + offset] = np.nan if value is _ABSENT else value
+        self.size = end
+
+    def to_dataframe(self, index: Optional[str] = None) -> pd.DataFrame:
+        """
+        构建DataFrame（只截取已写入的行）
+
+        Args:
+            index: 作为索引的列名
+
+        Returns:
+            pd.DataFrame: 特征数据
+        """
+        data = {name: values[:self.size] for name, values in self._columns.items()}
+        df = pd.DataFrame(data, copy=False)
+        if index and index in df.columns:
+            df.set_index(index, inplace=True)
+        return df
@@ -0,0 +1,172 @@
+"""
+进程内共享的预热实例（特征提取器、估价器）
+
+- 实例按名称注册：构造函数 + 依赖的配置文件；第一次取用时构造，之后各请求、各线程共用同一个实例
+- 取用时检查配置文件的修改时间和大小（每个实例最多每 CHECK_INTERVAL_SECONDS 秒检查一次），
+  有变化时重新构造并整体替换；正在使用旧实例的请求不受影响
+- 重新构造期间其他线程继续使用旧实例，不会等待；构造失败时保留旧实例
+- 共享的实例在取用后只读使用，不要在请求中修改其属性
+"""
+
+import os
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# 检查配置文件变化的最小间隔（秒）
+CHECK_INTERVAL_SECONDS = 2.0
+
+logger = logging.getLogger(__name__)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_instance_registry() -> 'InstanceRegistry':
+    """获取进程内的实例注册表（单例）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = InstanceRegistry()
+    return _registry
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _RegistryEntry:
+    """注册的实例：构造函数、依赖的配置文件、当前实例及构造时的文件状态"""
+
+    def __init__(self, factory: Callable[[], Any], watched_files: Tuple[str, ...]):
+        self.factory = factory
+        self.watched_files = watched_files
+        self.instance = None
+        self.signature = None
+        self.checked_at = 0.0
+        self.build_count = 0
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def current_signature(self) -> Tuple:
+        return tuple(_file_signature(path) for path in self.watched_files)
+
+
+class InstanceRegistry:
+    """按名称管理预热好的实例，依赖的配置文件变化时重新构造"""
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL_SECONDS):
+        """
+        Args:
+            check_interval: 检查配置文件变化的最小间隔（秒），为0时每次取用都检查
+        """
+        self.check_interval = check_interval
+        self._entries: Dict[str, _RegistryEntry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], watched_files: Iterable[str] = ()) -> None:
+        """
+        注册实例（已注册的名称保持不变）
+
+        Args:
+            name: 实例名称
+            factory: 无参构造函数
+            watched_files: 实例依赖的配置文件，变化时重新构造
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _RegistryEntry(
+                    factory, tuple(os.path.abspath(path) for path in watched_files))
+
+    def get(self, name: str) -> Any:
+        """
+        获取实例：未构造时构造，配置文件变化时重新构造
+
+        Raises:
+            KeyError: 名称未注册
+            Exception: 第一次构造失败时抛出构造函数的异常
+        """
+        entry = self._entries[name]
+        instance = entry.instance
+        if instance is None:
+            with entry.lock:
+                if entry.instance is None:
+                    self._build(name, entry, raise_error=True)
+                return entry.instance
+
+        if not entry.watched_files:
+            return instance
+        now = time.monotonic()
+        if now - entry.checked_at < self.check_interval:
+            return instance
+        # 其他线程正在检查或重新构造时直接使用当前实例
+        if not entry.lock.acquire(blocking=False):
+            return instance
+        try:
+            entry.checked_at = now
+            if entry.current_signature() != entry.signature:
+                logger.info(f"{name} 的配置文件已变化，重新构造实例")
+                self._build(name, entry, raise_error=False)
+            return entry.instance
+        finally:
+            entry.lock.release()
+
+    def reload(self, name: Optional[str] = None) -> bool:
+        """
+        立即重新构造实例（不检查配置文件是否变化）
+
+        Args:
+            name: 实例名称，为None时重新构造所有已构造过的实例
+
+        Returns:
+            bool: 是否全部重新构造成功
+        """
+        names = [name] if name is not None else list(self._entries)
+        success = True
+        for entry_name in names:
+            entry = self._entries[entry_name]
+            with entry.lock:
+                if name is None and entry.instance is None:
+                    continue
+                success = self._build(entry_name, entry, raise_error=False) and success
+        return success
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """各实例的构造状态（用于调试）"""
+        return {
+            name: {
+                'built': entry.instance is not None,
+                'build_count': entry.build_count,
+                'built_at': entry.built_at,
+                'watched_files': list(entry.watched_files),
+            }
+            for name, entry in self._entries.items()
+        }
+
+    def _build(self, name: str, entry: _RegistryEntry, raise_error: bool) -> bool:
+        """构造实例并替换（调用方持有 entry.lock）"""
+        # 先记录文件状态再构造，构造期间文件再次变化时下次检查会重新构造
+        signature = entry.current_signature()
+        entry.checked_at = time.monotonic()
+        start_time = time.time()
+        try:
+            instance = entry.factory()
+        except Exception as e:
+            # 记录失败时的文件状态，配置文件修正后再重新构造
+            entry.signature = signature
+            logger.error(f"构造 {name} 失败: {e}")
+            if raise_error:
+                raise
+            return False
+        entry.instance = instance
+        entry.signature = signature
+        entry.build_count += 1
+        entry.built_at = time.time()
+        logger.info(f"{name} 构造完成，耗时 {entry.built_at - start_time:.2f}秒")
+        return True
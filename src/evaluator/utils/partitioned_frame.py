@@ -0,0 +1,104 @@
+"""
+按分区键预先分组的市场数据
+
+- 每行的分区键只在加载或新增数据时计算一次（由采集器提供分区键函数）
+- 分区保存为 分区键 -> 行位置数组，查询时按分区键取并集再按原顺序切片
+- 新增数据时基于equip_sn去重（保留最新），只为新增行计算分区键
+"""
+
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _key_array(keys: List[Hashable]) -> np.ndarray:
+    """分区键转为一维object数组（元组键不展开为二维）"""
+    array = np.empty(len(keys), dtype=object)
+    for i, key in enumerate(keys):
+        array[i] = key
+    return array
+
+
+class PartitionedFrame:
+    """按分区键分组的DataFrame（查询返回原数据的切片）"""
+
+    def __init__(self,
+                 data: pd.DataFrame,
+                 key_func: Callable[[pd.DataFrame], List[Hashable]],
+                 dedup_column: Optional[str] = 'equip_sn'):
+        """
+        Args:
+            data: 初始数据
+            key_func: 分区键函数，输入若干行数据，返回与行一一对应的分区键
+            dedup_column: 新增数据时用于去重的列
+        """
+        self.key_func = key_func
+        self.dedup_column = dedup_column
+        # 分区每次变化时递增，供调用方失效基于分区键的缓存
+        self.generation = 0
+        self._set_data(data.reset_index(drop=True), _key_array(self._compute_keys(data)))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def _compute_keys(self, data: pd.DataFrame) -> List[Hashable]:
+        if data.empty:
+            return []
+        keys = self.key_func(data)
+        if len(keys) != len(data):
+            raise ValueError(f"分区键数量({len(keys)})与行数({len(data)})不一致")
+        return keys
+
+    def _set_data(self, data: pd.DataFrame, keys: np.ndarray):
+        self.data = data
+        self.row_keys = keys
+        partitions: Dict[Hashable, List[int]] = {}
+        for position, key in enumerate(keys):
+            partitions.setdefault(key, []).append(position)
+        self.partitions = {key: np.asarray(positions, dtype=np.int64) for key, positions in partitions.items()}
+        self.generation += 1
+
+    def keys(self) -> Iterable[Hashable]:
+        """所有分区键"""
+        return self.partitions.keys()
+
+    def positions(self, keys: Iterable[Hashable]) -> np.ndarray:
+        """若干分区的行位置（按原顺序）"""
+        arrays = [self.partitions[key] for key in keys if key in self.partitions]
+        if not arrays:
+            return np.zeros(0, dtype=np.int64)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.sort(np.concatenate(arrays))
+
+    def rows(self, keys: Iterable[Hashable]) -> pd.DataFrame:
+        """若干分区的数据（按原顺序）"""
+        return self.data.iloc[self.positions(keys)]
+
+    def append(self, new_data: pd.DataFrame) -> int:
+        """
+        合并新增数据（与 concat + drop_duplicates(keep='last') 结果一致），只为新增行计算分区键
+
+        Args:
+            new_data: 新增数据
+
+        Returns:
+            int: 合并后的总行数
+        """
+        if new_data is None or new_data.empty:
+            return len(self.data)
+
+        new_data = new_data.reset_index(drop=True)
+        keep = np.ones(len(self.data), dtype=bool)
+        if self.dedup_column and self.dedup_column in new_data.columns and self.dedup_column in self.data.columns:
+            new_data = new_data.drop_duplicates(subset=[self.dedup_column], keep='last').reset_index(drop=True)
+            keep = ~self.data[self.dedup_column].isin(new_data[self.dedup_column]).to_numpy()
+
+        new_keys = _key_array(self._compute_keys(new_data))
+        if self.data.empty:
+            data = new_data
+        else:
+            data = pd.concat([self.data[keep], new_data], ignore_index=True)
+        self._set_data(data, np.concatenate([self.row_keys[keep], new_keys]))
+        return len(self.data)
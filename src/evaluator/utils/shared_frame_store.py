@@ -0,0 +1,418 @@
+"""
+多进程共享的全量市场数据
+
+- 全量缓存由一个写入进程（持有写入锁的进程）发布为列式文件，每次发布为一个新的版本目录
+- NumPy原生类型的列保存为.npy，各进程以只读内存映射挂载（同一份物理页由操作系统共享）
+- object列无法跨进程共享，统一编码为一个二进制文件（按类型编码，解码后与原数据类型一致），挂载时在各进程中解码
+- 版本切换：新版本目录写完后再原子替换 CURRENT 文件；读取进程发现版本变化时挂载新版本
+- 旧版本目录只保留最近几个；已挂载的内存映射在文件删除后仍然有效（POSIX）
+- 同样的版本目录也作为磁盘快照：记录数据的更新时间水位，进程冷启动时挂载快照后只补齐水位之后的增量
+- 挂载的数据不能原地修改：需要修改时先用 ensure_writable() 复制到进程私有内存
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.dataframe_codec import encode_dataframe_message, decode_dataframe_message
+from src.utils.project_path import get_project_root
+
+try:
+    import fcntl
+except ImportError:  # Windows：不支持多进程共享，按单进程运行
+    fcntl = None
+
+# 启用共享缓存的目录（由生产入口设置），未设置时各进程独立缓存
+SHARED_CACHE_DIR_ENV = 'MH_SHARED_CACHE_DIR'
+# 保留的版本数（当前版本和上一个版本）
+KEEP_GENERATIONS = 2
+# 读取进程检查版本变化的最小间隔（秒）
+CHECK_INTERVAL_SECONDS = 1.0
+# 写入进程合并更新后延迟发布的时间（秒），期间的多次更新只发布一次
+PUBLISH_DELAY_SECONDS = 5.0
+
+# 磁盘快照目录（未设置时为 data/snapshots，设置为空字符串时不使用快照）
+SNAPSHOT_DIR_ENV = 'MH_SNAPSHOT_DIR'
+# 单进程部署时写入快照的间隔（秒）
+SNAPSHOT_INTERVAL_SECONDS = 600.0
+# 超过该时间的快照不再使用（增量过多时直接全量加载）
+SNAPSHOT_MAX_AGE_HOURS = 24
+# 补齐增量时从水位向前多取的时间（秒），重复数据按主键去重
+SNAPSHOT_DELTA_OVERLAP_SECONDS = 300
+
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+OBJECTS_FILE = 'objects.mhdf'
+OWNER_LOCK_FILE = '.owner.lock'
+PUBLISH_LOCK_FILE = '.publish.lock'
+GENERATION_PREFIX = 'gen-'
+INDEX_COLUMN = '__index__'
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_shared_frame_store(name: str) -> Optional['SharedFrameStore']:
+    """
+    获取命名的共享数据存储（进程内单例）
+
+    Args:
+        name: 数据名称（如 equipment_market）
+
+    Returns:
+        Optional[SharedFrameStore]: 未启用共享缓存或平台不支持时返回None
+    """
+    root = os.environ.get(SHARED_CACHE_DIR_ENV)
+    if not root or fcntl is None:
+        return None
+    with _stores_lock:
+        store = _stores.get(name)
+        if store is None:
+            store = _stores[name] = SharedFrameStore(name, root)
+        return store
+
+
+def get_snapshot_store(name: str) -> Optional['SharedFrameStore']:
+    """
+    获取命名的磁盘快照存储：启用共享缓存时与共享缓存为同一存储（发布的版本即快照）
+
+    Args:
+        name: 数据名称
+
+    Returns:
+        Optional[SharedFrameStore]: 不使用快照时返回None
+    """
+    shared_store = get_shared_frame_store(name)
+    if shared_store is not None:
+        return shared_store
+    root = os.environ.get(SNAPSHOT_DIR_ENV)
+    if root is None:
+        root = os.path.join(get_project_root(), 'data', 'snapshots')
+    if not root:
+        return None
+    key = f"snapshot:{name}"
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SharedFrameStore(name, root)
+        return store
+
+
+def _is_numpy_column(series: pd.Series) -> bool:
+    dtype = series.dtype
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM'
+
+
+def ensure_writable(data: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """
+    返回可以原地修改的DataFrame：挂载的数据（数值列为只读内存映射）复制到进程私有内存，其他数据原样返回
+
+    Args:
+        data: 全量数据
+
+    Returns:
+        Optional[pd.DataFrame]: 数值列均可写的DataFrame
+    """
+    if data is None:
+        return None
+    for position in range(data.shape[1]):
+        series = data.iloc[:, position]
+        # 检查底层数组本身（写时复制模式下 to_numpy() 总是返回只读视图）
+        if _is_numpy_column(series) and not np.asarray(series.array).flags.writeable:
+            return data.copy()
+    return data
+
+
+class SharedFrameStore:
+    """按版本发布、以内存映射挂载的列式DataFrame"""
+
+    def __init__(self, name: str, root: str, watermark_column: Optional[str] = 'update_time'):
+        """
+        Args:
+            name: 数据名称，作为子目录名
+            root: 共享缓存根目录
+            watermark_column: 记录水位（最大更新时间）的列
+        """
+        self.name = name
+        self.watermark_column = watermark_column
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+
+        self._owner_file = None
+        self._owner_checked_at = 0.0
+        self._checked_at = 0.0
+        self._publish_timer = None
+        self._publish_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 写入进程
+    # ------------------------------------------------------------------
+    def is_owner(self) -> bool:
+        """
+        当前进程是否为写入进程（持有写入锁）
+
+        未持有锁时每隔 CHECK_INTERVAL_SECONDS 重试一次，写入进程退出后由其他进程接替
+        """
+        if self._owner_file is not None or fcntl is None:
+            return True
+        now = time.time()
+        if now - self._owner_checked_at < CHECK_INTERVAL_SECONDS:
+            return False
+        self._owner_checked_at = now
+
+        lock_file = open(os.path.join(self.path, OWNER_LOCK_FILE), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._owner_file = lock_file
+        self.logger.info(f"📦 进程 {os.getpid()} 成为共享缓存 {self.name} 的写入进程")
+        return True
+
+    def publish(self, data: pd.DataFrame) -> Optional[int]:
+        """
+        发布新版本
+
+        Args:
+            data: 全量数据
+
+        Returns:
+            Optional[int]: 新版本号，数据为空时返回None
+        """
+        if data is None or data.empty:
+            return None
+        with self._publish_lock, open(os.path.join(self.path, PUBLISH_LOCK_FILE), 'a') as lock_file:
+            # 多个进程同时发布时依次进行（全量刷新可能发生在任意进程）
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            start_time = time.time()
+            generation = max(self._list_generations() + [self.current_generation() or 0]) + 1
+            final_dir = os.path.join(self.path, f"{GENERATION_PREFIX}{generation:06d}")
+            temp_dir = f"{final_dir}.tmp-{os.getpid()}"
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            os.makedirs(temp_dir)
+
+            try:
+                manifest = self._write_frame(temp_dir, data)
+                manifest.update({'generation': generation, 'created_at': datetime.now().isoformat(),
+                                 'watermark': self._watermark(data)})
+                with open(os.path.join(temp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, ensure_ascii=False)
+                os.rename(temp_dir, final_dir)
+            except Exception:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                raise
+
+            # 原子切换当前版本
+            current_temp = os.path.join(self.path, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+            with open(current_temp, 'w', encoding='utf-8') as f:
+                f.write(str(generation))
+            os.replace(current_temp, os.path.join(self.path, CURRENT_FILE))
+
+            self._remove_old_generations(generation)
+            print(f"📦 共享缓存 {self.name} 已发布版本 {generation}: {len(data)} 条，"
+                  f"耗时: {time.time() - start_time:.2f}秒")
+            return generation
+
+    def schedule_publish(self, get_data: Callable[[], Optional[pd.DataFrame]],
+                         delay: float = PUBLISH_DELAY_SECONDS):
+        """
+        延迟发布（合并短时间内的多次更新）
+
+        Args:
+            get_data: 发布时调用，返回要发布的全量数据
+            delay: 延迟时间（秒）
+        """
+        def publish_worker():
+            self._publish_timer = None
+            try:
+                self.publish(get_data())
+            except Exception as e:
+                self.logger.error(f"发布共享缓存 {self.name} 失败: {e}")
+
+        if self._publish_timer is not None:
+            return
+        timer = threading.Timer(delay, publish_worker)
+        timer.daemon = True
+        self._publish_timer = timer
+        timer.start()
+
+    def _watermark(self, data: pd.DataFrame) -> Optional[str]:
+        """数据的最大更新时间（ISO字符串），没有该列或无法解析时为None"""
+        if not self.watermark_column or self.watermark_column not in data.columns:
+            return None
+        latest = pd.to_datetime(data[self.watermark_column], errors='coerce').max()
+        return None if pd.isna(latest) else latest.isoformat()
+
+    def _write_frame(self, directory: str, data: pd.DataFrame) -> dict:
+        """写入列文件，返回清单"""
+        columns = []
+        object_columns = {}
+        for position, name in enumerate(data.columns):
+            series = data.iloc[:, position]
+            if _is_numpy_column(series):
+                file_name = f"c{position:04d}.npy"
+                np.save(os.path.join(directory, file_name), np.ascontiguousarray(series.to_numpy()),
+                        allow_pickle=False)
+                columns.append({'name': name, 'storage': 'npy', 'file': file_name})
+            else:
+                object_columns[f"c{position:04d}"] = series.reset_index(drop=True)
+                columns.append({'name': name, 'storage': 'object', 'key': f"c{position:04d}"})
+
+        index = data.index
+        has_index = not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1)
+        if has_index:
+            object_columns[INDEX_COLUMN] = index.to_series(index=None).reset_index(drop=True)
+
+        if object_columns:
+            objects = pd.DataFrame(object_columns)
+            with open(os.path.join(directory, OBJECTS_FILE), 'wb') as f:
+                f.write(encode_dataframe_message({}, objects, compress=False))
+
+        return {'rows': len(data), 'columns': columns,
+                'index': {'name': index.name} if has_index else None}
+
+    def _list_generations(self):
+        generations = []
+        for entry in os.listdir(self.path):
+            if entry.startswith(GENERATION_PREFIX) and '.tmp' not in entry:
+                try:
+                    generations.append(int(entry[len(GENERATION_PREFIX):]))
+                except ValueError:
+                    continue
+        return generations
+
+    def _remove_old_generations(self, current: int):
+        """删除旧版本（保留最近 KEEP_GENERATIONS 个）"""
+        for generation in sorted(self._list_generations())[:-KEEP_GENERATIONS]:
+            if generation >= current:
+                continue
+            directory = os.path.join(self.path, f"{GENERATION_PREFIX}{generation:06d}")
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # 读取进程
+    # ------------------------------------------------------------------
+    def current_generation(self) -> Optional[int]:
+        """当前版本号，尚未发布时返回None"""
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), 'r', encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def read_manifest(self, generation: int) -> dict:
+        """读取版本清单（行数、列、创建时间、水位）"""
+        directory = os.path.join(self.path, f"{GENERATION_PREFIX}{generation:06d}")
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def attach_snapshot(self, max_age_hours: float = SNAPSHOT_MAX_AGE_HOURS
+                        ) -> Optional[Tuple[pd.DataFrame, Optional[datetime]]]:
+        """
+        冷启动时挂载最新快照
+
+        Args:
+            max_age_hours: 快照的最长有效时间（小时）
+
+        Returns:
+            Optional[Tuple[DataFrame, 增量起始时间]]：没有可用快照时返回None；
+            增量起始时间为水位减去 SNAPSHOT_DELTA_OVERLAP_SECONDS，快照没有水位时为None
+        """
+        generation = self.current_generation()
+        if generation is None:
+            return None
+        try:
+            manifest = self.read_manifest(generation)
+            created_at = datetime.fromisoformat(manifest['created_at'])
+            if datetime.now() - created_at > timedelta(hours=max_age_hours):
+                print(f"📦 快照 {self.name} 版本 {generation} 已超过 {max_age_hours} 小时，不再使用")
+                return None
+            generation, data = self.attach(generation)
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"挂载快照 {self.name} 失败: {e}")
+            return None
+
+        delta_since = None
+        if manifest.get('watermark'):
+            delta_since = datetime.fromisoformat(manifest['watermark']) - \
+                timedelta(seconds=SNAPSHOT_DELTA_OVERLAP_SECONDS)
+        print(f"📦 挂载快照 {self.name} 版本 {generation}: {len(data)} 条，水位: {manifest.get('watermark')}")
+        return data, delta_since
+
+    def attach(self, generation: Optional[int] = None) -> Tuple[Optional[int], Optional[pd.DataFrame]]:
+        """
+        挂载指定版本（默认当前版本）：数值列为只读内存映射，object列在本进程解码
+        （挂载结果不能原地修改，需要修改时先调用 ensure_writable()）
+
+        Returns:
+            Tuple[版本号, DataFrame]，没有可用版本时为 (None, None)
+        """
+        if generation is None:
+            generation = self.current_generation()
+        if generation is None:
+            return None, None
+
+        directory = os.path.join(self.path, f"{GENERATION_PREFIX}{generation:06d}")
+        manifest = self.read_manifest(generation)
+
+        objects = None
+        object_path = os.path.join(directory, OBJECTS_FILE)
+        if os.path.exists(object_path):
+            with open(object_path, 'rb') as f:
+                _, objects = decode_dataframe_message(f.read())
+
+        arrays = {}
+        for position, spec in enumerate(manifest['columns']):
+            if spec['storage'] == 'npy':
+                arrays[position] = np.load(os.path.join(directory, spec['file']), mmap_mode='r',
+                                           allow_pickle=False).view(np.ndarray)
+            else:
+                arrays[position] = objects[spec['key']].array
+
+        index = None
+        if manifest.get('index'):
+            index = pd.Index(objects[INDEX_COLUMN].array, name=manifest['index']['name'])
+
+        # copy=False：数值列直接引用内存映射，不复制到进程私有内存
+        data = pd.DataFrame(arrays, index=index if index is not None else pd.RangeIndex(manifest['rows']),
+                            copy=False)
+        data.columns = [spec['name'] for spec in manifest['columns']]
+        return generation, data
+
+    def poll(self, attached_generation: Optional[int]) -> Optional[Tuple[int, pd.DataFrame]]:
+        """
+        检查是否有新版本（最多每 CHECK_INTERVAL_SECONDS 检查一次）
+
+        Args:
+            attached_generation: 当前已挂载的版本
+
+        Returns:
+            Optional[Tuple[int, pd.DataFrame]]: 有新版本时返回挂载结果，否则返回None
+        """
+        now = time.time()
+        if attached_generation is not None and now - self._checked_at < CHECK_INTERVAL_SECONDS:
+            return None
+        self._checked_at = now
+
+        generation = self.current_generation()
+        if generation is None or generation == attached_generation:
+            return None
+        try:
+            generation, data = self.attach(generation)
+        except (OSError, ValueError, KeyError) as e:
+            # 版本目录在读取期间被清理：下次检查时挂载最新版本
+            self.logger.warning(f"挂载共享缓存 {self.name} 版本 {generation} 失败: {e}")
+            return None
+        print(f"📦 挂载共享缓存 {self.name} 版本 {generation}: {len(data)} 条")
+        return generation, data
@@ -8,9 +8,11 @@
 import json
 import os
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Mapping, Optional
 from functools import lru_cache
 
+from src.utils.js_config_cache import load_js_config_cached
+
 
 class ConfigLoader:
     """配置加载器 - 从game_auto_config.js读取配置"""
@@ -19,7 +21,7 @@ class ConfigLoader:
     
     def __init__(self, logger: Optional[logging.Logger] = None):
         self.logger = logger if logger else self._setup_logger()
-        self._cached_config: Optional[Dict[str, Any]] = None
+        self._cached_config: Optional[Mapping[str, Any]] = None
     
     def _setup_logger(self) -> logging.Logger:
         """设置日志器"""
@@ -33,8 +35,8 @@ class ConfigLoader:
         return logger
     
     @lru_cache(maxsize=1)
-    def _load_full_config(self) -> Dict[str, Any]:
-        """加载完整配置（带缓存）"""
+    def _load_full_config(self) -> Mapping[str, Any]:
+        """加载完整配置（带缓存，配置项按需解码，只读使用）"""
         if self._cached_config:
             return self._cached_config
             
@@ -42,21 +44,9 @@ class ConfigLoader:
             if not os.path.exists(self.CONFIG_FILE):
                 raise FileNotFoundError(f"配置文件不存在: {self.CONFIG_FILE}")
             
-            with open(self.CONFIG_FILE, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # game_auto_config.js 是一个JavaScript变量文件
-            # 格式：var CBG_GAME_CONFIG={...}
-            var_prefix = 'var CBG_GAME_CONFIG='
-            start_pos = content.find(var_prefix)
-            if start_pos == -1:
-                raise ValueError(f"未找到JavaScript变量: CBG_GAME_CONFIG")
-            
-            # 获取JSON部分（从=号后开始）
-            json_start = start_pos + len(var_prefix)
-            json_content = content[json_start:].strip()
-            
-            self._cached_config = json.loads(json_content)
+            # game_auto_config.js 是一个JavaScript变量文件，格式：var CBG_GAME_CONFIG={...}
+            # 通过二进制缓存加载，各配置项（神器、召唤兽技能、内丹、装备等）在第一次访问时才解码
+            self._cached_config = load_js_config_cached(self.CONFIG_FILE, 'CBG_GAME_CONFIG')
             self.logger.info(f"成功加载game_auto_config.js配置，包含{len(self._cached_config)}个配置项")
             return self._cached_config
             
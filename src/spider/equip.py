@@ -9,13 +9,10 @@ import os
 import sys
 import json
 import time
-import random
 import logging
 from datetime import datetime
 from urllib.parse import urlencode
 import asyncio
-import pandas as pd
-from playwright.async_api import async_playwright
 import re
 import threading
 from concurrent.futures import ThreadPoolExecutor
@@ -25,27 +22,16 @@ from src.utils.project_path import get_project_root
 project_root = get_project_root()
 sys.path.insert(0, project_root)
 
+# 爬虫以子进程方式按服务器启动，模块级只导入抓取第一页需要的依赖；
+# pandas、Playwright、Flask/SQLAlchemy、搜索参数工具、特征提取器在第一次用到时再导入
+# （导入耗时见 tests/benchmark_spider_startup.py）
 from src.tools.setup_requests_session import setup_session
-from src.database import db
-from src.models.equipment import Equipment
-from src.tools.search_form_helper import (
-    get_equip_search_params_sync,
-    get_lingshi_search_params_sync,
-    get_pet_equip_search_params_sync,
-    get_equip_search_params_async,
-    get_lingshi_search_params_async,
-    get_pet_equip_search_params_async,
-)
 from src.utils.cookie_manager import (
     setup_session_with_cookies, 
     get_playwright_cookies_for_context,
     verify_cookie_validity
 )
-
-# 导入特征提取器
-from src.evaluator.feature_extractor.lingshi_feature_extractor import LingshiFeatureExtractor
-from src.evaluator.feature_extractor.pet_equip_feature_extractor import PetEquipFeatureExtractor
-from src.evaluator.feature_extractor.equip_feature_extractor import EquipFeatureExtractor
+from src.spider.page_scheduler import PageCrawlScheduler
 
 # 导入装备类型常量
 from src.evaluator.constants.equipment_types import LINGSHI_KINDIDS, PET_EQUIP_KINDID,WEAPON_KINDIDS,ARMOR_KINDIDS
@@ -56,10 +42,10 @@ class CBGEquipSpider:
         self.base_url = 'https://xyq.cbg.163.com/cgi-bin/recommend.py'
         self.output_dir = self.create_output_dir()
         
-        # 初始化特征提取器
-        self.lingshi_feature_extractor = LingshiFeatureExtractor()
-        self.pet_equip_feature_extractor = PetEquipFeatureExtractor()
-        self.equip_feature_extractor = EquipFeatureExtractor()
+        # 特征提取器在第一次解析对应类型的装备时初始化（一次爬取通常只用到其中一个）
+        self._lingshi_feature_extractor = None
+        self._pet_equip_feature_extractor = None
+        self._equip_feature_extractor = None
         # 配置专用的日志器，避免与其他模块冲突
         self.logger = self._setup_logger()
         
@@ -71,6 +57,27 @@ class CBGEquipSpider:
         self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='EquipDB-')
         self.logger.info("线程池初始化完成，最大并发数: 3")
 
+    @property
+    def lingshi_feature_extractor(self):
+        if self._lingshi_feature_extractor is None:
+            from src.evaluator.feature_extractor.lingshi_feature_extractor import LingshiFeatureExtractor
+            self._lingshi_feature_extractor = LingshiFeatureExtractor()
+        return self._lingshi_feature_extractor
+
+    @property
+    def pet_equip_feature_extractor(self):
+        if self._pet_equip_feature_extractor is None:
+            from src.evaluator.feature_extractor.pet_equip_feature_extractor import PetEquipFeatureExtractor
+            self._pet_equip_feature_extractor = PetEquipFeatureExtractor()
+        return self._pet_equip_feature_extractor
+
+    @property
+    def equip_feature_extractor(self):
+        if self._equip_feature_extractor is None:
+            from src.evaluator.feature_extractor.equip_feature_extractor import EquipFeatureExtractor
+            self._equip_feature_extractor = EquipFeatureExtractor()
+        return self._equip_feature_extractor
+
     def _setup_logger(self):
         """设置专用的日志器"""
         # 创建专用的日志器
@@ -449,6 +456,11 @@ class CBGEquipSpider:
 
         # 根据同步/异步模式选择不同的参数获取函数
         # （当前爬虫是同步的，所以使用同步函数）
+        from src.tools.search_form_helper import (
+            get_equip_search_params_sync,
+            get_lingshi_search_params_sync,
+            get_pet_equip_search_params_sync,
+        )
         params_getter_map = {
             'normal': get_equip_search_params_sync,
             'lingshi': get_lingshi_search_params_sync,
@@ -533,6 +545,25 @@ class CBGEquipSpider:
             for equipment in equipments
         ]
     
+    def _attach_precomputed_features(self, new_data_df):
+        """
+        为新数据附加预计算特征列（失败时返回原数据，由估价端惰性提取）
+        
+        Args:
+            new_data_df: 过滤后的DataFrame
+            
+        Returns:
+            DataFrame: 带预计算特征列的DataFrame
+        """
+        try:
+            from src.evaluator.market_anchor.equip.equip_market_data_collector import EquipMarketDataCollector
+            
+            collector = EquipMarketDataCollector.get_instance()
+            return collector.attach_precomputed_features(new_data_df)
+        except Exception as e:
+            self.logger.warning(f"预计算装备特征失败，估价时将重新提取: {e}")
+            return new_data_df
+    
     def _get_redis_total_count(self):
         """
         获取Redis中的装备总条数
@@ -549,8 +580,7 @@ class CBGEquipSpider:
             
             if redis_cache and redis_cache.is_available():
                 # 获取Redis Hash的总条数
-                full_key = redis_cache._make_key(collector._full_cache_key)
-                total_count = redis_cache.client.hlen(full_key)
+                total_count = redis_cache.get_hash_count(collector._full_cache_key)
                 self.logger.debug(f"Redis装备总条数: {total_count}")
                 return total_count
             else:
@@ -596,7 +626,7 @@ class CBGEquipSpider:
     
     def _batch_save_to_mysql(self, equipments):
         """
-        批量保存到MySQL，优化数据库查询性能
+        批量保存到MySQL（INSERT ... ON DUPLICATE KEY UPDATE，按块执行，不加载ORM对象）
         
         Args:
             equipments: 装备数据列表
@@ -604,54 +634,26 @@ class CBGEquipSpider:
         Returns:
             tuple: (新增数量, 更新数量)
         """
+        from src.database import db
+        from src.models.equipment import Equipment
+        from src.utils.smart_db_helper import bulk_upsert
+
         try:
-            # 批量查询已存在的装备（一次查询代替N次查询）
-            equip_sns = [eq.get('equip_sn') for eq in equipments if eq.get('equip_sn')]
-            
-            existing_equipments = {}
-            if equip_sns:
-                existing_list = db.session.query(Equipment).filter(
-                    Equipment.equip_sn.in_(equip_sns)
-                ).all()
-                existing_equipments = {eq.equip_sn: eq for eq in existing_list}
-            
-            new_equipments = []
-            updated_count = 0
-            
-            # 遍历装备数据，分类为新增和更新
-            for equipment_data in equipments:
-                try:
-                    equip_sn = equipment_data.get('equip_sn')
-                    
-                    if equip_sn and equip_sn in existing_equipments:
-                        # 更新现有记录
-                        existing = existing_equipments[equip_sn]
-                        for key, value in equipment_data.items():
-                            if hasattr(existing, key):
-                                setattr(existing, key, value)
-                        existing.update_time = datetime.now()
-                        updated_count += 1
-                    else:
-                        # 准备新记录
-                        new_equipments.append(Equipment(**equipment_data))
-                        
-                except Exception as e:
-                    self.logger.error(f"处理单个装备数据失败: {e}")
-                    continue
-            
-            # 批量插入新记录
-            if new_equipments:
-                db.session.bulk_save_objects(new_equipments)
+            # 同一批次中equip_sn重复的数据只保留最后一条，冲突时保留create_time
+            result = bulk_upsert(db.session.connection(), Equipment.__table__, equipments,
+                                 protected_columns=('create_time',))
             
             # 提交事务
             db.session.commit()
             
-            if len(new_equipments) > 0:
-                self.logger.info(f"✅ 成功保存 {len(new_equipments)} 条新装备数据到MySQL数据库")
-            if updated_count > 0:
-                self.logger.info(f"✅ 更新 {updated_count} 条已存在的装备数据")
+            if result['inserted'] > 0:
+                self.logger.info(f"✅ 成功保存 {result['inserted']} 条新装备数据到MySQL数据库")
+            if result['updated'] > 0:
+                self.logger.info(f"✅ 更新 {result['updated']} 条已存在的装备数据")
+            if result['skipped'] > 0:
+                self.logger.warning(f"⚠️ 跳过 {result['skipped']} 条缺少equip_sn的装备数据")
             
-            return len(new_equipments), updated_count
+            return result['inserted'], result['updated']
             
         except Exception as e:
             db.session.rollback()
@@ -700,6 +702,9 @@ class CBGEquipSpider:
             # 优化：只过滤一次，避免重复代码
             filtered_equipments = self._filter_equipment_fields(equipments)
             new_data_df = pd.DataFrame(filtered_equipments)
+
+            # 保存时提取一次普通装备特征，随DataFrame一起发布和同步到Redis
+            new_data_df = self._attach_precomputed_features(new_data_df)
             
             # 第一步：立即发布DataFrame消息，快速更新内存缓存（最高优先级，超快响应）
             publish_success = self._publish_dataframe_message(new_data_df, len(equipments))
@@ -861,6 +866,23 @@ class CBGEquipSpider:
         Returns:
             list: 解析后的装备数据
         """
+        text = await self.fetch_page_text(page, search_params, search_type)
+        if text is None:
+            return None
+        return self.parse_jsonp_response(text)
+
+    async def fetch_page_text(self, page=1, search_params=None, search_type='overall_search_equip'):
+        """
+        获取单页装备的原始JSONP响应（由调度器判断是否被限流后再解析）
+        
+        Args:
+            page: 页码
+            search_params: 搜索参数
+            search_type: 搜索类型
+            
+        Returns:
+            str: 响应文本，请求失败时返回None
+        """
         try:
             # 确保search_params不为None
             if search_params is None:
@@ -888,6 +910,7 @@ class CBGEquipSpider:
             url = f"{self.base_url}?{urlencode(params)}"
             
             # 使用Playwright发送请求
+            from playwright.async_api import async_playwright
             async with async_playwright() as p:
                 browser = await p.chromium.launch(headless=True)
                 context = await browser.new_context()
@@ -903,10 +926,7 @@ class CBGEquipSpider:
                 if response:
                     text = await response.text()
                     await browser.close()
-                    
-                    # 解析响应
-                    parsed_result = self.parse_jsonp_response(text)
-                    return parsed_result
+                    return text
                 
                 await browser.close()
                 return None
@@ -915,10 +935,13 @@ class CBGEquipSpider:
             self.logger.error(f"获取装备第{page}页数据时出错: {e}")
             return None
 
-    async def crawl_all_pages_async(self, max_pages=10, delay_range=None, use_browser=False, equip_type='normal', cached_params=None):
+    async def crawl_all_pages_async(self, max_pages=10, delay_range=None, use_browser=False, equip_type='normal', cached_params=None,
+                                    concurrency=1, rate=None):
         """
         异步爬取所有装备页面
         - equip_type: 'normal', 'lingshi', 'pet'
+        - concurrency: 同时在途的页面请求数
+        - rate: 每秒请求数（为None时按delay_range的平均间隔限速）
         """
         # 首先验证Cookie有效性
         self.logger.info("正在验证Cookie有效性...")
@@ -951,12 +974,6 @@ class CBGEquipSpider:
 
         self.logger.info(f" 开始 {equip_type} 装备爬取，最大页数: {max_pages}")
 
-        # 获取参数
-        params_getter_async_map = {
-            'normal': get_equip_search_params_async,
-            'lingshi': get_lingshi_search_params_async,
-            'pet': get_pet_equip_search_params_async
-        }
         params_file = f'config/equip_params_{equip_type}.json'
         
         # 强制浏览器模式：如果use_browser为True，则删除旧参数文件
@@ -975,6 +992,17 @@ class CBGEquipSpider:
             search_params = cached_params
             self.logger.info(f" 使用传入的缓存参数: {len(search_params)} 个")
         else:
+            # 获取参数（只有未传入缓存参数时才需要搜索参数工具）
+            from src.tools.search_form_helper import (
+                get_equip_search_params_async,
+                get_lingshi_search_params_async,
+                get_pet_equip_search_params_async,
+            )
+            params_getter_async_map = {
+                'normal': get_equip_search_params_async,
+                'lingshi': get_lingshi_search_params_async,
+                'pet': get_pet_equip_search_params_async
+            }
             search_params = await params_getter_async_map[equip_type](use_browser=use_browser)
             if search_params:
                 self.logger.info(f" 使用搜索参数: {len(search_params)} 个")
@@ -983,64 +1011,51 @@ class CBGEquipSpider:
             self.logger.error(f"无法获取 {equip_type} 装备的搜索参数，爬取中止")
             return
             
-        total_saved_count = 0
-        successful_pages = 0
-        
-        for page_num in range(1, max_pages + 1):
-            try:
-                # 确保日志立即输出
-                self.logger.info(f"📄 正在爬取 {equip_type} 装备第 {page_num} 页...")
-                # 强制刷新日志缓冲
-                import sys
-                sys.stdout.flush()
-                
-                equipments = await self.fetch_page(page_num, search_params, search_type)
-                
-                if equipments is None:
-                    self.logger.warning(f" 第 {page_num} 页数据获取失败，尝试重试...")
-                    await asyncio.sleep(5) # 等待5秒重试
-                    equipments = await self.fetch_page(page_num, search_params, search_type)
+        def handle_page(page_num, equipments):
+            saved_count = self.save_equipment_data(equipments)
+            
+            # 打印每条装备的简要信息
+            for equipment in equipments:
+                price = equipment.get('price_desc', equipment.get('price', '未知'))
+                equip_name = equipment.get('equip_name', '未知装备')
+                level = equipment.get('level', '未知')
+                server_name = equipment.get('server_name', '未知服务器')
+                seller_nickname = equipment.get('seller_nickname', '未知卖家')
+                self.logger.info(f"￥{price} - {equip_name}({level}级) - {server_name} - {seller_nickname}")
+            
+            self.logger.info(f" 第 {page_num} 页完成，获取 {len(equipments)} 条装备，保存 {saved_count} 条")
+            # 判断数据条数是否不足10条，如果不足则说明没有下一页
+            if len(equipments) < 10:
+                self.logger.info(f"📄 第 {page_num} 页数据条数({len(equipments)})不足10条，判断为最后一页，爬取结束")
+            sys.stdout.flush()
+            return saved_count
 
-                if equipments:
-                    saved_count = self.save_equipment_data(equipments)
-                    total_saved_count += saved_count
-                    successful_pages += 1
-                    
-                    # 打印每条装备的简要信息
-                    for equipment in equipments:
-                        price = equipment.get('price_desc', equipment.get('price', '未知'))
-                        equip_name = equipment.get('equip_name', '未知装备')
-                        level = equipment.get('level', '未知')
-                        server_name = equipment.get('server_name', '未知服务器')
-                        seller_nickname = equipment.get('seller_nickname', '未知卖家')
-                        self.logger.info(f"￥{price} - {equip_name}({level}级) - {server_name} - {seller_nickname}")
-                    
-                    self.logger.info(f" 第 {page_num} 页完成，获取 {len(equipments)} 条装备，保存 {saved_count} 条")
-                    
-                    # 判断数据条数是否不足10条，如果不足则说明没有下一页
-                    if len(equipments) < 10:
-                        self.logger.info(f"📄 第 {page_num} 页数据条数({len(equipments)})不足10条，判断为最后一页，爬取结束")
-                        break
-                else:
-                    self.logger.info(f"📄 第 {page_num} 页没有数据，爬取结束")
-                    break 
+        async def fetch_text(page_num):
+            self.logger.info(f"📄 正在爬取 {equip_type} 装备第 {page_num} 页...")
+            sys.stdout.flush()
+            return await self.fetch_page_text(page_num, search_params, search_type)
 
-                # 添加延迟
-                if delay_range and page_num < max_pages:  # 最后一页不需要延迟
-                    delay = random.uniform(delay_range[0], delay_range[1])
-                    self.logger.info(f"⏳ 等待 {delay:.2f} 秒后继续...")
-                    await asyncio.sleep(delay)
-                    
-            except Exception as e:
-                self.logger.error(f"处理第 {page_num} 页时发生异常: {e}")
-                import traceback
-                traceback.print_exc()
-                break
+        scheduler = PageCrawlScheduler(
+            concurrency=concurrency, rate=rate, delay_range=delay_range, logger=self.logger)
+        self.logger.info(f"📄 并发页数: {scheduler.concurrency}, 限速: "
+                         f"{f'{scheduler.base_rate:.3f} 页/秒' if scheduler.base_rate else '不限速'}")
+        sys.stdout.flush()
+
+        stats = await scheduler.run(
+            max_pages,
+            fetch_text=fetch_text,
+            parse_page=self.parse_jsonp_response,
+            handle_page=handle_page,
+            is_last_page=lambda equipments: len(equipments) < 10,
+        )
+        total_saved_count = stats['saved_count']
+        successful_pages = stats['successful_pages']
+        if stats['throttle_count']:
+            self.logger.warning(f" 爬取过程中被限流 {stats['throttle_count']} 次")
 
         self.logger.info(f" {equip_type} 装备爬取完成！成功页数: {successful_pages}/{max_pages}, 总装备数: {total_saved_count}")
         
         # 强制刷新所有日志缓冲区，确保日志被完整写入文件
-        import sys
         sys.stdout.flush()
         sys.stderr.flush()
         
@@ -1049,7 +1064,8 @@ class CBGEquipSpider:
             if hasattr(handler, 'flush'):
                 handler.flush()
 
-    def crawl_all_pages(self, max_pages=10, delay_range=None, use_browser=False, equip_type='normal', cached_params=None):
+    def crawl_all_pages(self, max_pages=10, delay_range=None, use_browser=False, equip_type='normal', cached_params=None,
+                        concurrency=1, rate=None):
         """
         同步启动异步装备爬虫的入口
         """
@@ -1059,7 +1075,9 @@ class CBGEquipSpider:
                 delay_range=delay_range,
                 use_browser=use_browser,
                 equip_type=equip_type,
-                cached_params=cached_params
+                cached_params=cached_params,
+                concurrency=concurrency,
+                rate=rate
             ))
         except Exception as e:
             self.logger.error(f"启动装备爬虫失败: {e}")
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫分页并发调度器
+- 每个搜索类型同时保持N个页面请求在途
+- 令牌桶限速，取代固定的随机延迟(delay_range)
+- JSONP响应提示请求过于频繁时，全局暂停并降低速率（指数退避），请求成功后逐步恢复
+- 角色(CBGSpider)、装备(CBGEquipSpider)、召唤兽(CBGPetSpider)爬虫共用
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 藏宝阁限流时的提示关键字（JSONP的msg字段或非JSONP的错误页面）
+THROTTLE_KEYWORDS = ('频繁', '过快', '稍后再试', '稍候再试', '验证码', 'captcha', 'too many requests')
+
+
+def detect_throttle(text: Optional[str]) -> bool:
+    """
+    判断响应是否为限流提示
+
+    Args:
+        text: 原始响应文本
+
+    Returns:
+        bool: 是否被限流
+    """
+    if not text:
+        return False
+
+    start = text.find('(') + 1
+    end = text.rfind(')')
+    if start > 0 and end > start:
+        try:
+            data = json.loads(text[start:end])
+        except (ValueError, TypeError):
+            data = None
+        if isinstance(data, dict):
+            if data.get('equip_list'):
+                return False
+            message = str(data.get('msg') or data.get('message') or '').lower()
+            return any(keyword in message for keyword in THROTTLE_KEYWORDS)
+
+    # 非JSONP响应（如429错误页面）检查原文
+    lowered = text[:2000].lower()
+    return any(keyword in lowered for keyword in THROTTLE_KEYWORDS)
+
+
+def rate_from_delay_range(delay_range: Optional[Tuple[float, float]]) -> Optional[float]:
+    """将旧的延迟范围换算为令牌桶速率（每秒请求数），平均间隔与原随机延迟一致"""
+    if not delay_range:
+        return None
+    mean_delay = (float(delay_range[0]) + float(delay_range[1])) / 2
+    return 1.0 / mean_delay if mean_delay > 0 else None
+
+
+class AsyncTokenBucket:
+    """异步令牌桶（速率可动态调整，rate为None时不限速）"""
+
+    def __init__(self, rate: Optional[float], capacity: float = 1.0):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = None
+        self._lock_loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        """按事件循环创建锁（同步入口每次asyncio.run都是新的事件循环）"""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def set_rate(self, rate: Optional[float]):
+        """调整速率（先按旧速率结算已经补充的令牌）"""
+        self._refill()
+        self.rate = rate
+
+    async def acquire(self):
+        """取一个令牌，不足时等待（按调用顺序排队）"""
+        if not self.rate:
+            return
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PageCrawlScheduler:
+    """分页并发爬取调度器"""
+
+    def __init__(self, concurrency: int = 1, rate: Optional[float] = None,
+                 delay_range: Optional[Tuple[float, float]] = None, burst: Optional[float] = None,
+                 max_retries: int = 2, retry_delay: float = 5.0,
+                 backoff_base: float = 10.0, backoff_max: float = 300.0,
+                 min_rate_ratio: float = 0.125, bucket: Optional[AsyncTokenBucket] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            concurrency: 同时在途的页面请求数
+            rate: 每秒请求数（为None时由delay_range换算，两者都为None时不限速）
+            delay_range: 兼容旧参数的延迟范围(min_seconds, max_seconds)
+            burst: 令牌桶容量，默认与并发数相同
+            max_retries: 单页失败或被限流后的最大重试次数
+            retry_delay: 请求失败后的重试等待秒数
+            backoff_base: 首次被限流时的暂停秒数，连续限流时翻倍
+            backoff_max: 最长暂停秒数
+            min_rate_ratio: 限流降速的下限（相对初始速率）
+            bucket: 共享的令牌桶（多个调度器共用同一速率预算时传入）
+            logger: 日志器
+        """
+        self.concurrency = max(1, int(concurrency or 1))
+        self.base_rate = rate if rate else rate_from_delay_range(delay_range)
+        if bucket is not None:
+            self.base_rate = self.base_rate or bucket.rate
+            self.bucket = bucket
+        else:
+            self.bucket = AsyncTokenBucket(self.base_rate, burst if burst else self.concurrency)
+        self.max_retries = max(0, int(max_retries))
+        self.retry_delay = retry_delay
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_rate = self.base_rate * min_rate_ratio if self.base_rate else None
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+        self.stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats() -> Dict[str, Any]:
+        return {
+            'successful_pages': 0,
+            'failed_pages': 0,
+            'item_count': 0,
+            'saved_count': 0,
+            'throttle_count': 0,
+            'last_page': None,
+        }
+
+    async def _call(self, func: Callable, *args):
+        """调用同步或异步函数（同步的请求函数放到线程中执行，避免阻塞事件循环）"""
+        if inspect.iscoroutinefunction(func):
+            return await func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    def _on_throttle(self, page: int):
+        """被限流：全局暂停一段时间并降低速率"""
+        self.stats['throttle_count'] += 1
+        self._consecutive_throttles += 1
+        backoff = min(self.backoff_max, self.backoff_base * (2 ** (self._consecutive_throttles - 1)))
+        backoff *= random.uniform(1.0, 1.25)
+        self._paused_until = max(self._paused_until, time.monotonic() + backoff)
+        if self.bucket.rate:
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+        rate_desc = f"{self.bucket.rate:.3f}/秒" if self.bucket.rate else "不限速"
+        self.logger.warning(f"第 {page} 页请求被限流，暂停 {backoff:.1f} 秒，当前速率 {rate_desc}")
+
+    def _on_success(self):
+        """请求成功：清除连续限流计数，速率逐步恢复到初始值"""
+        self._consecutive_throttles = 0
+        if self.base_rate and self.bucket.rate < self.base_rate:
+            self.bucket.set_rate(min(self.base_rate, self.bucket.rate + self.base_rate * 0.1))
+
+    async def _wait_backoff(self):
+        while True:
+            remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    async def _fetch_with_retry(self, page: int, fetch_text: Callable, parse_page: Callable) -> Optional[List]:
+        """获取并解析单页数据，失败或被限流时重试"""
+        for attempt in range(self.max_retries + 1):
+            await self._wait_backoff()
+            await self.bucket.acquire()
+
+            text = await self._call(fetch_text, page)
+            if detect_throttle(text):
+                self._on_throttle(page)
+                continue
+
+            items = parse_page(text) if text is not None else None
+            if items is not None:
+                self._on_success()
+                return items
+
+            if attempt < self.max_retries:
+                self.logger.warning(f" 第 {page} 页数据获取失败，{self.retry_delay:.0f} 秒后重试...")
+                await asyncio.sleep(self.retry_delay)
+        return None
+
+    async def run(self, max_pages: int, fetch_text: Callable, parse_page: Callable,
+                  handle_page: Callable, is_last_page: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        并发爬取第1页到第max_pages页
+
+        Args:
+            max_pages: 最大页数
+            fetch_text: fetch_text(page) -> 原始响应文本（同步或异步函数），失败返回None
+            parse_page: parse_page(text) -> 数据列表，解析失败返回None
+            handle_page: handle_page(page, items) -> 保存条数（同步或异步函数，在事件循环中依次执行）
+            is_last_page: is_last_page(items) -> 是否为最后一页
+
+        Returns:
+            Dict: 统计信息
+        """
+        self.stats = self._new_stats()
+        next_page = 1
+        stop_page = max_pages
+
+        async def worker():
+            nonlocal next_page, stop_page
+            while next_page <= stop_page:
+                page = next_page
+                next_page += 1
+
+                try:
+                    items = await self._fetch_with_retry(page, fetch_text, parse_page)
+                except Exception as e:
+                    self.logger.error(f"获取第 {page} 页时发生异常: {e}")
+                    items = None
+
+                if not items:
+                    # 获取失败或没有数据：不再发起更后面的页面请求
+                    if items is None:
+                        self.stats['failed_pages'] += 1
+                        self.logger.warning(f" 第 {page} 页数据获取失败，停止发起后续页面")
+                    else:
+                        self.logger.info(f"📄 第 {page} 页没有数据，爬取结束")
+                    stop_page = min(stop_page, page - 1)
+                    continue
+
+                if is_last_page and is_last_page(items):
+                    stop_page = min(stop_page, page)
+
+                try:
+                    result = handle_page(page, items)
+                    if inspect.isawaitable(result):
+                        result = await result
+                except Exception as e:
+                    self.logger.error(f"处理第 {page} 页时发生异常: {e}")
+                    stop_page = min(stop_page, page - 1)
+                    continue
+
+                self.stats['successful_pages'] += 1
+                self.stats['item_count'] += len(items)
+                self.stats['saved_count'] += int(result or 0)
+                self.stats['last_page'] = max(self.stats['last_page'] or 0, page)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, max(1, max_pages)))))
+        return self.stats
+
+    def run_sync(self, *args, **kwargs) -> Dict[str, Any]:
+        """同步入口（供同步爬虫使用）"""
+        return asyncio.run(self.run(*args, **kwargs))
@@ -9,7 +9,6 @@ import os
 import sys
 import json
 import time
-import random
 import logging
 from datetime import datetime
 from urllib.parse import urlencode
@@ -27,6 +26,7 @@ sys.path.insert(0, project_root)
 from src.tools.setup_requests_session import setup_session
 from src.database import db
 from src.models.pet import Pet
+from src.utils.smart_db_helper import bulk_upsert
 from src.tools.search_form_helper import (
     get_pet_search_params_sync,
     get_pet_search_params_async
@@ -36,6 +36,7 @@ from src.utils.cookie_manager import (
     get_playwright_cookies_for_context,
     verify_cookie_validity
 )
+from src.spider.page_scheduler import PageCrawlScheduler
 
 # 导入召唤兽描述解析相关模块
 from src.spider.helper.decode_desc import parse_pet_info
@@ -434,8 +435,7 @@ class CBGPetSpider:
             
             if redis_cache and redis_cache.is_available():
                 # 获取Redis Hash的总条数
-                full_key = redis_cache._make_key(collector._full_cache_key)
-                total_count = redis_cache.client.hlen(full_key)
+                total_count = redis_cache.get_hash_count(collector._full_cache_key)
                 self.logger.debug(f"Redis召唤兽总条数: {total_count}")
                 return total_count
             else:
@@ -481,7 +481,7 @@ class CBGPetSpider:
     
     def _batch_save_to_mysql(self, pets):
         """
-        批量保存到MySQL，优化数据库查询性能
+        批量保存到MySQL（INSERT ... ON DUPLICATE KEY UPDATE，按块执行，不加载ORM对象）
         
         Args:
             pets: 召唤兽数据列表
@@ -490,72 +490,21 @@ class CBGPetSpider:
             tuple: (新增数量, 更新数量)
         """
         try:
-            # 批量查询已存在的召唤兽（一次查询代替N次查询）
-            equip_sns = [pet.get('equip_sn') for pet in pets if pet.get('equip_sn')]
-            
-            existing_pets = {}
-            if equip_sns:
-                existing_list = db.session.query(Pet).filter(
-                    Pet.equip_sn.in_(equip_sns)
-                ).all()
-                existing_pets = {pet.equip_sn: pet for pet in existing_list}
-            
-            new_pets = []
-            updated_count = 0
-            
-            # 遍历召唤兽数据，分类为新增和更新
-            # 先对同一批次中的重复数据进行去重（保留最后一个）
-            seen_equip_sns = set()
-            unique_pets = []
-            for pet_data in pets:
-                equip_sn = pet_data.get('equip_sn')
-                if equip_sn:
-                    if equip_sn in seen_equip_sns:
-                        # 找到已存在的记录并替换
-                        for i, existing_pet in enumerate(unique_pets):
-                            if existing_pet.get('equip_sn') == equip_sn:
-                                unique_pets[i] = pet_data
-                                break
-                    else:
-                        seen_equip_sns.add(equip_sn)
-                        unique_pets.append(pet_data)
-                else:
-                    # 没有equip_sn的记录直接添加
-                    unique_pets.append(pet_data)
-            
-            for pet_data in unique_pets:
-                try:
-                    equip_sn = pet_data.get('equip_sn')
-                    
-                    if equip_sn and equip_sn in existing_pets:
-                        # 更新现有记录
-                        existing = existing_pets[equip_sn]
-                        for key, value in pet_data.items():
-                            if hasattr(existing, key):
-                                setattr(existing, key, value)
-                        existing.update_time = datetime.now()
-                        updated_count += 1
-                    else:
-                        # 准备新记录
-                        new_pets.append(Pet(**pet_data))
-                        
-                except Exception as e:
-                    self.logger.error(f"处理单个召唤兽数据失败: {e}")
-                    continue
-            
-            # 批量插入新记录
-            if new_pets:
-                db.session.bulk_save_objects(new_pets)
+            # 同一批次中equip_sn重复的数据只保留最后一条，冲突时保留create_time
+            result = bulk_upsert(db.session.connection(), Pet.__table__, pets,
+                                 protected_columns=('create_time',))
             
             # 提交事务
             db.session.commit()
             
-            if len(new_pets) > 0:
-                self.logger.info(f"✅ 成功保存 {len(new_pets)} 条新召唤兽数据到MySQL数据库")
-            if updated_count > 0:
-                self.logger.info(f"✅ 更新 {updated_count} 条已存在的召唤兽数据")
+            if result['inserted'] > 0:
+                self.logger.info(f"✅ 成功保存 {result['inserted']} 条新召唤兽数据到MySQL数据库")
+            if result['updated'] > 0:
+                self.logger.info(f"✅ 更新 {result['updated']} 条已存在的召唤兽数据")
+            if result['skipped'] > 0:
+                self.logger.warning(f"⚠️ 跳过 {result['skipped']} 条缺少equip_sn的召唤兽数据")
             
-            return len(new_pets), updated_count
+            return result['inserted'], result['updated']
             
         except Exception as e:
             db.session.rollback()
@@ -738,6 +687,23 @@ class CBGPetSpider:
         Returns:
             list: 解析后的召唤兽数据
         """
+        text = await self.fetch_page_text(page, search_params, search_type)
+        if text is None:
+            return None
+        return self.parse_jsonp_response(text)
+
+    async def fetch_page_text(self, page=1, search_params=None, search_type='overall_search_pet'):
+        """
+        获取单页召唤兽的原始JSONP响应（由调度器判断是否被限流后再解析）
+        
+        Args:
+            page: 页码
+            search_params: 搜索参数
+            search_type: 搜索类型
+            
+        Returns:
+            str: 响应文本，请求失败时返回None
+        """
         try:
             # 确保search_params不为None
             if search_params is None:
@@ -776,10 +742,7 @@ class CBGPetSpider:
                 if response:
                     text = await response.text()
                     await browser.close()
-                    
-                    # 解析响应
-                    parsed_result = self.parse_jsonp_response(text)
-                    return parsed_result
+                    return text
                 
                 await browser.close()
                 return None
@@ -788,9 +751,12 @@ class CBGPetSpider:
             self.logger.error(f"获取召唤兽第{page}页数据时出错: {e}")
             return None
 
-    async def crawl_all_pages_async(self, max_pages=10, delay_range=None, use_browser=False, cached_params=None):
+    async def crawl_all_pages_async(self, max_pages=10, delay_range=None, use_browser=False, cached_params=None,
+                                    concurrency=1, rate=None):
         """
         异步爬取所有召唤兽页面
+        - concurrency: 同时在途的页面请求数
+        - rate: 每秒请求数（为None时按delay_range的平均间隔限速）
         """
         # 首先验证Cookie有效性
         self.logger.info("正在验证Cookie有效性...")
@@ -835,60 +801,48 @@ class CBGPetSpider:
             self.logger.error(f"无法获取召唤兽的搜索参数，爬取中止")
             return
             
-        total_saved_count = 0
-        successful_pages = 0
-        
-        for page_num in range(1, max_pages + 1):
-            try:
-                # 确保日志立即输出
-                self.logger.info(f"📄 正在爬取召唤兽第 {page_num} 页...")
-                # 强制刷新日志缓冲
-                import sys
-                sys.stdout.flush()
-                
-                pets = await self.fetch_page(page_num, search_params, search_type)
-                
-                if pets is None:
-                    self.logger.warning(f" 第 {page_num} 页数据获取失败，尝试重试...")
-                    await asyncio.sleep(5) # 等待5秒重试
-                    pets = await self.fetch_page(page_num, search_params, search_type)
+        def handle_page(page_num, pets):
+            saved_count = self.save_pet_data(pets)
+            
+            # 打印每条召唤兽的简要信息
+            for pet in pets:
+                price = pet.get('price_desc', pet.get('price', '未知'))
+                pet_name = pet.get('equip_name', '未知召唤兽')
+                level = pet.get('level', '未知')
+                server_name = pet.get('server_name', '未知服务器')
+                seller_nickname = pet.get('seller_nickname', '未知卖家')
+                desc_sumup_short = pet.get('desc_sumup_short', '无描述')
+                self.logger.info(f" ￥{price} - {pet_name}({level}级) - {desc_sumup_short} - {server_name} - {seller_nickname}")
+            
+            self.logger.info(f" 第 {page_num} 页完成，获取 {len(pets)} 条召唤兽，保存 {saved_count} 条")
+            sys.stdout.flush()
+            return saved_count
 
-                if pets:
-                    saved_count = self.save_pet_data(pets)
-                    total_saved_count += saved_count
-                    successful_pages += 1
-                    
-                    # 打印每条召唤兽的简要信息
-                    for pet in pets:
-                        price = pet.get('price_desc', pet.get('price', '未知'))
-                        pet_name = pet.get('equip_name', '未知召唤兽')
-                        level = pet.get('level', '未知')
-                        server_name = pet.get('server_name', '未知服务器')
-                        seller_nickname = pet.get('seller_nickname', '未知卖家')
-                        desc_sumup_short = pet.get('desc_sumup_short', '无描述')
-                        self.logger.info(f" ￥{price} - {pet_name}({level}级) - {desc_sumup_short} - {server_name} - {seller_nickname}")
-                    
-                    self.logger.info(f" 第 {page_num} 页完成，获取 {len(pets)} 条召唤兽，保存 {saved_count} 条")
-                else:
-                    self.logger.info(f"📄 第 {page_num} 页没有数据，爬取结束")
-                    break 
+        async def fetch_text(page_num):
+            self.logger.info(f"📄 正在爬取召唤兽第 {page_num} 页...")
+            sys.stdout.flush()
+            return await self.fetch_page_text(page_num, search_params, search_type)
 
-                # 添加延迟
-                if delay_range and page_num < max_pages:  # 最后一页不需要延迟
-                    delay = random.uniform(delay_range[0], delay_range[1])
-                    self.logger.info(f"⏳ 等待 {delay:.2f} 秒后继续...")
-                    await asyncio.sleep(delay)
-                    
-            except Exception as e:
-                self.logger.error(f"处理第 {page_num} 页时发生异常: {e}")
-                import traceback
-                traceback.print_exc()
-                break
+        scheduler = PageCrawlScheduler(
+            concurrency=concurrency, rate=rate, delay_range=delay_range, logger=self.logger)
+        self.logger.info(f"📄 并发页数: {scheduler.concurrency}, 限速: "
+                         f"{f'{scheduler.base_rate:.3f} 页/秒' if scheduler.base_rate else '不限速'}")
+        sys.stdout.flush()
+
+        stats = await scheduler.run(
+            max_pages,
+            fetch_text=fetch_text,
+            parse_page=self.parse_jsonp_response,
+            handle_page=handle_page,
+        )
+        total_saved_count = stats['saved_count']
+        successful_pages = stats['successful_pages']
+        if stats['throttle_count']:
+            self.logger.warning(f" 爬取过程中被限流 {stats['throttle_count']} 次")
 
         self.logger.info(f" 召唤兽爬取完成！成功页数: {successful_pages}/{max_pages}, 总召唤兽数: {total_saved_count}")
         
         # 强制刷新所有日志缓冲区，确保日志被完整写入文件
-        import sys
         sys.stdout.flush()
         sys.stderr.flush()
         
@@ -897,7 +851,8 @@ class CBGPetSpider:
             if hasattr(handler, 'flush'):
                 handler.flush()
 
-    def crawl_all_pages(self, max_pages=10, delay_range=None, use_browser=False, cached_params=None):
+    def crawl_all_pages(self, max_pages=10, delay_range=None, use_browser=False, cached_params=None,
+                        concurrency=1, rate=None):
         """
         同步启动异步召唤兽爬虫的入口
         """
@@ -906,7 +861,9 @@ class CBGPetSpider:
                 max_pages=max_pages,
                 delay_range=delay_range,
                 use_browser=use_browser,
-                cached_params=cached_params
+                cached_params=cached_params,
+                concurrency=concurrency,
+                rate=rate
             ))
         except Exception as e:
             self.logger.error(f"启动召唤兽爬虫失败: {e}")
@@ -3,7 +3,6 @@ import requests
 from urllib.parse import urlparse
 import os
 import asyncio
-from playwright.async_api import async_playwright
 import logging
 
 # 配置日志
@@ -12,6 +11,8 @@ logger = logging.getLogger(__name__)
 
 async def get_browser_info():
     """获取浏览器信息"""
+    # 只有手动登录时才需要Playwright，爬虫子进程导入本模块时不加载
+    from playwright.async_api import async_playwright
     async with async_playwright() as p:
         # 启动 Chromium 浏览器
         browser = await p.chromium.launch(headless=False)
@@ -5,8 +5,27 @@ Utils package for CBG Spider
 Contains various utility classes and functions
 """
 
-from .lpc_helper import LPCHelper
-from .smart_db_helper import SmartDBHelper, CBGSmartDB
-from .jsonc_loader import load_jsonc, load_jsonc_relative_to_file, load_jsonc_from_config_dir, load_js_config_relative_to_file
+import importlib
+
+# 延迟导入：只用到某个工具模块（如爬虫子进程只用到cookie_manager）时不加载SQLAlchemy等重量级依赖
+_LAZY_EXPORTS = {
+    'LPCHelper': '.lpc_helper',
+    'SmartDBHelper': '.smart_db_helper',
+    'CBGSmartDB': '.smart_db_helper',
+    'load_jsonc': '.jsonc_loader',
+    'load_jsonc_relative_to_file': '.jsonc_loader',
+    'load_jsonc_from_config_dir': '.jsonc_loader',
+    'load_js_config_relative_to_file': '.jsonc_loader',
+}
+
+
+def __getattr__(name):
+    """第一次访问导出的名称时才导入对应模块"""
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = ['LPCHelper', 'SmartDBHelper', 'CBGSmartDB', 'load_jsonc', 'load_jsonc_relative_to_file', 'load_jsonc_from_config_dir', 'load_js_config_relative_to_file'] 
\ No newline at end of file
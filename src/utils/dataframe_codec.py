@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DataFrame二进制消息编码
+用于Redis发布/订阅直接传输字节，不再 pickle + base64 + JSON
+
+消息格式：
+    MAGIC(4字节) | 版本(1字节) | 标志(1字节) | 头部长度(uint32) | 头部JSON | 数据体
+- 头部JSON包含消息字段、行数和每列的编码/类型/在数据体中的位置
+- NumPy原生的数值/布尔/时间列：直接写入原始内存缓冲区
+- category列：编码值写入原始内存缓冲区，类别和是否有序写入头部
+- object列和其他扩展类型列：按JSON编码（不反序列化任意Python对象）；
+  JSON无法原样表示的值（时间、Decimal、元组/集合、bytes、数组、非字符串键的字典等）写为带类型标记的对象，
+  解码后与原值类型一致；不支持的类型直接报错，不转为字符串
+- 数据体可选zlib压缩
+
+版本1（object列按有损JSON编码）的消息仍可解码
+"""
+
+import base64
+import json
+import struct
+import zlib
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DATAFRAME_MAGIC = b'MHDF'
+DATAFRAME_FORMAT_VERSION = 2
+# 可以解码的版本
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+
+# 标志位
+FLAG_ZLIB = 0x01
+
+# 数据体小于该字节数时不压缩
+COMPRESS_MIN_BYTES = 4096
+ZLIB_LEVEL = 1
+
+_HEADER_STRUCT = struct.Struct('<4sBBI')
+
+# 带类型标记的值：{TYPE_TAG: 类型, 'v': 值}
+TYPE_TAG = '__t'
+
+_JSON_SCALARS = {str, int, float, bool, type(None)}
+
+
+def _message_default(value: Any) -> Any:
+    """消息字段中非JSON原生类型的转换（时间转为ISO字符串，其余转为字符串）"""
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def _tag_value(value: Any) -> Any:
+    """
+    将object列中的值转换为可JSON编码、且解码后类型不变的形式
+
+    Raises:
+        TypeError: 不支持的类型
+    """
+    # 按精确类型判断：np.float64、np.str_ 等是float/str的子类
+    if type(value) in _JSON_SCALARS:
+        return value
+    if isinstance(value, list):
+        return [_tag_value(item) for item in value]
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and TYPE_TAG not in value:
+            return {key: _tag_value(item) for key, item in value.items()}
+        return {TYPE_TAG: 'dict', 'v': [[_tag_value(key), _tag_value(item)] for key, item in value.items()]}
+    if isinstance(value, np.generic):
+        if isinstance(value, (np.datetime64, np.timedelta64)):
+            # 按int64保存，保留时间单位和NaT
+            return {TYPE_TAG: 'numpy_time', 'dtype': value.dtype.str, 'v': int(value.view('i8'))}
+        return {TYPE_TAG: 'numpy', 'dtype': value.dtype.str, 'v': value.item()}
+    if value is pd.NaT:
+        return {TYPE_TAG: 'nat'}
+    if isinstance(value, pd.Timestamp):
+        return {TYPE_TAG: 'timestamp', 'v': value.isoformat()}
+    if isinstance(value, datetime):
+        return {TYPE_TAG: 'datetime', 'v': value.isoformat()}
+    if isinstance(value, date):
+        return {TYPE_TAG: 'date', 'v': value.isoformat()}
+    if isinstance(value, time):
+        return {TYPE_TAG: 'time', 'v': value.isoformat()}
+    if isinstance(value, pd.Timedelta):
+        return {TYPE_TAG: 'pd_timedelta', 'v': value.value}
+    if isinstance(value, timedelta):
+        return {TYPE_TAG: 'timedelta', 'v': [value.days, value.seconds, value.microseconds]}
+    if isinstance(value, Decimal):
+        return {TYPE_TAG: 'decimal', 'v': str(value)}
+    if isinstance(value, tuple):
+        return {TYPE_TAG: 'tuple', 'v': [_tag_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {TYPE_TAG: type(value).__name__, 'v': [_tag_value(item) for item in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {TYPE_TAG: 'bytes', 'v': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return {TYPE_TAG: 'ndarray', 'dtype': value.dtype.str, 'shape': list(value.shape),
+                'v': base64.b64encode(np.ascontiguousarray(value).tobytes()).decode('ascii')}
+    raise TypeError(f"DataFrame object列包含不支持编码的类型: {type(value).__name__}")
+
+
+def _untag_value(obj: Dict[str, Any]) -> Any:
+    """json.loads的object_hook：还原带类型标记的值"""
+    tag = obj.get(TYPE_TAG)
+    if tag is None:
+        return obj
+    value = obj.get('v')
+    if tag == 'dict':
+        return {key: item for key, item in value}
+    if tag == 'numpy':
+        return np.dtype(obj['dtype']).type(value)
+    if tag == 'numpy_time':
+        return np.array([value], dtype='i8').view(obj['dtype'])[0]
+    if tag == 'nat':
+        return pd.NaT
+    if tag == 'timestamp':
+        return pd.Timestamp(value)
+    if tag == 'datetime':
+        return datetime.fromisoformat(value)
+    if tag == 'date':
+        return date.fromisoformat(value)
+    if tag == 'time':
+        return time.fromisoformat(value)
+    if tag == 'pd_timedelta':
+        return pd.Timedelta(value)
+    if tag == 'timedelta':
+        return timedelta(days=value[0], seconds=value[1], microseconds=value[2])
+    if tag == 'decimal':
+        return Decimal(value)
+    if tag == 'tuple':
+        return tuple(value)
+    if tag == 'set':
+        return set(value)
+    if tag == 'frozenset':
+        return frozenset(value)
+    if tag == 'bytes':
+        return base64.b64decode(value)
+    if tag == 'ndarray':
+        return np.frombuffer(base64.b64decode(value), dtype=np.dtype(obj['dtype'])).reshape(obj['shape']).copy()
+    raise ValueError(f"未知的值类型标记: {tag}")
+
+
+def _untag_tree(value: Any) -> Any:
+    """还原已解析JSON（如头部中的类别）中带类型标记的值"""
+    if isinstance(value, list):
+        return [_untag_tree(item) for item in value]
+    if isinstance(value, dict):
+        return _untag_value({key: _untag_tree(item) for key, item in value.items()})
+    return value
+
+
+def _encode_values(values) -> bytes:
+    return json.dumps([_tag_value(value) for value in values], ensure_ascii=False).encode('utf-8')
+
+
+def _decode_values(payload: memoryview) -> np.ndarray:
+    return _to_object_array(json.loads(bytes(payload).decode('utf-8'), object_hook=_untag_value))
+
+
+def _to_object_array(values: list) -> np.ndarray:
+    """列表转为一维object数组（列表元素不展开为二维）"""
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+def _encode_series(series: pd.Series) -> Tuple[Dict[str, Any], bytes]:
+    """单列编码，返回 (列描述, 字节数据)"""
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        return {'encoding': 'numpy', 'dtype': dtype.str}, np.ascontiguousarray(series.to_numpy()).tobytes()
+    if dtype == object:
+        return {'encoding': 'json', 'dtype': 'object'}, _encode_values(series.to_numpy())
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        return {'encoding': 'category', 'dtype': codes.dtype.str, 'ordered': bool(dtype.ordered),
+                'categories': [_tag_value(value) for value in dtype.categories]}, np.ascontiguousarray(codes).tobytes()
+    # 其他扩展类型（Int64、string、带时区时间等）：缺失值写为null，解码时按原类型还原
+    values = series.astype(object).where(series.notna(), None)
+    return {'encoding': 'json', 'dtype': str(dtype)}, _encode_values(values.to_numpy())
+
+
+def _decode_series(spec: Dict[str, Any], payload: memoryview, rows: int):
+    """单列解码"""
+    if spec['encoding'] == 'numpy':
+        return np.frombuffer(payload, dtype=np.dtype(spec['dtype']), count=rows)
+    if spec['encoding'] == 'category':
+        codes = np.frombuffer(payload, dtype=np.dtype(spec['dtype']), count=rows)
+        categories = _untag_tree(spec['categories'])
+        return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories, ordered=spec['ordered']))
+    values = _decode_values(payload)
+    dtype = spec['dtype']
+    if dtype == 'object':
+        return values
+    try:
+        return pd.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return pd.array(pd.to_datetime(values), dtype=dtype) if dtype.startswith('datetime64') else values
+
+
+def encode_dataframe_message(message: Dict[str, Any],
+                             dataframe: Optional[pd.DataFrame] = None,
+                             compress: bool = True) -> bytes:
+    """
+    将消息和DataFrame编码为二进制消息
+
+    Args:
+        message: 消息字段（需可JSON序列化）
+        dataframe: 要发送的DataFrame，为None时只发送消息字段
+        compress: 数据体较大时是否使用zlib压缩
+
+    Returns:
+        bytes: 二进制消息
+    """
+    header: Dict[str, Any] = {'message': message}
+    parts = []
+    offset = 0
+
+    if dataframe is not None:
+        columns = []
+        for col_idx, name in enumerate(dataframe.columns):
+            spec, payload = _encode_series(dataframe.iloc[:, col_idx])
+            spec.update({'name': name, 'offset': offset, 'length': len(payload)})
+            columns.append(spec)
+            parts.append(payload)
+            offset += len(payload)
+
+        index_spec = None
+        if not (isinstance(dataframe.index, pd.RangeIndex) and dataframe.index.start == 0
+                and dataframe.index.step == 1):
+            # 非默认索引单独编码
+            index_spec, payload = _encode_series(dataframe.index.to_series(index=None))
+            index_spec.update({'name': dataframe.index.name, 'offset': offset, 'length': len(payload)})
+            parts.append(payload)
+            offset += len(payload)
+
+        header.update({'rows': len(dataframe), 'columns': columns, 'index': index_spec})
+
+    body = b''.join(parts)
+    flags = 0
+    if compress and len(body) >= COMPRESS_MIN_BYTES:
+        body = zlib.compress(body, ZLIB_LEVEL)
+        flags |= FLAG_ZLIB
+
+    header_bytes = json.dumps(header, ensure_ascii=False, default=_message_default).encode('utf-8')
+    return _HEADER_STRUCT.pack(DATAFRAME_MAGIC, DATAFRAME_FORMAT_VERSION, flags, len(header_bytes)) + \
+        header_bytes + body
+
+
+def is_dataframe_message(data: Any) -> bool:
+    """是否为二进制DataFrame消息"""
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:4]) == DATAFRAME_MAGIC
+
+
+def decode_dataframe_message(data: bytes) -> Tuple[Dict[str, Any], Optional[pd.DataFrame]]:
+    """
+    解码二进制消息
+
+    Args:
+        data: encode_dataframe_message 生成的字节数据
+
+    Returns:
+        Tuple[消息字段, DataFrame（消息不含DataFrame时为None）]
+    """
+    if len(data) < _HEADER_STRUCT.size:
+        raise ValueError("二进制消息长度不足")
+    magic, version, flags, header_length = _HEADER_STRUCT.unpack_from(data, 0)
+    if magic != DATAFRAME_MAGIC:
+        raise ValueError("不是二进制DataFrame消息")
+    if version not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"不支持的二进制消息版本: {version}")
+
+    header_start = _HEADER_STRUCT.size
+    header = json.loads(bytes(data[header_start:header_start + header_length]).decode('utf-8'))
+    body = data[header_start + header_length:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    body = memoryview(body)
+
+    if 'columns' not in header:
+        return header['message'], None
+
+    rows = header['rows']
+    arrays = {}
+    for col_idx, spec in enumerate(header['columns']):
+        arrays[col_idx] = _decode_series(spec, body[spec['offset']:spec['offset'] + spec['length']], rows)
+
+    index = None
+    index_spec = header.get('index')
+    if index_spec:
+        index = pd.Index(_decode_series(index_spec, body[index_spec['offset']:index_spec['offset'] + index_spec['length']], rows),
+                         name=index_spec['name'])
+
+    # 从字典构建时复制数组，得到可写的DataFrame
+    dataframe = pd.DataFrame(arrays, index=index)
+    if not arrays:
+        dataframe = pd.DataFrame(index=index if index is not None else pd.RangeIndex(rows))
+    dataframe.columns = [spec['name'] for spec in header['columns']]
+    return header['message'], dataframe
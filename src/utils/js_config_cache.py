@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JavaScript变量配置文件（game_auto_config.js、auto_search_config.js）的二进制缓存
+
+缓存文件格式：
+    MAGIC(4字节) | 版本(1字节) | 保留(1字节) | 头部长度(uint32) | 头部JSON | 数据体
+- 头部JSON记录源文件的修改时间、大小、内容哈希，以及每个顶层配置项在数据体中的位置
+- 每个顶层配置项单独用marshal编码（只包含JSON基本类型），加载时只读索引，
+  配置项在第一次访问时才解码（LazyConfig）
+- 源文件修改时间和大小一致时直接使用缓存；不一致时计算内容哈希，内容未变（如git检出）继续使用
+- 缓存先写临时文件再原子替换，多个进程（各服务器的爬虫子进程）同时构建不会读到不完整的文件
+- 同一进程内按源文件复用已加载的配置，返回的配置在各调用方之间共享，只读使用
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import struct
+import sys
+import tempfile
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.utils.project_path import get_project_root
+
+CONFIG_CACHE_MAGIC = b'MHJC'
+CONFIG_CACHE_FORMAT_VERSION = 1
+
+# 缓存目录（未设置时为 data/cache/config，设置为空字符串时不使用缓存）
+CONFIG_CACHE_DIR_ENV = 'MH_CONFIG_CACHE_DIR'
+
+_HEADER_STRUCT = struct.Struct('<4sBBI')
+
+logger = logging.getLogger(__name__)
+
+# (源文件路径, 变量名) -> (源文件状态, 配置)
+_loaded: Dict[Tuple[str, str], Tuple[Tuple[int, int], 'LazyConfig']] = {}
+_loaded_lock = threading.Lock()
+
+
+class LazyConfig(Mapping):
+    """按顶层配置项延迟解码的只读配置"""
+
+    def __init__(self, body: bytes, sections: Dict[str, Tuple[int, int]]):
+        self._body = body
+        self._sections = sections
+        self._decoded: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        offset, length = self._sections[key]
+        value = marshal.loads(self._body[offset:offset + length])
+        self._decoded[key] = value
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._sections
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sections)
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """解码所有配置项"""
+        return {key: self[key] for key in self._sections}
+
+
+def parse_js_config_text(content: str, var_name: str) -> Dict[str, Any]:
+    """
+    解析JavaScript变量配置文件的内容（格式：var NAME={...}）
+
+    Raises:
+        ValueError: 未找到变量
+        json.JSONDecodeError: JSON格式错误
+    """
+    var_prefix = f'var {var_name}='
+    start_pos = content.find(var_prefix)
+    if start_pos == -1:
+        raise ValueError(f"未找到JavaScript变量: {var_name}")
+    return json.loads(content[start_pos + len(var_prefix):].strip())
+
+
+def get_config_cache_dir() -> Optional[str]:
+    """缓存目录，不使用缓存时返回None"""
+    cache_dir = os.environ.get(CONFIG_CACHE_DIR_ENV)
+    if cache_dir is None:
+        cache_dir = os.path.join(get_project_root(), 'data', 'cache', 'config')
+    return cache_dir or None
+
+
+def _cache_path(cache_dir: str, file_path: str, var_name: str) -> str:
+    # 文件名包含源文件路径的哈希，不同目录下的同名文件互不影响
+    path_hash = hashlib.md5(file_path.encode('utf-8')).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir, f"{name}.{var_name}.{path_hash}.mhjc")
+
+
+def _python_tag() -> str:
+    # marshal格式与Python版本相关
+    return f"{sys.version_info[0]}.{sys.version_info[1]}/{marshal.version}"
+
+
+def encode_config_cache(config: Dict[str, Any], source: Dict[str, Any]) -> bytes:
+    """把配置编码为缓存文件内容（每个顶层配置项单独编码）"""
+    sections = {}
+    chunks = []
+    offset = 0
+    for key, value in config.items():
+        chunk = marshal.dumps(value)
+        sections[key] = [offset, len(chunk)]
+        chunks.append(chunk)
+        offset += len(chunk)
+    header = json.dumps({
+        'python': _python_tag(),
+        'source': source,
+        'sections': sections,
+    }, ensure_ascii=False).encode('utf-8')
+    return b''.join([_HEADER_STRUCT.pack(CONFIG_CACHE_MAGIC, CONFIG_CACHE_FORMAT_VERSION, 0, len(header)),
+                     header] + chunks)
+
+
+def decode_config_cache(data: bytes) -> Tuple[Dict[str, Any], LazyConfig]:
+    """
+    解码缓存文件内容
+
+    Returns:
+        Tuple[Dict, LazyConfig]: 源文件信息, 配置
+
+    Raises:
+        ValueError: 格式或版本不匹配
+    """
+    if len(data) < _HEADER_STRUCT.size:
+        raise ValueError("缓存文件不完整")
+    magic, version, _, header_length = _HEADER_STRUCT.unpack_from(data, 0)
+    if magic != CONFIG_CACHE_MAGIC or version != CONFIG_CACHE_FORMAT_VERSION:
+        raise ValueError("缓存文件格式不匹配")
+    header_end = _HEADER_STRUCT.size + header_length
+    header = json.loads(data[_HEADER_STRUCT.size:header_end].decode('utf-8'))
+    if header.get('python') != _python_tag():
+        raise ValueError("缓存文件的Python版本不匹配")
+    sections = {key: (offset, length) for key, (offset, length) in header['sections'].items()}
+    return header['source'], LazyConfig(memoryview(data)[header_end:], sections)
+
+
+def _write_cache(cache_path: str, data: bytes) -> None:
+    """先写临时文件再原子替换"""
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp创建的文件只有所有者可读，缓存需要其他用户运行的进程也能读取
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_cache(cache_path: str) -> Optional[Tuple[Dict[str, Any], LazyConfig]]:
+    """读取缓存文件，不存在或不可用时返回None"""
+    try:
+        with open(cache_path, 'rb') as f:
+            return decode_config_cache(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"配置缓存不可用，重新构建: {cache_path}, {e}")
+        return None
+
+
+def load_js_config_cached(file_path: str, var_name: str = 'AUTO_SEARCH_CONFIG',
+                          encoding: str = 'utf-8') -> Mapping:
+    """
+    加载JavaScript变量配置文件，使用二进制缓存
+
+    Args:
+        file_path: JavaScript文件路径
+        var_name: JavaScript变量名
+        encoding: 文件编码
+
+    Returns:
+        Mapping: 配置（顶层配置项在第一次访问时解码），只读使用
+
+    Raises:
+        FileNotFoundError: 文件不存在
+        json.JSONDecodeError: JSON格式错误
+        ValueError: 未找到变量
+    """
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    memo_key = (file_path, var_name)
+
+    with _loaded_lock:
+        loaded = _loaded.get(memo_key)
+        if loaded is not None and loaded[0] == stat_key:
+            return loaded[1]
+
+        config = _load_config(file_path, var_name, encoding, stat_key)
+        _loaded[memo_key] = (stat_key, config)
+        return config
+
+
+def _load_config(file_path: str, var_name: str, encoding: str, stat_key: Tuple[int, int]) -> Mapping:
+    cache_dir = get_config_cache_dir()
+    if cache_dir is None:
+        with open(file_path, 'r', encoding=encoding) as f:
+            return parse_js_config_text(f.read(), var_name)
+
+    cache_path = _cache_path(cache_dir, file_path, var_name)
+    cached = _read_cache(cache_path)
+    if cached is not None and (cached[0].get('mtime_ns'), cached[0].get('size')) == stat_key:
+        return cached[1]
+
+    with open(file_path, 'rb') as f:
+        source_bytes = f.read()
+    content_hash = hashlib.sha1(source_bytes).hexdigest()
+    source = {'mtime_ns': stat_key[0], 'size': stat_key[1], 'sha1': content_hash, 'var_name': var_name}
+
+    # 修改时间变化但内容未变时沿用缓存的配置，只更新文件状态
+    if cached is not None and cached[0].get('sha1') == content_hash:
+        parsed = cached[1].to_dict()
+        logger.info(f"配置文件内容未变化，更新缓存的文件状态: {os.path.basename(file_path)}")
+    else:
+        parsed = parse_js_config_text(source_bytes.decode(encoding), var_name)
+        logger.info(f"构建配置缓存: {os.path.basename(file_path)}，包含{len(parsed)}个配置项")
+
+    data = encode_config_cache(parsed, source)
+    try:
+        _write_cache(cache_path, data)
+    except OSError as e:
+        # 缓存目录不可写时直接使用解析结果
+        logger.warning(f"写入配置缓存失败: {cache_path}, {e}")
+        return parsed
+    return decode_config_cache(data)[1]
@@ -1,7 +1,9 @@
 import json
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
+
+from src.utils.js_config_cache import load_js_config_cached
 
 
 def load_jsonc(file_path: str, encoding: str = 'utf-8') -> Dict[str, Any]:
@@ -56,9 +58,9 @@ def load_jsonc(file_path: str, encoding: str = 'utf-8') -> Dict[str, Any]:
         raise
 
 
-def load_js_config(file_path: str, var_name: str = 'AUTO_SEARCH_CONFIG', encoding: str = 'utf-8') -> Dict[str, Any]:
+def load_js_config(file_path: str, var_name: str = 'AUTO_SEARCH_CONFIG', encoding: str = 'utf-8') -> Mapping[str, Any]:
     """
-    加载JavaScript变量配置文件
+    加载JavaScript变量配置文件（使用二进制缓存，见 src/utils/js_config_cache.py）
     
     Args:
         file_path (str): JavaScript文件路径
@@ -66,7 +68,7 @@ def load_js_config(file_path: str, var_name: str = 'AUTO_SEARCH_CONFIG', encodin
         encoding (str): 文件编码，默认为'utf-8'
         
     Returns:
-        Dict[str, Any]: 解析后的JSON数据
+        Mapping[str, Any]: 解析后的配置（顶层配置项在第一次访问时解码，各调用方共享，只读使用）
         
     Raises:
         FileNotFoundError: 文件不存在
@@ -80,23 +82,8 @@ def load_js_config(file_path: str, var_name: str = 'AUTO_SEARCH_CONFIG', encodin
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"JavaScript配置文件不存在: {file_path}")
             
-        # 读取文件内容
-        with open(file_path, 'r', encoding=encoding) as f:
-            content = f.read()
-        
-        # 提取JavaScript变量中的JSON部分
         # 格式：var AUTO_SEARCH_CONFIG={...}
-        var_prefix = f'var {var_name}='
-        start_pos = content.find(var_prefix)
-        if start_pos == -1:
-            raise ValueError(f"未找到JavaScript变量: {var_name}")
-        
-        # 获取JSON部分（从=号后开始）
-        json_start = start_pos + len(var_prefix)
-        json_content = content[json_start:].strip()
-        
-        # 解析JSON
-        return json.loads(json_content)
+        return load_js_config_cached(file_path, var_name, encoding)
         
     except FileNotFoundError:
         logger.error(f"JavaScript配置文件不存在: {file_path}")
@@ -131,7 +118,7 @@ def load_jsonc_relative_to_file(base_file: str, relative_path: str, encoding: st
     return load_jsonc(absolute_path, encoding)
 
 
-def load_js_config_relative_to_file(base_file: str, relative_path: str, var_name: str = 'AUTO_SEARCH_CONFIG', encoding: str = 'utf-8') -> Dict[str, Any]:
+def load_js_config_relative_to_file(base_file: str, relative_path: str, var_name: str = 'AUTO_SEARCH_CONFIG', encoding: str = 'utf-8') -> Mapping[str, Any]:
     """
     基于某个文件的位置，加载相对路径的JavaScript配置文件
     
@@ -142,7 +129,7 @@ def load_js_config_relative_to_file(base_file: str, relative_path: str, var_name
         encoding (str): 文件编码，默认为'utf-8'
         
     Returns:
-        Dict[str, Any]: 解析后的JSON数据
+        Mapping[str, Any]: 解析后的配置
     """
     # 构建绝对路径
     base_dir = os.path.dirname(base_file)
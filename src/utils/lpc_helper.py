@@ -11,6 +11,30 @@ import logging
 import ast
 
 
+# 单遍LPC解析：一次正则匹配读取一个完整的映射项/数组项，字符串保留原始转义
+_LPC_STRING = r'"([^"\\]*(?:\\.[^"\\]*)*)"'
+_LPC_SCALAR = r'([^\s,:()\[\]{}"\\][^,:()\[\]{}"\\]*)'
+_LPC_OPEN = r'(\(\[|\(\{)'
+# 映射项：结束符 ]) | 空项 , | 键:值[,]（值可为空、字符串、标量或子结构的开始符）
+_LPC_MAPPING_ITEM_RE = re.compile(
+    r'\s*(?:(\]\))|,|(?:' + _LPC_STRING + '|' + _LPC_SCALAR + r')\s*:\s*(?:'
+    + _LPC_OPEN + '|' + _LPC_STRING + '|' + _LPC_SCALAR + r')?\s*(,)?)', re.DOTALL)
+# 数组项：结束符 }) | 空项 , | 值[,]
+_LPC_ARRAY_ITEM_RE = re.compile(
+    r'\s*(?:(\}\))|,|(?:' + _LPC_OPEN + '|' + _LPC_STRING + '|' + _LPC_SCALAR + r')\s*(,)?)', re.DOTALL)
+_LPC_ROOT_RE = re.compile(r'\s*' + _LPC_OPEN)
+_LPC_FLOAT_RE = re.compile(r'^-?\d+\.\d+$')
+
+
+def _lpc_scalar(text):
+    """LPC标量转换：整数、浮点数，其余保留为字符串"""
+    if text.isdigit() or (text.startswith('-') and text[1:].isdigit()):
+        return int(text)
+    if _LPC_FLOAT_RE.match(text):
+        return float(text)
+    return text
+
+
 class LPCHelper:
     """LPC格式解析助手工具类"""
     
@@ -171,15 +195,111 @@ class LPCHelper:
             self.logger.error(f"复杂LPC解析失败: {e}")
             return {}
     
+    def parse_lpc(self, lpc_str):
+        """
+        单遍LPC解析器：从左到右扫描一次，直接构建Python对象（线性复杂度）
+        
+        特点：
+        - 每次正则匹配读取一个完整的映射项或数组项，不再切分子串
+        - 映射 ([key:value,...]) -> dict，数组 ({item,...}) -> list，键统一为字符串
+        - 字符串保留原始转义字符，数字转换为int/float，与 recursive_lpc_parse 结果一致
+        - 用显式栈代替递归，深层嵌套不受递归深度限制
+        
+        Args:
+            lpc_str: LPC格式字符串，最外层必须是映射或数组
+        
+        Returns:
+            dict/list: 解析后的Python对象
+        
+        Raises:
+            ValueError: 不符合LPC语法（由调用方降级到递归解析）
+        """
+        text = lpc_str
+        m = _LPC_ROOT_RE.match(text)
+        if m is None:
+            raise ValueError("LPC最外层必须是映射或数组")
+        root = {} if m.group(1) == '([' else []
+        pos = m.end()
+        
+        match_mapping_item = _LPC_MAPPING_ITEM_RE.match
+        match_array_item = _LPC_ARRAY_ITEM_RE.match
+        container = root
+        is_mapping = isinstance(root, dict)
+        # 上一项之后没有逗号时，下一项必须是结束符或逗号
+        expect_separator = False
+        stack = []
+        
+        while True:
+            if is_mapping:
+                m = match_mapping_item(text, pos)
+                if m is None:
+                    raise ValueError(f"无法解析的LPC映射项，位置 {pos}")
+                close, quoted_key, key, opener, string_value, scalar_value, comma = m.groups()
+                if quoted_key is not None:
+                    key = quoted_key
+                elif key is not None:
+                    key = key.rstrip()
+            else:
+                m = match_array_item(text, pos)
+                if m is None:
+                    raise ValueError(f"无法解析的LPC数组项，位置 {pos}")
+                close, opener, string_value, scalar_value, comma = m.groups()
+                key = None
+            
+            if close:
+                if not stack:
+                    pos = m.end()
+                    break
+                container, is_mapping = stack.pop()
+                expect_separator = True
+                pos = m.end()
+                continue
+            
+            if key is None and (is_mapping or (opener is None and string_value is None and scalar_value is None)):
+                # 空项（连续或多余的逗号）
+                expect_separator = False
+                pos = m.end()
+                continue
+            
+            if expect_separator:
+                raise ValueError(f"LPC项之间缺少逗号，位置 {pos}")
+            pos = m.end()
+            
+            if opener:
+                value = {} if opener == '([' else []
+            elif string_value is not None:
+                value = string_value
+            elif scalar_value is not None:
+                value = _lpc_scalar(scalar_value.rstrip())
+            else:
+                # "key":, 空值
+                value = ''
+            
+            if is_mapping:
+                container[key] = value
+            else:
+                container.append(value)
+            
+            if opener:
+                stack.append((container, is_mapping))
+                container = value
+                is_mapping = opener == '(['
+                expect_separator = False
+            else:
+                expect_separator = comma is None
+        
+        if text[pos:].strip():
+            raise ValueError(f"LPC结构之后存在多余内容，位置 {pos}")
+        return root
+    
     def lpc_to_js(self, lpc_str, return_dict=False):
         """
-        增强版LPC转换器，支持深层递归解析
+        增强版LPC转换器
         
         特点：
-        - 递归处理嵌套的LPC结构
-        - 正确转换所有层级的数据
-        - 处理数字键和字符串键
-        - 支持数组和映射的嵌套
+        - 优先使用单遍解析器 parse_lpc
+        - 不符合语法时降级到递归解析 recursive_lpc_parse，再失败降级到 simple_lpc_to_js
+        - 处理数字键和字符串键，支持数组和映射的嵌套
         
         Args:
             lpc_str: LPC格式字符串
@@ -189,176 +309,182 @@ class LPCHelper:
             JSON字符串或Python字典对象，取决于return_dict参数
         """
         try:
-            def parse_lpc_structure(text):
-                """递归解析LPC结构，返回Python对象"""
-                text = text.strip()
-                
-                # 处理映射：([key:value,key:value]) -> {key:value,key:value}
-                if text.startswith('([') and text.endswith('])'):
-                    inner_content = text[2:-2].strip()
-                    return parse_lpc_mapping(inner_content)
+            try:
+                result_obj = self.parse_lpc(lpc_str)
+            except ValueError as e:
+                self.logger.debug(f"单遍LPC解析失败，使用递归解析: {e}")
+                result_obj = self.recursive_lpc_parse(lpc_str)
+            
+            # 如果请求返回字典对象
+            if return_dict:
+                return result_obj
+            
+            # 否则返回JSON字符串
+            json_str = json.dumps(result_obj, ensure_ascii=False, separators=(',', ':'))
+            self.logger.debug(f"深层LPC解析成功，结果长度: {len(json_str)}")
+            return json_str
+            
+        except Exception as e:
+            self.logger.warning(f"深层LPC解析失败: {e}")
+            # 降级到简单模式
+            return self.simple_lpc_to_js(lpc_str, return_dict)
+    
+    def recursive_lpc_parse(self, lpc_str):
+        """
+        递归LPC解析器（parse_lpc 的后备方案）
+        
+        按层级切分子串后递归解析，对不规范的数据更宽容（如跳过缺少冒号的映射项）
+        
+        Returns:
+            解析后的Python对象
+        """
+        def parse_lpc_structure(text):
+            """递归解析LPC结构，返回Python对象"""
+            text = text.strip()
+            
+            # 处理映射：([key:value,key:value]) -> {key:value,key:value}
+            if text.startswith('([') and text.endswith('])'):
+                inner_content = text[2:-2].strip()
+                return parse_lpc_mapping(inner_content)
+            
+            # 处理数组：({item,item,item}) -> [item,item,item]
+            elif text.startswith('({') and text.endswith('})'):
+                inner_content = text[2:-2].strip()
+                return parse_lpc_array(inner_content)
+            
+            # 处理字符串
+            elif text.startswith('"') and text.endswith('"'):
+                return text[1:-1]
+            
+            # 处理数字，其余返回字符串
+            return _lpc_scalar(text)
+        
+        def parse_lpc_mapping(content):
+            """解析LPC映射内容"""
+            if not content.strip():
+                return {}
+            
+            result = {}
+            items = split_lpc_items(content)
+            
+            for item in items:
+                item = item.strip()
+                if not item:
+                    continue
                 
-                # 处理数组：({item,item,item}) -> [item,item,item]
-                elif text.startswith('({') and text.endswith('})'):
-                    inner_content = text[2:-2].strip()
-                    return parse_lpc_array(inner_content)
+                # 找到键值分隔符 ':'
+                colon_pos = find_key_value_separator(item)
+                if colon_pos == -1:
+                    continue
                 
-                # 处理字符串
-                elif text.startswith('"') and text.endswith('"'):
-                    return text[1:-1]
+                key_part = item[:colon_pos].strip()
+                value_part = item[colon_pos + 1:].strip()
                 
-                # 处理数字
-                elif text.isdigit() or (text.startswith('-') and text[1:].isdigit()):
-                    return int(text)
+                # 处理键名（移除引号）
+                if key_part.startswith('"') and key_part.endswith('"'):
+                    key = key_part[1:-1]
+                else:
+                    key = key_part
                 
-                # 处理浮点数
-                elif re.match(r'^-?\d+\.\d+$', text):
-                    return float(text)
-                
-                # 默认返回字符串
-                return text
+                # 递归处理值
+                value = parse_lpc_structure(value_part)
+                result[key] = value
             
-            def parse_lpc_mapping(content):
-                """解析LPC映射内容"""
-                if not content.strip():
-                    return {}
-                
-                result = {}
-                items = split_lpc_items(content)
-                
-                for item in items:
-                    item = item.strip()
-                    if not item:
-                        continue
-                    
-                    # 找到键值分隔符 ':'
-                    colon_pos = find_key_value_separator(item)
-                    if colon_pos == -1:
-                        continue
-                    
-                    key_part = item[:colon_pos].strip()
-                    value_part = item[colon_pos + 1:].strip()
-                    
-                    # 处理键名（移除引号）
-                    if key_part.startswith('"') and key_part.endswith('"'):
-                        key = key_part[1:-1]
-                    else:
-                        key = key_part
-                    
-                    # 递归处理值
-                    value = parse_lpc_structure(value_part)
-                    result[key] = value
-                
-                return result
+            return result
+        
+        def parse_lpc_array(content):
+            """解析LPC数组内容"""
+            if not content.strip():
+                return []
             
-            def parse_lpc_array(content):
-                """解析LPC数组内容"""
-                if not content.strip():
-                    return []
-                
-                result = []
-                items = split_lpc_items(content)
-                
-                for item in items:
-                    item = item.strip()
-                    if not item:
-                        continue
-                    
-                    # 递归处理每个数组元素
-                    value = parse_lpc_structure(item)
-                    result.append(value)
-                
-                return result
+            result = []
+            items = split_lpc_items(content)
             
-            def split_lpc_items(content):
-                """智能分割LPC项目，考虑嵌套结构"""
-                items = []
-                current_item = ""
-                bracket_depth = 0
-                in_quotes = False
-                escape_next = False
+            for item in items:
+                item = item.strip()
+                if not item:
+                    continue
                 
-                for char in content:
-                    if escape_next:
-                        current_item += char
-                        escape_next = False
-                        continue
-                    
-                    if char == '\\':
-                        escape_next = True
-                        current_item += char
-                        continue
-                    
-                    if char == '"' and not escape_next:
-                        in_quotes = not in_quotes
-                        current_item += char
-                        continue
-                    
-                    if not in_quotes:
-                        if char in '([{':
-                            bracket_depth += 1
-                        elif char in ')]}':
-                            bracket_depth -= 1
-                        elif char == ',' and bracket_depth == 0:
-                            # 找到分隔符，添加当前项
-                            if current_item.strip():
-                                items.append(current_item.strip())
-                            current_item = ""
-                            continue
-                    
+                # 递归处理每个数组元素
+                value = parse_lpc_structure(item)
+                result.append(value)
+            
+            return result
+        
+        def split_lpc_items(content):
+            """智能分割LPC项目，考虑嵌套结构"""
+            items = []
+            current_item = ""
+            bracket_depth = 0
+            in_quotes = False
+            escape_next = False
+            
+            for char in content:
+                if escape_next:
                     current_item += char
+                    escape_next = False
+                    continue
                 
-                # 添加最后一项
-                if current_item.strip():
-                    items.append(current_item.strip())
+                if char == '\\':
+                    escape_next = True
+                    current_item += char
+                    continue
                 
-                return items
-            
-            def find_key_value_separator(item):
-                """找到键值分隔符':'的位置，考虑嵌套和引号"""
-                bracket_depth = 0
-                in_quotes = False
-                escape_next = False
+                if char == '"' and not escape_next:
+                    in_quotes = not in_quotes
+                    current_item += char
+                    continue
                 
-                for i, char in enumerate(item):
-                    if escape_next:
-                        escape_next = False
-                        continue
-                    
-                    if char == '\\':
-                        escape_next = True
+                if not in_quotes:
+                    if char in '([{':
+                        bracket_depth += 1
+                    elif char in ')]}':
+                        bracket_depth -= 1
+                    elif char == ',' and bracket_depth == 0:
+                        # 找到分隔符，添加当前项
+                        if current_item.strip():
+                            items.append(current_item.strip())
+                        current_item = ""
                         continue
-                    
-                    if char == '"':
-                        in_quotes = not in_quotes
-                        continue
-                    
-                    if not in_quotes:
-                        if char in '([{':
-                            bracket_depth += 1
-                        elif char in ')]}':
-                            bracket_depth -= 1
-                        elif char == ':' and bracket_depth == 0:
-                            return i
                 
-                return -1
+                current_item += char
             
-            # 开始解析
-            result_obj = parse_lpc_structure(lpc_str)
+            # 添加最后一项
+            if current_item.strip():
+                items.append(current_item.strip())
             
-            # 如果请求返回字典对象
-            if return_dict:
-                return result_obj
+            return items
+        
+        def find_key_value_separator(item):
+            """找到键值分隔符':'的位置，考虑嵌套和引号"""
+            bracket_depth = 0
+            in_quotes = False
+            escape_next = False
             
-            # 否则返回JSON字符串
-            json_str = json.dumps(result_obj, ensure_ascii=False, separators=(',', ':'))
-            self.logger.debug(f"深层LPC解析成功，结果长度: {len(json_str)}")
-            return json_str
+            for i, char in enumerate(item):
+                if escape_next:
+                    escape_next = False
+                    continue
+                
+                if char == '\\':
+                    escape_next = True
+                    continue
+                
+                if char == '"':
+                    in_quotes = not in_quotes
+                    continue
+                
+                if not in_quotes:
+                    if char in '([{':
+                        bracket_depth += 1
+                    elif char in ')]}':
+                        bracket_depth -= 1
+                    elif char == ':' and bracket_depth == 0:
+                        return i
             
-        except Exception as e:
-            self.logger.warning(f"深层LPC解析失败: {e}")
-            # 降级到简单模式
-            return self.simple_lpc_to_js(lpc_str, return_dict)
+            return -1
+        
+        return parse_lpc_structure(lpc_str)
     
     def simple_lpc_to_js(self, lpc_str, return_dict=False):
         """
@@ -5,28 +5,50 @@ Redis发布/订阅工具类
 用于解决跨进程数据同步问题
 """
 
+import os
 import json
 import redis
 import logging
+import uuid
 from typing import Dict, Any, Optional, Callable
 from datetime import datetime
 import threading
 import time
 import pandas as pd
 
+from src.utils.dataframe_codec import (
+    encode_dataframe_message, decode_dataframe_message, is_dataframe_message
+)
+from src.utils.redis_update_stream import RedisUpdateStream
+
+# 二进制消息超过该字节数时，数据存放在短期Redis键中，频道只发布引用
+DATAFRAME_REF_THRESHOLD = 256 * 1024
+# 引用数据的过期时间（秒）
+DATAFRAME_REF_TTL = 120
+DATAFRAME_REF_KEY_PREFIX = 'pubsub:dataframe:'
+
+# 更新消息的传输方式：'stream'（Redis Streams更新日志，默认）或 'pubsub'（发布/订阅）
+UPDATE_TRANSPORT = os.environ.get('MH_UPDATE_TRANSPORT', 'stream')
+
 
 class RedisPubSub:
     """Redis发布/订阅工具类"""
     
-    def __init__(self, redis_client: Optional[redis.Redis] = None):
+    def __init__(self, redis_client: Optional[redis.Redis] = None,
+                 binary_client: Optional[redis.Redis] = None,
+                 use_streams: Optional[bool] = None):
         """
         初始化Redis发布/订阅
         
         Args:
             redis_client: Redis客户端实例，如果为None则创建新实例
+            binary_client: 不解码响应的Redis客户端（二进制消息使用），为None时按redis_client的连接参数创建
+            use_streams: 是否通过Redis Streams更新日志收发消息，为None时按 UPDATE_TRANSPORT 配置
         """
         self.redis_client = redis_client or self._create_redis_client()
-        self.pubsub = self.redis_client.pubsub()
+        self.binary_client = binary_client or self._create_binary_client()
+        # 订阅连接不解码：二进制消息原样接收，JSON消息在处理时解码
+        self.pubsub = self.binary_client.pubsub()
         self.subscribers = {}  # 存储订阅者回调函数列表 {channel: [callback1, callback2, ...]}
         self.subscribe_thread = None
         self.running = False
@@ -35,6 +57,9 @@ class RedisPubSub:
         self.max_reconnect_attempts = 10  # 最大重连次数
         self.reconnect_delay = 1  # 初始重连延迟（秒）
         self.max_reconnect_delay = 60  # 最大重连延迟（秒）
+        # Streams模式：消息写入更新日志，订阅端按消费者组批量读取（断线/繁忙时不丢消息，启动时重放）
+        self.use_streams = UPDATE_TRANSPORT == 'stream' if use_streams is None else use_streams
+        self.update_stream = RedisUpdateStream(self.binary_client, self._dispatch) if self.use_streams else None
         
     def _create_redis_client(self) -> redis.Redis:
         """创建Redis客户端"""
@@ -53,6 +78,12 @@ class RedisPubSub:
         except Exception as e:
             self.logger.error(f"创建Redis客户端失败: {e}")
             raise
+
+    def _create_binary_client(self) -> redis.Redis:
+        """创建不解码响应的Redis客户端（与redis_client使用相同的连接参数）"""
+        connection_kwargs = dict(self.redis_client.connection_pool.connection_kwargs)
+        connection_kwargs['decode_responses'] = False
+        return redis.Redis(connection_pool=redis.ConnectionPool(**connection_kwargs))
     
     def publish(self, channel: str, message: Dict[str, Any]) -> bool:
         """
@@ -73,6 +104,11 @@ class RedisPubSub:
             # 序列化消息
             message_str = json.dumps(message, ensure_ascii=False)
             
+            if self.use_streams:
+                entry_id = self.update_stream.append(channel, message_str.encode('utf-8'))
+                self.logger.info(f"📢 写入更新日志 {channel}: {message.get('type', 'unknown')} ({entry_id})")
+                return True
+            
             # 发布消息
             result = self.redis_client.publish(channel, message_str)
             
@@ -83,46 +119,90 @@ class RedisPubSub:
             self.logger.error(f"发布消息失败: {e}")
             return False
     
-    def publish_with_dataframe(self, channel: str, message: Dict[str, Any], dataframe: pd.DataFrame) -> bool:
+    def publish_with_dataframe(self, channel: str, message: Dict[str, Any], dataframe: pd.DataFrame,
+                               compress: bool = True) -> bool:
         """
-        发布包含DataFrame数据的消息到指定频道
+        发布包含DataFrame数据的消息到指定频道（二进制列式编码，不使用pickle）
+        
+        消息超过 DATAFRAME_REF_THRESHOLD 时，数据存放在短期Redis键中，频道只发布引用。
+        Streams模式下数据直接写入更新日志（引用键会过期，无法重放）。
         
         Args:
             channel: 频道名称
             message: 消息内容
             dataframe: 要发送的DataFrame数据
+            compress: 是否压缩数据体
             
         Returns:
             bool: 是否发布成功
         """
         try:
-            import pickle
-            import base64
-            
             # 添加时间戳
             message['timestamp'] = datetime.now().isoformat()
             message['publisher'] = 'spider'
             message['has_dataframe'] = True
+            message['dataframe_shape'] = list(dataframe.shape)
             
-            # 序列化DataFrame
-            dataframe_bytes = pickle.dumps(dataframe)
-            dataframe_b64 = base64.b64encode(dataframe_bytes).decode('utf-8')
-            message['dataframe_data'] = dataframe_b64
-            message['dataframe_shape'] = dataframe.shape
-            message['dataframe_columns'] = dataframe.columns.tolist()
+            # 编码消息和DataFrame
+            payload = encode_dataframe_message(message, dataframe, compress=compress)
             
-            # 序列化消息
-            message_str = json.dumps(message, ensure_ascii=False)
+            if self.use_streams:
+                entry_id = self.update_stream.append(channel, payload)
+                self.logger.info(f"📢 写入DataFrame更新日志 {channel}: {message.get('type', 'unknown')} ({entry_id}), "
+                                 f"数据量: {len(dataframe)} 条, 消息大小: {len(payload)} 字节")
+                return True
+            
+            if len(payload) > DATAFRAME_REF_THRESHOLD:
+                # 大数据：写入短期键，只发布引用
+                ref_key = f"{DATAFRAME_REF_KEY_PREFIX}{uuid.uuid4().hex}"
+                self.binary_client.set(ref_key, payload, ex=DATAFRAME_REF_TTL)
+                payload = encode_dataframe_message(dict(message, dataframe_ref=ref_key))
             
             # 发布消息
-            result = self.redis_client.publish(channel, message_str)
+            result = self.binary_client.publish(channel, payload)
             
-            self.logger.info(f"📢 发布DataFrame消息到频道 {channel}: {message.get('type', 'unknown')}, 数据量: {len(dataframe)} 条")
+            self.logger.info(f"📢 发布DataFrame消息到频道 {channel}: {message.get('type', 'unknown')}, "
+                             f"数据量: {len(dataframe)} 条, 消息大小: {len(payload)} 字节")
             return result > 0
             
         except Exception as e:
             self.logger.error(f"发布DataFrame消息失败: {e}")
             return False
+
+    def _decode_message_data(self, data: Any) -> Dict[str, Any]:
+        """
+        解析消息：二进制DataFrame消息（含引用）或JSON消息
+        
+        Args:
+            data: 频道消息数据
+            
+        Returns:
+            Dict[str, Any]: 消息字段，包含DataFrame的消息附带 'dataframe'（失败时为None）
+        """
+        if not is_dataframe_message(data):
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            message_data = json.loads(data)
+            if message_data.get('has_dataframe', False):
+                # 旧格式（pickle）的数据不再反序列化
+                self.logger.warning("📨 收到旧格式的DataFrame消息，已忽略其中的数据")
+                message_data['dataframe'] = None
+            return message_data
+        
+        message_data, dataframe = decode_dataframe_message(data)
+        try:
+            ref_key = message_data.get('dataframe_ref')
+            if ref_key:
+                payload = self.binary_client.get(ref_key)
+                if payload is None:
+                    raise ValueError(f"引用数据已过期或不存在: {ref_key}")
+                _, dataframe = decode_dataframe_message(payload)
+            message_data['dataframe'] = dataframe
+            self.logger.info(f"📨 成功解码DataFrame: {dataframe.shape}")
+        except Exception as e:
+            self.logger.error(f"解码DataFrame失败: {e}")
+            message_data['dataframe'] = None
+        return message_data
     
     def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None]) -> bool:
         """
@@ -139,7 +219,8 @@ class RedisPubSub:
             # 如果频道不存在，创建回调列表
             if channel not in self.subscribers:
                 self.subscribers[channel] = []
-                self.pubsub.subscribe(channel)
+                if not self.use_streams:
+                    self.pubsub.subscribe(channel)
                 self.logger.info(f"📡 订阅频道: {channel} (首次订阅)")
             
             # 添加回调到列表（避免重复添加）
@@ -149,8 +230,11 @@ class RedisPubSub:
             else:
                 self.logger.debug(f"📡 回调已存在，跳过: {channel}")
             
-            # 启动订阅线程
-            if not self.running:
+            if self.use_streams:
+                # 回调注册后再开始读取更新日志，重放的消息不会在没有订阅者时被确认
+                self.update_stream.add_channel(channel)
+            elif not self.running:
+                # 启动订阅线程
                 self._start_subscribe_thread()
             
             return True
@@ -172,7 +256,10 @@ class RedisPubSub:
         try:
             if channel in self.subscribers:
                 del self.subscribers[channel]
-                self.pubsub.unsubscribe(channel)
+                if self.use_streams:
+                    self.update_stream.remove_channel(channel)
+                else:
+                    self.pubsub.unsubscribe(channel)
                 self.logger.info(f"📡 取消订阅频道: {channel}")
                 return True
             return False
@@ -221,28 +308,17 @@ class RedisPubSub:
         """处理接收到的消息（调用所有订阅者的回调）"""
         try:
             channel = message['channel']
-            data = message['data']
-            
-            # 解析消息
-            message_data = json.loads(data)
-            
-            # 如果消息包含DataFrame数据，进行反序列化
-            if message_data.get('has_dataframe', False):
-                try:
-                    import pickle
-                    import base64
-                    
-                    dataframe_b64 = message_data.get('dataframe_data')
-                    if dataframe_b64:
-                        dataframe_bytes = base64.b64decode(dataframe_b64)
-                        dataframe = pickle.loads(dataframe_bytes)
-                        message_data['dataframe'] = dataframe
-                        
-                        self.logger.info(f"📨 成功反序列化DataFrame: {dataframe.shape}")
-                        
-                except Exception as e:
-                    self.logger.error(f"反序列化DataFrame失败: {e}")
-                    message_data['dataframe'] = None
+            if isinstance(channel, bytes):
+                channel = channel.decode('utf-8')
+            self._dispatch(channel, message['data'])
+        except Exception as e:
+            self.logger.error(f"处理消息失败: {e}")
+    
+    def _dispatch(self, channel: str, data: Any):
+        """解析消息数据并调用频道所有订阅者的回调（发布/订阅与更新日志共用）"""
+        try:
+            # 解析消息（DataFrame消息同时解码数据）
+            message_data = self._decode_message_data(data)
             
             # 调用所有订阅者的回调函数
             if channel in self.subscribers:
@@ -287,7 +363,10 @@ class RedisPubSub:
             
             # 重新创建 Redis 客户端
             self.redis_client = self._create_redis_client()
-            self.pubsub = self.redis_client.pubsub()
+            self.binary_client = self._create_binary_client()
+            self.pubsub = self.binary_client.pubsub()
+            if self.update_stream is not None:
+                self.update_stream.client = self.binary_client
             
             # 重新订阅所有频道
             if self.subscribers:
@@ -307,6 +386,8 @@ class RedisPubSub:
         self.running = False
         if self.subscribe_thread:
             self.subscribe_thread.join(timeout=2)
+        if self.update_stream is not None:
+            self.update_stream.stop()
         try:
             self.pubsub.close()
         except:
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Redis Streams 更新日志
+用于跨进程缓存同步：发布/订阅在订阅端重连或繁忙时会丢消息，导致只能全量刷新
+
+- 发布端：每个频道对应一个Stream（XADD，按近似MAXLEN裁剪），消息体与发布/订阅的二进制消息格式相同
+- 订阅端：每个进程一个消费者组，组内记录已投递位置
+- 按进程号命名的临时消费者组在停止读取、进程退出（atexit / gunicorn worker_exit）时删除，避免残留
+- 批量读取：一次 XREADGROUP 读取所有订阅频道，每次最多 STREAM_READ_COUNT 条
+- 启动重放：先重放本消费者已投递但未确认的消息，新建的消费者组从 STREAM_REPLAY_WINDOW_SECONDS 之前开始读取
+- 连接断开期间的消息保留在Stream中，恢复后从消费者组的位置继续读取
+
+恢复保证：进程运行期间（包括断线重连）不丢消息；进程重启后只重放最近 STREAM_REPLAY_WINDOW_SECONDS 内的更新
+（临时消费者组在进程退出时删除），更早的变化由重启后的全量加载（共享缓存/快照补齐增量/Redis全量缓存）覆盖
+"""
+
+import atexit
+import os
+import socket
+import threading
+import time
+import logging
+import weakref
+from typing import Any, Callable, List, Optional
+
+import redis
+
+STREAM_KEY_PREFIX = 'stream:'
+# 每个Stream保留的最大消息数（近似裁剪）
+STREAM_MAXLEN = 2000
+# 每次批量读取的最大消息数
+STREAM_READ_COUNT = 100
+# 阻塞读取的超时（毫秒）
+STREAM_BLOCK_MS = 1000
+# 新建消费者组时重放的时间窗口（秒）
+STREAM_REPLAY_WINDOW_SECONDS = 600
+# 消费者组内的消费者名称（每个进程独占一个消费者组）
+STREAM_CONSUMER_NAME = 'main'
+# 消息体字段
+STREAM_PAYLOAD_FIELD = 'payload'
+
+
+def stream_key(channel: str) -> str:
+    """频道对应的Stream键"""
+    return f"{STREAM_KEY_PREFIX}{channel}"
+
+
+def default_group_name() -> str:
+    """
+    消费者组名称
+
+    每个进程需要收到全部更新，因此每个进程使用独立的消费者组（按主机名和进程号命名，进程退出时删除）。
+    设置环境变量 MH_UPDATE_STREAM_GROUP 时使用该固定名称，进程重启后从上次的位置继续读取；
+    该名称只能由单个进程使用（同一消费者组内的多个进程会分摊消息，而不是各自收到全部更新），
+    因此不适用于gunicorn等多worker部署。
+    """
+    return os.environ.get('MH_UPDATE_STREAM_GROUP') or f"mh:{socket.gethostname()}:{os.getpid()}"
+
+
+# 使用临时消费者组的读取器（进程退出时删除其消费者组）
+_ephemeral_streams = weakref.WeakSet()
+
+
+def destroy_ephemeral_groups():
+    """删除本进程所有临时消费者组（atexit / gunicorn worker_exit 时调用）"""
+    for stream in list(_ephemeral_streams):
+        stream.destroy_groups()
+
+
+atexit.register(destroy_ephemeral_groups)
+
+
+def _to_str(value: Any) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+class RedisUpdateStream:
+    """基于Redis Streams的更新日志（写入与按消费者组读取）"""
+
+    def __init__(self, client: redis.Redis,
+                 dispatch: Callable[[str, Any], None],
+                 group: Optional[str] = None,
+                 consumer: str = STREAM_CONSUMER_NAME,
+                 maxlen: int = STREAM_MAXLEN):
+        """
+        Args:
+            client: 不解码响应的Redis客户端
+            dispatch: 消息处理函数，参数为 (频道, 消息体)
+            group: 消费者组名称，为None时使用 default_group_name()
+                   （未设置 MH_UPDATE_STREAM_GROUP 时为临时消费者组，停止读取时删除）
+            consumer: 消费者名称
+            maxlen: 每个Stream保留的最大消息数
+        """
+        self.client = client
+        self.dispatch = dispatch
+        self.group = group or default_group_name()
+        # 按进程号命名的消费者组只属于本进程，停止读取/进程退出时删除
+        self.ephemeral = group is None and not os.environ.get('MH_UPDATE_STREAM_GROUP')
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.logger = logging.getLogger(__name__)
+
+        self.channels: List[str] = []
+        # 仍需重放未确认消息的频道
+        self._pending_channels = set()
+        # 已创建（或加入）消费者组的频道
+        self._group_channels = set()
+        self._lock = threading.Lock()
+
+        self.read_thread = None
+        self.running = False
+        self.retry_delay = 1
+        self.max_retry_delay = 60
+
+        if self.ephemeral:
+            _ephemeral_streams.add(self)
+
+    def append(self, channel: str, payload: bytes) -> str:
+        """
+        写入一条更新消息
+
+        Args:
+            channel: 频道名称
+            payload: 消息体（二进制消息或JSON字节）
+
+        Returns:
+            str: 消息ID
+        """
+        entry_id = self.client.xadd(stream_key(channel), {STREAM_PAYLOAD_FIELD: payload},
+                                    maxlen=self.maxlen, approximate=True)
+        return _to_str(entry_id)
+
+    def add_channel(self, channel: str):
+        """开始读取频道的更新日志（创建消费者组并启动读取线程）"""
+        with self._lock:
+            if channel in self.channels:
+                return
+            self._ensure_group(channel)
+            self.channels.append(channel)
+            self._pending_channels.add(channel)
+        self.logger.info(f"📡 读取更新日志: {stream_key(channel)} (消费者组: {self.group})")
+        self.start()
+
+    def remove_channel(self, channel: str):
+        """停止读取频道的更新日志（保留消费者组，之后重新订阅时继续读取）"""
+        with self._lock:
+            if channel in self.channels:
+                self.channels.remove(channel)
+            self._pending_channels.discard(channel)
+
+    def _ensure_group(self, channel: str):
+        """创建消费者组（已存在时忽略）；新建的组从重放窗口的起点开始读取"""
+        start_ms = max(int((time.time() - STREAM_REPLAY_WINDOW_SECONDS) * 1000), 0)
+        try:
+            self.client.xgroup_create(stream_key(channel), self.group, id=f"{start_ms}-0", mkstream=True)
+            self.logger.info(f"📡 创建消费者组 {self.group}，重放最近 {STREAM_REPLAY_WINDOW_SECONDS} 秒的更新")
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_channels.add(channel)
+
+    def destroy_groups(self):
+        """删除本读取器在各频道上的消费者组（连同其未确认消息）"""
+        with self._lock:
+            channels = list(self._group_channels)
+            self._group_channels.clear()
+        for channel in channels:
+            try:
+                self.client.xgroup_destroy(stream_key(channel), self.group)
+            except Exception as e:
+                self.logger.warning(f"删除消费者组 {self.group} ({stream_key(channel)}) 失败: {e}")
+        if channels:
+            self.logger.info(f"📡 已删除消费者组 {self.group}（{len(channels)} 个频道）")
+
+    def read_batch(self, block_ms: Optional[int] = STREAM_BLOCK_MS) -> int:
+        """
+        批量读取并处理一次更新消息
+
+        - 有未确认消息的频道从 '0' 读取（重放），其余频道读取新消息 '>'
+        - 每条消息处理后确认（处理失败也确认，避免同一条消息反复重放）
+
+        Args:
+            block_ms: 阻塞超时（毫秒），None表示不阻塞
+
+        Returns:
+            int: 处理的消息数
+        """
+        with self._lock:
+            channels = list(self.channels)
+            pending = set(self._pending_channels)
+        if not channels:
+            return 0
+
+        streams = {stream_key(channel): ('0' if channel in pending else '>') for channel in channels}
+        try:
+            response = self.client.xreadgroup(self.group, self.consumer, streams,
+                                              count=STREAM_READ_COUNT, block=None if pending else block_ms)
+        except redis.ResponseError as e:
+            if 'NOGROUP' not in str(e):
+                raise
+            # Stream或消费者组被删除（如Redis重启）：重新创建后下次读取
+            self.logger.warning(f"消费者组不存在，重新创建: {e}")
+            with self._lock:
+                for channel in channels:
+                    self._ensure_group(channel)
+            return 0
+
+        processed = 0
+        channel_by_key = {stream_key(channel): channel for channel in channels}
+        replied = set()
+        for key, entries in response or []:
+            channel = channel_by_key.get(_to_str(key))
+            if channel is None:
+                continue
+            replied.add(channel)
+            if channel in pending and not entries:
+                # 未确认消息已全部重放
+                with self._lock:
+                    self._pending_channels.discard(channel)
+                continue
+
+            entry_ids = []
+            for entry_id, fields in entries:
+                entry_ids.append(entry_id)
+                # 未确认消息可能已被裁剪，此时fields为空
+                payload = (fields or {}).get(STREAM_PAYLOAD_FIELD.encode('utf-8'),
+                                             (fields or {}).get(STREAM_PAYLOAD_FIELD))
+                if payload is not None:
+                    try:
+                        self.dispatch(channel, payload)
+                    except Exception as e:
+                        self.logger.error(f"处理更新日志消息失败: {e}")
+                    processed += 1
+            if entry_ids:
+                self.client.xack(stream_key(channel), self.group, *entry_ids)
+
+        # 部分Redis版本在没有未确认消息时不返回该Stream
+        for channel in pending - replied:
+            with self._lock:
+                self._pending_channels.discard(channel)
+        return processed
+
+    def start(self):
+        """启动读取线程"""
+        if self.read_thread and self.read_thread.is_alive():
+            return
+        self.running = True
+        self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.read_thread.start()
+        self.logger.info("📡 启动更新日志读取线程")
+
+    def _read_loop(self):
+        """读取循环：连接断开时退避重试，消息保留在Stream中，恢复后继续读取"""
+        while self.running:
+            try:
+                self.read_batch()
+                self.retry_delay = 1
+            except redis.ConnectionError as e:
+                self.logger.error(f"读取更新日志时Redis连接错误: {e}，{self.retry_delay} 秒后重试")
+                time.sleep(self.retry_delay)
+                self.retry_delay = min(self.retry_delay * 2, self.max_retry_delay)
+            except Exception as e:
+                self.logger.error(f"读取更新日志错误: {e}")
+                time.sleep(1)
+
+    def stop(self):
+        """停止读取线程；临时消费者组随之删除"""
+        self.running = False
+        if self.read_thread:
+            self.read_thread.join(timeout=(STREAM_BLOCK_MS / 1000) + 1)
+        if self.ephemeral:
+            self.destroy_groups()
+        self.logger.info("📡 停止更新日志读取")
@@ -10,16 +10,138 @@
 - REPLACE: 完全替换记录（删除旧记录，插入新记录）
 - IGNORE: 忽略新数据，保留现有记录
 - UPDATE: 更新现有记录，但保留create_time字段
+
+批量upsert（bulk_upsert）：
+- MySQL使用 INSERT ... ON DUPLICATE KEY UPDATE，SQLite/PostgreSQL使用 INSERT ... ON CONFLICT DO UPDATE
+- 按块executemany执行，返回新增/更新条数
 """
 
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Sequence
 from datetime import datetime
-from sqlalchemy import create_engine, text, MetaData, Table, Column, String, Integer, Text, DateTime, Float
+from sqlalchemy import create_engine, text, MetaData, Table, Column, String, Integer, Text, DateTime, Float, select, tuple_
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
+# 冲突更新时保留的字段（创建时间和估价结果不被爬虫数据覆盖）
+PROTECTED_UPDATE_FIELDS = frozenset({'create_time', 'base_price', 'equip_price', 'pet_price', 'split_price_desc'})
+
+# 批量upsert每块的行数
+BULK_UPSERT_CHUNK_SIZE = 500
+
+
+def build_upsert_statement(dialect_name: str, table: Table, columns: Sequence[str],
+                           key_columns: Sequence[str], protected_columns=PROTECTED_UPDATE_FIELDS):
+    """
+    构建方言对应的upsert语句
+    
+    Args:
+        dialect_name: 数据库方言名称（mysql/mariadb/sqlite/postgresql）
+        table: 目标表
+        columns: 本批数据包含的列
+        key_columns: 冲突判断的主键/唯一键列
+        protected_columns: 冲突时不更新的列
+        
+    Returns:
+        Insert: 可以executemany执行的语句
+    """
+    update_columns = [col for col in columns if col not in key_columns and col not in protected_columns]
+    
+    if dialect_name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        if not update_columns:
+            return stmt.prefix_with('IGNORE')
+        return stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in update_columns})
+    
+    if dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        if not update_columns:
+            return stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+        return stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={col: stmt.excluded[col] for col in update_columns}
+        )
+    
+    raise ValueError(f"不支持的数据库方言: {dialect_name}")
+
+
+def bulk_upsert(connection, table, rows: List[Dict[str, Any]], key_columns: Optional[Sequence[str]] = None,
+                protected_columns=PROTECTED_UPDATE_FIELDS, chunk_size: int = BULK_UPSERT_CHUNK_SIZE,
+                touch_column: Optional[str] = 'update_time') -> Dict[str, int]:
+    """
+    批量插入或更新（按主键冲突更新，不逐条加载ORM对象）
+    
+    Args:
+        connection: SQLAlchemy连接（或Session.connection()）
+        table: 目标表（Table或ORM模型类）
+        rows: 数据字典列表，不属于表的字段会被忽略
+        key_columns: 冲突判断的列，默认使用表的主键
+        protected_columns: 冲突时不更新的列
+        chunk_size: 每块的行数
+        touch_column: 未提供时自动设置为当前时间的更新时间列
+        
+    Returns:
+        Dict[str, int]: {'inserted': 新增条数, 'updated': 更新条数, 'skipped': 缺少主键跳过的条数}
+    """
+    table = getattr(table, '__table__', table)
+    key_columns = list(key_columns or [col.name for col in table.primary_key.columns])
+    table_columns = set(table.columns.keys())
+    datetime_columns = {col.name for col in table.columns if isinstance(col.type, DateTime)}
+    dialect_name = connection.dialect.name
+    now = datetime.now()
+    
+    # 过滤无效字段；同一批次中主键重复的数据只保留最后一条（与逐条更新的最终结果一致）
+    unique_rows = {}
+    skipped = 0
+    for row in rows:
+        filtered = {key: value for key, value in row.items() if key in table_columns}
+        key = tuple(filtered.get(col) for col in key_columns)
+        if any(value is None or value == '' for value in key):
+            skipped += 1
+            continue
+        if touch_column and touch_column in table_columns and filtered.get(touch_column) is None:
+            filtered[touch_column] = now
+        # 时间列的字符串值统一转换为datetime（SQLite的DateTime类型不接受字符串）
+        for col in datetime_columns.intersection(filtered):
+            if isinstance(filtered[col], str):
+                try:
+                    filtered[col] = datetime.fromisoformat(filtered[col])
+                except ValueError:
+                    pass
+        unique_rows.pop(key, None)
+        unique_rows[key] = filtered
+    
+    # executemany要求每行的列一致：按列集合分组执行
+    groups: Dict[tuple, List[tuple]] = {}
+    for key, row in unique_rows.items():
+        groups.setdefault(tuple(sorted(row)), []).append((key, row))
+    
+    key_expr = table.c[key_columns[0]] if len(key_columns) == 1 else tuple_(*[table.c[col] for col in key_columns])
+    inserted = updated = 0
+    for columns, group in groups.items():
+        stmt = build_upsert_statement(dialect_name, table, columns, key_columns, protected_columns)
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+            keys = [key[0] if len(key_columns) == 1 else key for key, _ in chunk]
+            
+            # 一次主键查询区分新增与更新（ON DUPLICATE KEY UPDATE的rowcount在executemany下不可靠）
+            existing = connection.execute(select(*[table.c[col] for col in key_columns]).where(key_expr.in_(keys)))
+            existing_keys = set(tuple(r) for r in existing)
+            chunk_updated = sum(1 for key, _ in chunk if key in existing_keys)
+            
+            connection.execute(stmt, [row for _, row in chunk])
+            updated += chunk_updated
+            inserted += len(chunk) - chunk_updated
+    
+    return {'inserted': inserted, 'updated': updated, 'skipped': skipped}
+
+
 class SmartDBHelper:
     """智能数据库操作助手 - MySQL版本"""
     
@@ -235,8 +357,7 @@ class SmartDBHelper:
             sql = f"INSERT IGNORE INTO {table_name} ({', '.join(escaped_columns)}) VALUES ({', '.join(placeholders)})"
         elif on_conflict == "UPDATE":
             # 构建UPDATE冲突处理，保留create_time和估价相关字段
-            protected_fields = {'create_time', 'base_price', 'equip_price', 'pet_price', 'split_price_desc'}
-            update_columns = [col for col in columns if col not in protected_fields]
+            update_columns = [col for col in columns if col not in PROTECTED_UPDATE_FIELDS]
             if update_columns:
                 # 对更新字段也进行转义处理
                 escaped_update_columns = []
@@ -361,6 +482,41 @@ class SmartDBHelper:
         except SQLAlchemyError as e:
             self.logger.error(f"插入数据到表 {table_name} 失败: {e}")
             return False
+    
+    def get_table(self, table_name: str) -> Table:
+        """获取表结构（优先使用ORM模型定义，其他表从数据库反射并缓存）"""
+        if not hasattr(self, '_table_cache'):
+            self._table_cache = {}
+        if table_name in self._table_cache:
+            return self._table_cache[table_name]
+        
+        from src.models import Base
+        import src.models  # noqa: F401  确保所有模型已注册到Base.metadata
+        
+        table = Base.metadata.tables.get(table_name)
+        if table is None:
+            table = Table(table_name, MetaData(), autoload_with=self.engine)
+        self._table_cache[table_name] = table
+        return table
+    
+    def bulk_upsert(self, table_name: str, rows: List[Dict[str, Any]], **kwargs) -> Dict[str, int]:
+        """
+        批量插入或更新数据（单个事务，按块executemany）
+        
+        Args:
+            table_name: 表名
+            rows: 数据字典列表
+            **kwargs: 传递给bulk_upsert的参数（key_columns、protected_columns、chunk_size、touch_column）
+            
+        Returns:
+            Dict[str, int]: {'inserted': 新增条数, 'updated': 更新条数, 'skipped': 跳过条数}
+        """
+        table = self.get_table(table_name)
+        with self.engine.begin() as conn:
+            result = bulk_upsert(conn, table, rows, **kwargs)
+        self.logger.info(f"批量upsert表 {table_name}: 新增 {result['inserted']} 条, 更新 {result['updated']} 条"
+                         + (f", 跳过 {result['skipped']} 条" if result['skipped'] else ""))
+        return result
 
 class CBGSmartDB:
     """CBG爬虫专用智能数据库管理器 - MySQL版本"""
@@ -429,29 +585,8 @@ class CBGSmartDB:
                     if result:
                         old_price, history_price_json = result
                         
-                        # 解析现有的价格历史
-                        try:
-                            if history_price_json and history_price_json != '[]':
-                                history_list = json.loads(history_price_json)
-                            else:
-                                history_list = []
-                        except (json.JSONDecodeError, TypeError):
-                            history_list = []
-                        
-                        # 添加新的价格记录
-                        new_price_record = {
-                            'price': old_price,
-                            'timestamp': current_time,
-                            'action': 'price_change'
-                        }
-                        history_list.append(new_price_record)
-                        
-                        # 限制历史记录数量，保留最近100条
-                        if len(history_list) > 100:
-                            history_list = history_list[-100:]
-                        
                         # 更新role_data中的history_price
-                        role_data['history_price'] = json.dumps(history_list, ensure_ascii=False)
+                        role_data['history_price'] = self._append_price_history(history_price_json, old_price, current_time)
                         
                         self.logger.info(f"角色 {eid} 价格从 {old_price} 变更为 {current_price}，已记录到价格历史")
                     
@@ -475,13 +610,54 @@ class CBGSmartDB:
             return self.db_helper.insert_data('roles', role_data, on_conflict="UPDATE")
     
     def save_roles_batch(self, roles_list: List[Dict[str, Any]]) -> bool:
-        """智能批量保存角色数据，应用与save_role相同的保护逻辑"""
+        """智能批量保存角色数据，应用与save_role相同的保护逻辑（一次查询价格历史，批量upsert）"""
         if not roles_list:
             self.logger.debug("角色列表为空，跳过保存")
             return True
         
         self.logger.info(f"开始智能批量保存 {len(roles_list)} 条角色数据...")
         
+        try:
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            roles = []
+            for role_data in roles_list:
+                role_data = role_data.copy()
+                role_data['update_time'] = current_time
+                if 'create_time' not in role_data:
+                    role_data['create_time'] = current_time
+                roles.append(role_data)
+            
+            # 一次查询所有已存在角色的价格和价格历史
+            eids = [role.get('eid') for role in roles if role.get('eid')]
+            existing_prices = {}
+            if eids:
+                roles_table = self.db_helper.get_table('roles')
+                with self.db_helper.get_connection() as conn:
+                    query = select(roles_table.c.eid, roles_table.c.price, roles_table.c.history_price).where(
+                        roles_table.c.eid.in_(eids))
+                    existing_prices = {row[0]: (row[1], row[2]) for row in conn.execute(query)}
+            
+            for role_data in roles:
+                eid = role_data.get('eid')
+                current_price = role_data.get('price')
+                if eid not in existing_prices or current_price is None:
+                    continue
+                old_price, history_price_json = existing_prices[eid]
+                if old_price == current_price:
+                    continue
+                role_data['history_price'] = self._append_price_history(history_price_json, old_price, current_time)
+                # 同一批次中同一角色再次出现时，以本条价格为基准
+                existing_prices[eid] = (current_price, role_data['history_price'])
+                self.logger.info(f"角色 {eid} 价格从 {old_price} 变更为 {current_price}，已记录到价格历史")
+            
+            validated_roles = [self.db_helper.validate_data_types(role_data, 'roles') for role_data in roles]
+            result = self.db_helper.bulk_upsert('roles', validated_roles)
+            self.logger.info(f"智能批量保存完成: 新增 {result['inserted']} 条, 更新 {result['updated']} 条")
+            return result['inserted'] + result['updated'] > 0
+            
+        except Exception as e:
+            self.logger.error(f"批量upsert角色数据失败，改为逐条保存: {e}")
+        
         success_count = 0
         error_count = 0
         
@@ -504,6 +680,28 @@ class CBGSmartDB:
         # 如果有成功保存的记录，就认为批量操作成功
         return success_count > 0
     
+    @staticmethod
+    def _append_price_history(history_price_json, old_price, current_time: str) -> str:
+        """把旧价格追加到价格历史（保留最近100条）"""
+        try:
+            if history_price_json and history_price_json != '[]':
+                history_list = json.loads(history_price_json)
+            else:
+                history_list = []
+        except (json.JSONDecodeError, TypeError):
+            history_list = []
+        
+        history_list.append({
+            'price': old_price,
+            'timestamp': current_time,
+            'action': 'price_change'
+        })
+        
+        # 限制历史记录数量，保留最近100条
+        if len(history_list) > 100:
+            history_list = history_list[-100:]
+        return json.dumps(history_list, ensure_ascii=False)
+    
     def save_large_equip_data(self, equip_data: Dict[str, Any]) -> bool:
         """智能保存详细装备数据，冲突时保留create_time"""
         # 添加更新时间，使用MySQL标准格式
@@ -512,72 +710,23 @@ class CBGSmartDB:
         return self.db_helper.insert_data('large_equip_desc_data', equip_data, on_conflict="UPDATE")
     
     def save_large_equip_batch(self, equip_list: List[Dict[str, Any]]) -> bool:
-        """批量保存详细装备数据 - 使用ORM方式"""
+        """批量保存详细装备数据 - 批量upsert（冲突时保留create_time）"""
         if not equip_list:
             return True
         
-        self.logger.info(f"开始批量保存 {len(equip_list)} 条详细装备数据 (ORM方式)...")
+        self.logger.info(f"开始批量保存 {len(equip_list)} 条详细装备数据...")
         
         try:
-            from src.models.role import LargeEquipDescData
-            from sqlalchemy.orm import sessionmaker
-            from sqlalchemy import inspect
-            
-            # 获取LargeEquipDescData模型的所有列名
-            inspector = inspect(LargeEquipDescData)
-            valid_columns = set(column.key for column in inspector.columns)
+            # 为所有记录添加时间戳
+            timestamp = datetime.now()
+            rows = [{**equip_data, 'update_time': timestamp, 'create_time': timestamp} for equip_data in equip_list]
             
-            # 创建Session
-            Session = sessionmaker(bind=self.db_helper.engine)
-            session = Session()
-            
-            try:
-                # 为所有记录添加时间戳
-                timestamp = datetime.now()
-                
-                # 批量创建ORM对象
-                equip_objects = []
-                for equip_data in equip_list:
-                    # 过滤掉不存在的字段
-                    filtered_data = {}
-                    invalid_fields = []
-                    
-                    for key, value in equip_data.items():
-                        if key in valid_columns:
-                            filtered_data[key] = value
-                        else:
-                            invalid_fields.append(key)
-                    
-                    if invalid_fields:
-                        self.logger.debug(f"过滤掉无效字段: {invalid_fields}")
-                    
-                    # 添加时间戳
-                    filtered_data['update_time'] = timestamp
-                    filtered_data['create_time'] = timestamp
-                    
-                    # 创建LargeEquipDescData对象，ORM会自动处理数据类型转换
-                    equip_obj = LargeEquipDescData(**filtered_data)
-                    equip_objects.append(equip_obj)
-                
-                # 批量插入/更新
-                for equip_obj in equip_objects:
-                    session.merge(equip_obj)  # merge会自动处理插入/更新
-                
-                # 提交事务
-                session.commit()
-                
-                self.logger.info(f"ORM批量保存详细装备数据成功: {len(equip_list)} 条")
-                return True
-                
-            except Exception as e:
-                session.rollback()
-                self.logger.error(f"ORM批量保存详细装备数据失败，已回滚: {e}")
-                raise e
-            finally:
-                session.close()
+            result = self.db_helper.bulk_upsert('large_equip_desc_data', rows)
+            self.logger.info(f"批量保存详细装备数据成功: 新增 {result['inserted']} 条, 更新 {result['updated']} 条")
+            return True
                 
         except Exception as e:
-            self.logger.error(f"ORM批量保存详细装备数据时发生异常: {e}")
+            self.logger.error(f"批量保存详细装备数据时发生异常: {e}")
             return False
     
     def save_equipment(self, equipment_data: Dict[str, Any]) -> bool:
@@ -598,7 +747,12 @@ class CBGSmartDB:
         for equip in equipments_list:
             equip['update_time'] = timestamp
         
-        return self.db_helper.insert_data('equipments', equipments_list, on_conflict="UPDATE")
+        try:
+            self.db_helper.bulk_upsert('equipments', equipments_list)
+            return True
+        except Exception as e:
+            self.logger.error(f"批量保存装备数据失败: {e}")
+            return False
     
     def save_pet_data(self, pet_data: Dict[str, Any]) -> bool:
         """智能保存召唤兽数据，冲突时保留create_time"""
@@ -617,7 +771,12 @@ class CBGSmartDB:
         for pet in pets_list:
             pet['update_time'] = timestamp
         
-        return self.db_helper.insert_data('pets', pets_list, on_conflict="UPDATE")
+        try:
+            self.db_helper.bulk_upsert('pets', pets_list)
+            return True
+        except Exception as e:
+            self.logger.error(f"批量保存召唤兽数据失败: {e}")
+            return False
 
     def check_role_exists_by_eid(self, eid: str) -> bool:
         """检查角色是否存在"""
@@ -4,10 +4,16 @@
 """
 CBG爬虫后端启动脚本 - 生产模式
 性能优化，不启用调试功能
+
+多进程WSGI服务（gunicorn）：
+- 全量市场缓存由一个worker（持有写入锁）加载后发布到共享内存，其他worker只读挂载
+- 刷新完成后发布新版本，各worker在下次查询时切换
+- 不支持gunicorn的平台（Windows）退回Flask单进程多线程服务
 """
 
 import os
 import sys
+import threading
 
 # 设置生产环境
 os.environ['FLASK_ENV'] = 'production'
@@ -17,22 +23,105 @@ project_root = os.path.dirname(os.path.abspath(__file__))
 src_path = os.path.join(project_root, 'src')
 sys.path.insert(0, src_path)
 
-if __name__ == "__main__":
+# 启用多进程共享的市场缓存（各采集器读取该环境变量）
+os.environ.setdefault('MH_SHARED_CACHE_DIR', os.path.join(project_root, 'data', 'shared_cache'))
+
+# 服务配置（可通过环境变量覆盖）
+BIND = os.environ.get('API_BIND', '0.0.0.0:5000')
+WORKERS = int(os.environ.get('API_WORKERS', min(4, os.cpu_count() or 1)))
+THREADS = int(os.environ.get('API_THREADS', 4))
+TIMEOUT = int(os.environ.get('API_TIMEOUT', 300))
+
+
+def warm_up_collectors(app):
+    """
+    预先创建市场数据采集器：持有写入锁的worker在后台加载全量缓存并发布到共享内存，
+    其他worker在首次查询时直接挂载
+    """
+    from src.evaluator.market_anchor.equip.equip_market_data_collector import EquipMarketDataCollector
+    from src.evaluator.market_anchor.pet.pet_market_data_collector import PetMarketDataCollector
+    from src.evaluator.market_data_collector import MarketDataCollector
+
+    with app.app_context():
+        for collector_cls in (EquipMarketDataCollector, PetMarketDataCollector, MarketDataCollector):
+            try:
+                collector_cls()
+            except Exception as e:
+                print(f"⚠️ 预加载 {collector_cls.__name__} 失败: {e}")
+
+
+def post_worker_init(worker):
+    """gunicorn worker启动后在后台预加载采集器（不阻塞请求处理）"""
+    threading.Thread(target=warm_up_collectors, args=(worker.wsgi,), daemon=True).start()
+
+
+def worker_exit(server, worker):
+    """gunicorn worker退出时删除本进程的临时消费者组（gunicorn不保证执行atexit）"""
+    from src.utils.redis_update_stream import destroy_ephemeral_groups
+    destroy_ephemeral_groups()
+
+
+def run_gunicorn():
+    """多进程运行（gunicorn gthread worker）"""
+    from gunicorn.app.base import BaseApplication
+
+    class ProductionApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': BIND,
+                'workers': WORKERS,
+                'worker_class': 'gthread',
+                'threads': THREADS,
+                'timeout': TIMEOUT,
+                # 不预加载应用：采集器会启动后台线程，需在各worker中分别创建
+                'preload_app': False,
+                'accesslog': '-',
+                'post_worker_init': post_worker_init,
+                'worker_exit': worker_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import create_app
+            return create_app()
+
+    print(f"⚡ gunicorn: {WORKERS} 个worker x {THREADS} 线程，共享缓存目录: {os.environ['MH_SHARED_CACHE_DIR']}")
+    ProductionApplication().run()
+
+
+def run_flask():
+    """单进程多线程运行（不支持gunicorn时）"""
     from app import create_app
-    
-    print("🚀 CBG爬虫API服务器 - 生产模式")
-    print("🌐 API地址: http://localhost:5000")
-    print("📱 前端地址: http://localhost:8080 (需要单独启动)")
-    print("⚡ 性能优化模式，关闭调试功能")
-    print("🚀 Ctrl+C 停止服务器")
-    print("-" * 50)
-    
+
+    host, _, port = BIND.rpartition(':')
     app = create_app()
     app.run(
-        host='0.0.0.0', 
-        port=5000, 
+        host=host or '0.0.0.0',
+        port=int(port),
         debug=False,
         use_reloader=False,  # 关闭自动重载
         use_debugger=False,  # 关闭调试器
         threaded=True        # 启用多线程支持
-    ) 
\ No newline at end of file
+    )
+
+
+if __name__ == "__main__":
+    print("🚀 CBG爬虫API服务器 - 生产模式")
+    print(f"🌐 API地址: http://{BIND}")
+    print("📱 前端地址: http://localhost:8080 (需要单独启动)")
+    print("⚡ 性能优化模式，关闭调试功能")
+    print("🚀 Ctrl+C 停止服务器")
+    print("-" * 50)
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        gunicorn = None
+
+    if gunicorn is None or os.name == 'nt':
+        print("⚠️ gunicorn不可用，使用Flask单进程服务（不启用共享缓存）")
+        os.environ.pop('MH_SHARED_CACHE_DIR', None)
+        run_flask()
+    else:
+        run_gunicorn()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+装备描述解析性能：EquipFeatureExtractor.extract_features 处理只有cDesc的装备数据的吞吐量
+
+样本为 libs/RoleDemo.json 中角色身上/背包里的装备描述（cDesc + iType），
+按不同装备类型重复解析，输出每秒处理的装备数。
+
+用法: python tests/benchmark_equip_desc_parser.py [重复轮数]
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils.lpc_helper import LPCHelper
+from src.evaluator.feature_extractor.equip_feature_extractor import EquipFeatureExtractor
+
+
+def _collect_desc_items(node, items):
+    if isinstance(node, dict):
+        if 'cDesc' in node and 'iType' in node:
+            items.append({'cDesc': node['cDesc'], 'iType': node['iType']})
+        for value in node.values():
+            _collect_desc_items(value, items)
+    elif isinstance(node, list):
+        for value in node:
+            _collect_desc_items(value, items)
+
+
+def _load_samples():
+    with open(os.path.join(project_root, 'libs', 'RoleDemo.json'), 'r', encoding='utf-8') as f:
+        role = LPCHelper().parse_lpc(json.load(f)['large_equip_desc'])
+    items = []
+    _collect_desc_items(role, items)
+    return items
+
+
+def _rows_per_second(func, rows, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for row in rows:
+            func(row)
+    return len(rows) * rounds / (time.perf_counter() - start)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with contextlib.redirect_stdout(io.StringIO()):
+        extractor = EquipFeatureExtractor()
+    samples = _load_samples()
+    descs = [item['cDesc'] for item in samples]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_rate = _rows_per_second(lambda row: extractor.extract_features(dict(row)), samples, rounds)
+        parse_rate = _rows_per_second(lambda row: extractor._parse_equip_data_from_desc(dict(row)), samples, rounds)
+
+    avg_len = sum(len(desc) for desc in descs) / len(descs)
+    print(f"样本: {len(samples)} 件装备，平均描述长度 {avg_len:.0f} 字符，{rounds} 轮")
+    print(f"{'extract_features':<20}{extract_rate:>12.0f} 件/秒")
+    print(f"{'描述解析':<20}{parse_rate:>12.0f} 件/秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LPC解析器性能对比：单遍解析 parse_lpc vs 原有的递归/字符串替换解析
+
+样本为 libs/RoleDemo.json 的 large_equip_desc，并把多份样本嵌套在一个映射中模拟更大的描述，
+观察解析耗时随数据量的变化。
+
+用法: python tests/benchmark_lpc_parser.py [重复次数]
+"""
+
+import sys
+import os
+import json
+import time
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils.lpc_helper import LPCHelper
+
+
+def _load_samples():
+    with open(os.path.join(project_root, 'libs', 'RoleDemo.json'), 'r', encoding='utf-8') as f:
+        desc = json.load(f)['large_equip_desc']
+    samples = {'RoleDemo x1': desc}
+    for copies in (4, 16):
+        samples[f'RoleDemo x{copies}'] = '([' + ','.join(f'"role{i}":{desc}' for i in range(copies)) + '])'
+    return samples
+
+
+def _timeit(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    helper = LPCHelper()
+    parsers = [
+        ('parse_lpc', helper.parse_lpc),
+        ('recursive_lpc_parse', helper.recursive_lpc_parse),
+        ('improved_lpc_parser', helper.improved_lpc_parser),
+        ('simple_lpc_to_js', lambda text: helper.simple_lpc_to_js(text, return_dict=True)),
+    ]
+
+    print(f"{'样本':<14}{'长度':>10}  " + ''.join(f"{name:>22}" for name, _ in parsers) + f"{'加速比':>10}")
+    for label, text in _load_samples().items():
+        assert helper.parse_lpc(text) == helper.recursive_lpc_parse(text)
+        timings = [_timeit(func, text, repeat) for _, func in parsers]
+        print(f"{label:<14}{len(text):>10}  " + ''.join(f"{ms:>19.2f} ms" for ms in timings)
+              + f"{timings[1] / timings[0]:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
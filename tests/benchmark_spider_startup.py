@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫子进程启动耗时：SpiderService 每个服务器启动一个 run.py 子进程，每次都要导入 src/spider/equip.py
+
+- 用 python -X importtime 导入爬虫模块，解析导入耗时，按顶层包汇总并列出最耗时的模块
+- 检查启动时不应加载的重量级依赖（pandas、SQLAlchemy、Flask、Playwright等）
+- 在新进程中导入并创建爬虫实例，统计冷启动的总耗时（含解释器启动），与启动预算比较
+
+用法: python tests/benchmark_spider_startup.py [模块名] [重复次数]
+"""
+
+import sys
+import os
+import re
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+# 冷启动预算（毫秒）
+STARTUP_BUDGET_MS = 300
+# 爬取第一页之前不应加载的依赖
+DEFERRED_MODULES = ('pandas', 'numpy', 'sqlalchemy', 'flask', 'flask_sqlalchemy', 'playwright',
+                    'src.database', 'src.tools.search_form_helper')
+
+_IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# 爬虫模块 -> 冷启动时执行的代码
+SPIDER_STARTUP_CODE = {
+    'src.spider.equip': 'from src.spider.equip import CBGEquipSpider; CBGEquipSpider()',
+}
+
+
+def parse_importtime(stderr: str):
+    """解析 -X importtime 的输出: [(模块名, 自身耗时us, 累计耗时us, 层级)]"""
+    rows = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def run_importtime(module: str):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=project_root, capture_output=True, text=True)
+    return parse_importtime(result.stderr)
+
+
+def cold_start_ms(code: str, repeat: int) -> float:
+    """在新进程中执行启动代码的耗时（取最小值，排除磁盘缓存等干扰）"""
+    env = dict(os.environ, PYTHONPATH=project_root)
+    timings = []
+    # 爬虫实例会在当前目录创建output日志目录，使用临时目录
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=work_dir, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else 'src.spider.equip'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    rows = run_importtime(module)
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        package = name.split('.')[0] if not name.startswith('src.') else '.'.join(name.split('.')[:2])
+        by_package[package] += self_us
+
+    print(f"导入 {module}: {len(rows)} 个模块，导入耗时 {total_ms:.1f} ms")
+    print(f"\n{'包':<36}{'耗时(ms)':>10}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:15]:
+        print(f"{package:<36}{self_us / 1000:>10.1f}")
+
+    print(f"\n{'模块（累计耗时）':<48}{'耗时(ms)':>10}")
+    for name, _, cumulative_us, _ in sorted(rows, key=lambda row: -row[2])[:15]:
+        print(f"{name:<48}{cumulative_us / 1000:>10.1f}")
+
+    loaded = {name for name, _, _, _ in rows}
+    eager = [name for name in DEFERRED_MODULES if name in loaded]
+    print(f"\n启动时加载的重量级依赖: {', '.join(eager) if eager else '无'}")
+
+    code = SPIDER_STARTUP_CODE.get(module, f'import {module}')
+    startup_ms = cold_start_ms(code, repeat)
+    baseline_ms = cold_start_ms('pass', repeat)
+    status = '符合' if startup_ms <= STARTUP_BUDGET_MS else '超出'
+    print(f"冷启动: {startup_ms:.0f} ms（解释器启动 {baseline_ms:.0f} ms），预算 {STARTUP_BUDGET_MS} ms，{status}")
+
+
+if __name__ == '__main__':
+    main()
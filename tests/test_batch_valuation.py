@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试分组批量估价：结果与逐个calculate_value一致，同组物品只加载一次市场候选
+"""
+
+import sys
+import os
+import io
+import random
+import logging
+import contextlib
+
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor.equip.index import (
+    EquipAnchorEvaluator, BaseEquipmentConfig, EquipmentPluginManager
+)
+from src.evaluator.market_anchor.pet.index import PetMarketAnchorEvaluator
+from src.evaluator.utils.extreme_value_filter import ExtremeValueFilter
+
+
+class _StubEquipCollector:
+    """按kindid返回固定候选的装备市场数据采集器，记录加载次数"""
+
+    def __init__(self, market_data):
+        self.market_data = market_data
+        self.load_count = 0
+        self.feature_extractor = None
+
+    def _load(self, filters):
+        self.load_count += 1
+        return self.market_data[self.market_data['kindid'] == filters['kindid']].copy()
+
+    def get_market_data_for_similarity(self, filters):
+        return self._load(filters)
+
+    def get_market_data_with_addon_classification(self, filters):
+        return self._load(filters)
+
+    def _get_target_addon_classification(self, target_features):
+        return 'addon' if target_features.get('addon_tizhi', 0) else '无属性'
+
+
+class _StubFeatureExtractor:
+    def extract_features(self, record):
+        return {key: value for key, value in record.items() if key != 'price'}
+
+
+class _StubPetCollector:
+    def __init__(self, market_data):
+        self.market_data = market_data
+        self.load_count = 0
+
+    def get_market_data_with_business_rules(self, filters):
+        self.load_count += 1
+        return self.market_data[self.market_data['role_grade_limit'] == filters['role_grade_limit']].copy()
+
+
+def _equip(rng, kindid, equip_sn):
+    return {
+        'kindid': kindid,
+        'equip_level': 120,
+        'init_damage': rng.choice([0, rng.randint(300, 700)]),
+        'init_defense': rng.randint(50, 200),
+        'init_hp': rng.randint(100, 400),
+        'addon_tizhi': rng.choice([0, 10]),
+        'gem_level': rng.randint(0, 12),
+        'special_skill': 0,
+        'special_effect': [],
+        'suit_effect': 0,
+        'price': rng.randint(100, 100000),
+        'equip_sn': equip_sn,
+    }
+
+
+def _make_equip_evaluator(collector):
+    evaluator = EquipAnchorEvaluator.__new__(EquipAnchorEvaluator)
+    evaluator.logger = logging.getLogger(__name__)
+    evaluator.base_config = BaseEquipmentConfig()
+    evaluator.plugin_manager = EquipmentPluginManager(evaluator.base_config)
+    evaluator.lingshi_market_collector = None
+    evaluator.extreme_value_filter = ExtremeValueFilter()
+    evaluator.vectorized_similarity = True
+    evaluator.market_collector = collector
+    evaluator.feature_extractor = _StubFeatureExtractor()
+    return evaluator
+
+
+def _valuate_each(evaluator, items, **kwargs):
+    expected = []
+    for i, item in enumerate(items):
+        result = evaluator.calculate_value(item, verbose=False, **kwargs)
+        result['item_index'] = i
+        expected.append(result)
+    return expected
+
+
+def test_equipment_batch_matches_single_valuation_and_loads_once_per_group():
+    """装备批量估价与逐个估价结果一致（含排除自身、无效装备），每组只加载一次候选"""
+    rng = random.Random(7)
+    market = pd.DataFrame([_equip(rng, kindid, f"m{kindid}_{i}") for kindid in (18, 20) for i in range(60)])
+
+    items = [_equip(rng, 18, f"t{i}") for i in range(6)] + [_equip(rng, 20, f"t{i}") for i in range(6, 10)]
+    items.append(dict(market.iloc[3].to_dict()))  # 目标本身在市场中，需要排除自身
+    items.append({**items[0], 'equip_level': 0})  # 无效装备，不加载候选
+
+    collector = _StubEquipCollector(market)
+    evaluator = _make_equip_evaluator(collector)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = _valuate_each(evaluator, items, similarity_threshold=0.5, max_anchors=10)
+        single_loads = collector.load_count
+        collector.load_count = 0
+        results = evaluator.batch_valuation(items, similarity_threshold=0.5, max_anchors=10)
+
+    assert results == expected
+    assert single_loads == len(items) - 1
+    groups = {evaluator._get_candidate_group_key(item) for item in items[:-1]}
+    assert collector.load_count == len(groups) < single_loads
+    assert results[-1]['invalid_item'] and results[-1]['item_index'] == len(items) - 1
+    assert all(anchor['equip_sn'] != items[10]['equip_sn'] for anchor in results[10]['anchors'])
+
+
+def test_pet_batch_groups_by_grade_and_skills():
+    """召唤兽按携带等级和技能分组加载候选，结果与逐个估价一致"""
+    rng = random.Random(3)
+    market = pd.DataFrame([{
+        'equip_sn': f"p{i}", 'role_grade_limit': rng.choice([45, 105]), 'all_skill': '',
+        'growth': rng.uniform(1.0, 1.3), 'lx': rng.randint(0, 20), 'skill_count': rng.randint(2, 8),
+        'is_baobao': 1, 'equip_level': 100, 'price': rng.randint(100, 5000), 'equip_list_amount': 0,
+    } for i in range(40)])
+    items = [{**market.iloc[i].to_dict(), 'iType': 1} for i in range(8)]
+    items += [{**items[0], 'equip_sn': 'new', 'growth': 1.1}]
+
+    collector = _StubPetCollector(market)
+    evaluator = PetMarketAnchorEvaluator(collector)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = _valuate_each(evaluator, items, similarity_threshold=0.6, max_anchors=5)
+        collector.load_count = 0
+        results = evaluator.batch_valuation(items, similarity_threshold=0.6, max_anchors=5)
+
+    assert results == expected
+    assert collector.load_count == len({item['role_grade_limit'] for item in items})
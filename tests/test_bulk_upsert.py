@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试批量upsert：新增/更新计数、create_time保留、分块执行、批次内去重、MySQL语句生成
+"""
+
+import sys
+import os
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import mysql
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.models import Base, Equipment, Pet, Role, LargeEquipDescData
+from src.utils.smart_db_helper import CBGSmartDB, bulk_upsert, build_upsert_statement
+
+OLD_TIME = datetime(2024, 1, 1, 0, 0, 0)
+
+
+def _engine():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _rows(table, key, engine):
+    with engine.connect() as conn:
+        return {row._mapping[key]: dict(row._mapping) for row in conn.execute(select(table))}
+
+
+def test_counts_chunking_and_protected_create_time():
+    """分块执行时新增/更新计数正确，更新保留create_time并刷新update_time"""
+    engine = _engine()
+    table = Equipment.__table__
+    first = [{'equip_sn': f"sn{i}", 'price': 100 + i, 'create_time': OLD_TIME, 'update_time': OLD_TIME,
+              'not_a_column': 'x'} for i in range(5)]
+    with engine.begin() as conn:
+        assert bulk_upsert(conn, Equipment, first, chunk_size=2) == {'inserted': 5, 'updated': 0, 'skipped': 0}
+
+    second = [{'equip_sn': 'sn1', 'price': 1}, {'equip_sn': 'sn3', 'price': 2}, {'equip_sn': 'sn3', 'price': 3},
+              {'equip_sn': 'sn9', 'price': 9}, {'equip_sn': None, 'price': 0}]
+    with engine.begin() as conn:
+        result = bulk_upsert(conn, table, second, chunk_size=2)
+    assert result == {'inserted': 1, 'updated': 2, 'skipped': 1}
+
+    rows = _rows(table, 'equip_sn', engine)
+    assert len(rows) == 6
+    assert rows['sn1']['price'] == 1 and rows['sn3']['price'] == 3 and rows['sn0']['price'] == 100
+    assert rows['sn1']['create_time'] == OLD_TIME
+    assert rows['sn1']['update_time'] > OLD_TIME
+    assert rows['sn0']['update_time'] == OLD_TIME
+
+
+def test_pet_and_role_tables():
+    """召唤兽、角色、详细装备表都可以批量upsert（字符串时间自动转换）"""
+    engine = _engine()
+    with engine.begin() as conn:
+        assert bulk_upsert(conn, Pet, [{'equip_sn': 'p1', 'eid': 'e1', 'price': 10}])['inserted'] == 1
+        assert bulk_upsert(conn, Pet, [{'equip_sn': 'p1', 'eid': 'e1', 'price': 20}])['updated'] == 1
+        assert bulk_upsert(conn, Role, [{'eid': 'r1', 'price': 5, 'update_time': '2025-01-02 03:04:05'}])['inserted'] == 1
+        assert bulk_upsert(conn, LargeEquipDescData, [{'eid': 'r1', 'equip_desc': 'desc'}])['inserted'] == 1
+
+    assert _rows(Pet.__table__, 'equip_sn', engine)['p1']['price'] == 20
+    assert _rows(Role.__table__, 'eid', engine)['r1']['update_time'] == datetime(2025, 1, 2, 3, 4, 5)
+
+
+def test_roles_batch_records_price_history(tmp_path):
+    """角色批量保存只查询一次价格，价格变化的角色记录价格历史"""
+    smart_db = CBGSmartDB(f"sqlite:///{tmp_path / 'cbg.db'}")
+    Base.metadata.create_all(smart_db.db_helper.engine)
+
+    assert smart_db.save_roles_batch([{'eid': 'a', 'price': 100}, {'eid': 'b', 'price': 200}])
+    assert smart_db.save_roles_batch([{'eid': 'a', 'price': 150}, {'eid': 'b', 'price': 200}, {'eid': 'c', 'price': 1}])
+
+    rows = _rows(Role.__table__, 'eid', smart_db.db_helper.engine)
+    assert len(rows) == 3
+    assert rows['a']['price'] == 150
+    assert [record['price'] for record in json.loads(rows['a']['history_price'])] == [100]
+    assert not rows['b']['history_price']
+
+
+def test_mysql_statement_uses_on_duplicate_key_update():
+    """MySQL使用ON DUPLICATE KEY UPDATE，保护字段不在更新子句中"""
+    columns = ['equip_sn', 'price', 'create_time', 'equip_price', 'update_time']
+    stmt = build_upsert_statement('mysql', Equipment.__table__, columns, ['equip_sn'])
+    sql = str(stmt.compile(dialect=mysql.dialect()))
+    update_clause = sql.split('ON DUPLICATE KEY UPDATE', 1)[1]
+    assert 'price = VALUES(price)' in update_clause
+    assert 'update_time' in update_clause
+    assert 'create_time' not in update_clause and 'equip_price' not in update_clause
+
+    only_keys = build_upsert_statement('mysql', Equipment.__table__, ['equip_sn', 'create_time'], ['equip_sn'])
+    assert 'INSERT IGNORE' in str(only_keys.compile(dialect=mysql.dialect()))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试装备描述解析记录：属性记号的取值规则，以及从cDesc解析出的装备数据
+"""
+
+import sys
+import os
+import io
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.feature_extractor.equip_desc_tokenizer import EquipDescRecord
+from src.evaluator.feature_extractor.equip_feature_extractor import EquipFeatureExtractor
+
+WEAPON_DESC = ('#r等级 160  五行 金#r#r命中 +807 伤害 +524#r耐久度 152  修理失败 1次#r锻炼等级 10  镶嵌宝石 太阳石、 红玛瑙'
+               '#r#G#G体质 +21#Y #G力量 +35#Y#Y#r#c4DBAF4特技：#c4DBAF4破血狂攻#Y#Y#r#c4DBAF4特效：#c4DBAF4永不磨损#Y#Y'
+               '#r#G开运孔数：5孔/5孔#r#G符石: 伤害 +1.5 #G#G敏捷 +1#Y')
+CRIT_DESC = ('#r等级 160  五行 水#r#r伤害 +400 #c4DBAFF法术暴击伤害 +3.42%#r命中 +700#r耐久度 300#r#G#G魔力 -5#Y#Y'
+             '#r#G开运孔数：2孔/5孔#r熔炼效果：#r#Y#r+12伤害#r制造者：小明强化打造#Y')
+ARMOR_DESC = ('#r等级 150  #r#r防御 +200 气血 +300#r耐久度 500#r锻炼等级 8  镶嵌宝石 月亮石#r#G#G耐力 +20#Y'
+              '#r#G开运孔数：4孔/4孔#r#G星位：躲避 +5#Y')
+
+
+def _extractor():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return EquipFeatureExtractor()
+
+
+def test_first_value_rules():
+    """前缀颜色代码、#r结尾、排除区间、解析范围的取值规则"""
+    record = EquipDescRecord('#r伤害 +400#c4DBAFF法术暴击伤害 +3.42%#r命中 +700#r')
+    # 暴击伤害不是基础伤害
+    assert [token[4] for token in record.tokens('伤害')] == [400]
+    assert record.first_value('伤害', before_r=True) is None
+    assert record.first_value('伤害', before_r=True, skip_excluded=True) == 400
+
+    record = EquipDescRecord('#r命中 +1#r#G开运孔数：5孔/5孔#r#G符石: #G#G敏捷 +1#Y')
+    # 先只扫描到开运孔数，找不到时再扫描后面的部分
+    assert record.first_value('敏捷', prefix='#G', endpos=record.hole_pos) is None
+    assert record.first_value('敏捷', prefix='#G') == 1
+    assert record.first_value('敏捷', prefix='#G#G') == 1
+    assert record.first_value('敏捷', prefix='#r') is None
+
+
+def test_first_variant_value_prefers_earlier_variant():
+    """按写法优先级取值，与出现顺序无关；'-' 写法返回负值"""
+    record = EquipDescRecord('#r#G体质 -3#Y #G#G体质 +5#Y')
+    assert record.first_variant_value('体质', [('#G#G', '+'), ('#G', '+'), ('#G', '-')]) == 5
+    assert record.first_variant_value('体质', [('#G', '-'), ('#G#G', '+')]) == -3
+    assert record.first_variant_value('力量', [('#G#G', '+')]) is None
+
+
+def test_landmarks_and_effects():
+    record = EquipDescRecord(CRIT_DESC)
+    assert record.hole_pos == CRIT_DESC.index('开运孔数：')
+    assert record.added_attrs_end == record.hole_pos
+    assert record.first_variant_value('魔力', [('#G', '+'), ('#G', '-')], record.added_attrs_end) == -5
+
+    record = EquipDescRecord(WEAPON_DESC)
+    assert record.effects == {'破血狂攻', '永不磨损'}
+    assert EquipDescRecord('').hole_pos == 0
+
+
+def test_parse_equip_data_from_desc():
+    """从cDesc解析的装备数据（期望值与逐个正则匹配的解析结果一致）"""
+    extractor = _extractor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        weapon, weapon_record = extractor._parse_equip_data_from_desc({'cDesc': WEAPON_DESC, 'iType': 1301})
+        crit, _ = extractor._parse_equip_data_from_desc({'cDesc': CRIT_DESC, 'iType': 1301})
+        armor, _ = extractor._parse_equip_data_from_desc({'cDesc': ARMOR_DESC, 'iType': 2701})
+        item, item_record = extractor._parse_equip_data_from_desc({'cDesc': WEAPON_DESC, 'iType': 1})
+
+    assert weapon_record is not None and weapon_record.desc == WEAPON_DESC
+    expected = {'kindid': 9, 'equip_level': 160, 'init_damage': 710, 'init_damage_raw': 516, 'all_damage': 793,
+                'mingzhong': 807, 'shanghai': 524, 'addon_tizhi': 21, 'addon_liliang': 35,
+                'gem_level': 10, 'gem_value': [2, 1], 'special_skill': 1036, 'special_effect': [5],
+                'suit_effect': 0, 'gem_score': 40.62}
+    assert {key: weapon[key] for key in expected} == expected
+
+    expected = {'kindid': 9, 'init_damage': 633, 'init_damage_raw': 400, 'all_damage': 633,
+                'mingzhong': 700, 'shanghai': 400, 'addon_moli': -5, 'gem_level': 0, 'gem_value': []}
+    assert {key: crit[key] for key in expected} == expected
+
+    expected = {'kindid': 19, 'equip_level': 150, 'init_defense': 188, 'init_hp': 0,
+                'gem_level': 8, 'gem_value': [5], 'gem_score': 10.75, 'hp_gem_level': 7}
+    assert {key: armor[key] for key in expected} == expected
+
+    # 不是装备的物品不解析
+    assert item_record is None and 'kindid' not in item
+
+
+def test_extract_features_from_desc():
+    extractor = _extractor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        features = extractor.extract_features({'cDesc': WEAPON_DESC, 'iType': 1301})
+    assert features['hole_num'] == 5
+    assert features['repair_fail_num'] == 1
+    assert features['addon_total'] == 56
+    assert features['special_effect'] == [5]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试装备全量缓存多维索引：筛选结果与逐步布尔掩码筛选一致，增量更新与重建一致
+"""
+
+import sys
+import os
+import io
+import random
+import logging
+import warnings
+import contextlib
+
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.feature_extractor.equip_feature_extractor import EquipFeatureExtractor
+from src.evaluator.market_anchor.equip.equip_market_index import EquipMarketIndex
+from src.evaluator.market_anchor.equip.equip_market_data_collector import (
+    EquipMarketDataCollector, HIGH_VALUE_SUITS, SIMPLE_EFFECT_ID
+)
+
+FILTER_CASES = [
+    dict(kindid=5),
+    dict(kindid=18, level_range=(100, 160)),
+    dict(level_range=(60, 90), price_range=(100, 5000)),
+    dict(kindid=19, server='a', special_skill=1001),
+    dict(kindid=20, special_skill=1001, exclude_high_value_special_skills=True),
+    dict(suit_effect=4002),
+    dict(require_high_value_suits=True, limit=5000),
+    dict(special_effect=[1, 6], limit=5000),
+    dict(exclude_special_effect=[1, 16]),
+    dict(exclude_suit_effect=[4002, 3011], limit=5000),
+    dict(exclude_high_value_simple_equips=True, limit=5000),
+    dict(kindid=18, limit=50),
+]
+
+
+def _make_collector():
+    """创建不连接Redis/MySQL的采集器（只初始化筛选所需的部分）"""
+    collector = object.__new__(EquipMarketDataCollector)
+    collector.logger = logging.getLogger(__name__)
+    collector.feature_extractor = EquipFeatureExtractor()
+    collector._full_data_cache = None
+    collector._market_index = None
+    return collector
+
+
+def _random_row(rng: random.Random, index: int) -> dict:
+    effects = rng.choice([[], [1], [2, 3], [6], [16], [1, 6, 16], [SIMPLE_EFFECT_ID]])
+    return {
+        'equip_sn': f"sn_{index}",
+        'kindid': rng.choice([5, 18, 19, 20]),
+        'equip_level': rng.choice([60, 70, 90, 110, 130, 150, 160]),
+        'price': rng.randint(1, 10000),
+        'server_name': rng.choice(['a', 'b']),
+        'special_skill': rng.choice([0, 0, 1001, 2004, None]),
+        'suit_effect': rng.choice([0, 4002, 3011, None] + HIGH_VALUE_SUITS[:3]),
+        'special_effect': rng.choice([None, str(effects).replace(' ', '')]),
+        'update_time': f"2025-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+    }
+
+
+def _filter_both(collector, df, filters):
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return (collector._filter_data_from_full_cache(df, **filters),
+                collector._filter_data_with_masks(df, **filters))
+
+
+def test_index_filter_matches_mask_filter():
+    """索引筛选与逐步布尔掩码筛选返回相同的行和顺序"""
+    collector = _make_collector()
+    rng = random.Random(2025)
+    df = pd.DataFrame([_random_row(rng, i) for i in range(3000)])
+
+    for filters in FILTER_CASES:
+        indexed, masked = _filter_both(collector, df, filters)
+        assert len(indexed) > 0, filters
+        assert list(indexed['equip_sn']) == list(masked['equip_sn']), filters
+
+
+def test_index_does_not_copy_full_frame():
+    """索引只记录行位置，全量数据对象保持不变"""
+    collector = _make_collector()
+    rng = random.Random(3)
+    df = pd.DataFrame([_random_row(rng, i) for i in range(500)])
+    collector._full_data_cache = df
+
+    _filter_both(collector, df, dict(kindid=5))
+    assert collector._market_index is not None
+    assert collector._market_index.data is df
+
+
+def test_incremental_index_update_matches_rebuild():
+    """合并新数据后增量更新的索引与重新构建的索引查询结果一致"""
+    collector = _make_collector()
+    rng = random.Random(7)
+    collector._full_data_cache = pd.DataFrame([_random_row(rng, i) for i in range(2000)])
+    _filter_both(collector, collector._full_data_cache, dict(kindid=5))
+
+    # 前10条替换已有装备，其余为新装备
+    new_data = pd.DataFrame([_random_row(rng, i) for i in range(1990, 2100)])
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert collector._update_memory_cache_with_dataframe(new_data)
+
+    full_data = collector._full_data_cache
+    incremental_index = collector._market_index
+    assert len(full_data) == 2100
+    assert incremental_index is not None and incremental_index.data is full_data
+
+    rebuilt_index = EquipMarketIndex(full_data)
+    for filters in FILTER_CASES:
+        assert list(collector._query_market_index(incremental_index, **filters)) == \
+            list(collector._query_market_index(rebuilt_index, **filters)), filters
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试普通装备预计算特征存储：与实时提取结果一致、版本过期时惰性重新提取
+"""
+
+import sys
+import os
+import random
+import logging
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.feature_extractor.equip_feature_extractor import EquipFeatureExtractor
+from src.evaluator.market_anchor.equip.equip_market_data_collector import (
+    EquipMarketDataCollector, FEATURE_VERSION_COLUMN, PRECOMPUTED_FEATURE_PREFIX
+)
+
+
+def _make_collector():
+    """创建不连接Redis/MySQL的采集器（只初始化特征存储所需的部分）"""
+    collector = object.__new__(EquipMarketDataCollector)
+    collector.logger = logging.getLogger(__name__)
+    collector.feature_extractor = EquipFeatureExtractor()
+    collector._full_data_cache = None
+    return collector
+
+
+def _random_raw_equip(rng: random.Random, index: int) -> dict:
+    """生成随机的原始装备数据（与全量缓存中的字段一致）"""
+    kindid = rng.choice([5, 18, 17, 19, 20, 21, 61, 29])
+    desc_parts = []
+    if rng.random() < 0.5:
+        desc_parts.append(f"#r开运孔数：{rng.randint(0, 5)}孔/5孔")
+    if rng.random() < 0.3:
+        desc_parts.append(f"#r修理失败 {rng.randint(1, 3)}次")
+    if rng.random() < 0.3:
+        desc_parts.append(f"熔炼效果：#r#Y#r+{rng.randint(1, 10)}体质 +{rng.randint(1, 20)}防御#r")
+    if rng.random() < 0.2:
+        desc_parts.append("#r玩家68766666专用#r")
+    return {
+        'equip_sn': f"sn_{index}",
+        'kindid': kindid,
+        'equip_level': rng.choice([60, 80, 100, 120, 130, 140, 150, 160]),
+        'init_damage': rng.choice([0, rng.randint(300, 700)]),
+        'init_damage_raw': rng.choice([0, rng.randint(250, 600)]),
+        'all_damage': rng.choice([0, rng.randint(300, 900)]),
+        'init_wakan': rng.choice([0, rng.randint(50, 200)]),
+        'init_defense': rng.choice([0, rng.randint(50, 200)]),
+        'init_hp': rng.choice([0, rng.randint(100, 400), None]),
+        'init_dex': rng.choice([0, rng.randint(20, 60)]),
+        'mingzhong': rng.choice([0, rng.randint(100, 400)]),
+        'shanghai': rng.choice([0, rng.randint(100, 400)]),
+        'addon_tizhi': rng.choice([0, rng.randint(1, 40)]),
+        'addon_liliang': rng.choice([0, rng.randint(1, 40)]),
+        'addon_naili': rng.choice([0, rng.randint(1, 40)]),
+        'addon_minjie': rng.choice([0, rng.randint(1, 40)]),
+        'addon_lingli': rng.choice([0, rng.randint(1, 40)]),
+        'addon_moli': 0,
+        'agg_added_attrs': rng.choice(['[]', '["魔力 +12"]']),
+        'gem_value': rng.choice(['[]', '[1]', '[4, 6]']),
+        'gem_level': rng.randint(0, 12),
+        'special_skill': rng.choice([0, 1001, 2004]),
+        'special_effect': rng.choice(['[]', '[1]', '[2, 3]']),
+        'suit_effect': rng.choice([0, 0, 4002, 3011, None]),
+        'large_equip_desc': ''.join(desc_parts) if desc_parts else rng.choice(['', None]),
+        'price': rng.randint(100, 100000),
+        'server_name': 'test',
+        'update_time': '2025-09-01T00:00:00',
+    }
+
+
+def _expected_features(collector, df):
+    """与估价器实时提取时相同的输入转换和特征提取"""
+    expected = []
+    for record in df.to_dict('records'):
+        if record['kindid'] in (61, 29):
+            expected.append(None)
+            continue
+        expected.append(collector.feature_extractor.extract_features(
+            {key: collector._to_native_value(value) for key, value in record.items()}))
+    return expected
+
+
+def test_precomputed_features_match_extraction():
+    """预计算特征还原后与实时提取的特征完全一致，灵饰/召唤兽装备不做预计算"""
+    collector = _make_collector()
+    rng = random.Random(20250902)
+    df = pd.DataFrame([_random_raw_equip(rng, i) for i in range(300)])
+
+    stored = collector.attach_precomputed_features(df)
+    assert FEATURE_VERSION_COLUMN in stored.columns
+    assert f"{PRECOMPUTED_FEATURE_PREFIX}gem_score" in stored.columns
+    assert stored[f"{PRECOMPUTED_FEATURE_PREFIX}gem_score"].dtype == np.float64
+
+    restored = collector.get_precomputed_features(stored)
+    expected = _expected_features(collector, df)
+    assert len(restored) == len(expected)
+    for restored_features, expected_features in zip(restored, expected):
+        assert restored_features == expected_features
+
+    # 特征已是当前版本时不再重复提取
+    assert collector.attach_precomputed_features(stored) is stored
+
+
+def test_stale_feature_version_reextracts_lazily():
+    """特征版本过期的行在使用时重新提取，并回写到内存全量缓存"""
+    collector = _make_collector()
+    rng = random.Random(11)
+    df = pd.DataFrame([_random_raw_equip(rng, i) for i in range(50)])
+    collector._full_data_cache = collector.attach_precomputed_features(df)
+
+    # 模拟提取器配置变化
+    collector.feature_extractor.config_version = 'changed'
+    normal_mask = ~collector._full_data_cache['kindid'].isin([61, 29])
+    assert collector._get_stale_feature_mask(collector._full_data_cache).equals(normal_mask)
+
+    market_slice = collector._full_data_cache.iloc[10:30].copy()
+    restored = collector.get_precomputed_features(market_slice)
+    expected = _expected_features(collector, df.iloc[10:30])
+    assert restored == expected
+
+    versions = collector._full_data_cache[FEATURE_VERSION_COLUMN]
+    assert (versions.iloc[10:30][normal_mask.iloc[10:30]] == 'changed').all()
+    assert (versions.iloc[:10][normal_mask.iloc[:10]] != 'changed').all()
+
+
+def test_config_version_is_stable():
+    """相同配置的提取器版本一致，配置变化时版本变化"""
+    first = EquipFeatureExtractor()
+    second = EquipFeatureExtractor()
+    assert first.config_version == second.config_version
+
+    second.suit_effects = {**second.suit_effects, '__test__': 1}
+    assert second._compute_config_version() != first.config_version
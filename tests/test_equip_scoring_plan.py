@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试装备打分计划：目标侧配置按目标只构建一次，缓存键区分取值和类型，插件变化时失效
+"""
+
+import sys
+import os
+import random
+import logging
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor.equip.index import (
+    EquipAnchorEvaluator, BaseEquipmentConfig, EquipmentPluginManager,
+    EquipmentTypePlugin, SIMILARITY_EXCLUDED_FEATURES
+)
+from src.evaluator.utils.extreme_value_filter import ExtremeValueFilter
+
+
+def _make_evaluator():
+    """创建不连接Redis/MySQL的估价器（只初始化相似度计算所需的部分）"""
+    evaluator = EquipAnchorEvaluator.__new__(EquipAnchorEvaluator)
+    evaluator.logger = logging.getLogger(__name__)
+    evaluator.base_config = BaseEquipmentConfig()
+    evaluator.plugin_manager = EquipmentPluginManager(evaluator.base_config)
+    evaluator.lingshi_market_collector = None
+    evaluator.extreme_value_filter = ExtremeValueFilter()
+    evaluator.vectorized_similarity = True
+    return evaluator
+
+
+def _features(rng, kindid, equip_sn):
+    return {
+        'kindid': kindid,
+        'equip_level': rng.choice([100, 120, 140, 160]),
+        'init_damage': rng.randint(300, 700),
+        'init_defense': rng.choice([0, rng.randint(50, 200)]),
+        'addon_minjie': rng.choice([0, rng.randint(1, 40)]),
+        'addon_total': rng.randint(0, 80),
+        'gem_level': rng.randint(0, 16),
+        'special_skill': rng.choice([0, 1001]),
+        'special_effect': rng.choice([[], [1]]),
+        'suit_effect': rng.choice([0, 4002]),
+        'repair_fail_num': rng.choice([0, 1, 2]),
+        'price': rng.randint(100, 100000),
+        'equip_sn': equip_sn,
+    }
+
+
+class _CountingPlugin(EquipmentTypePlugin):
+    """统计权重覆盖调用次数的插件"""
+
+    def __init__(self):
+        self.weight_calls = 0
+
+    @property
+    def plugin_name(self) -> str:
+        return "计数插件"
+
+    @property
+    def supported_kindids(self):
+        return [5]
+
+    @property
+    def priority(self) -> int:
+        return 200
+
+    def get_weight_overrides(self, kindid=None, target_features=None):
+        self.weight_calls += 1
+        return {'gem_level': 2.0}
+
+    def calculate_custom_similarity(self, feature_name, target_val, market_val):
+        if feature_name == 'special_skill':
+            return 0.42
+        return None
+
+
+def test_plan_built_once_per_target():
+    """逐行标量打分和向量化打分共享同一个打分计划，结果与计划内容一致"""
+    evaluator = _make_evaluator()
+    plugin = _CountingPlugin()
+    evaluator.add_plugin(plugin)
+    rng = random.Random(14)
+    target = _features(rng, 5, 'target')
+    market = [_features(rng, 5, f"m{i}") for i in range(100)]
+
+    scalar = np.array([evaluator._calculate_similarity(target, m) for m in market])
+    vectorized = evaluator._calculate_similarity_vectorized(target, market)
+    assert np.allclose(scalar, vectorized, atol=1e-9)
+    assert plugin.weight_calls == 1
+
+    plan = evaluator._get_scoring_plan(target)
+    assert plan.feature_weights == evaluator.plugin_manager.get_final_weights(5, target)
+    assert plan.relative_tolerances == evaluator.plugin_manager.get_final_tolerances(5, target)
+    expected_target = evaluator.plugin_manager.get_enhanced_features(5, target)
+    for name in SIMILARITY_EXCLUDED_FEATURES:
+        expected_target.pop(name, None)
+    assert plan.enhanced_target_features == expected_target
+    assert plan.calculate_plugin_similarity('special_skill', 0, 1001) == 0.42
+
+
+def test_plan_cache_key():
+    """元数据字段不影响计划；取值或类型不同的特征、注册新插件时重新构建"""
+    manager = EquipmentPluginManager(BaseEquipmentConfig())
+    rng = random.Random(15)
+    target = _features(rng, 20, 'a')
+
+    plan = manager.get_scoring_plan(20, target)
+    assert manager.get_scoring_plan(20, dict(target, equip_sn='b', price=1)) is plan
+    assert 'equip_sn' not in plan.enhanced_target_features
+    assert manager.get_scoring_plan(20, dict(target, gem_level=target['gem_level'] + 1)) is not plan
+    assert manager.get_scoring_plan(20, target, {'target_match_attrs': ['x']}) is not plan
+
+    typed = dict(target, hole_score=np.int64(75))
+    assert manager.get_scoring_plan(20, typed) is not manager.get_scoring_plan(20, dict(target, hole_score='75'))
+
+    manager.register_plugin(_CountingPlugin())
+    assert manager.get_scoring_plan(20, target) is not plan
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试装备列式（向量化）相似度与逐行标量相似度的一致性
+"""
+
+import sys
+import os
+import random
+import logging
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor.equip.index import (
+    EquipAnchorEvaluator, BaseEquipmentConfig, EquipmentPluginManager
+)
+from src.evaluator.market_anchor.equip.constant import (
+    get_agility_suits_detailed, get_magic_suits_detailed
+)
+from src.evaluator.utils.extreme_value_filter import ExtremeValueFilter
+
+# 武器、衣服、头盔、鞋子、腰带、项链
+TEST_KINDIDS = [5, 18, 17, 19, 20, 21]
+
+
+def _make_evaluator():
+    """创建不连接Redis/MySQL的估价器（只初始化相似度计算所需的部分）"""
+    evaluator = EquipAnchorEvaluator.__new__(EquipAnchorEvaluator)
+    evaluator.logger = logging.getLogger(__name__)
+    evaluator.base_config = BaseEquipmentConfig()
+    evaluator.plugin_manager = EquipmentPluginManager(evaluator.base_config)
+    evaluator.lingshi_market_collector = None
+    evaluator.extreme_value_filter = ExtremeValueFilter()
+    evaluator.vectorized_similarity = True
+    return evaluator
+
+
+def _suit_pool():
+    agility = get_agility_suits_detailed()
+    magic = get_magic_suits_detailed()
+    return [0, 0, 4002, 3011] + agility['A'] + agility['B'] + magic['A'] + magic['B']
+
+
+def _random_features(rng: random.Random, kindid: int, edge_cases: bool = True) -> dict:
+    """生成随机装备特征，包含零值、缺失值和非数值等边界情况"""
+    features = {
+        'kindid': kindid,
+        'equip_level': rng.choice([60, 80, 100, 120, 130, 140, 150, 160]),
+        'init_damage': rng.choice([0, rng.randint(300, 700)]),
+        'init_damage_raw': rng.choice([0, rng.randint(250, 600)]),
+        'all_damage': rng.choice([0, rng.randint(300, 900)]),
+        'init_defense': rng.choice([0, rng.randint(50, 200)]),
+        'init_hp': rng.choice([0, rng.randint(100, 400)]),
+        'init_dex': rng.choice([0, rng.randint(20, 60)]),
+        'init_wakan': rng.choice([0, rng.randint(50, 200)]),
+        'addon_minjie': rng.choice([0, 0, rng.randint(1, 40)]),
+        'addon_liliang': rng.choice([0, 0, rng.randint(1, 40)]),
+        'addon_naili': rng.choice([0, rng.randint(1, 40)]),
+        'addon_tizhi': rng.choice([0, rng.randint(1, 40)]),
+        'addon_moli': rng.choice([0, rng.randint(1, 40)]),
+        'addon_lingli': rng.choice([0, rng.randint(1, 40)]),
+        'gem_score': rng.choice([0, round(rng.uniform(1, 100), 2)]),
+        'gem_level': rng.randint(0, 16),
+        'gem_value': rng.choice([[], [1], [4, 4]]),
+        'hole_score': rng.choice([0, 15, 75, 100]),
+        'repair_fail_num': rng.choice([0, 0, 1, 2, 3, 5]),
+        'special_skill': rng.choice([0, 0, 1001, 2004, 1050]),
+        'special_effect': rng.choice([[], [1], [2, 3]]),
+        'binding': rng.choice([0, 1]),
+        'suit_effect': rng.choice(_suit_pool()),
+        'price': rng.randint(100, 100000),
+        'equip_sn': f"sn_{rng.randint(0, 10 ** 9)}",
+    }
+    features['addon_total'] = sum(features[k] for k in [
+        'addon_minjie', 'addon_liliang', 'addon_naili', 'addon_tizhi', 'addon_moli'])
+
+    # 边界情况：None、字符串、缺失特征、额外未配置特征
+    roll = rng.random() if edge_cases else 1.0
+    if roll < 0.05:
+        features['init_hp'] = None
+    elif roll < 0.10:
+        features['hole_score'] = '75'
+    elif roll < 0.15:
+        features.pop('gem_score')
+    elif roll < 0.20:
+        features['extra_flag'] = rng.choice([0, 1, 'x'])
+    elif roll < 0.25:
+        features['repair_fail_num'] = None
+    return features
+
+
+def test_vectorized_similarity_matches_scalar():
+    """向量化相似度与 _calculate_similarity 逐行结果一致"""
+    evaluator = _make_evaluator()
+    rng = random.Random(20250901)
+
+    for kindid in TEST_KINDIDS:
+        for _ in range(3):
+            target = _random_features(rng, kindid, edge_cases=False)
+            market = [_random_features(rng, kindid) for _ in range(200)]
+
+            scalar = np.array([evaluator._calculate_similarity(target, m) for m in market])
+            vectorized = evaluator._calculate_similarity_vectorized(target, market)
+
+            assert vectorized.shape == scalar.shape
+            assert np.count_nonzero(scalar) > len(market) // 2
+            assert np.allclose(vectorized, scalar, atol=1e-9), (
+                f"kindid={kindid} 最大差异: {np.max(np.abs(vectorized - scalar))}")
+
+
+def test_vectorized_similarity_invalid_rows():
+    """非字典候选与标量路径一致地记为0"""
+    evaluator = _make_evaluator()
+    rng = random.Random(7)
+    target = _random_features(rng, 5, edge_cases=False)
+    market = [_random_features(rng, 5), None, _random_features(rng, 5)]
+
+    vectorized = evaluator._calculate_similarity_vectorized(target, market)
+    assert vectorized[1] == 0.0
+    assert np.isclose(vectorized[0], evaluator._calculate_similarity(target, market[0]))
+    assert len(evaluator._calculate_similarity_vectorized(target, [])) == 0
+
+
+class _FrameCollector:
+    """返回固定DataFrame的市场数据源（仅用于测试锚点选择逻辑）"""
+
+    def __init__(self, df):
+        self.df = df
+
+    def get_market_data_with_addon_classification(self, filters):
+        return self.df
+
+    def get_market_data_for_similarity(self, filters):
+        return self.df
+
+
+def test_find_market_anchors_parity():
+    """find_market_anchors 在两种模式下返回相同的锚点"""
+    evaluator = _make_evaluator()
+    rng = random.Random(42)
+
+    for kindid in [18, 19]:
+        target = _random_features(rng, kindid, edge_cases=False)
+        rows = [_random_features(rng, kindid) for _ in range(150)]
+        # 特征已提取好的数据，直接作为market特征使用
+        market_df = pd.DataFrame(rows)
+        market_df.loc[3, 'equip_sn'] = target['equip_sn']  # 自身应被排除
+
+        evaluator.market_collector = _FrameCollector(market_df)
+        evaluator.feature_extractor = type('PassThrough', (), {
+            'extract_features': staticmethod(lambda row: row)})()
+
+        evaluator.vectorized_similarity = False
+        scalar_anchors = evaluator.find_market_anchors(
+            target, similarity_threshold=0.3, max_anchors=20, verbose=False)
+        evaluator.vectorized_similarity = True
+        vectorized_anchors = evaluator.find_market_anchors(
+            target, similarity_threshold=0.3, max_anchors=20, verbose=False)
+
+        assert len(scalar_anchors) > 0
+        assert [a['equip_sn'] for a in vectorized_anchors] == [a['equip_sn'] for a in scalar_anchors]
+        assert [a['similarity'] for a in vectorized_anchors] == [a['similarity'] for a in scalar_anchors]
+        assert [a['price'] for a in vectorized_anchors] == [a['price'] for a in scalar_anchors]
+        assert target['equip_sn'] not in [a['equip_sn'] for a in vectorized_anchors]
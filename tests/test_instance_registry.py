@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试共享实例注册表：实例复用、配置文件变化时重新构造、构造失败保留旧实例、并发取用只构造一次
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.utils.instance_registry import InstanceRegistry
+from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
+
+
+class _ConfigReader:
+    """构造时读取配置文件的测试对象"""
+    builds = 0
+
+    def __init__(self, path):
+        _ConfigReader.builds += 1
+        with open(path, 'r', encoding='utf-8') as f:
+            self.value = f.read()
+        if self.value == 'bad':
+            raise ValueError('配置错误')
+
+
+def _write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    # 保证修改时间变化（部分文件系统的时间精度较低）
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reuse_and_reload_on_config_change(tmp_path):
+    config = str(tmp_path / 'config.txt')
+    _write(config, 'v1')
+    registry = InstanceRegistry(check_interval=0)
+    registry.register('reader', lambda: _ConfigReader(config), [config])
+    # 重复注册不替换
+    registry.register('reader', lambda: None, [])
+
+    first = registry.get('reader')
+    assert first.value == 'v1'
+    assert registry.get('reader') is first
+
+    _write(config, 'v2')
+    second = registry.get('reader')
+    assert second is not first and second.value == 'v2'
+    assert registry.get_status()['reader']['build_count'] == 2
+
+    # 构造失败时保留旧实例，配置修正后重新构造
+    _write(config, 'bad')
+    assert registry.get('reader') is second
+    assert registry.get('reader') is second
+    _write(config, 'v3')
+    assert registry.get('reader').value == 'v3'
+
+    assert registry.reload('reader')
+    assert registry.get_status()['reader']['build_count'] == 4
+
+
+def test_check_interval_limits_stat_calls(tmp_path):
+    config = str(tmp_path / 'config.txt')
+    _write(config, 'v1')
+    registry = InstanceRegistry(check_interval=60)
+    registry.register('reader', lambda: _ConfigReader(config), [config])
+    first = registry.get('reader')
+    _write(config, 'v2')
+    # 检查间隔内不检查文件
+    assert registry.get('reader') is first
+    assert registry.reload()
+    assert registry.get('reader').value == 'v2'
+
+
+def test_concurrent_get_builds_once(tmp_path):
+    config = str(tmp_path / 'config.txt')
+    _write(config, 'v1')
+
+    def slow_factory():
+        time.sleep(0.05)
+        return _ConfigReader(config)
+
+    registry = InstanceRegistry(check_interval=0)
+    registry.register('reader', slow_factory, [config])
+    builds_before = _ConfigReader.builds
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get('reader'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _ConfigReader.builds - builds_before == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_first_build_failure_raises(tmp_path):
+    config = str(tmp_path / 'config.txt')
+    _write(config, 'bad')
+    registry = InstanceRegistry(check_interval=0)
+    registry.register('reader', lambda: _ConfigReader(config), [config])
+    try:
+        registry.get('reader')
+        assert False, "第一次构造失败应抛出异常"
+    except ValueError:
+        pass
+    _write(config, 'v1')
+    assert registry.get('reader').value == 'v1'
+
+
+def test_feature_extractor_config_files_exist():
+    files = FeatureExtractor.get_config_files()
+    assert any(path.endswith('rule_setting.jsonc') for path in files)
+    assert any(path.endswith('rate.jsonc') for path in files)
+    assert all(os.path.exists(path) for path in files)
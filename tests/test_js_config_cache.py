@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试JavaScript变量配置文件的二进制缓存：与直接解析结果一致、按配置项延迟解码、源文件变化时重新构建
+"""
+
+import sys
+import os
+import json
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils import js_config_cache
+from src.utils.js_config_cache import (
+    CONFIG_CACHE_DIR_ENV, LazyConfig, load_js_config_cached, parse_js_config_text
+)
+from src.parser.config_loader import ConfigLoader
+
+
+def _write(path, content, mtime_shift=0):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    if mtime_shift:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_shift))
+
+
+def _load(path, var_name='TEST_CONFIG'):
+    # 清空进程内的复用，模拟新进程启动
+    js_config_cache._loaded.clear()
+    return load_js_config_cached(path, var_name)
+
+
+def test_cache_matches_source_and_decodes_lazily(tmp_path, monkeypatch):
+    monkeypatch.setenv(CONFIG_CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    path = str(tmp_path / 'config.js')
+    _write(path, 'var TEST_CONFIG={"a": {"1": "x", "2": [1, 2.5, null, true]}, "b": ["y"], "中文": "值"}')
+
+    built = _load(path)
+    cache_files = os.listdir(tmp_path / 'cache')
+    assert len(cache_files) == 1
+
+    config = _load(path)
+    assert isinstance(config, LazyConfig)
+    assert config._decoded == {}
+    assert config['a'] == {'1': 'x', '2': [1, 2.5, None, True]}
+    assert list(config._decoded) == ['a']
+    assert config.get('missing', 0) == 0 and 'b' in config and len(config) == 3
+    assert config.to_dict() == dict(built) == {'a': {'1': 'x', '2': [1, 2.5, None, True]}, 'b': ['y'], '中文': '值'}
+
+    # 同一进程内复用
+    assert load_js_config_cached(path, 'TEST_CONFIG') is config
+
+
+def test_cache_rebuilt_when_source_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv(CONFIG_CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    path = str(tmp_path / 'config.js')
+    _write(path, 'var TEST_CONFIG={"a": 1}')
+    assert _load(path)['a'] == 1
+
+    # 修改时间变化、内容不变：沿用缓存
+    _write(path, 'var TEST_CONFIG={"a": 1}', mtime_shift=2_000_000_000)
+    assert _load(path)['a'] == 1
+
+    # 内容变化
+    _write(path, 'var TEST_CONFIG={"a": 2, "b": 3}', mtime_shift=4_000_000_000)
+    assert dict(_load(path)) == {'a': 2, 'b': 3}
+
+    # 进程内复用的配置在源文件变化后也会更新
+    _write(path, 'var TEST_CONFIG={"a": 4}', mtime_shift=6_000_000_000)
+    assert dict(load_js_config_cached(path, 'TEST_CONFIG')) == {'a': 4}
+
+
+def test_corrupt_cache_and_disabled_cache(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setenv(CONFIG_CACHE_DIR_ENV, str(cache_dir))
+    path = str(tmp_path / 'config.js')
+    _write(path, 'var TEST_CONFIG={"a": [1, 2]}')
+    _load(path)
+    cache_file = cache_dir / os.listdir(cache_dir)[0]
+    cache_file.write_bytes(b'MHJC\x01')
+    assert _load(path)['a'] == [1, 2]
+
+    monkeypatch.setenv(CONFIG_CACHE_DIR_ENV, '')
+    config = _load(path)
+    assert config == {'a': [1, 2]} and not isinstance(config, LazyConfig)
+
+
+def test_config_loader_matches_direct_parse(tmp_path, monkeypatch):
+    monkeypatch.setenv(CONFIG_CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    js_config_cache._loaded.clear()
+    with open(ConfigLoader.CONFIG_FILE, 'r', encoding='utf-8') as f:
+        expected = parse_js_config_text(f.read(), 'CBG_GAME_CONFIG')
+
+    for _ in range(2):
+        js_config_cache._loaded.clear()
+        loader = ConfigLoader()
+        config = loader._load_full_config()
+        assert set(config) == set(expected)
+        assert json.dumps(config['shenqi_info'], sort_keys=True) == json.dumps(expected['shenqi_info'], sort_keys=True)
+        assert loader.get_pet_skill_config() == {str(k): str(v) for k, v in expected['pet_skills_for_front'].items()}
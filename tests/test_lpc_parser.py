@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试单遍LPC解析器：与递归解析器结果一致，不规范数据降级到递归解析
+"""
+
+import sys
+import os
+import json
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils.lpc_helper import LPCHelper
+
+
+def _role_demo_desc():
+    with open(os.path.join(project_root, 'libs', 'RoleDemo.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)['large_equip_desc']
+
+
+def test_parse_lpc_matches_recursive_parser():
+    """角色large_equip_desc及各种边界格式的解析结果与递归解析器一致"""
+    helper = LPCHelper()
+    cases = [
+        _role_demo_desc(),
+        '([])',
+        '({})',
+        '(["a":,"b":])',
+        '(["a":1,,"b":({1,2,}),])',
+        ' (["x":"a\\"b:c","y":"#r等级 115#Y"]) ',
+        '([1:-2,2:1.5,3:abc def ,"4":"007"])',
+        '({,1,,"x",(["k":({})]),})',
+        '([ "a" : 1 , "b" : "q" ])',
+    ]
+    for case in cases:
+        assert helper.parse_lpc(case) == helper.recursive_lpc_parse(case), case
+
+    parsed = helper.parse_lpc(cases[0])
+    assert parsed['iTotalMagDef_all'] == 812
+    assert parsed['AllRider']['1']['all_skills'] == {'600': 2, '611': 1}
+    assert isinstance(parsed['AllSummon'], list)
+
+
+def test_lpc_to_js_falls_back_on_malformed_input():
+    """单遍解析器拒绝的数据由递归解析器按原有规则处理"""
+    helper = LPCHelper()
+    for case in ['(["a"])', '(["a":1})', '({1:2})', '([])x']:
+        try:
+            helper.parse_lpc(case)
+            assert False, f"应拒绝不规范的数据: {case}"
+        except ValueError:
+            pass
+        assert helper.lpc_to_js(case, return_dict=True) == helper.recursive_lpc_parse(case)
+
+    desc = _role_demo_desc()
+    assert json.loads(helper.lpc_to_js(desc)) == helper.parse_lpc(desc)
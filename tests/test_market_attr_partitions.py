@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试灵饰/宠物装备分区缓存：分区查询与逐行筛选结果一致，更新消息增量合并分区
+"""
+
+import sys
+import os
+import io
+import json
+import random
+import logging
+import contextlib
+
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor.lingshi.lingshi_market_data_collector import LingshiMarketDataCollector
+from src.evaluator.market_anchor.pet_equip.pet_equip_market_data_collector import PetEquipMarketDataCollector
+from src.evaluator.constants.equipment_types import PET_EQUIP_KINDID
+from src.evaluator.constants.lingshi_priorities import get_priority_by_attr_name
+
+RING_ATTRS = ['伤害', '物理暴击等级', '穿刺等级', '法术伤害', '固定伤害', '速度']
+
+
+class _FullCacheCollector:
+    """返回固定全量缓存的装备数据采集器"""
+
+    def __init__(self, df):
+        self.df = df
+
+    def _get_full_data_from_redis(self):
+        return self.df
+
+
+def _reference_attr_match(market_attrs, target_attr_types, kindid):
+    """原逐行附加属性匹配逻辑"""
+    from collections import Counter
+    if isinstance(market_attrs, str):
+        market_attrs = json.loads(market_attrs)
+    if not market_attrs:
+        return False
+    market_counter = Counter(attr['attr_type'] for attr in market_attrs if attr.get('attr_type'))
+    if len(target_attr_types) == 2 or len(set(target_attr_types)) == 1:
+        required = Counter(target_attr_types)
+    else:
+        counter = Counter(target_attr_types)
+        if len(counter) < len(target_attr_types):
+            attr = counter.most_common(1)[0][0]
+            required = Counter([attr, attr])
+        else:
+            ordered = sorted(target_attr_types, key=lambda x: get_priority_by_attr_name(x, kindid))
+            required = Counter(ordered[:2])
+    return all(market_counter[a] >= n for a, n in required.items())
+
+
+def _random_lingshi(rng, count, start=0):
+    rows = []
+    for i in range(count):
+        attrs = [{'attr_type': rng.choice(RING_ATTRS), 'attr_value': rng.randint(1, 30)}
+                 for _ in range(rng.randint(0, 3))]
+        rows.append({'equip_sn': f"l{start + i}", 'kindid': rng.choice([61, 62, 63]),
+                     'agg_added_attrs': json.dumps(attrs, ensure_ascii=False) if rng.random() < 0.5 else attrs,
+                     'equip_level': rng.choice([80, 100, 120]), 'price': rng.randint(1, 1000),
+                     'update_time': f"2025-01-{rng.randint(1, 28):02d}"})
+    return pd.DataFrame(rows)
+
+
+def _make_lingshi_collector(df):
+    collector = object.__new__(LingshiMarketDataCollector)
+    collector.logger = logging.getLogger(__name__)
+    collector.target_features = None
+    collector.equip_collector = _FullCacheCollector(df)
+    collector._cached_lingshi_data = None
+    collector._cache_timestamp = None
+    collector._lingshi_partitions = None
+    collector._attr_match_keys = {}
+    return collector
+
+
+def test_lingshi_attr_partitions_match_row_filter():
+    """附加属性分区查询与逐行匹配一致，并更新目标匹配属性；新增数据增量合并"""
+    rng = random.Random(15)
+    full_data = _random_lingshi(rng, 600)
+    collector = _make_lingshi_collector(full_data)
+
+    targets = [['伤害', '伤害'], ['伤害', '速度'], ['速度', '速度', '速度'],
+               ['伤害', '伤害', '速度'], ['伤害', '穿刺等级', '固定伤害'], ['法术伤害', '速度', '伤害']]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for kindid in (61, 62):
+            for target in targets:
+                attrs = [{'attr_type': attr_type, 'attr_value': 10} for attr_type in target]
+                result = collector._get_attr_partition_data(kindid, attrs)
+                rows = full_data[full_data['kindid'] == kindid]
+                expected = rows[[_reference_attr_match(a, target, kindid) for a in rows['agg_added_attrs']]]
+                assert list(result['equip_sn']) == list(expected['equip_sn'])
+                assert collector.target_features['attrs'] == attrs
+                assert len(collector.target_features['target_match_attrs']) in (2, 3)
+
+                # 逐行筛选（MySQL降级路径）与分区结果一致
+                filtered = collector._filter_by_attrs(rows, attrs)
+                assert sorted(filtered.get('equip_sn', [])) == sorted(expected['equip_sn'])
+
+        # 新增数据：已有装备按equip_sn替换，新装备追加
+        new_rows = _random_lingshi(rng, 40, start=580)
+        collector.handle_equipment_update_message(
+            {'type': 'equipment_data_saved', 'action': 'add_dataframe', 'dataframe': new_rows})
+        merged = pd.concat([full_data, new_rows], ignore_index=True).drop_duplicates(subset=['equip_sn'], keep='last')
+        assert list(collector._cached_lingshi_data['equip_sn']) == list(merged['equip_sn'])
+
+        attrs = [{'attr_type': '伤害'}, {'attr_type': '速度'}]
+        result = collector._get_attr_partition_data(61, attrs)
+        rows = merged[merged['kindid'] == 61]
+        expected = rows[[_reference_attr_match(a, ['伤害', '速度'], 61) for a in rows['agg_added_attrs']]]
+        assert list(result['equip_sn']) == list(expected['equip_sn'])
+
+
+def _random_pet_equips(rng, count, start=0):
+    rows = []
+    for i in range(count):
+        row = {'equip_sn': f"p{start + i}", 'kindid': PET_EQUIP_KINDID,
+               'fangyu': rng.choice([0, 0, rng.randint(1, 80)]), 'speed': rng.choice([0, 0, rng.randint(1, 40)]),
+               'shanghai': rng.choice([0, 10, 25, 60]), 'equip_level': rng.choice([65, 85, 105]),
+               'price': rng.randint(1, 1000), 'update_time': f"2025-02-{rng.randint(1, 28):02d}"}
+        for column in ['addon_fali', 'addon_lingli', 'addon_liliang', 'addon_minjie', 'addon_naili', 'addon_tizhi']:
+            row[column] = rng.choice([0, 0, 0, rng.randint(1, 20)])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _make_pet_equip_collector(df):
+    collector = object.__new__(PetEquipMarketDataCollector)
+    collector.logger = logging.getLogger(__name__)
+    collector.equip_collector = _FullCacheCollector(df)
+    collector._cached_pet_equip_data = None
+    collector._cache_timestamp = None
+    collector._pet_equip_partitions = None
+    return collector
+
+
+def test_pet_equip_partitions_match_row_filter():
+    """类型/附加属性分区查询与逐行筛选一致；新增数据增量合并"""
+    rng = random.Random(16)
+    full_data = pd.concat([_random_pet_equips(rng, 500), pd.DataFrame([{'equip_sn': 'x', 'kindid': 5}])],
+                          ignore_index=True)
+    collector = _make_pet_equip_collector(full_data)
+    pet_equips = full_data[full_data['kindid'] == PET_EQUIP_KINDID]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for fangyu, speed, shanghai in [(10, 0, 0), (0, 5, 30), (0, 0, 0), (0, 0, 40)]:
+            for addon_classes in (None, ['力量', '力敏', '无属性']):
+                result = collector._get_shared_cache_data(fangyu, speed, shanghai, addon_classes)
+                expected = collector._filter_cached_data_by_attrs(pet_equips, fangyu, speed, shanghai)
+                if addon_classes is not None:
+                    classes = expected.apply(lambda row: collector._classify_addon_attributes(
+                        *[row[c] for c in ['addon_fali', 'addon_lingli', 'addon_liliang',
+                                           'addon_minjie', 'addon_naili', 'addon_tizhi']]), axis=1)
+                    expected = expected[classes.isin(addon_classes)]
+                assert len(expected) > 0
+                assert list(result['equip_sn']) == list(expected['equip_sn'])
+
+        new_rows = _random_pet_equips(rng, 30, start=490)
+        collector.handle_equipment_update_message(
+            {'type': 'equipment_data_saved', 'action': 'add_dataframe', 'dataframe': new_rows})
+        merged = pd.concat([pet_equips, new_rows], ignore_index=True).drop_duplicates(subset=['equip_sn'], keep='last')
+        result = collector._get_shared_cache_data(10, 0, 0)
+        expected = collector._filter_cached_data_by_attrs(merged, 10, 0, 0)
+        assert list(result['equip_sn']) == list(expected['equip_sn'])
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试角色市场数据流式加载：列式存储与逐行构建DataFrame一致，子进程提取与当前进程提取结果一致，
+特征缓存只重新提取新增或变化的角色
+"""
+
+import sys
+import os
+import io
+import logging
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.models import Base, Role, LargeEquipDescData
+from src.evaluator.utils.columnar_store import ColumnarFeatureStore
+from src.evaluator.market_data_collector import MarketDataCollector
+
+
+class _StubExtractor:
+    """只返回少量特征的特征提取器（第3条数据抛出异常），记录提取过的角色"""
+
+    config_version = 'v1'
+
+    def __init__(self):
+        self.extracted = []
+
+    def extract_features(self, role_data):
+        self.extracted.append(role_data['eid'])
+        if role_data['eid'] == 'r3':
+            raise ValueError("bad row")
+        return {
+            'level': role_data['level'],
+            'expt_ski1': role_data.get('expt_ski1'),
+            'school_skills': [role_data['level'], 1],
+        }
+
+
+def _make_collector(engine, feature_extractor, feature_cache_path=None):
+    collector = object.__new__(MarketDataCollector)
+    collector.logger = logging.getLogger(__name__)
+    collector.feature_extractor = feature_extractor
+    collector._stream_engine = engine
+    collector.feature_workers = 0
+    collector.feature_cache_path = feature_cache_path
+    return collector
+
+
+def _load(collector, engine, total_count=18):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return collector._stream_load_market_data(engine, total_count=total_count, chunk_size=4, max_workers=0)
+
+
+def _make_engine(tmp_path, count=23):
+    engine = create_engine(f"sqlite:///{tmp_path / 'roles.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Role.__table__.insert(), [
+            {'eid': f"r{i}", 'role_type': 'empty' if i % 5 else 'normal', 'price': 1000 - i * 10,
+             'level': 100 + i, 'school': i % 15, 'serverid': i}
+            for i in range(count)])
+        conn.execute(LargeEquipDescData.__table__.insert(), [
+            {'eid': f"r{i}", 'expt_ski1': i} for i in range(0, count, 2)])
+    return engine
+
+
+def test_columnar_store_matches_dataframe_from_records():
+    """分块追加（含缺失列、类型升级、扩容）与pd.DataFrame(records)一致"""
+    records = [{'eid': f"e{i}", 'a': i, 'b': [i], 'c': True} for i in range(5)]
+    records += [{'eid': 'e5', 'a': 1.5, 'd': 'x'}, {'eid': 'e6', 'a': None, 'c': False}]
+    store = ColumnarFeatureStore(capacity=2)
+    for start in range(0, len(records), 3):
+        store.append_records(records[start:start + 3])
+
+    expected = pd.DataFrame(records).set_index('eid')
+    pd.testing.assert_frame_equal(store.to_dataframe(index='eid'), expected)
+
+
+def test_stream_load_preserves_price_order_and_skips_failed_rows(tmp_path):
+    """流式加载按价格升序返回，提取失败的行被跳过，进度字段被更新"""
+    engine = _make_engine(tmp_path)
+    collector = _make_collector(engine, _StubExtractor())
+
+    df = _load(collector, engine)
+
+    expected_eids = [f"r{i}" for i in sorted(range(23), key=lambda i: 1000 - i * 10) if i % 5 and i != 3]
+    assert list(df.index) == expected_eids
+    assert df.loc['r2', 'expt_ski1'] == 2 and np.isnan(df.loc['r1', 'expt_ski1'])
+    assert df.loc['r4', 'school_skills'] == [104, 1]
+    assert collector._refresh_processed_records == len(expected_eids)
+    assert collector._refresh_current_batch == 5
+
+
+def test_process_pool_matches_in_process_extraction(tmp_path):
+    """子进程提取特征与当前进程提取的结果一致"""
+    from src.evaluator.feature_extractor.feature_extractor import FeatureExtractor
+
+    engine = _make_engine(tmp_path, count=12)
+    with contextlib.redirect_stdout(io.StringIO()):
+        collector = _make_collector(engine, FeatureExtractor())
+        in_process = collector._stream_load_market_data(engine, total_count=9, chunk_size=3, max_workers=0)
+        pooled = collector._stream_load_market_data(engine, total_count=9, chunk_size=3, max_workers=2)
+
+    assert len(in_process) == 9
+    pd.testing.assert_frame_equal(pooled, in_process)
+
+
+def test_feature_cache_only_extracts_new_or_changed_roles(tmp_path):
+    """特征缓存命中的角色不再提取；更新时间变化、新增的角色重新提取；配置版本变化时全部重新提取"""
+    engine = _make_engine(tmp_path)
+    extractor = _StubExtractor()
+    collector = _make_collector(engine, extractor, str(tmp_path / 'cache' / 'role_features.pkl'))
+
+    first = _load(collector, engine)
+    assert len(extractor.extracted) == 18
+    # 临时文件已替换为缓存文件，没有残留
+    assert os.listdir(tmp_path / 'cache') == ['role_features.pkl']
+
+    extractor.extracted.clear()
+    second = _load(collector, engine)
+    # 提取失败的角色没有缓存，每次都重新尝试
+    assert extractor.extracted == ['r3']
+    pd.testing.assert_frame_equal(second, first)
+
+    with engine.begin() as conn:
+        conn.execute(Role.__table__.update().where(Role.eid == 'r4').values(
+            price=1, level=200, update_time=datetime(2030, 1, 1)))
+        conn.execute(Role.__table__.delete().where(Role.eid == 'r6'))
+        conn.execute(Role.__table__.insert(), [{'eid': 'r99', 'role_type': 'empty', 'price': 5, 'level': 99}])
+
+    extractor.extracted.clear()
+    third = _load(collector, engine)
+    assert sorted(extractor.extracted) == ['r3', 'r4', 'r99']
+    assert list(third.index[:2]) == ['r4', 'r99']
+    assert third.loc['r4', 'level'] == 200 and 'r6' not in third.index
+    assert third.loc['r2', 'school_skills'] == first.loc['r2', 'school_skills']
+
+    extractor.extracted.clear()
+    extractor.config_version = 'v2'
+    _load(collector, engine)
+    assert len(extractor.extracted) == 18
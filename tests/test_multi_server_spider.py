@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试多服务器爬虫调度：多个服务器同时爬取、速率预算分配、进度记录和断点续爬
+"""
+
+import sys
+import os
+import time
+import threading
+import importlib.util
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+import src.utils.cookie_manager as cookie_manager
+
+# 直接按文件加载服务模块，避免导入services包时初始化所有估价服务
+_spec = importlib.util.spec_from_file_location(
+    'spider_service_under_test', os.path.join(project_root, 'src', 'app', 'services', 'spider_service.py'))
+spider_service = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(spider_service)
+
+SERVERS = [{'server_id': i, 'server_name': f's{i}', 'areaid': i % 3} for i in range(1, 7)]
+CACHED_PARAMS = {'server_id': 0, 'areaid': 0, 'level_min': 60, 'nested': [{'server_name': 'x'}]}
+
+
+class _RecordingService(spider_service.SpiderService):
+    """记录子进程调用的爬虫服务（不启动run.py子进程）"""
+
+    def __init__(self, checkpoint_root, fail_ids=()):
+        super().__init__()
+        self.project_root = checkpoint_root
+        self.fail_ids = set(fail_ids)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def _run_single_server_spider(self, spider_type, equip_type, max_pages, delay_min, delay_max,
+                                  cached_params, server_info, skip_cookie_check=False,
+                                  rate=None, progress=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.calls.append((server_info['server_id'], cached_params, rate))
+        try:
+            time.sleep(0.05)
+            progress['completed_pages'] = max_pages
+            if server_info['server_id'] in self.fail_ids:
+                raise Exception("模拟失败")
+            return {"stdout": "", "stderr": ""}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def _run(service, **kwargs):
+    return service._run_multi_server_spider(
+        spider_type='equip', equip_type='normal', max_pages=3, delay_min=0, delay_max=0,
+        cached_params=CACHED_PARAMS, target_server_list=SERVERS, **kwargs)
+
+
+def test_servers_run_concurrently_with_shared_rate_budget(tmp_path, monkeypatch):
+    """服务器并发爬取，速率预算平均分配，完成后记录每个服务器的进度并清除断点"""
+    monkeypatch.setattr(cookie_manager, 'verify_cookie_validity', lambda logger: True)
+    service = _RecordingService(str(tmp_path))
+
+    started = time.monotonic()
+    _run(service, max_workers=3, rate_budget=0.9)
+    elapsed = time.monotonic() - started
+
+    assert service.max_running == 3
+    assert elapsed < 0.05 * len(SERVERS)
+    assert sorted(call[0] for call in service.calls) == [s['server_id'] for s in SERVERS]
+    assert all(abs(call[2] - 0.3) < 1e-9 for call in service.calls)
+
+    # 每个服务器的参数都注入了自己的服务器信息，原参数不被修改
+    for server_id, params, _ in service.calls:
+        assert params['server_id'] == server_id
+        assert params['nested'][0]['server_name'] == f's{server_id}'
+    assert CACHED_PARAMS['server_id'] == 0
+
+    status = spider_service.task_status
+    assert status['status'] == 'completed'
+    assert all(p['status'] == 'completed' and p['completed_pages'] == 3 for p in status['details']['servers'].values())
+    assert os.listdir(os.path.join(str(tmp_path), 'output', 'spider_checkpoints')) == []
+
+
+def test_failed_servers_resume_from_checkpoint(tmp_path, monkeypatch):
+    """部分服务器失败时保存断点，重新运行只爬取未完成的服务器"""
+    monkeypatch.setattr(cookie_manager, 'verify_cookie_validity', lambda logger: True)
+    failing = _RecordingService(str(tmp_path), fail_ids={2, 5})
+    try:
+        _run(failing, max_workers=2)
+        assert False, "应抛出服务器失败异常"
+    except Exception as e:
+        assert '2个服务器爬取失败' in str(e)
+    assert spider_service.task_status['status'] == 'error'
+
+    resumed = _RecordingService(str(tmp_path))
+    _run(resumed, max_workers=2)
+    assert sorted(call[0] for call in resumed.calls) == [2, 5]
+    servers = spider_service.task_status['details']['servers']
+    assert servers['1']['status'] == 'skipped'
+    assert servers['2']['status'] == 'completed'
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试爬虫分页并发调度器：并发上限、最后一页截止、令牌桶限速、限流退避重试
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.spider.page_scheduler import (
+    PageCrawlScheduler, AsyncTokenBucket, detect_throttle, rate_from_delay_range
+)
+
+
+def _jsonp(payload):
+    return f"Request.JSONP.request_map.request_0({json.dumps(payload, ensure_ascii=False)})"
+
+
+def _parse(text):
+    start = text.find('(') + 1
+    return json.loads(text[start:text.rfind(')')]).get('equip_list', [])
+
+
+class _FakeSite:
+    """模拟分页接口：记录同时在途的请求数，可指定被限流的次数"""
+
+    def __init__(self, total_pages, page_size=15, latency=0.02, throttle_times=0):
+        self.total_pages = total_pages
+        self.page_size = page_size
+        self.latency = latency
+        self.throttle_times = throttle_times
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requested_pages = []
+
+    async def fetch(self, page):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.requested_pages.append(page)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.throttle_times > 0:
+                self.throttle_times -= 1
+                return _jsonp({'status': 2, 'msg': '您的访问过于频繁，请稍后再试'})
+            if page > self.total_pages:
+                return _jsonp({'status': 1, 'equip_list': []})
+            size = self.page_size if page < self.total_pages else 3
+            return _jsonp({'status': 1, 'equip_list': [{'page': page, 'i': i} for i in range(size)]})
+        finally:
+            self.in_flight -= 1
+
+
+def test_concurrent_pages_bounded_and_stop_at_last_page():
+    """在途请求不超过并发数，最后一页之后不再发起请求"""
+    site = _FakeSite(total_pages=7)
+    handled = {}
+    scheduler = PageCrawlScheduler(concurrency=3, retry_delay=0)
+
+    stats = scheduler.run_sync(
+        20, fetch_text=site.fetch, parse_page=_parse,
+        handle_page=lambda page, items: handled.setdefault(page, len(items)),
+        is_last_page=lambda items: len(items) < 10)
+
+    assert site.max_in_flight == 3
+    assert sorted(handled) == list(range(1, 8))
+    assert stats['successful_pages'] == 7
+    assert stats['saved_count'] == 6 * 15 + 3
+    # 最后一页被识别时最多还有 并发数-1 个请求在途
+    assert max(site.requested_pages) <= 7 + 2
+
+
+def test_token_bucket_limits_rate():
+    """令牌桶按设定速率发放令牌（容量内允许突发）"""
+    async def take(bucket, n):
+        started = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(take(AsyncTokenBucket(rate=50, capacity=1), 6))
+    assert elapsed >= 5 / 50 * 0.9
+    assert asyncio.run(take(AsyncTokenBucket(rate=None), 100)) < 0.05
+    assert rate_from_delay_range((5, 8)) == 1 / 6.5
+
+
+def test_throttled_response_backs_off_and_retries():
+    """限流响应触发全局暂停和降速，重试后正常获取"""
+    site = _FakeSite(total_pages=2, latency=0, throttle_times=1)
+    scheduler = PageCrawlScheduler(concurrency=1, rate=100, retry_delay=0,
+                                   backoff_base=0.05, backoff_max=0.05)
+    started = time.monotonic()
+    stats = scheduler.run_sync(5, fetch_text=site.fetch, parse_page=_parse,
+                               handle_page=lambda page, items: len(items))
+
+    assert time.monotonic() - started >= 0.05
+    assert stats['throttle_count'] == 1
+    assert stats['successful_pages'] == 2
+    assert site.requested_pages[:2] == [1, 1]
+    assert scheduler.bucket.rate <= 100
+
+
+def test_detect_throttle():
+    """只有提示频繁访问的响应被识别为限流"""
+    assert detect_throttle(_jsonp({'status': 2, 'msg': '访问过于频繁'}))
+    assert detect_throttle('<html>429 Too Many Requests</html>')
+    assert not detect_throttle(_jsonp({'status': 1, 'equip_list': [{'msg': '频繁'}]}))
+    assert not detect_throttle(_jsonp({'status': 1, 'equip_list': []}))
+    assert not detect_throttle(None)
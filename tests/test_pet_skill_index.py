@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试召唤兽技能位图索引：与逐行集合匹配一致，增量编码、合并后的列升级不影响结果
+"""
+
+import sys
+import os
+import io
+import random
+import logging
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor.pet.pet_skill_index import (
+    PetSkillVocabulary, attach_skill_masks, skill_subset_mask, SKILL_MASK_VERSION_COLUMN
+)
+from src.evaluator.market_anchor.pet.pet_market_data_collector import PetMarketDataCollector
+
+SKILL_IDS = [str(i) for i in range(301, 401)]
+
+
+def _reference_match(data, target_skills):
+    """原逐行集合匹配逻辑"""
+    target_set = set(target_skills)
+
+    def match(row):
+        all_skill_val = row.get('all_skill', '')
+        skill_set = set(all_skill_val.split('|')) if all_skill_val else set()
+        return target_set.issubset(skill_set)
+    return data.apply(match, axis=1).to_numpy(dtype=bool)
+
+
+def _random_pets(rng, count, start=0):
+    pets = []
+    for i in range(count):
+        skills = rng.sample(SKILL_IDS, rng.randint(0, 8))
+        if rng.random() < 0.1:
+            skills.append('99999')  # 技能表以外的技能
+        pets.append({'equip_sn': f"p{start + i}", 'all_skill': '|'.join(skills),
+                     'role_grade_limit': rng.choice([45, 105]), 'price': rng.randint(1, 1000)})
+    return pd.DataFrame(pets)
+
+
+def test_subset_mask_matches_set_matching():
+    """位图子集判断与逐行集合匹配一致（含空技能、未知技能）"""
+    rng = random.Random(1)
+    vocabulary = PetSkillVocabulary(SKILL_IDS)
+    data = attach_skill_masks(_random_pets(rng, 500), vocabulary)
+    assert vocabulary.word_count == 4
+
+    targets = [['301'], ['305', '322'], ['399', '350', '301'], ['99999'], ['301', '99999']]
+    targets += [rng.sample(SKILL_IDS, 2) for _ in range(20)]
+    for target in targets:
+        expected = _reference_match(data, target)
+        np.testing.assert_array_equal(skill_subset_mask(data, target, vocabulary), expected)
+        np.testing.assert_array_equal(skill_subset_mask(data, target, None), expected)
+
+
+def test_incremental_encoding_survives_merge():
+    """合并未编码的新数据后（位图列升级为float）只编码新行，结果与全量编码一致"""
+    rng = random.Random(2)
+    vocabulary = PetSkillVocabulary(SKILL_IDS)
+    existing = attach_skill_masks(_random_pets(rng, 200), vocabulary)
+    merged = pd.concat([existing, _random_pets(rng, 50, start=200)], ignore_index=True)
+    assert merged[vocabulary.mask_columns[0]].dtype == np.float64
+
+    encoded = attach_skill_masks(merged, vocabulary)
+    fresh = attach_skill_masks(merged.drop(columns=vocabulary.mask_columns + [SKILL_MASK_VERSION_COLUMN]), vocabulary)
+    for col in vocabulary.mask_columns:
+        np.testing.assert_array_equal(encoded[col].to_numpy(dtype=np.uint32), fresh[col].to_numpy())
+    # 已编码的数据不重复编码
+    assert attach_skill_masks(fresh, vocabulary) is fresh
+    # 技能表变化时重新编码
+    assert (attach_skill_masks(fresh, PetSkillVocabulary(SKILL_IDS + ['500']))[SKILL_MASK_VERSION_COLUMN]
+            != vocabulary.version).all()
+
+
+def test_collector_filters_full_cache_with_skill_masks():
+    """全量缓存筛选使用技能位图，结果与逐行集合匹配一致"""
+    rng = random.Random(3)
+    collector = object.__new__(PetMarketDataCollector)
+    collector.logger = logging.getLogger(__name__)
+    collector._skill_vocabulary = PetSkillVocabulary(SKILL_IDS)
+    full_data = collector._attach_skill_masks(_random_pets(rng, 300))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        filtered = collector._filter_data_from_full_cache(
+            full_data, role_grade_limit_range=(0, 60), all_skill='301|', limit=5000)
+
+    in_range = full_data[full_data['role_grade_limit'] <= 60]
+    expected = in_range[_reference_match(in_range, ['301'])]
+    assert len(expected) > 0
+    assert sorted(filtered['equip_sn']) == sorted(expected['equip_sn'])
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试召唤兽列式（向量化）相似度与逐行标量相似度的一致性，以及前N个锚点的选择
+"""
+
+import sys
+import os
+import io
+import random
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor.pet.index import PetMarketAnchorEvaluator
+
+
+class _StubPetCollector:
+    def __init__(self, market_data):
+        self.market_data = market_data
+
+    def get_market_data_with_business_rules(self, filters):
+        return self.market_data.copy()
+
+
+def _random_pet(rng: random.Random, i: int) -> dict:
+    return {
+        'equip_sn': f"p{i}",
+        'role_grade_limit': rng.choice([0, 45, 65, 105, 125]),
+        'growth': rng.choice([0, round(rng.uniform(1.0, 1.3), 3)]),
+        'lx': rng.choice([0, rng.randint(1, 30)]),
+        'skill_count': rng.randint(0, 10),
+        'texing': rng.choice([0, 1]),
+        'neidan_count': rng.choice([0, 1, 2, 3, 4]),
+        'equip_level': rng.choice([0, 65, 105, 125]),
+        'is_baobao': rng.choice([True, False]),
+        'evol_skill_list_value': rng.choice([0, 3, 10, 13]),
+        'price': rng.randint(100, 50000),
+        'equip_list_amount': rng.choice([0, 0, rng.randint(1, 60000)]),
+    }
+
+
+def _make_market(rng, count=300):
+    market = pd.DataFrame([_random_pet(rng, i) for i in range(count)])
+    # 边界情况：缺失值和非数值
+    market['lx'] = market['lx'].astype(object)
+    market.loc[5, 'lx'] = None
+    market.loc[6, 'lx'] = 'bad'
+    market.loc[7, 'growth'] = np.nan
+    return market
+
+
+def test_vectorized_similarity_matches_scalar():
+    """列式相似度与逐行标量计算一致（含零值、NaN、None、字符串、缺失特征）"""
+    rng = random.Random(11)
+    market = _make_market(rng)
+    evaluator = PetMarketAnchorEvaluator(_StubPetCollector(market))
+    prepared = evaluator._prepare_market_candidates({}, market)
+    records = market.to_dict('records')
+
+    targets = [_random_pet(rng, 1000 + i) for i in range(15)]
+    targets.append({'growth': 1.2, 'lx': 0})  # 目标缺失大部分特征
+    with contextlib.redirect_stdout(io.StringIO()):
+        for target in targets:
+            vectorized = evaluator._calculate_similarity_vectorized(target, prepared)
+            scalar = [evaluator._calculate_similarity(target, record) for record in records]
+            np.testing.assert_allclose(vectorized, scalar, rtol=0, atol=1e-12)
+
+
+def test_anchors_match_sorted_scalar_selection():
+    """锚点与逐行计算、稳定排序后取前N个的结果一致，价格减去装备估价且不为负"""
+    rng = random.Random(5)
+    market = _make_market(rng)
+    evaluator = PetMarketAnchorEvaluator(_StubPetCollector(market))
+    records = market.to_dict('records')
+    target = {**records[10], 'equip_sn': records[10]['equip_sn']}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = []
+        for record in records:
+            if record['equip_sn'] == target['equip_sn']:
+                continue
+            similarity = evaluator._calculate_similarity(target, record)
+            if similarity >= 0.6:
+                expected.append((record['equip_sn'], round(float(similarity), 3),
+                                 max(record['price'] - record['equip_list_amount'], 0)))
+        expected.sort(key=lambda x: x[1], reverse=True)
+
+        evaluator.extreme_value_filter.filter_anchors_for_extreme_values = lambda anchors: anchors
+        anchors = evaluator.find_market_anchors(target, similarity_threshold=0.6, max_anchors=12)
+
+    assert len(expected) > 12
+    assert [(a['equip_sn'], a['similarity'], a['price']) for a in anchors] == expected[:12]
+
+
+def test_select_top_anchors_keeps_original_order_for_ties():
+    """相似度相同的候选按原顺序入选"""
+    similarities = np.array([0.5, 0.9, 0.7, 0.9, 0.7, 0.7, 0.1, 0.7])
+    selected = PetMarketAnchorEvaluator._select_top_anchors(similarities, 0.2, 4)
+    assert selected.tolist() == [1, 3, 2, 4]
+    assert PetMarketAnchorEvaluator._select_top_anchors(similarities, 0.95, 4).tolist() == []
+    assert PetMarketAnchorEvaluator._select_top_anchors(similarities, 0.0, 20).tolist() == [1, 3, 2, 4, 5, 7, 0, 6]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试DataFrame二进制消息：编码往返一致，发布/订阅（含大数据引用）不依赖pickle
+"""
+
+import sys
+import os
+import json
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils.dataframe_codec import encode_dataframe_message, decode_dataframe_message, is_dataframe_message
+from src.utils import redis_pubsub
+from src.utils.redis_pubsub import RedisPubSub
+
+
+class _FakeRedis:
+    """只记录发布和键值的Redis客户端"""
+
+    def __init__(self, store=None):
+        self.published = []
+        self.store = {} if store is None else store
+
+    def pubsub(self):
+        return None
+
+    def publish(self, channel, payload):
+        self.published.append((channel, payload))
+        return 1
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    def get(self, key):
+        return self.store.get(key)
+
+
+def _sample_frame(rows=50):
+    rng = np.random.default_rng(16)
+    return pd.DataFrame({
+        'equip_sn': [f"sn{i}" for i in range(rows)],
+        'price': rng.integers(1, 100000, rows),
+        'score': rng.random(rows),
+        'binding': rng.random(rows) < 0.5,
+        'desc': ['#r等级 160 #G附加属性 敏捷 +%d' % i if i % 7 else None for i in range(rows)],
+        'gem_value': [[1, 2] if i % 2 else [] for i in range(rows)],
+        'server_id': pd.array([i if i % 5 else None for i in range(rows)], dtype='Int64'),
+        'update_time': pd.date_range('2025-01-01', periods=rows, freq='h'),
+    })
+
+
+def _make_pubsub():
+    client = _FakeRedis()
+    binary = _FakeRedis(client.store)
+    pubsub = RedisPubSub(redis_client=client, binary_client=binary, use_streams=False)
+    pubsub.logger = logging.getLogger(__name__)
+    return pubsub, binary
+
+
+def test_codec_roundtrip():
+    """各类列（数值、布尔、时间、字符串、列表、可空整数、非默认索引）往返一致，解码结果可写"""
+    df = _sample_frame()
+    for frame in (df, df.iloc[5:20], df.set_index('equip_sn')):
+        for compress in (True, False):
+            payload = encode_dataframe_message({'type': 'x'}, frame, compress=compress)
+            assert is_dataframe_message(payload)
+            message, decoded = decode_dataframe_message(payload)
+            assert message == {'type': 'x'}
+            pd.testing.assert_frame_equal(decoded, frame)
+    decoded.iloc[0, 0] = 1
+
+    message, decoded = decode_dataframe_message(encode_dataframe_message({'type': 'y'}))
+    assert message == {'type': 'y'} and decoded is None
+
+
+def _typed_object_frame(rows=12):
+    """object列中JSON无法原样表示的值，以及类别/带时区时间列"""
+    return pd.DataFrame({
+        'create_time': [datetime(2025, 1, 1, 8, i) if i % 4 else None for i in range(rows)],
+        'sold_at': [pd.Timestamp('2025-02-01', tz='Asia/Shanghai') + pd.Timedelta(minutes=i) for i in range(rows)],
+        'sale_date': [date(2025, 3, i + 1) for i in range(rows)],
+        'price': [Decimal(f"{i}.10") for i in range(rows)],
+        'pos': [(i, i + 1) for i in range(rows)],
+        'tags': [{'a', 'b'} if i % 2 else frozenset({i}) for i in range(rows)],
+        'raw': [bytes([i, 255]) for i in range(rows)],
+        'vector': [np.arange(3, dtype=np.int16) + i for i in range(rows)],
+        'attrs': [{1: 'x', (2, 3): [Decimal('1.5'), None]} if i % 3 else {'k': i} for i in range(rows)],
+        'mixed': [np.int64(i) if i % 2 else pd.NaT if i % 4 else np.datetime64(i, 's') for i in range(rows)],
+        'score': [np.float64(i / 2) if i % 2 else float(i) for i in range(rows)],
+        'cooldown': [timedelta(seconds=i) for i in range(rows)],
+        'grade': pd.Categorical(['B' if i % 3 else 'A' for i in range(rows)], categories=['C', 'B', 'A'], ordered=True),
+        'listed_at': pd.Series(pd.date_range('2025-01-01', periods=rows, freq='D', tz='UTC')),
+    })
+
+
+def test_codec_roundtrip_typed_objects():
+    """object列中的时间、Decimal、元组/集合、bytes、数组、非字符串键字典等往返后类型不变；类别保留顺序和未使用的类别"""
+    df = _typed_object_frame()
+    _, decoded = decode_dataframe_message(encode_dataframe_message({'type': 'x'}, df))
+    pd.testing.assert_frame_equal(decoded, df)
+    for column in df.columns:
+        assert decoded[column].dtype == df[column].dtype, column
+        for original, restored in zip(df[column], decoded[column]):
+            assert type(restored) is type(original), (column, original, restored)
+    assert list(decoded['grade'].cat.categories) == ['C', 'B', 'A'] and decoded['grade'].cat.ordered
+    assert decoded.loc[1, 'attrs'] == {1: 'x', (2, 3): [Decimal('1.5'), None]}
+    assert decoded.loc[1, 'vector'].dtype == np.int16 and decoded.loc[1, 'vector'].flags.writeable
+
+    # 版本1的消息（更新日志、共享缓存中已有的数据）仍可解码
+    legacy = bytearray(encode_dataframe_message({'type': 'x'}, _sample_frame()))
+    legacy[4] = 1
+    pd.testing.assert_frame_equal(decode_dataframe_message(bytes(legacy))[1], _sample_frame())
+
+
+def test_codec_rejects_unsupported_objects():
+    """不支持的对象直接报错，不再转为字符串"""
+    df = pd.DataFrame({'equip_sn': ['a'], 'obj': [object()]})
+    with pytest.raises(TypeError):
+        encode_dataframe_message({'type': 'x'}, df)
+
+
+def test_publish_and_handle_binary_message(monkeypatch):
+    """发布二进制消息，订阅端解码后回调；大数据通过短期键引用传递"""
+    pubsub, binary = _make_pubsub()
+    received = []
+    pubsub.subscribers['equipment_updates'] = [received.append]
+    df = _sample_frame()
+
+    assert pubsub.publish_with_dataframe('equipment_updates', {'type': 'equipment_data_saved'}, df)
+    channel, payload = binary.published[-1]
+    assert isinstance(payload, bytes) and b'pickle' not in payload
+    pubsub._handle_message({'type': 'message', 'channel': channel.encode('utf-8'), 'data': payload})
+    assert received[-1]['type'] == 'equipment_data_saved'
+    pd.testing.assert_frame_equal(received[-1]['dataframe'], df)
+
+    # 超过阈值：频道只发布引用
+    monkeypatch.setattr(redis_pubsub, 'DATAFRAME_REF_THRESHOLD', 64)
+    assert pubsub.publish_with_dataframe('equipment_updates', {'type': 'equipment_data_saved'}, df)
+    channel, payload = binary.published[-1]
+    assert len(binary.store) == 1 and len(payload) < len(next(iter(binary.store.values())))
+    pubsub._handle_message({'type': 'message', 'channel': channel, 'data': payload})
+    pd.testing.assert_frame_equal(received[-1]['dataframe'], df)
+
+    # 引用过期：数据为None，回调仍然执行
+    binary.store.clear()
+    pubsub._handle_message({'type': 'message', 'channel': channel, 'data': payload})
+    assert received[-1]['dataframe'] is None
+
+    # 普通JSON消息；旧格式的pickle数据不再反序列化
+    pubsub._handle_message({'type': 'message', 'channel': b'equipment_updates',
+                            'data': json.dumps({'type': 'refresh'}).encode('utf-8')})
+    assert received[-1] == {'type': 'refresh'}
+    pubsub._handle_message({'type': 'message', 'channel': 'equipment_updates',
+                            'data': json.dumps({'type': 'old', 'has_dataframe': True, 'dataframe_data': 'gASV'})})
+    assert received[-1]['dataframe'] is None
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试Redis列式存储的列块编码/解码（不需要连接Redis）
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils.redis_cache import RedisCache, _encode_columnar_chunks, _decode_columnar_chunks
+
+
+def _roundtrip(df, chunk_rows):
+    columns, chunk_count, fields = _encode_columnar_chunks(df, chunk_rows)
+    meta = {'columns': columns, 'chunk_count': chunk_count}
+    # Redis返回的字段名是bytes
+    return _decode_columnar_chunks(meta, {k.encode('utf-8'): v for k, v in fields.items()})
+
+
+def _sample_frame(n=1234):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'equip_sn': [f"sn_{i}" for i in range(n)],
+        'kindid': rng.integers(1, 100, n),
+        'price': rng.random(n) * 1000,
+        'binding': rng.random(n) > 0.5,
+        'gem_value': [[1, 6] if i % 2 else [] for i in range(n)],
+        'suit_effect': [None if i % 3 else 4002 for i in range(n)],
+        'update_time': pd.date_range('2025-01-01', periods=n, freq='min'),
+        'gem_level': pd.array([None if i % 5 == 0 else i % 16 for i in range(n)], dtype='Int64'),
+        'server_name': pd.Categorical(['紫禁城' if i % 2 else '长安城' for i in range(n)]),
+    })
+
+
+def test_columnar_roundtrip_preserves_values_and_dtypes():
+    """多列块编码后还原，数据和类型与原DataFrame一致"""
+    df = _sample_frame()
+    for chunk_rows in [100, 5000]:
+        restored = _roundtrip(df, chunk_rows)
+        pd.testing.assert_frame_equal(restored, df)
+
+
+def test_columnar_numeric_columns_are_writable():
+    """还原后的数值列可以直接修改（缓冲区已复制到DataFrame块中）"""
+    restored = _roundtrip(_sample_frame(10), 4)
+    restored.loc[0, 'price'] = -1.0
+    assert restored.loc[0, 'price'] == -1.0
+
+
+def test_merge_row_delta_overrides_snapshot_rows():
+    """增量行按主键覆盖快照中的同名行，新主键追加"""
+    cache = RedisCache.__new__(RedisCache)
+    base = pd.DataFrame({'equip_sn': ['a', 'b', 'c'], 'price': [1, 2, 3]})
+    delta = pd.DataFrame({'equip_sn': ['b', 'd'], 'price': [20, 40]})
+
+    merged = cache._merge_row_delta(base, delta, 'equip_sn')
+    assert dict(zip(merged['equip_sn'], merged['price'])) == {'a': 1, 'c': 3, 'b': 20, 'd': 40}
+    assert len(merged) == 4
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试RedisCache列式存储的读写路径（使用fakeredis）：
+快照写入与读取、快照之上的增量更新与合并、增量行的条件删除、旧版逐行Hash的读取与迁移、列式键的计数与重命名
+"""
+
+import sys
+import os
+import pickle
+
+import fakeredis
+import pandas as pd
+import pytest
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils import redis_cache
+from src.utils.redis_cache import RedisCache, COLUMNAR_META_FIELD
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def cache(monkeypatch, server):
+    client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(redis_cache.redis, 'Redis', lambda connection_pool=None: client)
+    cache = RedisCache()
+    # 小列块，覆盖多列块读写
+    cache.columnar_chunk_rows = 4
+    return cache
+
+
+def _frame(keys, key_column='equip_sn', price_base=100):
+    return pd.DataFrame({
+        key_column: keys,
+        'price': [price_base + i for i in range(len(keys))],
+        'server_name': [f"server_{i % 3}" for i in range(len(keys))],
+    })
+
+
+def _prices(df, key_column='equip_sn'):
+    return dict(zip(df[key_column], df['price']))
+
+
+def test_set_and_get_hash_data_roundtrip(cache):
+    """全量写入列式快照后读取一致；临时键已切换，行级Hash被清空"""
+    full_key = cache._make_key('equip_all')
+    columnar_key = cache._columnar_key(full_key)
+    df = _frame([f"sn_{i}" for i in range(10)])
+
+    # 全量写入会清空此前的行级增量
+    cache.client.hset(full_key, 'stale', pickle.dumps({'equip_sn': 'stale', 'price': 1}))
+    assert cache.set_hash_data('equip_all', df, ttl=600)
+
+    assert not cache.client.exists(full_key)
+    assert 0 < cache.client.ttl(columnar_key) <= 600
+    assert list(cache.client.scan_iter(match='*:tmp_*')) == []
+    meta = pickle.loads(cache.client.hget(columnar_key, COLUMNAR_META_FIELD))
+    assert meta['total_count'] == 10 and meta['chunk_count'] == 3 and meta['key_column'] == 'equip_sn'
+
+    pd.testing.assert_frame_equal(cache.get_hash_data('equip_all'), df)
+    assert cache.get_hash_count('equip_all') == 10
+
+    # 再次全量写入替换整个快照
+    replacement = _frame(['x', 'y'], price_base=7)
+    assert cache.set_hash_data('equip_all', replacement)
+    pd.testing.assert_frame_equal(cache.get_hash_data('equip_all'), replacement)
+    assert cache.get_hash_count('equip_all') == 2
+
+
+def test_incremental_update_on_top_of_snapshot(cache):
+    """增量行覆盖快照中的同名行；增量达到阈值时合并进快照，只删除未被改写的增量行"""
+    full_key = cache._make_key('equip_all')
+    assert cache.set_hash_data('equip_all', _frame(['a', 'b', 'c']))
+    assert cache.update_hash_incremental('equip_all', _frame(['b', 'd'], price_base=200))
+
+    assert cache.client.hlen(full_key) == 2
+    merged = cache.get_hash_data('equip_all')
+    assert _prices(merged) == {'a': 100, 'b': 200, 'c': 102, 'd': 201}
+    # 快照行数 + 增量行数（近似值）
+    assert cache.get_hash_count('equip_all') == 5
+
+    # 增量达到阈值：读取时合并进新快照并清理增量行
+    cache.columnar_compact_rows = 2
+    assert _prices(cache.get_hash_data('equip_all')) == _prices(merged)
+    assert cache.client.hlen(full_key) == 0
+    assert cache.get_hash_count('equip_all') == 4
+    assert _prices(cache.get_hash_data('equip_all')) == _prices(merged)
+
+    # 读取之后又被改写的增量行不会被清理
+    cache.update_hash_incremental('equip_all', _frame(['e', 'f'], price_base=300))
+    field_digests = {}
+    cache._read_row_hash_data(full_key, cache.client.hlen(full_key), field_digests)
+    cache.update_hash_incremental('equip_all', _frame(['f'], price_base=999))
+    assert cache._remove_unchanged_row_fields(full_key, field_digests) == 1
+    assert cache.client.hkeys(full_key) == [b'f']
+    assert _prices(cache.get_hash_data('equip_all'))['f'] == 999
+
+
+def test_guarded_hdel_retries_when_hash_changes(cache, server, monkeypatch):
+    """比较字段期间行级Hash被其他客户端改写时重试，只删除未被改写的字段"""
+    full_key = cache._make_key('equip_all')
+    cache.update_hash_incremental('equip_all', _frame(['a', 'b', 'c']))
+    field_digests = {}
+    cache._read_row_hash_data(full_key, cache.client.hlen(full_key), field_digests)
+
+    other = fakeredis.FakeRedis(server=server)
+    original_pipeline = cache.client.pipeline
+    reads = []
+
+    def racing_pipeline(*args, **kwargs):
+        pipe = original_pipeline(*args, **kwargs)
+        hmget = pipe.hmget
+
+        def racing_hmget(*hmget_args):
+            values = hmget(*hmget_args)
+            if not reads:
+                # 第一次比较后、删除前：另一个进程改写了b
+                other.hset(full_key, 'b', pickle.dumps({'equip_sn': 'b', 'price': 1}))
+            reads.append(values)
+            return values
+        pipe.hmget = racing_hmget
+        return pipe
+
+    monkeypatch.setattr(cache.client, 'pipeline', racing_pipeline)
+    assert cache._remove_unchanged_row_fields(full_key, field_digests) == 2
+    assert len(reads) == 2
+    assert cache.client.hkeys(full_key) == [b'b']
+
+
+def test_legacy_row_hash_is_read_and_migrated(cache):
+    """旧版逐行Hash读取结果不变，读取后迁移为列式快照（主键列从字段名推断）"""
+    full_key = cache._make_key('role_all')
+    df = _frame(['r1', 'r2', 'r3'], key_column='eid')
+    cache.hash_storage_format = 'row'
+    assert cache.set_hash_data('role_all', df, ttl=600, key_column='eid')
+    assert cache.client.hlen(full_key) == 3
+    assert not cache.client.exists(cache._columnar_key(full_key))
+
+    cache.hash_storage_format = 'columnar'
+    legacy = cache.get_hash_data('role_all')
+    assert _prices(legacy, 'eid') == _prices(df, 'eid')
+
+    assert not cache.client.exists(full_key)
+    assert 0 < cache.client.ttl(cache._columnar_key(full_key)) <= 600
+    meta = pickle.loads(cache.client.get(f"{full_key}:meta"))
+    assert meta['structure'] == 'columnar' and meta['key_column'] == 'eid'
+
+    migrated = cache.get_hash_data('role_all')
+    assert _prices(migrated, 'eid') == _prices(df, 'eid')
+    assert cache.get_hash_count('role_all') == 3
+
+
+def test_rename_key_switches_columnar_snapshot(cache):
+    """重命名时列式快照和元数据一起切换，目标键上残留的行级增量被删除"""
+    staging_key = cache._make_key('equip_staging')
+    live_key = cache._make_key('equip_live')
+    assert cache.set_hash_data('equip_live', _frame(['old']))
+    cache.update_hash_incremental('equip_live', _frame(['old_delta']))
+    df = _frame(['a', 'b', 'c', 'd', 'e'])
+    assert cache.set_hash_data('equip_staging', df)
+
+    assert cache.rename_key('equip_staging', 'equip_live')
+
+    assert not cache.client.exists(staging_key)
+    assert not cache.client.exists(cache._columnar_key(staging_key))
+    assert not cache.client.exists(live_key)
+    assert pickle.loads(cache.client.get(f"{live_key}:meta"))['total_count'] == 5
+    pd.testing.assert_frame_equal(cache.get_hash_data('equip_live'), df)
+    assert cache.get_hash_count('equip_live') == 5
+    assert not cache.rename_key('equip_staging', 'equip_live')
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试Redis Streams更新日志：批量读取、确认、启动时重放未确认消息、断线期间的消息不丢失、停止时删除临时消费者组
+"""
+
+import sys
+import os
+import logging
+
+import pandas as pd
+import redis
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.utils import redis_update_stream
+from src.utils.redis_update_stream import RedisUpdateStream, stream_key
+from src.utils.redis_pubsub import RedisPubSub
+
+
+class _FakeStreamRedis:
+    """只实现Streams消费者组基本语义的Redis客户端（响应为bytes）"""
+
+    def __init__(self):
+        self.streams = {}  # key -> [(id, fields)]
+        self.groups = {}  # (key, group) -> {'last': id, 'pending': {consumer: [id]}}
+        self.sequence = 0
+        self.down = False
+
+    def pubsub(self):
+        return None
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        self.sequence += 1
+        entry_id = f"{1700000000000 + self.sequence}-0".encode()
+        entries = self.streams.setdefault(key, [])
+        entries.append((entry_id, {k.encode(): v for k, v in fields.items()}))
+        if maxlen is not None:
+            del entries[:-maxlen]
+        return entry_id
+
+    def xgroup_create(self, key, group, id='$', mkstream=False):
+        if (key, group) in self.groups:
+            raise redis.ResponseError('BUSYGROUP Consumer Group name already exists')
+        self.streams.setdefault(key, [])
+        self.groups[(key, group)] = {'last': b'0-0', 'pending': {}}
+
+    def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        if self.down:
+            raise redis.ConnectionError('connection refused')
+        response = []
+        for key, start in streams.items():
+            if (key, group) not in self.groups:
+                raise redis.ResponseError('NOGROUP No such key')
+            state = self.groups[(key, group)]
+            pending = state['pending'].setdefault(consumer, [])
+            entries = dict(self.streams.get(key, []))
+            if start == '>':
+                new = [(i, f) for i, f in self.streams.get(key, []) if self._id(i) > self._id(state['last'])][:count]
+                if new:
+                    state['last'] = new[-1][0]
+                    pending.extend(i for i, _ in new)
+                    response.append([key.encode(), new])
+            else:
+                response.append([key.encode(), [(i, entries.get(i)) for i in pending[:count]]])
+        return response
+
+    def xgroup_destroy(self, key, group):
+        return 1 if self.groups.pop((key, group), None) is not None else 0
+
+    def xack(self, key, group, *ids):
+        pending = self.groups[(key, group)]['pending']
+        for consumer in pending:
+            pending[consumer] = [i for i in pending[consumer] if i not in ids]
+        return len(ids)
+
+    @staticmethod
+    def _id(entry_id):
+        return tuple(int(part) for part in entry_id.decode().split('-'))
+
+
+def _make_pubsub(client, group='worker-1'):
+    pubsub = RedisPubSub(redis_client=client, binary_client=client, use_streams=True)
+    pubsub.update_stream = RedisUpdateStream(client, pubsub._dispatch, group=group)
+    return pubsub
+
+
+def test_stream_batch_read_and_replay(monkeypatch):
+    """消息写入更新日志后批量读取；未确认的消息在进程重启后重放，断线期间的消息恢复后读取"""
+    monkeypatch.setattr(redis_update_stream, 'STREAM_READ_COUNT', 3)
+    monkeypatch.setattr(RedisUpdateStream, 'start', lambda self: None)
+    client = _FakeStreamRedis()
+    publisher = RedisPubSub(redis_client=client, binary_client=client, use_streams=True)
+    publisher.logger = logging.getLogger(__name__)
+
+    received = []
+    subscriber = _make_pubsub(client)
+    subscriber.subscribe('equipment_updates', received.append)
+
+    df = pd.DataFrame({'equip_sn': ['a', 'b'], 'price': [1, 2]})
+    assert publisher.publish_with_dataframe('equipment_updates', {'type': 'equipment_data_saved'}, df)
+    for i in range(4):
+        assert publisher.publish('equipment_updates', {'type': 'refresh', 'seq': i})
+
+    # 先重放未确认消息（无），再按批量大小读取新消息
+    stream = subscriber.update_stream
+    assert stream.read_batch() == 0
+    assert stream.read_batch() == 3 and stream.read_batch() == 2
+    pd.testing.assert_frame_equal(received[0]['dataframe'], df)
+    assert [m.get('seq') for m in received[1:]] == [0, 1, 2, 3]
+    assert not any(client.groups[(stream_key('equipment_updates'), 'worker-1')]['pending'].values())
+
+    # 消息已投递但进程在确认前退出：重启后（同一消费者组）先重放
+    publisher.publish('equipment_updates', {'type': 'refresh', 'seq': 4})
+    monkeypatch.setattr(stream, 'dispatch', lambda channel, payload: (_ for _ in ()).throw(SystemExit()))
+    try:
+        stream.read_batch()
+    except SystemExit:
+        pass
+    restarted = []
+    subscriber = _make_pubsub(client)
+    subscriber.subscribe('equipment_updates', restarted.append)
+    assert subscriber.update_stream.read_batch() == 1 and restarted[-1]['seq'] == 4
+    assert subscriber.update_stream.read_batch() == 0
+
+    # 读取时连接断开：消息保留在Stream中，恢复后继续读取
+    publisher.publish('equipment_updates', {'type': 'refresh', 'seq': 5})
+    client.down = True
+    try:
+        subscriber.update_stream.read_batch()
+        assert False, "连接断开时应抛出异常"
+    except redis.ConnectionError:
+        pass
+    client.down = False
+    assert subscriber.update_stream.read_batch() == 1 and restarted[-1]['seq'] == 5
+
+    # 另一个进程（独立消费者组）同样收到全部更新
+    other = []
+    worker2 = _make_pubsub(client, group='worker-2')
+    worker2.subscribe('equipment_updates', other.append)
+    assert worker2.update_stream.read_batch() == 0
+    while worker2.update_stream.read_batch():
+        pass
+    assert [m.get('seq') for m in other] == [None, 0, 1, 2, 3, 4, 5]
+
+
+def test_stop_destroys_ephemeral_group(monkeypatch):
+    """未指定固定名称的消费者组在停止读取时删除；固定名称的消费者组保留"""
+    monkeypatch.delenv('MH_UPDATE_STREAM_GROUP', raising=False)
+    monkeypatch.setattr(RedisUpdateStream, 'start', lambda self: None)
+    client = _FakeStreamRedis()
+
+    ephemeral = RedisUpdateStream(client, lambda channel, payload: None)
+    assert ephemeral.ephemeral and ephemeral.group.endswith(f":{os.getpid()}")
+    ephemeral.add_channel('equipment_updates')
+    ephemeral.add_channel('pet_updates')
+    assert (stream_key('pet_updates'), ephemeral.group) in client.groups
+    ephemeral.stop()
+    assert not any(group == ephemeral.group for _, group in client.groups)
+
+    # 进程退出钩子删除仍在运行的临时读取器的消费者组
+    leftover = RedisUpdateStream(client, lambda channel, payload: None)
+    leftover.add_channel('equipment_updates')
+    redis_update_stream.destroy_ephemeral_groups()
+    assert (stream_key('equipment_updates'), leftover.group) not in client.groups
+
+    fixed = RedisUpdateStream(client, lambda channel, payload: None, group='worker-1')
+    fixed.add_channel('equipment_updates')
+    fixed.stop()
+    assert (stream_key('equipment_updates'), 'worker-1') in client.groups
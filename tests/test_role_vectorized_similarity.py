@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试角色特征矩阵（向量化）相似度与逐行标量相似度的一致性，以及锚点选择结果的一致性
+"""
+
+import sys
+import os
+import io
+import random
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor_evaluator import MarketAnchorEvaluator
+
+
+class _StubRoleCollector:
+    def __init__(self, market_data):
+        self.market_data = market_data
+
+    def get_market_data_for_similarity(self, filters):
+        return self.market_data.copy()
+
+
+def _random_role(rng: random.Random, i: int) -> dict:
+    role = {
+        'eid': f"r{i}",
+        'level': rng.choice([109, 129, 159, 175]),
+        'gender': rng.choice([0, 1]),
+        'price': rng.randint(100, 500000),
+        'rule_value': rng.choice([0, rng.randint(100, 50000)]),
+        'server_heat': rng.choice([0, rng.randint(1, 3000)]),
+        'all_new_point': rng.choice([0, 3, 5, 7]),
+        'three_fly_lv': rng.choice([0, 0, 1, 2, 3]),
+        'qianyuandan_breakthrough': rng.choice([0, 1]),
+        'school_history_count': rng.randint(0, 4),
+        'avg_school_skills': rng.choice([0, round(rng.uniform(140, 180), 2)]),
+        'total_qiangzhuang_shensu': rng.choice([0, rng.randint(100, 360)]),
+        'shenqi_score': rng.choice([0, 0, rng.randint(1, 2000)]),
+        'limited_skin_value': rng.choice([0, 0, rng.randint(100, 30000)]),
+        'limited_huge_horse_value': rng.choice([0, 0, rng.randint(100, 30000)]),
+        'jiyuan_amount': rng.choice([0, rng.randint(1, 80)]),
+        'xianyu_amount': rng.choice([0, rng.randint(1, 100000)]),
+        'sum_exp': rng.randint(0, 5000),
+        'packet_page': rng.randint(0, 6),
+    }
+    for field in MarketAnchorEvaluator.CULTIVATION_FIELDS:
+        role[field] = rng.choice([0, rng.randint(15, 25)])
+    for field in ('beast_ski1', 'beast_ski2', 'beast_ski3', 'beast_ski4'):
+        role[field] = rng.choice([0, rng.randint(15, 25)])
+    role['total_cultivation'] = sum(role[f] for f in MarketAnchorEvaluator.CULTIVATION_FIELDS[:4])
+    role['total_beast_cultivation'] = sum(role[f] for f in ('beast_ski1', 'beast_ski2', 'beast_ski3', 'beast_ski4'))
+    return role
+
+
+def _make_market(rng, count=300):
+    market = pd.DataFrame([_random_role(rng, i) for i in range(count)])
+    # 边界情况：None、NaN、非数值，以及物理/法术门派修炼相同的角色
+    market['expt_ski3'] = market['expt_ski3'].astype(object)
+    market.loc[3, 'expt_ski3'] = None
+    market['shenqi_score'] = market['shenqi_score'].astype(object)
+    market.loc[4, 'shenqi_score'] = 'bad'
+    market['server_heat'] = market['server_heat'].astype(float)
+    market.loc[5, 'server_heat'] = np.nan
+    market.loc[6, 'expt_ski1'] = market.loc[6, 'expt_ski3'] = 20
+    return market
+
+
+def _make_evaluator(market):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return MarketAnchorEvaluator(_StubRoleCollector(market))
+
+
+def test_vectorized_similarity_matches_scalar():
+    """特征矩阵相似度与逐行标量计算一致（含零值、NaN、None、字符串、缺失特征、修炼互换）"""
+    rng = random.Random(7)
+    market = _make_market(rng)
+    evaluator = _make_evaluator(market)
+    prepared = evaluator._prepare_market_matrix(market)
+    records = [evaluator._convert_pandas_row_to_dict(row) for _, row in market.iterrows()]
+
+    targets = [_random_role(rng, 1000 + i) for i in range(15)]
+    targets.append({'level': 129, 'expt_ski3': 25, 'lingyou_count': 3})  # 目标缺失大部分特征，含市场中没有的特征
+    targets.append({**targets[0], 'expt_ski1': None, 'rule_value': 0})
+    for target in targets:
+        vectorized = evaluator._calculate_similarity_vectorized(target, prepared)
+        scalar = [evaluator._calculate_similarity(target, record) for record in records]
+        np.testing.assert_allclose(vectorized, scalar, rtol=0, atol=1e-12)
+
+
+def test_find_market_anchors_matches_row_scoring():
+    """两种模式返回相同的锚点（eid、相似度、价格、特征，按相似度稳定排序）"""
+    rng = random.Random(3)
+    market = _make_market(rng)
+    # 复制部分角色，使前N个锚点中出现相同相似度
+    market = pd.concat([market, market.iloc[:40].assign(eid=lambda df: df['eid'] + '_copy')], ignore_index=True)
+    evaluator = _make_evaluator(market)
+    target = {k: v for k, v in market.iloc[10].to_dict().items() if k not in ('eid', 'price')}
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for vectorized in (False, True):
+            evaluator.vectorized_similarity = vectorized
+            results[vectorized] = evaluator.find_market_anchors(
+                target, similarity_threshold=0.5, max_anchors=15, verbose=False)
+
+    assert len(results[False]) == 15
+    assert results[True] == results[False]
+
+    # eid 作为 index 时从 index 获取
+    evaluator.market_collector = _StubRoleCollector(market.set_index('eid'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        anchors = evaluator.find_market_anchors(target, similarity_threshold=0.5, max_anchors=15, verbose=False)
+    assert [a['eid'] for a in anchors] == [a['eid'] for a in results[False]]
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试多进程共享的全量市场缓存：版本发布/挂载、写入进程选举、采集器按版本切换
+"""
+
+import sys
+import os
+import io
+import logging
+import contextlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.utils import shared_frame_store
+from src.evaluator.utils.shared_frame_store import SharedFrameStore
+from src.evaluator.market_anchor.equip.equip_market_data_collector import EquipMarketDataCollector
+
+
+def _sample_frame(rows=20, start=0):
+    return pd.DataFrame({
+        'equip_sn': [f"sn{start + i}" for i in range(rows)],
+        'kindid': np.full(rows, 61),
+        'price': np.arange(rows, dtype=np.float64) * 10,
+        'desc': [f"desc {i}" for i in range(rows)],
+        'gem_value': [[1, i] for i in range(rows)],
+        'server_id': pd.array([i if i % 3 else None for i in range(rows)], dtype='Int64'),
+    })
+
+
+def test_publish_attach_and_generation_swap(tmp_path, monkeypatch):
+    """发布后挂载结果一致，数值列为只读内存映射；新版本发布后读取方切换，旧版本被清理"""
+    monkeypatch.setattr(shared_frame_store, 'CHECK_INTERVAL_SECONDS', 0)
+    writer = SharedFrameStore('equipment_market', str(tmp_path))
+    reader = SharedFrameStore('equipment_market', str(tmp_path))
+    # 同一时间只有一个写入进程
+    assert writer.is_owner() and not reader.is_owner()
+
+    df = _sample_frame()
+    df.index = np.arange(100, 120)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert reader.poll(None) is None
+        generation = writer.publish(df)
+        attached_generation, attached = reader.poll(None)
+    assert attached_generation == generation
+    pd.testing.assert_frame_equal(attached, df)
+    price = attached['price'].to_numpy()
+    assert not price.flags.writeable
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert reader.poll(generation) is None
+        for start in (20, 40, 60):
+            latest = writer.publish(_sample_frame(start=start))
+        latest_generation, latest_data = reader.poll(generation)
+    assert latest_generation == latest and latest_data['equip_sn'].iloc[0] == 'sn60'
+    assert sorted(writer._list_generations()) == [latest - 1, latest]
+    # 已挂载的旧版本在目录删除后仍可读取
+    assert attached['price'].sum() == df['price'].sum()
+
+
+def test_attached_frame_keeps_column_types(tmp_path):
+    """挂载结果与写入进程的内存数据类型一致（object列中的时间/Decimal/元组等、类别、带时区时间、可空整数）"""
+    rows = 8
+    df = pd.DataFrame({
+        'equip_sn': [f"sn{i}" for i in range(rows)],
+        'price': np.arange(rows, dtype=np.float64),
+        'update_time': pd.date_range('2025-01-01', periods=rows, freq='h'),
+        'create_time': [datetime(2025, 1, 1, i) if i % 3 else None for i in range(rows)],
+        'fee': [Decimal(f"{i}.5") for i in range(rows)],
+        'pos': [(i, i + 1) for i in range(rows)],
+        'raw_attrs': [{1: 'x', 'k': (i,)} for i in range(rows)],
+        'server_id': pd.array([i if i % 3 else None for i in range(rows)], dtype='Int64'),
+        'grade': pd.Categorical(['A' if i % 2 else 'B' for i in range(rows)], categories=['C', 'B', 'A']),
+        'sold_at': pd.Series(pd.date_range('2025-01-01', periods=rows, freq='D', tz='Asia/Shanghai')),
+    }, index=pd.Index([date(2025, 1, i + 1) for i in range(rows)], name='day'))
+
+    store = SharedFrameStore('equipment_market', str(tmp_path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        store.publish(df)
+    _, attached = store.attach()
+    pd.testing.assert_frame_equal(attached, df)
+    assert list(attached.dtypes) == list(df.dtypes)
+    for column in df.columns:
+        assert [type(value) for value in attached[column]] == [type(value) for value in df[column]], column
+    assert [type(value) for value in attached.index] == [type(value) for value in df.index]
+
+
+def _make_equip_collector(store):
+    collector = object.__new__(EquipMarketDataCollector)
+    collector.logger = logging.getLogger(__name__)
+    collector.redis_cache = None
+    collector._full_data_cache = None
+    collector._market_index = None
+    collector._shared_store = store
+    collector._shared_generation = None
+    collector._snapshot_store = store
+    return collector
+
+
+def test_collectors_share_full_cache(tmp_path, monkeypatch):
+    """非写入进程挂载共享缓存并跳过更新消息；写入进程合并更新后发布，其他进程切换到新版本"""
+    monkeypatch.setattr(shared_frame_store, 'CHECK_INTERVAL_SECONDS', 0)
+    monkeypatch.setattr(EquipMarketDataCollector, 'attach_precomputed_features', lambda self, data: data)
+    owner_store = SharedFrameStore('equipment_market', str(tmp_path))
+    worker_store = SharedFrameStore('equipment_market', str(tmp_path))
+    assert owner_store.is_owner()
+    # 延迟发布改为立即发布
+    monkeypatch.setattr(SharedFrameStore, 'schedule_publish', lambda self, get_data, delay=0: self.publish(get_data()))
+
+    owner = _make_equip_collector(owner_store)
+    worker = _make_equip_collector(worker_store)
+    full_data = _sample_frame(50)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        owner._full_data_cache = full_data
+        owner._publish_shared_cache()
+        assert worker._attach_shared_cache()
+        pd.testing.assert_frame_equal(worker._full_data_cache, full_data)
+
+        # 更新消息：非写入进程不修改自己的缓存，写入进程合并后发布
+        new_rows = _sample_frame(10, start=45)
+        message = {'type': 'equipment_data_saved', 'action': 'add_dataframe', 'dataframe': new_rows}
+        attached = worker._full_data_cache
+        worker._handle_equipment_update_message(message)
+        assert worker._full_data_cache is attached
+
+        monkeypatch.setattr(EquipMarketDataCollector, '_async_sync_to_redis', lambda self, data=None: None)
+        owner._handle_equipment_update_message(message)
+        assert len(owner._full_data_cache) == 55
+
+        assert worker._attach_shared_cache()
+        assert list(worker._full_data_cache['equip_sn']) == list(owner._full_data_cache['equip_sn'])
+
+
+def test_cold_start_from_snapshot(tmp_path, monkeypatch):
+    """冷启动时挂载快照并只补齐水位之后的增量；过期快照不使用"""
+    snapshot_store = SharedFrameStore('equipment_market', str(tmp_path))
+    full_data = _sample_frame(30)
+    full_data['update_time'] = pd.date_range('2025-03-01', periods=30, freq='h').strftime('%Y-%m-%dT%H:%M:%S')
+    with contextlib.redirect_stdout(io.StringIO()):
+        generation = snapshot_store.publish(full_data)
+    assert snapshot_store.read_manifest(generation)['watermark'] == full_data['update_time'].iloc[-1]
+
+    delta = _sample_frame(5, start=28)
+    delta['price'] = -1.0
+    delta['update_time'] = '2025-03-02T08:00:00'
+    requested = []
+
+    def fake_incremental(self, since):
+        requested.append(since)
+        return delta.copy()
+
+    monkeypatch.setattr(EquipMarketDataCollector, '_get_incremental_data_from_mysql_removed', fake_incremental)
+    monkeypatch.setattr(EquipMarketDataCollector, 'attach_precomputed_features', lambda self, data: data)
+    collector = _make_equip_collector(None)
+    collector.redis_cache = object()
+    collector._snapshot_store = snapshot_store
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = collector._get_full_data_from_redis()
+    # 增量从水位向前多取一段时间
+    watermark = pd.Timestamp(full_data['update_time'].iloc[-1])
+    assert requested == [watermark - pd.Timedelta(seconds=shared_frame_store.SNAPSHOT_DELTA_OVERLAP_SECONDS)]
+    assert len(data) == 33 and collector._full_data_cache is data
+    prices = data.set_index('equip_sn')['price']
+    assert (prices[[f"sn{i}" for i in range(28, 33)]] == -1).all() and prices['sn0'] == 0
+
+    # 快照过期：不挂载
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert snapshot_store.attach_snapshot(max_age_hours=0) is None
+
+
+def _with_features(data, version='v0'):
+    data = data.copy()
+    data['feat_level'] = np.zeros(len(data))
+    data['feature_version'] = version
+    return data
+
+
+def _reextracted_rows(data, positions, version='v1'):
+    rows = data.iloc[positions].copy()
+    rows['feat_level'] = [float(100 + position) for position in positions]
+    rows['feature_version'] = version
+    return rows
+
+
+def test_write_back_into_attached_shared_cache(tmp_path, monkeypatch, caplog):
+    """挂载的共享缓存为只读：非写入进程不回写；接替写入的进程复制到私有内存后回写并发布"""
+    monkeypatch.setattr(shared_frame_store, 'CHECK_INTERVAL_SECONDS', 0)
+    monkeypatch.setattr(SharedFrameStore, 'schedule_publish', lambda self, get_data, delay=0: self.publish(get_data()))
+    owner_store = SharedFrameStore('equipment_market', str(tmp_path))
+    worker_store = SharedFrameStore('equipment_market', str(tmp_path))
+    assert owner_store.is_owner()
+    full_data = _with_features(_sample_frame(10))
+    # 进程私有的数据原样返回，不复制
+    assert shared_frame_store.ensure_writable(full_data) is full_data
+
+    worker = _make_equip_collector(worker_store)
+    rows = _reextracted_rows(full_data, [1, 2])
+    with contextlib.redirect_stdout(io.StringIO()), caplog.at_level(logging.WARNING):
+        owner_store.publish(full_data)
+        assert worker._attach_shared_cache()
+        attached = worker._full_data_cache
+        worker._write_back_precomputed_features(rows)
+        assert worker._full_data_cache is attached
+        assert (attached['feat_level'] == 0).all()
+
+        # 写入进程退出，本进程接替：挂载的版本复制后回写
+        owner_store._owner_file.close()
+        owner_store._owner_file = None
+        assert worker_store.is_owner()
+        worker._write_back_precomputed_features(rows)
+    assert not caplog.records
+    assert worker._full_data_cache is not attached
+    assert list(worker._full_data_cache['feat_level'].iloc[:4]) == [0, 101, 102, 0]
+    assert (attached['feat_level'] == 0).all()
+    # 回写后发布新版本
+    _, published = SharedFrameStore('equipment_market', str(tmp_path)).attach()
+    pd.testing.assert_frame_equal(published, worker._full_data_cache)
+
+
+def test_write_back_into_frame_loaded_from_snapshot(tmp_path, monkeypatch, caplog):
+    """冷启动挂载快照（没有增量）后全量缓存可原地回写，快照文件不受影响"""
+    snapshot_store = SharedFrameStore('equipment_market', str(tmp_path))
+    full_data = _with_features(_sample_frame(10))
+    full_data['update_time'] = '2025-03-01T00:00:00'
+    monkeypatch.setattr(EquipMarketDataCollector, '_get_incremental_data_from_mysql_removed',
+                        lambda self, since: pd.DataFrame())
+    collector = _make_equip_collector(None)
+    collector.redis_cache = object()
+    collector._snapshot_store = snapshot_store
+
+    with contextlib.redirect_stdout(io.StringIO()), caplog.at_level(logging.WARNING):
+        snapshot_store.publish(full_data)
+        data = collector._get_full_data_from_redis()
+        collector._write_back_precomputed_features(_reextracted_rows(full_data, [3]))
+    assert not caplog.records
+    assert collector._full_data_cache is data
+    assert data['feat_level'].iloc[3] == 103 and data['feature_version'].iloc[3] == 'v1'
+    _, snapshot = snapshot_store.attach()
+    assert (snapshot['feat_level'] == 0).all()
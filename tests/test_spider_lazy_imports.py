@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试爬虫子进程的延迟导入：导入爬虫模块时不加载pandas、SQLAlchemy、Flask、Playwright等重量级依赖
+"""
+
+import sys
+import os
+import subprocess
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from tests.benchmark_spider_startup import DEFERRED_MODULES
+
+
+def _loaded_modules(code):
+    """在新进程中执行代码，返回已加载的重量级依赖"""
+    check = (f"{code}\nimport sys\n"
+             f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', check], cwd=project_root,
+                            capture_output=True, text=True, check=True)
+    lines = result.stdout.strip().splitlines()
+    return [name for name in (lines[-1] if lines else '').split(',') if name]
+
+
+def test_spider_module_defers_heavy_imports():
+    assert _loaded_modules('import src.spider.equip') == []
+
+
+def test_package_exports_still_available():
+    loaded = _loaded_modules('import src, src.utils')
+    assert loaded == []
+
+    import src
+    import src.utils
+    from src.utils.smart_db_helper import SmartDBHelper
+    assert src.SmartDBHelper is SmartDBHelper
+    assert src.utils.CBGSmartDB is not None
+    assert callable(src.utils.load_jsonc)
+    assert src.ProxySourceManager is None or src.ProxySourceManager
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试套装效果相似度查找表与原逐个列表判断的规则一致（含鞋子/饰品的限制规则）
+"""
+
+import sys
+import os
+import itertools
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from src.evaluator.market_anchor.equip.constant import (
+    get_agility_suits_detailed, get_magic_suits_detailed
+)
+from src.evaluator.market_anchor.equip.suit_effect_table import SuitEffectTable
+
+
+def _reference_similarity(target_val, market_val, target_kindid, market_kindid):
+    """原逐个列表判断的套装效果相似度"""
+    if target_val == market_val:
+        return 1.0
+    if target_val == 0 or market_val == 0:
+        return 0.1
+    agility_suits = get_agility_suits_detailed()
+    magic_suits = get_magic_suits_detailed()
+
+    def get_suit_info(suit_id):
+        if suit_id in agility_suits['B']:
+            return ('agility', 'B')
+        elif suit_id in agility_suits['A']:
+            return ('agility', 'A')
+        elif suit_id in magic_suits['B']:
+            return ('magic', 'B')
+        elif suit_id in magic_suits['A']:
+            return ('magic', 'A')
+        return (None, None)
+
+    target_type, target_grade = get_suit_info(target_val)
+    market_type, market_grade = get_suit_info(market_val)
+    if target_type is not None and market_type is not None:
+        is_restricted_agility = target_kindid in [19] and market_kindid in [19] and target_kindid == market_kindid
+        is_restricted_magic = target_kindid in [21] and market_kindid in [21] and target_kindid == market_kindid
+        if (is_restricted_agility or is_restricted_magic) and target_type != market_type:
+            return 0.0
+        if target_type == market_type and target_grade == market_grade:
+            return 0.8
+        elif target_type != market_type and target_grade == market_grade:
+            return 0.5
+        elif target_type == market_type and target_grade != market_grade:
+            return 0.5
+        elif target_type != market_type and target_grade != market_grade:
+            return 0.2
+    return 0.2
+
+
+def _suit_values():
+    agility = get_agility_suits_detailed()
+    magic = get_magic_suits_detailed()
+    suits = agility['A'][:2] + agility['B'][:2] + magic['A'][:2] + magic['B'][:2]
+    return suits + [0, 4002, -1, float(suits[0]), np.int64(suits[-1]), 'x', float('nan'), 10 ** 6]
+
+
+def test_scalar_lookup_matches_reference():
+    """标量查表与原规则一致"""
+    table = SuitEffectTable.from_config()
+    values = _suit_values()
+    for target_val, market_val in itertools.product(values, values):
+        for target_kindid, market_kindid in [(19, 19), (21, 21), (19, 21), (17, 17), (20, 19)]:
+            assert table.similarity(target_val, market_val, target_kindid, market_kindid) == \
+                _reference_similarity(target_val, market_val, target_kindid, market_kindid)
+
+
+def test_array_lookup_matches_scalar():
+    """数组查表（数值ID批量、其余逐个）与标量查表一致"""
+    table = SuitEffectTable.from_config()
+    values = _suit_values()
+    market_kindids = [19, 21, 19, 17] * (len(values) // 4 + 1)
+    for target_val in values:
+        for target_kindid in (19, 21, 17):
+            result = table.similarity_array(target_val, values, target_kindid, market_kindids[:len(values)])
+            expected = [table.similarity(target_val, value, target_kindid, kindid)
+                        for value, kindid in zip(values, market_kindids)]
+            np.testing.assert_array_equal(result, expected)